@@ -0,0 +1,177 @@
+"""
+Benchmark do cliente assíncrono contra o CalendarManager em um pool de threads.
+Um servidor HTTP/1.1 falso responde a listagem de eventos com latência fixa (sem HTTP/2,
+então o cliente assíncrono também usa uma conexão por chamada em andamento). Cada modo
+roda em um subprocesso próprio, com N chamadas em andamento ao mesmo tempo, medindo a
+vazão e a memória (RSS) por chamada em andamento.
+
+Uso:
+    python bench/async_calendar_bench.py --concurrency 500 --calls 5000 --latency-ms 100
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import threading
+import subprocess
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+from google.oauth2.credentials import Credentials
+
+# Os módulos do bot ficam em src/ (importados nos modos que os usam, para medir a memória de cada um)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+def rss_kib():
+    """Memória residente do processo em KiB"""
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    return 0
+
+class FakeAuth:
+    """Credenciais válidas para qualquer usuário; serviços apontando para o servidor falso"""
+
+    def __init__(self, base_url=None, transport=None):
+        self.base_url = base_url
+        self.transport = transport
+
+    def get_credentials(self, user_id):
+        return Credentials(token=f"token-{user_id}", expiry=datetime.utcnow() + timedelta(hours=1))
+
+    def refresh_credentials(self, user_id, creds):
+        return False
+
+    def get_calendar_service(self, user_id):
+        from googleapiclient.discovery import build
+        return build('calendar', 'v3', http=self.transport.http_for(self.get_credentials(user_id)),
+                     client_options={'api_endpoint': self.base_url + 'calendar/v3/'}, cache_discovery=False)
+
+class PeakSampler:
+    """Amostra o RSS em segundo plano e guarda o pico"""
+
+    def __init__(self):
+        self.peak = rss_kib()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(0.01):
+            self.peak = max(self.peak, rss_kib())
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.peak
+
+def run_threads(args, base_url):
+    """CalendarManager síncrono: uma thread por chamada em andamento"""
+    from calendar_manager import CalendarManager
+    from http_transport import PooledTransport
+
+    manager = CalendarManager(FakeAuth(base_url, PooledTransport(pool_size=args.concurrency)))
+    manager.list_events('0')  # Aquecimento (imports, discovery)
+    baseline = rss_kib()
+    sampler = PeakSampler()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(lambda index: manager.list_events(str(index))[0], range(args.calls)))
+    elapsed = time.perf_counter() - started
+    return elapsed, sum(results), sampler.stop() - baseline
+
+def run_async(args, base_url):
+    """AsyncCalendarManager: todas as chamadas no loop de eventos"""
+    from async_calendar import AsyncCalendarManager
+
+    async def main():
+        manager = AsyncCalendarManager(FakeAuth(), base_url=base_url + 'calendar/v3/',
+                                       http2=False, max_connections=args.concurrency)
+        await manager.list_events('0')
+        baseline = rss_kib()
+        sampler = PeakSampler()
+        pending = iter(range(args.calls))
+        ok = 0
+
+        async def worker():
+            nonlocal ok
+            for index in pending:
+                success, _ = await manager.list_events(str(index))
+                ok += success
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+        peak = sampler.stop()
+        await manager.aclose()
+        return elapsed, ok, peak - baseline
+
+    return asyncio.run(main())
+
+async def serve(args):
+    """Servidor HTTP/1.1 falso da API (keep-alive), até o processo pai encerrar"""
+    payload = json.dumps({'items': [{'id': 'evt', 'summary': 'Reunião',
+                                     'start': {'dateTime': '2026-10-20T10:00:00-03:00'}}]}).encode()
+    response = (f"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(payload)}\r\n\r\n").encode() + payload
+
+    async def handle(reader, writer):
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                for line in head.split(b"\r\n"):
+                    if line.lower().startswith(b"content-length:"):
+                        await reader.readexactly(int(line.split(b":")[1]))
+                await asyncio.sleep(args.latency_ms / 1000)
+                writer.write(response)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+
+    # Backlog grande: todos os clientes conectam ao mesmo tempo no início
+    await asyncio.start_server(handle, '127.0.0.1', args.port, backlog=4096)
+    print("pronto", flush=True)
+    await asyncio.Event().wait()
+
+def main():
+    """Sobe o servidor e executa cada modo em um subprocesso"""
+    parser = argparse.ArgumentParser(description="Benchmark do cliente assíncrono do Calendar")
+    parser.add_argument('--concurrency', type=int, default=500)
+    parser.add_argument('--calls', type=int, default=5000)
+    parser.add_argument('--latency-ms', type=float, default=100)
+    parser.add_argument('--port', type=int, default=8787)
+    parser.add_argument('--mode', choices=('server', 'threads', 'async'))
+    args = parser.parse_args()
+    base_url = f"http://127.0.0.1:{args.port}/"
+
+    if args.mode == 'server':
+        asyncio.run(serve(args))
+        return
+    if args.mode:
+        runner = run_threads if args.mode == 'threads' else run_async
+        elapsed, ok, memory = runner(args, base_url)
+        print(json.dumps({'elapsed': elapsed, 'ok': ok, 'memory_kib': memory}))
+        return
+
+    common = ['--concurrency', str(args.concurrency), '--calls', str(args.calls),
+              '--latency-ms', str(args.latency_ms), '--port', str(args.port)]
+    server = subprocess.Popen([sys.executable, __file__, '--mode', 'server'] + common,
+                              stdout=subprocess.PIPE, text=True)
+    try:
+        server.stdout.readline()
+        for mode, label in (('threads', "CalendarManager + threads"), ('async', "AsyncCalendarManager")):
+            output = subprocess.run([sys.executable, __file__, '--mode', mode] + common,
+                                    capture_output=True, text=True, check=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{label}: {args.calls / result['elapsed']:.0f} chamadas/s "
+                  f"({result['ok']}/{args.calls} ok), memória por chamada em andamento: "
+                  f"{result['memory_kib'] / args.concurrency:.1f} KiB")
+    finally:
+        server.terminate()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Benchmark dos disjuntores durante uma queda simulada da API do Google Calendar.
+Um serviço falso responde rápido, passa a esperar o timeout e falhar por um período e
+depois se recupera. Usuários simulados listam eventos o tempo todo; o benchmark mede a
+latência das chamadas com e sem disjuntor e quantas chegaram à API durante a queda.
+
+Uso:
+    python bench/circuit_bench.py --users 200 --timeout-ms 2000 --outage 6
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Os módulos do bot ficam em src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from calendar_manager import CalendarManager, CIRCUIT_OPEN_MESSAGE
+from circuit_breaker import CalendarCircuit
+
+class FakeService:
+    """Imita service.events().list(...).execute() com latência e falhas controladas"""
+
+    def __init__(self, api):
+        self.api = api
+
+    def events(self):
+        return self
+
+    def list(self, **params):
+        return self
+
+    def execute(self):
+        return self.api.execute()
+
+class FakeAPI:
+    """API que fica fora do ar entre outage_start e outage_end (timeout e erro de conexão)"""
+
+    def __init__(self, latency, timeout):
+        self.latency = latency
+        self.timeout = timeout
+        self.outage = (0, 0)
+        self.calls = 0
+        self.calls_during_outage = 0
+        self.lock = threading.Lock()
+
+    def execute(self):
+        now = time.monotonic()
+        down = self.outage[0] <= now < self.outage[1]
+        with self.lock:
+            self.calls += 1
+            self.calls_during_outage += down
+        if down:
+            time.sleep(self.timeout)
+            raise TimeoutError("timed out")
+        time.sleep(self.latency)
+        return {'items': []}
+
+class FakeAuth:
+    def __init__(self, api):
+        self.service = FakeService(api)
+
+    def get_calendar_service(self, user_id):
+        return self.service
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))] if values else 0.0
+
+async def run(args, circuit):
+    """Simula usuários consultando a agenda antes, durante e depois da queda"""
+    api = FakeAPI(args.latency_ms / 1000, args.timeout_ms / 1000)
+    manager = CalendarManager(FakeAuth(api), circuit)
+    executor = ThreadPoolExecutor(max_workers=args.threads)
+    loop = asyncio.get_running_loop()
+    started = time.monotonic()
+    api.outage = (started + args.warmup, started + args.warmup + args.outage)
+    end = api.outage[1] + args.recovery
+    latencies, errors, rejected = [], 0, 0
+
+    async def user(user_id):
+        nonlocal errors, rejected
+        while time.monotonic() < end:
+            call_started = time.monotonic()
+            success, result = await loop.run_in_executor(executor, manager.list_events, user_id)
+            latencies.append(time.monotonic() - call_started)
+            if not success:
+                errors += 1
+                rejected += result == CIRCUIT_OPEN_MESSAGE
+            await asyncio.sleep(args.think_ms / 1000)
+
+    await asyncio.gather(*(user(str(index)) for index in range(args.users)))
+    executor.shutdown(wait=False)
+    return api, latencies, errors, rejected
+
+async def main():
+    """Executa o benchmark com e sem disjuntor e imprime os resultados"""
+    parser = argparse.ArgumentParser(description="Benchmark dos disjuntores")
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--latency-ms', type=float, default=20)
+    parser.add_argument('--timeout-ms', type=float, default=2000)
+    parser.add_argument('--think-ms', type=float, default=200)
+    parser.add_argument('--warmup', type=float, default=2)
+    parser.add_argument('--outage', type=float, default=6)
+    parser.add_argument('--recovery', type=float, default=4)
+    args = parser.parse_args()
+
+    for label, circuit in (("sem disjuntor", None),
+                           ("com disjuntor", CalendarCircuit(min_calls=20, open_seconds=2, slow_call=1))):
+        api, latencies, errors, rejected = await run(args, circuit)
+        print(f"{label}: {len(latencies)} chamadas, p50 {1000 * percentile(latencies, 0.5):.0f}ms, "
+              f"p99 {1000 * percentile(latencies, 0.99):.0f}ms, máx {1000 * max(latencies):.0f}ms")
+        print(f"  erros: {errors} (recusadas pelo disjuntor: {rejected}), "
+              f"chamadas à API durante a queda: {api.calls_during_outage}")
+        if circuit:
+            print(f"  {circuit.get_stats()}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,55 @@
+"""
+Benchmark da gramática de datas contra a cascata de expressões regulares que ela substituiu.
+A cascata antiga (extract_date/extract_time da versão anterior do NLPProcessor) fica em
+tests/date_cascade.py, oráculo dos casos de referência, e é usada aqui para comparar vazão e resultados.
+
+Uso:
+    python bench/date_grammar_bench.py --messages 20000 --repeat 3
+"""
+
+import os
+import sys
+import time
+import argparse
+from datetime import date
+
+# Os módulos do bot ficam em src/ e a cascata antiga, em tests/
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT_DIR, 'src'), os.path.join(ROOT_DIR, 'tests')]
+
+from date_grammar import DateTimeParser
+from date_cascade import grammar_parse, legacy_parse
+from process_messages_bench import build_messages
+
+def main():
+    """Mede a vazão das duas implementações sobre as mesmas mensagens"""
+    parser = argparse.ArgumentParser(description="Benchmark da gramática de datas")
+    parser.add_argument('--messages', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    messages = build_messages(args.messages)
+    today = date(2026, 10, 19)
+    grammar = DateTimeParser()
+
+    implementations = (
+        ("cascata de regex", lambda text: legacy_parse(text, today)),
+        ("gramática", lambda text: grammar_parse(grammar, text, today)),
+    )
+    outputs = {}
+    for label, parse in implementations:
+        best = float('inf')
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            results = [parse(text) for text in messages]
+            best = min(best, time.perf_counter() - started)
+        outputs[label] = results
+        print(f"{label:<18} {len(messages) / best:10.0f} msg/s ({1e6 * best / len(messages):.1f} µs/msg)")
+
+    legacy, current = outputs.values()
+    differing = sum(old != new for old, new in zip(legacy, current))
+    print(f"Resultados diferentes da cascata: {differing} de {len(messages)} "
+          f"(correções esperadas; ver tests/test_date_grammar.py)")
+
+if __name__ == "__main__":
+    main()
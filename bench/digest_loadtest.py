@@ -0,0 +1,163 @@
+"""
+Teste de carga do resumo diário com usuários simulados.
+A API do Google e a Bot API são substituídas por funções com latência artificial;
+o envio passa pelo limitador real. Com --interrupt-after, a execução é cancelada no meio
+e retomada pelo checkpoint, conferindo que ninguém recebe o resumo duas vezes. Com
+--kill-after, o primeiro envio roda em um subprocesso morto com SIGKILL (como em um OOM):
+só envios em andamento no instante da morte podem se repetir na retomada.
+
+Uso:
+    python bench/digest_loadtest.py --users 50000 --send-rate 2000 --interrupt-after 20000
+    python bench/digest_loadtest.py --users 50000 --send-rate 2000 --kill-after 20000
+"""
+
+import os
+import sys
+import time
+import json
+import random
+import signal
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from collections import Counter
+from datetime import date
+
+import pytz
+
+# Os módulos do bot ficam em src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from digest import DigestCheckpoint, DigestPipeline
+from rate_limiter import FloodControlRateLimiter
+
+class FakeCalendarManager:
+    """Agenda simulada: 0 a 6 eventos por usuário, com latência de rede"""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def list_events(self, user_id, time_min=None, time_max=None, max_results=10):
+        time.sleep(self.latency)
+        rng = random.Random(user_id)
+        day = time_min[:10]
+        events = []
+        for hour in sorted(rng.sample(range(7, 20), rng.randint(0, 6))):
+            events.append({
+                'start': {'dateTime': f"{day}T{hour:02d}:00:00-03:00"},
+                'end': {'dateTime': f"{day}T{hour:02d}:45:00-03:00"},
+                'summary': f"Compromisso {hour}h",
+            })
+        return True, events
+
+class FakeBot:
+    """Bot simulado: cada envio passa pelo limitador e espera a latência da Bot API"""
+
+    def __init__(self, limiter, latency, log_path=None):
+        self.limiter = limiter
+        self.latency = latency
+        self.deliveries = Counter()
+        # Entregas também vão para um arquivo, para contar as de um processo morto
+        self.log = open(log_path, 'a', buffering=1) if log_path else None
+
+    async def send_message(self, chat_id, text, rate_limit_args=None):
+        async def deliver():
+            await asyncio.sleep(self.latency)
+            self.deliveries[chat_id] += 1
+            if self.log:
+                self.log.write(f"{chat_id}\n")
+        await self.limiter.process_request(deliver, (), {}, 'sendMessage', {'chat_id': chat_id}, rate_limit_args)
+
+async def run_once(pipeline, day, interrupt_after=None):
+    """Executa o pipeline, interrompendo depois de interrupt_after envios se pedido"""
+    task = asyncio.create_task(pipeline.run(day))
+    if interrupt_after:
+        while not task.done() and pipeline.sent < interrupt_after:
+            await asyncio.sleep(0.05)
+        task.cancel()
+    try:
+        return await task
+    except asyncio.CancelledError:
+        return None
+
+def kill_child(args, workdir, deliveries_path):
+    """Roda o envio em um subprocesso e o mata com SIGKILL após kill_after entregas"""
+    command = [sys.executable, __file__, '--child', workdir, '--users', str(args.users),
+               '--concurrency', str(args.concurrency), '--api-rate', str(args.api_rate),
+               '--api-latency-ms', str(args.api_latency_ms), '--send-rate', str(args.send_rate),
+               '--send-latency-ms', str(args.send_latency_ms)]
+    child = subprocess.Popen(command)
+    delivered = 0
+    while child.poll() is None and delivered < args.kill_after:
+        time.sleep(0.02)
+        if os.path.exists(deliveries_path):
+            with open(deliveries_path) as f:
+                delivered = sum(1 for _ in f)
+    child.send_signal(signal.SIGKILL)
+    child.wait()
+    with open(deliveries_path) as f:
+        return sum(1 for _ in f)
+
+async def main():
+    """Executa o teste e imprime as métricas"""
+    parser = argparse.ArgumentParser(description="Teste de carga do resumo diário")
+    parser.add_argument('--users', type=int, default=50000)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--api-rate', type=float, default=5000)
+    parser.add_argument('--api-latency-ms', type=float, default=20)
+    parser.add_argument('--send-rate', type=float, default=2000)
+    parser.add_argument('--send-latency-ms', type=float, default=10)
+    parser.add_argument('--interrupt-after', type=int, default=0)
+    parser.add_argument('--kill-after', type=int, default=0)
+    parser.add_argument('--child', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    limiter = FloodControlRateLimiter(global_rate=args.send_rate)
+    await limiter.initialize()
+    day = date.today()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # O subprocesso usa o checkpoint e o registro de entregas do processo pai
+        workdir = args.child or tmp
+        checkpoint_path = os.path.join(workdir, "digest_checkpoint.txt")
+        deliveries_path = os.path.join(workdir, "deliveries.txt")
+        bot = FakeBot(limiter, args.send_latency_ms / 1000, deliveries_path)
+
+        def make_pipeline():
+            return DigestPipeline(
+                bot, FakeCalendarManager(args.api_latency_ms / 1000),
+                list_users=lambda: (str(100000 + i) for i in range(args.users)),
+                checkpoint=DigestCheckpoint(checkpoint_path),
+                timezone=pytz.timezone('America/Sao_Paulo'),
+                concurrency=args.concurrency, api_rate=args.api_rate
+            )
+
+        if args.child:
+            await run_once(make_pipeline(), day)
+            return
+
+        started = time.perf_counter()
+        if args.interrupt_after:
+            first = make_pipeline()
+            await run_once(first, day, args.interrupt_after)
+            print(f"Interrompido após {first.sent} envios; retomando pelo checkpoint")
+        if args.kill_after:
+            killed_after = kill_child(args, tmp, deliveries_path)
+            print(f"Processo morto com SIGKILL após {killed_after} envios; retomando pelo checkpoint")
+
+        pipeline = make_pipeline()
+        stats = await run_once(pipeline, day)
+        elapsed = time.perf_counter() - started
+        with open(deliveries_path) as f:
+            deliveries = Counter(int(line) for line in f)
+
+    await limiter.shutdown()
+
+    duplicates = sum(1 for count in deliveries.values() if count > 1)
+    print(f"Usuários: {args.users} em {elapsed:.1f}s ({args.users / elapsed:.0f} usuários/s)")
+    print(f"Resumos entregues: {sum(deliveries.values())}, usuários com envio duplicado: {duplicates}")
+    print(f"Última execução: {json.dumps(stats, indent=2)}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
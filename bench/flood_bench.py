@@ -0,0 +1,127 @@
+"""
+Benchmark do controle de envio contra uma Bot API falsa.
+O servidor falso aplica limites parecidos com os do Telegram (global e por chat) e
+responde 429 com retry_after quando são excedidos. Um envio em massa é disparado
+junto com respostas interativas para medir vazão, RetryAfter e espera por prioridade.
+
+Uso:
+    python bench/flood_bench.py --broadcast 300 --chats 100 --interactive 20
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from urllib.parse import parse_qs
+from telegram.ext import ExtBot
+
+# Os módulos do bot ficam em src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from rate_limiter import FloodControlRateLimiter, PRIORITY_BROADCAST, PRIORITY_INTERACTIVE
+from webhook_server import WebhookServer
+
+TOKEN = "123456:fake"
+
+class FakeBotAPI:
+    """Responde sendMessage aplicando limites global e por chat"""
+
+    def __init__(self, global_rate, chat_interval):
+        self.global_rate = global_rate
+        self.chat_interval = chat_interval
+        self._recent = []  # instantes dos envios aceitos no último segundo
+        self._last_by_chat = {}
+        self._message_id = 0
+        self.accepted = 0
+        self.rejected = 0
+
+    async def get_me(self, method, query, body):
+        """Handler da rota /bot<token>/getMe, chamada ao inicializar o bot"""
+        return 200, json.dumps({'ok': True, 'result': {
+            'id': int(TOKEN.split(':')[0]), 'is_bot': True, 'first_name': "Bench", 'username': "bench_bot",
+        }})
+
+    async def send_message(self, method, query, body):
+        """Handler da rota /bot<token>/sendMessage"""
+        params = {key: values[0] for key, values in parse_qs((body or b'').decode()).items()}
+        if not params and body:
+            params = json.loads(body)
+        chat_id = int(params.get('chat_id', 0))
+
+        now = time.monotonic()
+        self._recent = [sent for sent in self._recent if now - sent < 1]
+        too_fast_chat = now - self._last_by_chat.get(chat_id, -1e9) < self.chat_interval
+        if len(self._recent) >= self.global_rate or too_fast_chat:
+            self.rejected += 1
+            return 429, json.dumps({
+                'ok': False, 'error_code': 429,
+                'description': "Too Many Requests: retry after 1",
+                'parameters': {'retry_after': 1},
+            })
+
+        self._recent.append(now)
+        self._last_by_chat[chat_id] = now
+        self._message_id += 1
+        self.accepted += 1
+        return 200, json.dumps({'ok': True, 'result': {
+            'message_id': self._message_id, 'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'}, 'text': params.get('text', ''),
+        }})
+
+async def main():
+    """Executa o benchmark e imprime as métricas"""
+    parser = argparse.ArgumentParser(description="Benchmark do controle de envio")
+    parser.add_argument('--broadcast', type=int, default=300)
+    parser.add_argument('--chats', type=int, default=100)
+    parser.add_argument('--interactive', type=int, default=20)
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    api = FakeBotAPI(global_rate=30, chat_interval=1.0)
+    server = WebhookServer(
+        None, path='/unused', host='127.0.0.1', port=args.port,
+        routes={
+            f'/bot{TOKEN}/getMe': api.get_me,
+            f'/bot{TOKEN}/sendMessage': api.send_message,
+        }
+    )
+    await server.start()
+
+    limiter = FloodControlRateLimiter()
+    bot = ExtBot(TOKEN, base_url=f"http://127.0.0.1:{args.port}/bot", rate_limiter=limiter)
+
+    async def broadcast(index):
+        await bot.send_message(chat_id=1000 + index % args.chats, text=f"Resumo {index}",
+                               rate_limit_args=PRIORITY_BROADCAST)
+
+    async def interactive(index):
+        await asyncio.sleep(1 + index * 0.2)  # chegam durante o envio em massa
+        started = time.monotonic()
+        await bot.send_message(chat_id=index + 1, text="Resposta", rate_limit_args=PRIORITY_INTERACTIVE)
+        return time.monotonic() - started
+
+    started = time.perf_counter()
+    async with bot:  # inicializa e encerra o limitador junto com o bot
+        results = await asyncio.gather(
+            *(broadcast(i) for i in range(args.broadcast)),
+            *(interactive(i) for i in range(args.interactive)),
+            return_exceptions=True
+        )
+    elapsed = time.perf_counter() - started
+
+    await server.stop()
+
+    failures = [result for result in results if isinstance(result, Exception)]
+    latencies = sorted(result for result in results if isinstance(result, float))
+    print(f"Mensagens: {args.broadcast + args.interactive} em {elapsed:.1f}s "
+          f"({(args.broadcast + args.interactive) / elapsed:.1f}/s), falhas: {len(failures)}")
+    print(f"Bot API falsa: {api.accepted} aceitas, {api.rejected} respondidas com 429")
+    if latencies:
+        print(f"Respostas interativas: mediana {1000 * latencies[len(latencies) // 2]:.0f}ms, "
+              f"máxima {1000 * latencies[-1]:.0f}ms")
+    print(f"Limitador: {json.dumps(limiter.get_stats(), indent=2)}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,113 @@
+"""
+Benchmark do modelo de intenções.
+Envia mensagens de vários "usuários" ao mesmo tempo e mede a vazão, a latência de cada
+predição (p50/p99) e o tamanho médio dos lotes montados, com e sem micro-lotes.
+Sem --model-dir, monta um classificador BERT minúsculo com pesos aleatórios em um diretório
+temporário (nenhum download); o tempo de inferência é então só o custo fixo por lote.
+Sem torch e transformers instalados (requirements-nlp.txt), o benchmark é pulado.
+
+Uso:
+    python bench/intent_model_bench.py --messages 2000 --concurrency 1 8 32
+    python bench/intent_model_bench.py --model-dir modelos/intencoes --batch-sizes 1 8 16
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import importlib.util
+from statistics import median
+from concurrent.futures import ThreadPoolExecutor
+
+# Os módulos do bot ficam em src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from intent_model import INTENT_LABELS, TransformerIntentModel
+
+TEXTS = ["blá blá blá", "marcar reunião amanhã", "agenda de hoje", "reunião"]
+VOCAB = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]",
+         "blá", "marcar", "reunião", "amanhã", "agenda", "de", "hoje"]
+
+def build_tiny_model(directory):
+    """Salva um tokenizer e um classificador BERT aleatório com os rótulos do bot"""
+    import torch
+    import transformers
+
+    vocab_file = os.path.join(directory, "vocab.txt")
+    with open(vocab_file, "w") as f:
+        f.write("\n".join(VOCAB) + "\n")
+    transformers.BertTokenizer(vocab_file=vocab_file).save_pretrained(directory)
+
+    torch.manual_seed(0)
+    config = transformers.BertConfig(
+        vocab_size=len(VOCAB), hidden_size=32, num_hidden_layers=2, num_attention_heads=2,
+        intermediate_size=64, max_position_embeddings=64, num_labels=len(INTENT_LABELS),
+        id2label=dict(enumerate(INTENT_LABELS)),
+        label2id={label: index for index, label in enumerate(INTENT_LABELS)})
+    transformers.BertForSequenceClassification(config).save_pretrained(directory)
+
+def run(model_dir, batch_size, max_wait_ms, concurrency, messages):
+    """Uma rodada: concurrency threads chamando predict, como handlers de usuários diferentes"""
+    model = TransformerIntentModel(model_dir, max_batch_size=batch_size, max_wait_ms=max_wait_ms,
+                                   min_confidence=0.0)
+    if not model.wait_ready(timeout=120):
+        raise RuntimeError(model.get_stats()['load_error'])
+    model.predict(TEXTS[0], timeout=30)  # Aquecimento (primeiro lote aloca os buffers)
+    warmup = model.get_stats()
+
+    def timed(index):
+        started = time.perf_counter()
+        model.predict(TEXTS[index % len(TEXTS)], timeout=30)
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = sorted(executor.map(timed, range(messages)))
+    elapsed = time.perf_counter() - started
+
+    stats = model.get_stats()
+    batches = stats['batches'] - warmup['batches']
+    return {
+        'rate': messages / elapsed,
+        'p50_ms': 1000 * median(latencies),
+        'p99_ms': 1000 * latencies[int(0.99 * (len(latencies) - 1))],
+        'avg_batch': (stats['items'] - warmup['items']) / batches if batches else 0.0,
+        'avg_inference_ms': stats['avg_inference_ms'],
+    }
+
+def main():
+    """Executa o benchmark e imprime os resultados"""
+    parser = argparse.ArgumentParser(description="Benchmark do modelo de intenções")
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8])
+    parser.add_argument('--max-wait-ms', type=float, default=10)
+    parser.add_argument('--model-dir', default=None, help="Modelo de intenções local (padrão: modelo aleatório)")
+    args = parser.parse_args()
+
+    missing = [name for name in ('torch', 'transformers') if importlib.util.find_spec(name) is None]
+    if missing:
+        print(f"Benchmark pulado: {', '.join(missing)} não instalado(s) (pip install -r requirements-nlp.txt)")
+        return
+
+    # Sem rede: o modelo é sempre lido do diretório local
+    os.environ.setdefault('HF_HUB_OFFLINE', '1')
+    os.environ.setdefault('TRANSFORMERS_OFFLINE', '1')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_dir = args.model_dir
+        if model_dir is None:
+            build_tiny_model(tmp)
+            model_dir = tmp
+        print(f"{args.messages} mensagens por rodada, modelo: {args.model_dir or 'BERT aleatório minúsculo'}, "
+              f"espera máxima do lote: {args.max_wait_ms:g} ms")
+        for concurrency in args.concurrency:
+            for batch_size in args.batch_sizes:
+                result = run(model_dir, batch_size, args.max_wait_ms, concurrency, args.messages)
+                print(f"  {concurrency:3d} em paralelo, lote até {batch_size:2d}: {result['rate']:7.0f} msg/s, "
+                      f"p50 {result['p50_ms']:6.1f} ms, p99 {result['p99_ms']:6.1f} ms, "
+                      f"lote médio {result['avg_batch']:4.1f}, inferência {result['avg_inference_ms']:5.1f} ms/lote")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Benchmark da outbox de alterações contra uma API falsa que injeta falhas.
+Mede a vazão do envio, confere a ordem por usuário e, com --crash-after, interrompe
+os workers no meio e reinicia a outbox a partir do banco, conferindo que nenhuma
+alteração se perdeu nem foi aplicada em dobro.
+
+Uso:
+    python bench/outbox_bench.py --mutations 5000 --users 500 --failure-rate 0.2 --crash-after 2000
+"""
+
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import threading
+
+# Os módulos do bot ficam em src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from outbox import MutationOutbox
+from calendar_manager import CalendarError
+
+class StubCalendarManager:
+    """API falsa: latência fixa, falhas 5xx aleatórias e eventos guardados em memória
+
+    Como no Google Calendar, eventos excluídos ficam com status "cancelled": criar de novo
+    com o mesmo ID dá 409 e excluir de novo dá 410.
+    """
+
+    def __init__(self, latency, failure_rate, seed=7):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.events = {}     # event_id -> evento
+        self.applied = {}    # user_id -> números de sequência aplicados, em ordem
+        self.calls = 0
+        self.injected = 0
+
+    def _call(self):
+        time.sleep(self.latency)
+        with self.lock:
+            self.calls += 1
+            if self.rng.random() < self.failure_rate:
+                self.injected += 1
+                return False
+        return True
+
+    def create_event(self, user_id, summary, start_date, start_time, sequence=None, event_id=None, **kwargs):
+        if not self._call():
+            return False, CalendarError("Erro ao criar evento: <HttpError 503 \"Backend Error\">", 503)
+        with self.lock:
+            if event_id in self.events:
+                return False, CalendarError("Erro ao criar evento: <HttpError 409 \"The requested identifier already exists.\">", 409)
+            event = {'id': event_id, 'summary': summary, 'start': {'dateTime': f"{start_date}T{start_time}:00"}}
+            self.events[event_id] = event
+            self.applied.setdefault(user_id, []).append(sequence)
+        return True, event
+
+    def delete_event(self, user_id, event_id, sequence=None):
+        if not self._call():
+            return False, CalendarError("Erro na API do Google Calendar: <HttpError 500 \"Internal Error\">", 500)
+        with self.lock:
+            event = self.events.get(event_id)
+            if event is None or event.get('status') == 'cancelled':
+                return False, CalendarError("Erro na API do Google Calendar: <HttpError 410 \"Resource has been deleted\">", 410)
+            event['status'] = 'cancelled'
+            self.applied.setdefault(user_id, []).append(sequence)
+        return True, "Evento excluído com sucesso."
+
+    def get_event_by_id(self, user_id, event_id):
+        with self.lock:
+            event = self.events.get(event_id)
+        return (True, event) if event else (False, "Evento não encontrado")
+
+async def drain(outbox, total):
+    """Espera a outbox concluir total alterações"""
+    while outbox.succeeded + outbox.failed < total:
+        await asyncio.sleep(0.01)
+
+async def main():
+    """Executa o benchmark e imprime os resultados"""
+    parser = argparse.ArgumentParser(description="Benchmark da outbox de alterações")
+    parser.add_argument('--mutations', type=int, default=5000)
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--latency-ms', type=float, default=5)
+    parser.add_argument('--failure-rate', type=float, default=0.2)
+    parser.add_argument('--crash-after', type=int, default=0)
+    args = parser.parse_args()
+
+    api = StubCalendarManager(args.latency_ms / 1000, args.failure_rate)
+    rng = random.Random(1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "outbox.db")
+
+        def make_outbox():
+            return MutationOutbox(api, db_path=db_path, workers=args.workers,
+                                  max_attempts=50, base_delay=0.01, max_delay=0.2)
+
+        outbox = make_outbox()
+        await outbox.start()
+
+        # Cada usuário cria eventos e às vezes exclui um criado antes (a ordem importa)
+        started = time.perf_counter()
+        created, sequence, submits = {}, {}, []
+        for _ in range(args.mutations):
+            user_id = str(rng.randint(1, args.users))
+            seq = sequence[user_id] = sequence.get(user_id, 0) + 1
+            if created.get(user_id) and rng.random() < 0.3:
+                event_id = created[user_id].pop()
+                submits.append(outbox.submit(user_id, 'delete_event', event_id=event_id, sequence=seq))
+            else:
+                event_id = f"{int(user_id):08x}{seq:08x}"
+                created.setdefault(user_id, []).append(event_id)
+                submits.append(outbox.submit(user_id, 'create_event', summary="Evento", start_date="2026-10-20",
+                                             start_time="10:00", event_id=event_id, sequence=seq))
+        futures = [future for _, future in await asyncio.gather(*submits)]
+        journaled = time.perf_counter() - started
+        print(f"Gravadas: {args.mutations} alterações em {journaled:.2f}s "
+              f"({outbox.insert_batches} transações)")
+
+        done_before = 0
+        if args.crash_after:
+            while outbox.succeeded + outbox.failed < args.crash_after:
+                await asyncio.sleep(0.005)
+            await outbox.stop()  # Simula a queda: nada mais é registrado
+            await asyncio.sleep(5 * args.latency_ms / 1000)  # Chamadas em andamento morrem com o processo
+            done_before = outbox.succeeded + outbox.failed
+            for future in futures:
+                future.cancel()
+            print(f"Interrompida após {done_before} alterações; reiniciando a partir do banco")
+            outbox = make_outbox()
+            await outbox.start()
+            print(f"Recuperadas: {outbox.recovered}")
+            await drain(outbox, outbox.recovered)
+        else:
+            await asyncio.gather(*futures)
+        elapsed = time.perf_counter() - started
+        await outbox.stop()
+
+    applied = sum(len(items) for items in api.applied.values())
+    out_of_order = sum(1 for items in api.applied.values() if items != sorted(items))
+    duplicated = sum(len(items) - len(set(items)) for items in api.applied.values())
+    print(f"Aplicadas: {applied} de {args.mutations} em {elapsed:.2f}s ({applied / elapsed:.0f}/s)")
+    print(f"Chamadas à API: {api.calls}, falhas injetadas: {api.injected}")
+    print(f"Usuários fora de ordem: {out_of_order}, alterações duplicadas: {duplicated}")
+    print(f"Outbox: {outbox.get_stats()}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
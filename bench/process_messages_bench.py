@@ -0,0 +1,90 @@
+"""
+Benchmark de process_messages.
+Processa um lote de mensagens variadas com 1, 2, 4... processos, mede a vazão de cada
+configuração e confere que todas devolvem exatamente os mesmos resultados que a execução
+em um único processo (mesmo "agora" fixo, mesma ordem).
+
+Uso:
+    python bench/process_messages_bench.py --messages 20000 --workers 1 2 4
+    python bench/process_messages_bench.py --model-dir modelos/intencoes --workers 1 2
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+from datetime import datetime
+
+import pytz
+
+# Os módulos do bot ficam em src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from nlp_processor import NLPProcessor
+
+TEMPLATES = [
+    "o que tenho {dia}?",
+    "quais são meus compromissos {dia}",
+    "marcar reunião com {nome} {dia} às {hora}h",
+    "agendar consulta {dia} de {hora}h às {fim}h no {local}",
+    "preciso marcar call com {email} {dia} {hora}:30",
+    "mudar a reunião de {dia} para {hora}h",
+    "aumentar a duração da reunião de {dia} para 2 horas",
+    "cancelar o evento de {dia}",
+    "academia toda segunda às {hora}h até 30/12",
+    "o que tenho esta semana?",
+    "mostre minha agenda do próximo mês",
+    "bom dia, tudo bem?",
+]
+DAYS = ["hoje", "amanhã", "segunda", "sexta-feira", "15/11", "dia 3", "próxima terça"]
+NAMES = ["Ana", "Bruno", "Carla", "Diego"]
+PLACES = ["escritório", "consultório", "café da esquina"]
+
+def build_messages(count, seed=42):
+    """Gera mensagens variadas a partir dos modelos acima"""
+    rng = random.Random(seed)
+    messages = []
+    for _ in range(count):
+        hour = rng.randint(8, 18)
+        name = rng.choice(NAMES)
+        messages.append(rng.choice(TEMPLATES).format(
+            dia=rng.choice(DAYS), nome=name, hora=hour, fim=hour + 1,
+            local=rng.choice(PLACES), email=f"{name.lower()}@exemplo.com"))
+    return messages
+
+def main():
+    """Executa o benchmark e imprime a vazão de cada configuração"""
+    parser = argparse.ArgumentParser(description="Benchmark de process_messages")
+    parser.add_argument('--messages', type=int, default=20000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--chunksize', type=int, default=64)
+    parser.add_argument('--model-dir', default=None, help="Modelo de intenções local (opcional)")
+    args = parser.parse_args()
+
+    messages = build_messages(args.messages)
+    now = datetime(2026, 10, 19, 9, 0, tzinfo=pytz.timezone('America/Sao_Paulo'))
+    print(f"{len(messages)} mensagens, {os.cpu_count()} CPUs, modelo: {args.model_dir or 'não'}")
+
+    baseline = None
+    single_rate = None
+    for workers in args.workers:
+        # Processador novo a cada rodada: o cache de resultados não passa de uma para outra
+        processor = NLPProcessor(model_dir=args.model_dir, cache_size=0)
+        started = time.perf_counter()
+        results = list(processor.process_messages(messages, now=now, workers=workers,
+                                                  chunksize=args.chunksize))
+        elapsed = time.perf_counter() - started
+
+        rate = len(results) / elapsed
+        single_rate = single_rate or rate
+        if baseline is None:
+            baseline = results
+        same = results == baseline
+        # Com mais processos que CPUs não há ganho a medir, só o custo de distribuir as mensagens
+        oversubscribed = " [mais processos que CPUs]" if workers > (os.cpu_count() or 1) else ""
+        print(f"  {workers} processo(s): {rate:8.0f} msg/s ({rate / single_rate:.2f}x), "
+              f"resultados {'idênticos' if same else 'DIFERENTES'}{oversubscribed}")
+
+if __name__ == "__main__":
+    main()
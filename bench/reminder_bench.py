@@ -0,0 +1,97 @@
+"""
+Benchmark da roda de lembretes.
+Agenda lembretes distribuídos pela próxima semana, mede inserção, reagendamento e
+cancelamento, a memória por lembrete e o custo de avançar a roda um dia inteiro,
+contando quantas mensagens saem depois de agrupar por usuário e minuto.
+
+Uso:
+    python bench/reminder_bench.py --reminders 1000000 --users 200000
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tracemalloc
+
+import pytz
+
+# Os módulos do bot ficam em src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from reminders import ReminderScheduler
+
+async def _discard(user_id, text):
+    pass
+
+def main():
+    """Executa o benchmark e imprime os resultados"""
+    parser = argparse.ArgumentParser(description="Benchmark da roda de lembretes")
+    parser.add_argument('--reminders', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=200000)
+    parser.add_argument('--days', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    now = time.time()
+    # Eventos começam em horas cheias ou meias horas, como na prática
+    starts = [now + 1800 * rng.randint(1, args.days * 48) for _ in range(args.reminders)]
+    users = [str(rng.randint(1, args.users)) for _ in range(args.reminders)]
+    summaries = ["Reunião", "Consulta", "Aula", "Call com cliente", "Almoço"]
+
+    def build():
+        scheduler = ReminderScheduler(_discard, pytz.timezone('America/Sao_Paulo'),
+                                      lead_minutes=10, max_reminders=args.reminders)
+        for index in range(args.reminders):
+            scheduler.schedule(users[index], f"evt{index}", starts[index], summaries[index % 5])
+        return scheduler
+
+    # Memória medida em uma montagem separada (o tracemalloc deixa a inserção mais lenta)
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    scheduler = build()
+    memory = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    del scheduler
+
+    started = time.perf_counter()
+    scheduler = build()
+    insert_time = time.perf_counter() - started
+
+    # Eventos alterados: reagendar 10% para outro horário e cancelar outros 10%
+    sample = rng.sample(range(args.reminders), args.reminders // 5)
+    moved, removed = sample[:len(sample) // 2], sample[len(sample) // 2:]
+    started = time.perf_counter()
+    for index in moved:
+        scheduler.schedule(users[index], f"evt{index}", starts[index] + 3600, summaries[index % 5])
+    reschedule_time = time.perf_counter() - started
+    started = time.perf_counter()
+    for index in removed:
+        scheduler.cancel(users[index], f"evt{index}")
+    cancel_time = time.perf_counter() - started
+
+    # Um dia de ticks de um minuto
+    started = time.perf_counter()
+    fired = messages = slowest = 0
+    for minute in range(1, 24 * 60 + 1):
+        tick_started = time.perf_counter()
+        batches = scheduler.due(now + 60 * minute)
+        for user_id, reminders in batches.items():
+            scheduler.render(reminders, now + 60 * minute)
+            fired += len(reminders)
+            messages += 1
+        slowest = max(slowest, time.perf_counter() - tick_started)
+    day_time = time.perf_counter() - started
+
+    print(f"Lembretes: {args.reminders} de {args.users} usuários em {args.days} dias")
+    print(f"Inserção: {1e6 * insert_time / args.reminders:.2f}µs/lembrete ({insert_time:.1f}s)")
+    print(f"Reagendamento: {1e6 * reschedule_time / len(moved):.2f}µs, "
+          f"cancelamento: {1e6 * cancel_time / len(removed):.2f}µs")
+    print(f"Memória: {memory / 2**20:.0f} MiB ({memory / args.reminders:.0f} bytes/lembrete)")
+    print(f"Um dia de ticks: {day_time:.2f}s, tick mais lento {1000 * slowest:.1f}ms")
+    print(f"Disparados: {fired} em {messages} mensagens (agrupados por usuário e minuto)")
+    print(f"Pendentes: {len(scheduler.wheel)}")
+
+if __name__ == "__main__":
+    main()
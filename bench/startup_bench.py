@@ -0,0 +1,156 @@
+"""
+Benchmark de partida do bot: tempo até responder o primeiro update e detalhamento do
+`python -X importtime`. A Bot API é simulada dentro do processo (nenhuma chamada de rede);
+cada execução é um processo novo, medindo desde o início do interpretador.
+
+Uso:
+    python bench/startup_bench.py --runs 5 --budget-ms 1000
+
+Sai com código 1 se a mediana do tempo até a primeira resposta passar do orçamento.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+from collections import defaultdict
+from statistics import median
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+
+# Mensagem de um usuário ainda sem Google Calendar configurado
+FIRST_UPDATE = {
+    'update_id': 1,
+    'message': {
+        'message_id': 1,
+        'date': 0,
+        'chat': {'id': 1001, 'type': 'private'},
+        'from': {'id': 1001, 'is_bot': False, 'first_name': 'Ana'},
+        'text': 'o que tenho hoje?'
+    }
+}
+
+def run_child(t0):
+    """Sobe o bot com a Bot API simulada e imprime o tempo de cada fase (ms desde t0)"""
+    import asyncio
+
+    phases = {}
+
+    def mark(name):
+        phases[name] = 1000 * (time.time() - t0)
+
+    mark('interpreter')
+    from telegram.request import HTTPXRequest
+
+    first_reply = None
+
+    async def do_request(self, url, method, request_data=None, **kwargs):
+        endpoint = url.rsplit('/', 1)[-1]
+        if endpoint == 'getMe':
+            result = {'id': 1, 'is_bot': True, 'first_name': 'Bot', 'username': 'bench_bot'}
+        elif endpoint == 'sendMessage':
+            mark('first_reply')
+            first_reply.set()
+            result = {'message_id': 2, 'date': 0, 'chat': FIRST_UPDATE['message']['chat']}
+        else:
+            result = True
+        return 200, json.dumps({'ok': True, 'result': result}).encode()
+
+    HTTPXRequest.do_request = do_request
+
+    import bot
+    mark('import')
+    calendar_bot = bot.CalendarBot()
+    mark('init')
+
+    async def main():
+        nonlocal first_reply
+        first_reply = asyncio.Event()
+        async with calendar_bot.app:
+            await calendar_bot._post_init(calendar_bot.app)
+            await calendar_bot.app.start()
+            mark('ready')
+            update = bot.Update.de_json(FIRST_UPDATE, calendar_bot.app.bot)
+            await calendar_bot.app.update_queue.put(update)
+            await asyncio.wait_for(first_reply.wait(), 30)
+            await calendar_bot._post_stop(calendar_bot.app)
+            await calendar_bot.app.stop()
+
+    asyncio.run(main())
+    print(json.dumps(phases))
+
+def child_env(tmp):
+    """Ambiente do processo medido: token falso e bancos em diretório temporário"""
+    env = dict(os.environ)
+    env.update({
+        'TELEGRAM_TOKEN': '1:bench',
+        'PERSISTENCE_DB': os.path.join(tmp, 'bot_state.db'),
+        'OUTBOX_DB': os.path.join(tmp, 'outbox.db'),
+        'PYTHONPATH': SRC_DIR,
+    })
+    env.pop('WEBHOOK_URL', None)
+    return env
+
+def import_breakdown(env, cwd, top):
+    """Tempo de import acumulado por pacote de primeiro nível (ms), via -X importtime"""
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import bot'],
+                            env=env, cwd=cwd, capture_output=True, text=True, check=True).stderr
+    by_package = defaultdict(float)
+    total = 0.0
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        head, cumulative_us, name = line.split('|')
+        self_us = head.split(':')[1]
+        name = name.strip()
+        by_package[name.split('.')[0]] += int(self_us) / 1000
+        if name == 'bot':
+            total = int(cumulative_us) / 1000
+    ranked = sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:top]
+    return total, ranked
+
+def main():
+    """Executa as medições e compara com o orçamento"""
+    parser = argparse.ArgumentParser(description="Benchmark de partida do bot")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=1000,
+                        help="Orçamento para a primeira resposta (mediana, desde o início do processo)")
+    parser.add_argument('--top', type=int, default=12, help="Pacotes mostrados no detalhamento de imports")
+    parser.add_argument('--child', type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        run_child(args.child)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = child_env(tmp)
+        runs = []
+        for _ in range(args.runs):
+            t0 = time.time()
+            output = subprocess.run([sys.executable, __file__, '--child', repr(t0)],
+                                    env=env, cwd=tmp, capture_output=True, text=True, check=True).stdout
+            runs.append(json.loads(output.strip().splitlines()[-1]))
+        total, ranked = import_breakdown(env, tmp, args.top)
+
+    print(f"Mediana de {args.runs} partidas (ms desde o início do processo):")
+    for phase, label in (('interpreter', "interpretador"), ('import', "import bot"),
+                         ('init', "CalendarBot()"), ('ready', "aplicação iniciada"),
+                         ('first_reply', "primeira resposta")):
+        print(f"  {label:<20} {median(run[phase] for run in runs):8.1f}")
+
+    print(f"\n-X importtime: import bot = {total:.1f} ms; por pacote (tempo próprio):")
+    for package, ms in ranked:
+        print(f"  {package:<28} {ms:8.1f}")
+
+    first_reply = median(run['first_reply'] for run in runs)
+    if first_reply > args.budget_ms:
+        print(f"\nACIMA do orçamento: {first_reply:.0f} ms > {args.budget_ms:.0f} ms")
+        sys.exit(1)
+    print(f"\nDentro do orçamento: {first_reply:.0f} ms <= {args.budget_ms:.0f} ms")
+
+if __name__ == "__main__":
+    main()
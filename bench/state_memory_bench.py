@@ -0,0 +1,99 @@
+"""
+Benchmark de memória do estado de conversa por usuário.
+Compara o evento pendente como dicionário e como PendingEvent e mede a memória
+de fluxos abandonados antes e depois da expiração.
+
+Uso:
+    python bench/state_memory_bench.py --users 100000
+"""
+
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+
+# Os módulos do bot ficam em src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from conversation import STATE_NORMAL, STATE_AWAITING_TIME
+from conversation_expiry import ConversationExpiry
+from models import PendingEvent
+
+def event_fields(user_id):
+    """Entidades típicas de quem parou em "Em qual horário?" """
+    return {
+        'date': '2026-10-20', 'time': None, 'duration': None,
+        'summary': f"Reunião com cliente {user_id}", 'location': None,
+        'is_meeting': True, 'attendees': [],
+    }
+
+def abandoned_flow(user_id):
+    """Estado de conversa de um fluxo abandonado"""
+    return {
+        'state': STATE_AWAITING_TIME,
+        'pending_intent': "CREATE_EVENT",
+        'pending_event': PendingEvent(**event_fields(user_id)),
+    }
+
+def measure(factory, users):
+    """Memória média (bytes) de um objeto criado por factory"""
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    objects = [factory(user_id) for user_id in range(users)]
+    used = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    del objects
+    return used / users
+
+def main():
+    """Executa o benchmark e imprime a memória por usuário"""
+    parser = argparse.ArgumentParser(description="Memória do estado de conversa por usuário")
+    parser.add_argument('--users', type=int, default=100000)
+    args = parser.parse_args()
+
+    # Evento pendente: dicionário (formato antigo) x PendingEvent com os mesmos valores,
+    # então a diferença é o custo do contêiner
+    as_dict = measure(event_fields, args.users)
+    as_slots = measure(lambda user_id: PendingEvent(**event_fields(user_id)), args.users)
+    print(f"Evento pendente como dict: {as_dict:.0f} bytes/usuário")
+    print(f"Evento pendente como PendingEvent: {as_slots:.0f} bytes/usuário")
+
+    expiry = ConversationExpiry(STATE_NORMAL, default_ttl=900, idle_ttl=3600, notify=False)
+    now = time.time()
+
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+
+    user_data = {}
+    for user_id in range(args.users):
+        user_data[user_id] = abandoned_flow(user_id)
+        expiry.touch(user_id, user_data[user_id], now=now)
+    pending = tracemalloc.get_traced_memory()[0] - baseline
+
+    # Prazo dos fluxos vencido: limpar e renovar como usuário ocioso
+    started = time.perf_counter()
+    for user_id in expiry.due(now=now + 901):
+        expiry.expire(user_data[user_id])
+        expiry.touch(user_id, user_data[user_id], now=now + 901)
+    sweep_flows = time.perf_counter() - started
+    idle = tracemalloc.get_traced_memory()[0] - baseline
+
+    # Prazo de ociosidade vencido: liberar os usuários
+    started = time.perf_counter()
+    for user_id in expiry.due(now=now + 901 + 3601):
+        expiry.expire(user_data[user_id])
+        if expiry.is_idle(user_data[user_id]):
+            del user_data[user_id]
+    sweep_idle = time.perf_counter() - started
+    released = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+
+    print(f"Usuários: {args.users}")
+    print(f"Fluxo abandonado: {pending / args.users:.0f} bytes/usuário")
+    print(f"Após expirar o fluxo: {idle / args.users:.0f} bytes/usuário ({sweep_flows * 1000:.1f}ms)")
+    print(f"Após liberar ociosos: {released / args.users:.0f} bytes/usuário ({sweep_idle * 1000:.1f}ms)")
+    print(f"Métricas: {expiry.get_stats()}")
+
+if __name__ == "__main__":
+    main()
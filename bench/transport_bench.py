@@ -0,0 +1,153 @@
+"""
+Benchmark do transporte HTTP compartilhado contra uma API do Google falsa com TLS.
+Compara o caminho antigo (um httplib2.Http por serviço e uma sessão nova a cada renovação
+de token) com o PooledTransport, contando conexões TLS abertas no servidor e a latência
+por chamada com várias threads consultando agendas de usuários diferentes.
+
+Uso:
+    python bench/transport_bench.py --calls 2000 --users 200 --threads 16
+"""
+
+import os
+import sys
+import ssl
+import json
+import time
+import argparse
+import tempfile
+import threading
+import subprocess
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httplib2
+import google_auth_httplib2
+from google.oauth2.credentials import Credentials
+from google.auth.transport.requests import Request
+from googleapiclient.discovery import build
+
+# Os módulos do bot ficam em src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from http_transport import PooledTransport
+
+class FakeGoogleHandler(BaseHTTPRequestHandler):
+    """Responde a renovação de token e a listagem de eventos"""
+
+    protocol_version = 'HTTP/1.1'  # keep-alive
+
+    def _reply(self, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self._reply({'access_token': 'novo', 'expires_in': 3600, 'token_type': 'Bearer'})
+
+    def do_GET(self):
+        self._reply({'items': [{'id': 'evt', 'summary': 'Reunião'}]})
+
+    def log_message(self, *args):
+        pass
+
+class CountingServer(ThreadingHTTPServer):
+    """Servidor TLS que conta as conexões aceitas"""
+
+    daemon_threads = True
+
+    def __init__(self, address, context):
+        super().__init__(address, FakeGoogleHandler)
+        self.socket = context.wrap_socket(self.socket, server_side=True)
+        self.connections = 0
+
+    def get_request(self):
+        connection = super().get_request()
+        self.connections += 1
+        return connection
+
+def make_certificate(directory):
+    """Gera um certificado autoassinado para 127.0.0.1"""
+    cert, key = os.path.join(directory, 'cert.pem'), os.path.join(directory, 'key.pem')
+    subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+                    '-keyout', key, '-out', cert, '-subj', '/CN=127.0.0.1',
+                    '-addext', 'subjectAltName=IP:127.0.0.1'], check=True, capture_output=True)
+    return cert, key
+
+def credentials(base_url, expired):
+    """Credenciais de teste; vencidas para forçar a renovação a cada serviço"""
+    creds = Credentials(token='antigo', refresh_token='r', token_uri=f"{base_url}/token",
+                        client_id='c', client_secret='s')
+    creds.expiry = datetime.utcnow() + (timedelta(hours=-1) if expired else timedelta(hours=1))
+    return creds
+
+def run(label, calls, users, threads, service_for):
+    """Executa as chamadas em paralelo e retorna as latências"""
+    latencies = []
+
+    def call(index):
+        started = time.perf_counter()
+        service = service_for(str(index % users), index < users)
+        service.events().list(calendarId='primary', maxResults=10).execute()
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(call, range(calls)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    print(f"{label}: {calls / elapsed:.0f} chamadas/s, p50 {1000 * latencies[len(latencies) // 2]:.1f}ms, "
+          f"p99 {1000 * latencies[int(0.99 * len(latencies))]:.1f}ms")
+
+def main():
+    """Executa o benchmark e imprime os resultados"""
+    parser = argparse.ArgumentParser(description="Benchmark do transporte HTTP")
+    parser.add_argument('--calls', type=int, default=2000)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=16)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cert, key = make_certificate(tmp)
+        context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        context.load_cert_chain(cert, key)
+        server = CountingServer(('127.0.0.1', 0), context)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"https://127.0.0.1:{server.server_address[1]}"
+        options = {'api_endpoint': base_url + '/'}
+        os.environ['REQUESTS_CA_BUNDLE'] = cert
+
+        # Caminho antigo: renovação com Request() novo e um httplib2.Http por serviço
+        def old_service(user_id, first_use):
+            creds = credentials(base_url, expired=first_use)
+            if creds.expired:
+                creds.refresh(Request())
+            http = google_auth_httplib2.AuthorizedHttp(creds, http=httplib2.Http(ca_certs=cert))
+            return build('calendar', 'v3', http=http, client_options=options, cache_discovery=False)
+
+        run("httplib2 por serviço", args.calls, args.users, args.threads, old_service)
+        old_connections, server.connections = server.connections, 0
+
+        # Transporte compartilhado
+        transport = PooledTransport(pool_size=args.threads)
+        transport.session.verify = cert
+
+        def pooled_service(user_id, first_use):
+            creds = credentials(base_url, expired=first_use)
+            if creds.expired:
+                creds.refresh(transport.auth_request)
+            return build('calendar', 'v3', http=transport.http_for(creds),
+                         client_options=options, cache_discovery=False)
+
+        run("PooledTransport", args.calls, args.users, args.threads, pooled_service)
+        print(f"Conexões TLS abertas: {old_connections} (httplib2 por serviço) vs "
+              f"{server.connections} (PooledTransport)")
+        print(f"PooledTransport: {transport.get_stats()}")
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
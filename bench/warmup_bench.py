@@ -0,0 +1,147 @@
+"""
+Benchmark do pré-aquecimento após um reinício.
+Simula os "o que tenho hoje?" dos usuários mais ativos chegando logo depois de um deploy
+(--rate por segundo, em ordem aleatória), contra uma API falsa com latência fixa, em três
+cenários: partida fria, pré-aquecimento concluído antes e pré-aquecimento começando junto
+com as mensagens (como no bot).
+
+Uso:
+    python bench/warmup_bench.py --users 200 --rate 20 --latency-ms 80
+"""
+
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import googleapiclient.discovery
+
+# Os módulos do bot ficam em src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from agenda import AgendaCache, AgendaView
+from async_calendar_bench import serve
+from calendar_auth import CalendarAuth
+from calendar_manager import CalendarManager
+from http_transport import PooledTransport
+from warmup import UserActivity, WarmUp
+
+def write_tokens(directory, users):
+    """Arquivos de token válidos por uma hora para os usuários"""
+    os.makedirs(os.path.join(directory, 'user_data'), exist_ok=True)
+    expiry = (datetime.utcnow() + timedelta(hours=1)).isoformat()
+    for user_id in users:
+        with open(os.path.join(directory, 'user_data', f"{user_id}_token.json"), 'w') as f:
+            f.write(f'{{"token": "t-{user_id}", "refresh_token": "r", "token_uri": "http://127.0.0.1/token", '
+                    f'"client_id": "c", "client_secret": "s", "expiry": "{expiry}"}}')
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+async def scenario(label, args, storage, users, warm):
+    """Executa a rajada com componentes novos (como após um reinício) e imprime as latências"""
+    # Como no bot: uma thread por update concorrente, compartilhadas com o aquecimento
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=args.concurrency))
+    auth = CalendarAuth(storage_path=storage, transport=PooledTransport(pool_size=args.concurrency))
+    manager = CalendarManager(auth)
+    cache = AgendaCache(ttl=600)
+    today = datetime.now().date()
+    start = datetime.combine(today, datetime.min.time())
+
+    def view_for(user_id):
+        pages = manager.iter_event_pages(user_id, start.isoformat() + 'Z', (start + timedelta(days=1)).isoformat() + 'Z')
+        return AgendaView("📅 Hoje:\n\n", pages, single_day=today)
+
+    async def prefetch(user_id):
+        view = view_for(user_id)
+        await view.page(0)
+        if view.error:
+            return False
+        cache.put(user_id, today, view)
+        return True
+
+    async def agenda_today(user_id):
+        """Mesmo caminho do bot: cache do dia ou busca na API (serviço montado sob demanda)"""
+        view = cache.get(user_id, today)
+        if view is None:
+            view = view_for(user_id)
+            text, _ = await view.page(0)
+            if not view.error:
+                cache.put(user_id, today, view)
+        else:
+            text, _ = await view.page(0)
+        return text is not None
+
+    activity = UserActivity(path=os.path.join(storage, 'activity.json'))
+    for rank, user_id in enumerate(users):
+        for _ in range(len(users) - rank):
+            activity.record(user_id)
+    warmup = WarmUp(auth, prefetch=prefetch, concurrency=args.warmup_concurrency)
+    warm_task = None
+    if warm == 'before':
+        await warmup.run(activity.top(len(users)))
+    elif warm == 'during':
+        warm_task = asyncio.create_task(warmup.run(activity.top(len(users))))
+
+    arrivals = list(users)
+    random.Random(1).shuffle(arrivals)
+    latencies = []
+    failures = 0
+
+    async def message(user_id):
+        nonlocal failures
+        started = time.perf_counter()
+        if not await agenda_today(user_id):
+            failures += 1
+        latencies.append(time.perf_counter() - started)
+        warmup.note_served(user_id)
+
+    tasks = []
+    for user_id in arrivals:
+        tasks.append(asyncio.create_task(message(user_id)))
+        await asyncio.sleep(1 / args.rate)
+    await asyncio.gather(*tasks)
+    if warm_task:
+        await warm_task
+
+    print(f"{label}: p50 {1000 * percentile(latencies, 0.5):.0f}ms, p99 {1000 * percentile(latencies, 0.99):.0f}ms, "
+          f"máx {1000 * max(latencies):.0f}ms, erros {failures}"
+          + (f"; aquecimento {warmup.elapsed:.1f}s ({warmup.warmed} prontos, {warmup.skipped} já atendidos)"
+             if warm else ""))
+
+def main():
+    """Sobe a API falsa e executa os cenários"""
+    parser = argparse.ArgumentParser(description="Benchmark do pré-aquecimento")
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--rate', type=float, default=20, help="Mensagens por segundo após o deploy")
+    parser.add_argument('--concurrency', type=int, default=16, help="Threads para a API (BOT_MAX_CONCURRENT_UPDATES)")
+    parser.add_argument('--warmup-concurrency', type=int, default=4)
+    parser.add_argument('--latency-ms', type=float, default=80)
+    parser.add_argument('--port', type=int, default=8797)
+    args = parser.parse_args()
+
+    # API falsa em segundo plano; os serviços apontam para ela
+    server_args = argparse.Namespace(latency_ms=args.latency_ms, port=args.port)
+    threading.Thread(target=lambda: asyncio.run(serve(server_args)), daemon=True).start()
+    time.sleep(0.5)
+    base_url = f"http://127.0.0.1:{args.port}/calendar/v3/"
+    googleapiclient.discovery.build = functools.partial(
+        googleapiclient.discovery.build, client_options={'api_endpoint': base_url})
+
+    users = [str(1000 + index) for index in range(args.users)]
+    with tempfile.TemporaryDirectory() as storage:
+        write_tokens(storage, users)
+        asyncio.run(scenario("Partida fria", args, storage, users, warm=None))
+        asyncio.run(scenario("Aquecido antes da rajada", args, storage, users, warm='before'))
+        asyncio.run(scenario("Aquecimento junto com a rajada", args, storage, users, warm='during'))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Gerador de carga local para o modo webhook.
+Envia updates sintéticos ao servidor embutido e mede vazão e latência.
+
+Uso:
+    python bench/webhook_loadgen.py --url http://127.0.0.1:8443/telegram --secret SEGREDO \
+        --requests 5000 --concurrency 40 --users 500
+"""
+
+import json
+import time
+import random
+import asyncio
+import argparse
+from urllib.parse import urlsplit
+
+SAMPLE_TEXTS = [
+    "o que tenho hoje?",
+    "agenda de amanhã",
+    "marcar reunião amanhã às 15h",
+    "o que tenho nas próximas duas semanas",
+    "cancelar reunião de amanhã",
+]
+
+def build_update(update_id, user_id):
+    """Monta um update de mensagem de texto no formato da Bot API"""
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private', 'first_name': 'Carga'},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': 'Carga'},
+            'text': random.choice(SAMPLE_TEXTS),
+        }
+    }
+
+async def worker(url, secret, update_ids, users, latencies, statuses):
+    """Envia requisições por uma conexão keep-alive, como o Telegram faz"""
+    reader, writer = await asyncio.open_connection(url.hostname, url.port or 80)
+    try:
+        for update_id in update_ids:
+            body = json.dumps(build_update(update_id, random.randint(1, users))).encode()
+            request = (
+                f"POST {url.path} HTTP/1.1\r\n"
+                f"Host: {url.hostname}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"X-Telegram-Bot-Api-Secret-Token: {secret}\r\n"
+                "\r\n"
+            ).encode() + body
+
+            started = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+
+            status_line = await reader.readline()
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b''):
+                    break
+                if line.lower().startswith(b'content-length:'):
+                    length = int(line.split(b':', 1)[1])
+            if length:
+                await reader.readexactly(length)
+
+            latencies.append(time.perf_counter() - started)
+            status = int(status_line.split()[1]) if status_line else 0
+            statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        writer.close()
+
+def percentile(values, fraction):
+    """Percentil simples de uma lista ordenada"""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, int(len(values) * fraction))
+    return values[index]
+
+async def main():
+    """Executa a carga e imprime o resumo"""
+    parser = argparse.ArgumentParser(description="Gerador de carga para o webhook do bot")
+    parser.add_argument('--url', default='http://127.0.0.1:8443/telegram')
+    parser.add_argument('--secret', default='')
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=40)
+    parser.add_argument('--users', type=int, default=500)
+    args = parser.parse_args()
+
+    url = urlsplit(args.url)
+    latencies = []
+    statuses = {}
+    ids = list(range(1, args.requests + 1))
+    slices = [ids[i::args.concurrency] for i in range(args.concurrency)]
+
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        worker(url, args.secret, part, args.users, latencies, statuses) for part in slices if part
+    ))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"Requisições: {len(latencies)} em {elapsed:.2f}s ({len(latencies) / elapsed:.0f} req/s)")
+    print(f"Status: {statuses}")
+    print(f"Latência p50={1000 * percentile(latencies, 0.50):.1f}ms "
+          f"p95={1000 * percentile(latencies, 0.95):.1f}ms "
+          f"p99={1000 * percentile(latencies, 0.99):.1f}ms")
+
+if __name__ == "__main__":
+    asyncio.run(main())
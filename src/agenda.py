@@ -0,0 +1,480 @@
+"""
+Renderização paginada da agenda.
+Converte os eventos da API uma única vez em entradas com início e fim já interpretados,
+formata cada linha em uma só passada e monta páginas abaixo do limite do Telegram.
+As páginas seguintes só são buscadas e formatadas quando o usuário toca em "próxima página".
+Listagens de um dia ficam em cache por (usuário, dia) até expirarem ou a agenda mudar.
+"""
+
+import time
+import asyncio
+import logging
+import secrets
+import threading
+from datetime import datetime
+from collections import OrderedDict
+from telegram import InlineKeyboardMarkup, InlineKeyboardButton
+
+logger = logging.getLogger(__name__)
+
+# Limite de tamanho de uma mensagem do Telegram (em unidades UTF-16)
+MAX_MESSAGE_LENGTH = 4096
+
+# Dias da semana para formatação
+WEEKDAYS = ["Segunda", "Terça", "Quarta", "Quinta", "Sexta", "Sábado", "Domingo"]
+
+# Prefixo dos callbacks dos botões de página
+CALLBACK_PREFIX = "agenda:"
+
+def telegram_length(text):
+    """Tamanho do texto como o Telegram conta (emojis ocupam duas unidades UTF-16)"""
+    return len(text.encode('utf-16-le')) // 2
+
+def _parse_timestamp(value):
+    """Converte um horário ISO da API em datetime no horário local do evento"""
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).replace(tzinfo=None)
+
+
+class AgendaEntry:
+    """Evento da listagem com os horários já interpretados"""
+
+    __slots__ = ('start', 'end', 'all_day', 'summary', 'has_meet')
+
+    def __init__(self, start, end, all_day, summary, has_meet=False):
+        self.start = start
+        self.end = end
+        self.all_day = all_day
+        self.summary = summary
+        self.has_meet = has_meet
+
+    @classmethod
+    def from_event(cls, event):
+        """
+        Cria a entrada a partir de um evento da API do Google Calendar
+
+        Args:
+            event (dict): Evento retornado pela API
+
+        Returns:
+            AgendaEntry: Entrada com início e fim convertidos uma única vez
+        """
+        start = event['start']
+        end = event.get('end', {})
+        all_day = 'dateTime' not in start
+        conference = event.get('conferenceData')
+        return cls(
+            start=_parse_timestamp(start.get('dateTime') or start['date']),
+            end=_parse_timestamp(end['dateTime']) if not all_day and end.get('dateTime') else None,
+            all_day=all_day,
+            summary=event.get('summary', '(sem título)'),
+            has_meet=bool(conference and conference.get('conferenceId')),
+        )
+
+    def format_line(self, single_day=None):
+        """
+        Formata a entrada em uma linha da listagem
+
+        Args:
+            single_day (date): Dia consultado, para omitir a data dos eventos desse dia
+
+        Returns:
+            str: Linha terminada em quebra de linha
+        """
+        start = self.start
+
+        # Mostrar a data quando o evento não é do dia consultado
+        if single_day is None or start.date() != single_day:
+            date_str = f"{WEEKDAYS[start.weekday()]}, {start.day:02d}/{start.month:02d} • "
+        else:
+            date_str = ""
+
+        if self.all_day:
+            return f"📌 {date_str}{self.summary} (dia todo)\n"
+
+        end = f" - {self.end:%H:%M}" if self.end else ""
+        meet = " 📹" if self.has_meet else ""
+        return f"🕒 {date_str}{start:%H:%M}{end}: {self.summary}{meet}\n"
+
+
+class AgendaView:
+    """Listagem de um período, paginada sob demanda"""
+
+    def __init__(self, header, source, single_day=None, empty_message=None,
+                 page_events=10, max_length=MAX_MESSAGE_LENGTH, on_events=None):
+        """
+        Inicializa a listagem
+
+        Args:
+            header (str): Cabeçalho de cada página
+            source (iterator): Páginas da API no formato (sucesso, eventos ou mensagem de erro)
+            single_day (date): Dia consultado, para omitir a data dos eventos desse dia
+            empty_message (str): Texto quando não houver eventos
+            page_events (int): Máximo de eventos por página exibida
+            max_length (int): Tamanho máximo de uma página (unidades UTF-16)
+            on_events (callable): Chamada com os eventos de cada página buscada na API
+        """
+        self.header = header
+        self.single_day = single_day
+        self.empty_message = empty_message or "Não há eventos agendados."
+        self.page_events = page_events
+        self.max_length = max_length
+        self.on_events = on_events
+
+        self._source = iter(source)
+        self._exhausted = False
+        self._buffer = []  # entradas já convertidas e ainda não colocadas em uma página
+        self._pages = []   # textos das páginas já montadas
+        self.error = None
+        # A mesma listagem pode atender dois toques seguidos (ou o cache do dia) ao mesmo tempo:
+        # o gerador de páginas não aceita next() concorrente e o buffer é compartilhado
+        self._lock = asyncio.Lock()
+
+        # Métricas
+        self.fetches = 0
+
+    async def _fetch(self):
+        """Busca a próxima página da API em uma thread, sem bloquear o loop"""
+        page = await asyncio.to_thread(next, self._source, None)
+        if page is None:
+            self._exhausted = True
+            return
+        self.fetches += 1
+
+        success, events = page
+        if not success:
+            self.error = events
+            self._exhausted = True
+            return
+        if self.on_events:
+            self.on_events(events)
+        self._buffer.extend(AgendaEntry.from_event(event) for event in events)
+
+    async def _fill_buffer(self, count):
+        """Busca páginas da API até ter count entradas no buffer ou acabarem os eventos"""
+        while len(self._buffer) < count and not self._exhausted:
+            await self._fetch()
+
+    async def page(self, index):
+        """
+        Monta (ou devolve do cache) a página pedida
+
+        Args:
+            index (int): Número da página, a partir de 0
+
+        Returns:
+            tuple: (texto da página ou None se não existir, há próxima página (bool))
+        """
+        if index < len(self._pages):
+            # Já montada: não precisa esperar quem estiver buscando as seguintes
+            return self._pages[index], index + 1 < len(self._pages) or bool(self._buffer)
+
+        async with self._lock:
+            while len(self._pages) <= index:
+                # Uma entrada a mais indica se haverá próxima página
+                await self._fill_buffer(self.page_events + 1)
+                if not self._buffer:
+                    break
+                self._pages.append(self._render_next())
+
+            if index >= len(self._pages):
+                return None, False
+            return self._pages[index], index + 1 < len(self._pages) or bool(self._buffer)
+
+    def _render_next(self):
+        """Consome entradas do buffer e formata a próxima página em uma passada"""
+        number = len(self._pages) + 1
+        header = self.header
+        if number > 1:
+            header = f"{self.header.rstrip().rstrip(':')} (página {number}):\n\n"
+        lines = [header]
+        length = telegram_length(header)
+
+        taken = 0
+        for entry in self._buffer:
+            if taken >= self.page_events:
+                break
+            line = entry.format_line(self.single_day)
+            line_length = telegram_length(line)
+            if taken and length + line_length > self.max_length:
+                break
+            lines.append(line)
+            length += line_length
+            taken += 1
+
+        del self._buffer[:taken]
+        return "".join(lines)
+
+
+class AgendaPager:
+    """Guarda as listagens abertas para atender os botões de página"""
+
+    def __init__(self, max_views=1000, ttl=600):
+        """
+        Inicializa o paginador
+
+        Args:
+            max_views (int): Máximo de listagens guardadas (as mais antigas saem primeiro)
+            ttl (float): Segundos até uma listagem expirar
+        """
+        self.max_views = max_views
+        self.ttl = ttl
+        self._views = OrderedDict()  # view_id -> (user_id, criada em, AgendaView)
+
+        # Métricas
+        self.opened = 0
+        self.page_requests = 0
+        self.expired_requests = 0
+
+    async def open(self, user_id, view):
+        """
+        Registra a listagem e monta a primeira página
+
+        Args:
+            user_id (str): ID do usuário dono da listagem
+            view (AgendaView): Listagem a exibir
+
+        Returns:
+            tuple: (texto, teclado ou None); texto None se a listagem falhou (ver view.error)
+        """
+        text, has_next = await view.page(0)
+        if text is None:
+            return (None if view.error else view.empty_message), None
+
+        self.opened += 1
+        if not has_next:
+            return self._with_error(text, view), None
+
+        self._purge()
+        view_id = secrets.token_hex(4)
+        self._views[view_id] = (user_id, time.monotonic(), view)
+        return text, self._keyboard(view_id, 0, has_next)
+
+    async def show(self, user_id, callback_data):
+        """
+        Monta a página pedida por um botão
+
+        Args:
+            user_id (str): ID de quem tocou no botão
+            callback_data (str): Dados do callback ("agenda:<id>:<página>")
+
+        Returns:
+            tuple: (texto, teclado ou None); texto None se a listagem expirou
+        """
+        self.page_requests += 1
+        try:
+            _, view_id, index = callback_data.split(':')
+            index = int(index)
+        except ValueError:
+            return None, None
+
+        item = self._views.get(view_id)
+        if item is None or item[0] != user_id or time.monotonic() - item[1] > self.ttl:
+            self.expired_requests += 1
+            return None, None
+        view = item[2]
+
+        text, has_next = await view.page(index)
+        if text is None:
+            if view.error:
+                return f"❌ Erro ao listar eventos: {view.error}", None
+            return None, None
+        if not has_next:
+            text = self._with_error(text, view)
+        return text, self._keyboard(view_id, index, has_next)
+
+    @staticmethod
+    def _with_error(text, view):
+        """Última página de uma listagem interrompida por erro da API: avisar que falta o restante"""
+        if not view.error:
+            return text
+        note = f"⚠️ Não foi possível buscar o restante da agenda: {view.error}"
+        if telegram_length(text) + telegram_length(note) + 1 > MAX_MESSAGE_LENGTH:
+            return text
+        return f"{text}\n{note}"
+
+    @staticmethod
+    def _keyboard(view_id, index, has_next):
+        """Botões de navegação da página"""
+        buttons = []
+        if index > 0:
+            buttons.append(InlineKeyboardButton(
+                "◀️ Página anterior", callback_data=f"{CALLBACK_PREFIX}{view_id}:{index - 1}"))
+        if has_next:
+            buttons.append(InlineKeyboardButton(
+                "Próxima página ▶️", callback_data=f"{CALLBACK_PREFIX}{view_id}:{index + 1}"))
+        return InlineKeyboardMarkup([buttons]) if buttons else None
+
+    def _purge(self):
+        """Remove listagens expiradas e as mais antigas acima do limite"""
+        now = time.monotonic()
+        while self._views:
+            view_id, (_, created, _) = next(iter(self._views.items()))
+            if now - created <= self.ttl and len(self._views) < self.max_views:
+                break
+            del self._views[view_id]
+
+    def get_stats(self):
+        """
+        Retorna métricas da paginação
+
+        Returns:
+            dict: Listagens abertas, páginas pedidas por botão e pedidos expirados
+        """
+        return {
+            'open_views': len(self._views),
+            'opened': self.opened,
+            'page_requests': self.page_requests,
+            'expired_requests': self.expired_requests,
+        }
+
+
+class AgendaCache:
+    """Cache das listagens de um dia, por (usuário, dia), invalidado quando a agenda muda"""
+
+    def __init__(self, ttl=60, max_entries=10000, max_stale=0):
+        """
+        Inicializa o cache
+
+        Args:
+            ttl (float): Segundos que uma listagem pode ser reaproveitada
+            max_entries (int): Máximo de listagens guardadas (as mais antigas saem primeiro)
+            max_stale (float): Segundos que uma listagem vencida ainda é guardada para
+                get_stale (respostas com a API fora do ar)
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_stale = max_stale
+        self._entries = OrderedDict()  # (user_id, dia) -> (expira em, AgendaView, guardada em)
+        self._days_by_user = {}        # user_id -> dias em cache
+        # Invalidações chegam das threads que chamam a API do Google
+        self._lock = threading.Lock()
+
+        # Métricas
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.stale_hits = 0
+        self._miss_time = 0.0  # tempo total para montar a primeira página nos misses
+        self._saved_time = 0.0
+
+    def get(self, user_id, day):
+        """
+        Retorna a listagem do dia, se ainda válida
+
+        Args:
+            user_id (str): ID do usuário
+            day (date): Dia consultado
+
+        Returns:
+            AgendaView: Listagem em cache ou None
+        """
+        key = (user_id, day)
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None and item[0] <= time.monotonic():
+                # Vencida: fica guardada enquanto puder servir de resposta de emergência
+                if item[0] + self.max_stale <= time.monotonic():
+                    self._remove(key)
+                item = None
+        if item is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return item[1]
+
+    def put(self, user_id, day, view):
+        """
+        Guarda a listagem do dia
+
+        Args:
+            user_id (str): ID do usuário
+            day (date): Dia consultado
+            view (AgendaView): Listagem a reaproveitar
+        """
+        key = (user_id, day)
+        with self._lock:
+            self._remove(key)
+            while len(self._entries) >= self.max_entries:
+                self._remove(next(iter(self._entries)))
+            now = time.monotonic()
+            self._entries[key] = (now + self.ttl, view, now)
+            self._days_by_user.setdefault(user_id, set()).add(day)
+
+    def get_stale(self, user_id, day):
+        """
+        Retorna a listagem do dia mesmo vencida (até max_stale), para quando a API está fora do ar
+
+        Args:
+            user_id (str): ID do usuário
+            day (date): Dia consultado
+
+        Returns:
+            tuple: (AgendaView, idade em segundos) ou None
+        """
+        key = (user_id, day)
+        now = time.monotonic()
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None or item[0] + self.max_stale <= now:
+                return None
+        self.stale_hits += 1
+        return item[1], now - item[2]
+
+    def invalidate_user(self, user_id, event=None, deleted_event_id=None):
+        """
+        Descarta todas as listagens do usuário (listener de CalendarManager)
+
+        Args:
+            user_id (str): ID do usuário cuja agenda mudou
+            event (dict): Evento alterado (não usado: um evento pode mudar de dia)
+            deleted_event_id (str): Evento excluído (não usado)
+        """
+        with self._lock:
+            days = self._days_by_user.pop(user_id, ())
+            for day in days:
+                self._entries.pop((user_id, day), None)
+            if days:
+                self.invalidations += 1
+
+    def _remove(self, key):
+        """Remove uma entrada e seu índice por usuário (com o lock adquirido)"""
+        if self._entries.pop(key, None) is None:
+            return
+        user_id, day = key
+        days = self._days_by_user.get(user_id)
+        if days is not None:
+            days.discard(day)
+            if not days:
+                del self._days_by_user[user_id]
+
+    def record_latency(self, hit, elapsed):
+        """
+        Registra quanto levou para responder, para estimar o tempo economizado
+
+        Args:
+            hit (bool): Se a resposta veio do cache
+            elapsed (float): Segundos até a primeira página
+        """
+        if not hit:
+            self._miss_time += elapsed
+        elif self.misses:
+            self._saved_time += max(0.0, self._miss_time / self.misses - elapsed)
+
+    def get_stats(self):
+        """
+        Retorna métricas do cache
+
+        Returns:
+            dict: Entradas, acertos, taxa de acerto, invalidações e tempo economizado
+        """
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+            'invalidations': self.invalidations,
+            'stale_hits': self.stale_hits,
+            'avg_miss_ms': 1000 * self._miss_time / self.misses if self.misses else 0.0,
+            'saved_ms': 1000 * self._saved_time,
+        }
@@ -0,0 +1,439 @@
+"""
+Cliente assíncrono da API REST do Google Calendar (v3).
+Alternativa ao CalendarManager que não ocupa uma thread por chamada: as requisições
+saem por clientes httpx.AsyncClient com pool de conexões e, se o pacote h2 estiver instalado,
+HTTP/2 (várias chamadas multiplexadas na mesma conexão). Os métodos têm os mesmos nomes,
+argumentos e retornos (sucesso, resultado) do CalendarManager, mas são corrotinas.
+
+No bot (CALENDAR_BACKEND=async) ele é usado pelo BlockingCalendarManager: os handlers,
+a outbox e o resumo continuam chamando a agenda em threads, e as requisições saem daqui.
+"""
+
+import time
+import asyncio
+import logging
+import functools
+import itertools
+import importlib.util
+from collections import OrderedDict
+from datetime import datetime
+
+import httpx
+
+from calendar_manager import (
+    CalendarManager, CalendarError, CIRCUIT_OPEN_MESSAGE, NO_SERVICE_MESSAGE, is_backend_failure
+)
+
+# HTTP/2 é opcional (pip install httpx[http2]); o httpx importa o h2 quando precisar
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+logger = logging.getLogger(__name__)
+
+API_BASE_URL = "https://www.googleapis.com/calendar/v3/"
+EVENTS_PATH = "calendars/primary/events"
+
+
+class ApiError(Exception):
+    """Resposta de erro da API (texto no mesmo formato do HttpError do googleapiclient)"""
+
+    def __init__(self, status, url, reason):
+        super().__init__(status, url, reason)
+        self.status = status
+        self.url = url
+        self.reason = reason
+
+    def __str__(self):
+        return f'<HttpError {self.status} when requesting {self.url} returned "{self.reason}">'
+
+
+def _guarded(method):
+    """Passa a chamada pelo disjuntor, como o _guarded do CalendarManager"""
+    @functools.wraps(method)
+    async def wrapper(self, user_id, *args, **kwargs):
+        if self.circuit is None:
+            return await method(self, user_id, *args, **kwargs)
+        if not self.circuit.allow(user_id):
+            return False, CIRCUIT_OPEN_MESSAGE
+        started = time.monotonic()
+        success, result = await method(self, user_id, *args, **kwargs)
+        self.circuit.record(user_id, is_backend_failure(success, result), time.monotonic() - started)
+        return success, result
+    return wrapper
+
+
+def _error(prefix, error):
+    """Mensagem de erro no formato do CalendarManager"""
+    if isinstance(error, ApiError):
+        message = CalendarError(f"Erro na API do Google Calendar: {error}", error.status)
+    else:
+        # Timeouts do httpx vêm sem texto
+        message = f"{prefix}: {str(error) or type(error).__name__}"
+    logger.error(message)
+    return False, message
+
+
+class AsyncCalendarManager:
+    """Gerencia eventos no Google Calendar com chamadas HTTP assíncronas"""
+
+    def __init__(self, auth_manager, circuit=None, base_url=API_BASE_URL, http2=True,
+                 max_connections=100, connections_per_pool=16, connect_timeout=5.0, read_timeout=20.0,
+                 max_users=10000, executor=None):
+        """
+        Inicializa o cliente
+
+        Args:
+            auth_manager (CalendarAuth): Fornece e renova as credenciais dos usuários
+            circuit (CalendarCircuit): Disjuntores da API (opcional)
+            base_url (str): Endereço base da API (outro para testes)
+            http2 (bool): Usar HTTP/2 quando o pacote h2 estiver instalado
+            max_connections (int): Conexões simultâneas no total
+            connections_per_pool (int): Conexões por cliente httpx; o pool do httpcore percorre
+                todas as conexões a cada requisição, então o total é dividido em vários clientes
+            connect_timeout (float): Tempo máximo (s) para abrir uma conexão
+            read_timeout (float): Tempo máximo (s) esperando a resposta
+            max_users (int): Credenciais mantidas em memória
+            executor (Executor): Threads para leitura e renovação de credenciais (padrão: o
+                executor padrão do loop; ver BlockingCalendarManager)
+        """
+        self.auth_manager = auth_manager
+        self.circuit = circuit
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self.max_users = max_users
+        self.executor = executor
+        pools = max(1, -(-max_connections // connections_per_pool))
+        per_pool = -(-max_connections // pools)
+        self._clients = [
+            httpx.AsyncClient(
+                base_url=base_url,
+                http2=self.http2,
+                limits=httpx.Limits(max_connections=per_pool, max_keepalive_connections=per_pool),
+                timeout=httpx.Timeout(read_timeout, connect=connect_timeout)
+            )
+            for _ in range(pools)
+        ]
+        self._next_client = itertools.cycle(self._clients)
+        self._credentials = OrderedDict()  # user_id -> Credentials válidas
+        self._change_listeners = []
+
+        # Métricas
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def aclose(self):
+        """Fecha as conexões dos pools"""
+        for client in self._clients:
+            await client.aclose()
+
+    def add_change_listener(self, listener):
+        """Registra uma função chamada quando eventos de um usuário mudam (ver CalendarManager)"""
+        self._change_listeners.append(listener)
+
+    def notify_change(self, user_id, event=None, deleted_event_id=None):
+        """Avisa os listeners que a agenda do usuário mudou (chamado no loop de eventos)"""
+        for listener in self._change_listeners:
+            try:
+                listener(user_id, event, deleted_event_id)
+            except Exception as e:
+                logger.error(f"Erro ao notificar mudança na agenda de {user_id}: {e}")
+
+    # Credenciais e requisições
+
+    async def _get_credentials(self, user_id):
+        """Credenciais válidas do usuário; o arquivo só é lido (em uma thread) quando vencem"""
+        creds = self._credentials.get(user_id)
+        if creds is not None and creds.valid:
+            self._credentials.move_to_end(user_id)
+            return creds
+
+        creds = await self._in_thread(self.auth_manager.get_credentials, user_id)
+        if creds is None:
+            self._credentials.pop(user_id, None)
+            return None
+        self._credentials[user_id] = creds
+        self._credentials.move_to_end(user_id)
+        while len(self._credentials) > self.max_users:
+            self._credentials.popitem(last=False)
+        return creds
+
+    async def _in_thread(self, function, *args):
+        """Executa uma chamada bloqueante do auth_manager em uma thread de self.executor"""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    async def _request(self, user_id, creds, method, path, params=None, body=None):
+        """
+        Executa uma chamada autenticada, renovando o token e repetindo uma vez se receber 401
+
+        Returns:
+            dict: Corpo JSON da resposta (None se vazio)
+
+        Raises:
+            ApiError: Se a API responder com erro
+        """
+        self.requests += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            for attempt in range(2):
+                response = await next(self._next_client).request(
+                    method, path, params=params, json=body,
+                    headers={'Authorization': f"Bearer {creds.token}"}
+                )
+                if response.status_code == 401 and attempt == 0:
+                    if await self._in_thread(self.auth_manager.refresh_credentials, user_id, creds):
+                        continue
+                break
+        finally:
+            self.in_flight -= 1
+
+        if response.status_code >= 400:
+            try:
+                reason = response.json()['error']['message']
+            except Exception:
+                reason = response.reason_phrase
+            raise ApiError(response.status_code, str(response.url), reason)
+        return response.json() if response.content else None
+
+    @staticmethod
+    def _event_path(event_id):
+        return f"{EVENTS_PATH}/{event_id}"
+
+    # Mesma interface do CalendarManager
+
+    pending_event_args = staticmethod(CalendarManager.pending_event_args)
+
+    async def create_pending_event(self, user_id, event):
+        """Cria no Google Calendar o evento montado durante a conversa"""
+        return await self.create_event(user_id=user_id, **self.pending_event_args(event))
+
+    @_guarded
+    async def create_event(self, user_id, summary, start_date, start_time,
+                           duration=1, description="", location="", attendees=None,
+                           add_meet_link=False, recurrence=None, end_date=None, event_id=None):
+        """Cria um novo evento (argumentos como em CalendarManager.create_event)"""
+        creds = await self._get_credentials(user_id)
+        if not creds:
+            return False, NO_SERVICE_MESSAGE
+        try:
+            event, conference_data_version = CalendarManager.event_body(
+                user_id, summary, start_date, start_time, duration, description, location,
+                attendees, add_meet_link, recurrence, end_date, event_id
+            )
+            created_event = await self._request(
+                user_id, creds, 'POST', EVENTS_PATH,
+                params={'conferenceDataVersion': conference_data_version}, body=event
+            )
+            self.notify_change(user_id, event=created_event)
+            return True, created_event
+        except Exception as e:
+            return _error("Erro ao criar evento", e)
+
+    @_guarded
+    async def list_events(self, user_id, time_min=None, time_max=None, max_results=10):
+        """Lista eventos do calendário do usuário (como CalendarManager.list_events)"""
+        creds = await self._get_credentials(user_id)
+        if not creds:
+            return False, NO_SERVICE_MESSAGE
+        params = {
+            'timeMin': time_min or datetime.utcnow().isoformat() + 'Z',
+            'maxResults': max_results,
+            'singleEvents': 'true',
+            'orderBy': 'startTime'
+        }
+        if time_max:
+            params['timeMax'] = time_max
+        try:
+            events_result = await self._request(user_id, creds, 'GET', EVENTS_PATH, params=params)
+            return True, events_result.get('items', [])
+        except Exception as e:
+            return _error("Erro ao listar eventos", e)
+
+    async def iter_event_pages(self, user_id, time_min, time_max, page_size=50):
+        """
+        Percorre os eventos de um período página a página (gerador assíncrono)
+
+        Yields:
+            tuple: (sucesso (bool), eventos da página (list) ou mensagem de erro (str))
+        """
+        creds = await self._get_credentials(user_id)
+        if not creds:
+            yield False, NO_SERVICE_MESSAGE
+            return
+
+        params = {
+            'timeMin': time_min,
+            'timeMax': time_max,
+            'maxResults': page_size,
+            'singleEvents': 'true',
+            'orderBy': 'startTime'
+        }
+        while True:
+            # Cada página passa pelo disjuntor, como uma chamada separada
+            if self.circuit is not None and not self.circuit.allow(user_id):
+                yield False, CIRCUIT_OPEN_MESSAGE
+                return
+            started = time.monotonic()
+            try:
+                events_result = await self._request(user_id, creds, 'GET', EVENTS_PATH, params=params)
+            except Exception as e:
+                failure = _error("Erro ao listar eventos", e)
+            else:
+                failure = None
+            if self.circuit is not None:
+                self.circuit.record(user_id, failure is not None and is_backend_failure(*failure),
+                                    time.monotonic() - started)
+            if failure:
+                yield failure
+                return
+
+            yield True, events_result.get('items', [])
+
+            page_token = events_result.get('nextPageToken')
+            if not page_token:
+                return
+            params['pageToken'] = page_token
+
+    @_guarded
+    async def update_event(self, user_id, event_id, updates, update_conference=False):
+        """Atualiza um evento existente (como CalendarManager.update_event)"""
+        creds = await self._get_credentials(user_id)
+        if not creds:
+            return False, NO_SERVICE_MESSAGE
+        try:
+            event = await self._request(user_id, creds, 'GET', self._event_path(event_id))
+            conference_data_version = CalendarManager.apply_updates(user_id, event, updates, update_conference)
+            updated_event = await self._request(
+                user_id, creds, 'PUT', self._event_path(event_id),
+                params={'conferenceDataVersion': conference_data_version}, body=event
+            )
+            self.notify_change(user_id, event=updated_event)
+            return True, updated_event
+        except Exception as e:
+            return _error("Erro ao atualizar evento", e)
+
+    @_guarded
+    async def delete_event(self, user_id, event_id):
+        """Exclui um evento"""
+        creds = await self._get_credentials(user_id)
+        if not creds:
+            return False, NO_SERVICE_MESSAGE
+        try:
+            await self._request(user_id, creds, 'DELETE', self._event_path(event_id))
+            self.notify_change(user_id, deleted_event_id=event_id)
+            return True, "Evento excluído com sucesso."
+        except Exception as e:
+            return _error("Erro ao excluir evento", e)
+
+    async def find_events_by_query(self, user_id, query_text, time_min=None, time_max=None, max_results=10):
+        """Busca eventos que correspondam a um texto de consulta"""
+        success, events = await self.list_events(user_id, time_min, time_max, max_results=50)
+        if not success:
+            return False, events
+        return True, CalendarManager.match_events(events, query_text, max_results)
+
+    @_guarded
+    async def get_event_by_id(self, user_id, event_id):
+        """Obtém um evento pelo ID"""
+        creds = await self._get_credentials(user_id)
+        if not creds:
+            return False, NO_SERVICE_MESSAGE
+        try:
+            return True, await self._request(user_id, creds, 'GET', self._event_path(event_id))
+        except Exception as e:
+            return _error("Erro ao obter evento", e)
+
+    @_guarded
+    async def update_event_duration(self, user_id, event_id, duration_hours):
+        """Atualiza apenas a duração de um evento, mantendo o horário de início"""
+        creds = await self._get_credentials(user_id)
+        if not creds:
+            return False, NO_SERVICE_MESSAGE
+        try:
+            event = await self._request(user_id, creds, 'GET', self._event_path(event_id))
+            CalendarManager.apply_duration(event, duration_hours)
+            updated_event = await self._request(user_id, creds, 'PUT', self._event_path(event_id), body=event)
+            self.notify_change(user_id, event=updated_event)
+            return True, updated_event
+        except Exception as e:
+            return _error("Erro ao atualizar duração", e)
+
+    def get_stats(self):
+        """
+        Retorna métricas do cliente
+
+        Returns:
+            dict: Requisições, em andamento, pico simultâneo e se usa HTTP/2
+        """
+        return {
+            'requests': self.requests,
+            'in_flight': self.in_flight,
+            'max_in_flight': self.max_in_flight,
+            'http2': self.http2,
+            'pools': len(self._clients),
+            'cached_credentials': len(self._credentials),
+        }
+
+
+async def _next_page(pages):
+    """Próxima página do gerador assíncrono, ou None no fim"""
+    return await anext(pages, None)
+
+
+class BlockingCalendarManager:
+    """
+    Fachada síncrona do AsyncCalendarManager, com a interface do CalendarManager
+
+    Cada chamada, feita de uma thread (asyncio.to_thread, executores da outbox e do resumo),
+    é executada como corrotina no loop do bot; a thread só espera o resultado. As credenciais
+    devem ser lidas em um executor próprio (executor do AsyncCalendarManager): no executor
+    padrão, threads ocupadas esperando aqui poderiam impedir a leitura que as liberaria.
+    """
+
+    def __init__(self, manager):
+        """
+        Inicializa a fachada
+
+        Args:
+            manager (AsyncCalendarManager): Cliente assíncrono que executa as chamadas
+        """
+        self.manager = manager
+        self._loop = None
+
+    def bind(self, loop):
+        """Define o loop onde as chamadas são executadas (chamado no início do bot)"""
+        self._loop = loop
+
+    async def aclose(self):
+        """Fecha as conexões do cliente"""
+        await self.manager.aclose()
+
+    def _run(self, coro):
+        """Executa a corrotina no loop do bot e aguarda o resultado nesta thread"""
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if self._loop is None or running is self._loop:
+            coro.close()
+            raise RuntimeError("BlockingCalendarManager deve ser chamado de uma thread, com o loop definido (bind)")
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def iter_event_pages(self, *args, **kwargs):
+        """Percorre as páginas do gerador assíncrono do cliente (ver CalendarManager.iter_event_pages)"""
+        pages = self.manager.iter_event_pages(*args, **kwargs)
+        while True:
+            page = self._run(_next_page(pages))
+            if page is None:
+                return
+            yield page
+
+    def __getattr__(self, name):
+        """Métodos assíncronos do cliente viram chamadas bloqueantes; o resto é repassado"""
+        attribute = getattr(self.manager, name)
+        if not asyncio.iscoroutinefunction(attribute):
+            return attribute
+
+        @functools.wraps(attribute)
+        def call(*args, **kwargs):
+            return self._run(attribute(*args, **kwargs))
+        return call
@@ -4,24 +4,55 @@ Integra processamento de linguagem natural e Google Calendar API.
 """
 
 import os
+import time
+import signal
+import asyncio
 import logging
-import json
+import html
+import secrets
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+import pytz
 from dotenv import load_dotenv
-from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton
+from telegram import Bot, Update, InlineKeyboardMarkup, InlineKeyboardButton
 from telegram.ext import (
     Application, CommandHandler, MessageHandler, 
-    CallbackQueryHandler, ContextTypes, filters
+    CallbackQueryHandler, ContextTypes, ExtBot, TypeHandler, filters
 )
 
-from calendar_auth import CalendarAuth
+from agenda import (
+    AgendaCache, AgendaPager, AgendaView, CALLBACK_PREFIX, MAX_MESSAGE_LENGTH, WEEKDAYS, telegram_length
+)
+from async_calendar import AsyncCalendarManager, BlockingCalendarManager
+from calendar_auth import CalendarAuth, user_id_from_state
 from calendar_manager import CalendarManager
+from circuit_breaker import CalendarCircuit
+from conversation import (
+    STATE_NORMAL, STATE_SETUP_START, STATE_AWAITING_CLIENT_ID, STATE_AWAITING_CLIENT_SECRET,
+    STATE_AWAITING_AUTH_CODE, STATE_AWAITING_DATE, STATE_AWAITING_TIME, STATE_AWAITING_DURATION,
+    STATE_AWAITING_SUMMARY, STATE_AWAITING_ATTENDEES, STATE_AWAITING_EVENT_REF,
+    STATE_CONFIRM_DELETE, SETUP_STATES, StateMachine, next_slot
+)
+from conversation_expiry import ConversationExpiry, EXPIRED_NOTICE
+from debounce import MessageDebouncer
+from digest import DailyDigest, DigestCheckpoint, DigestPipeline
+from http_transport import PooledTransport
+from models import PendingEvent
 from nlp_processor import NLPProcessor
+from outbox import MutationOutbox
+from persistence import SQLitePersistence
+from rate_limiter import FloodControlRateLimiter, PRIORITY_BACKGROUND
+from reminders import ReminderScheduler
+from sharding import ShardedDispatcher, in_ranges
+from update_processor import PerUserUpdateProcessor
+from warmup import UserActivity, WarmUp
+from webhook_server import WebhookServer
 
 # Carregar variáveis de ambiente
 load_dotenv()
 
-# Configuração de logging
+# Configuração de logging (única; os demais módulos só obtêm seus loggers)
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     level=logging.INFO
@@ -33,35 +64,238 @@ TOKEN = os.getenv('TELEGRAM_TOKEN')
 if not TOKEN:
     raise ValueError("Token do Telegram não encontrado! Adicione TELEGRAM_TOKEN ao arquivo .env")
 
-# Estados de conversa
-(
-    STATE_NORMAL,                 # Estado normal, processando comandos
-    STATE_SETUP_START,            # Início da configuração
-    STATE_AWAITING_CLIENT_ID,     # Aguardando Client ID
-    STATE_AWAITING_CLIENT_SECRET, # Aguardando Client Secret
-    STATE_AWAITING_AUTH_CODE,     # Aguardando código de autorização
-    
-    STATE_AWAITING_DATE,          # Aguardando data
-    STATE_AWAITING_TIME,          # Aguardando hora
-    STATE_AWAITING_DURATION,      # Aguardando duração
-    STATE_AWAITING_SUMMARY,       # Aguardando título/assunto
-    STATE_AWAITING_ADD_MEET,      # Aguardando confirmação para adicionar Meet
-    STATE_AWAITING_ATTENDEES,     # Aguardando participantes
-    STATE_AWAITING_EVENT_REF,     # Aguardando referência do evento para edição/exclusão
-    STATE_CONFIRM_DELETE          # Confirmação para excluir evento
-) = range(13)
+# Modo webhook (opcional): ativado quando WEBHOOK_URL está definido
+WEBHOOK_URL = os.getenv('WEBHOOK_URL')
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8443'))
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/telegram')
+# Exigido também no /healthz (cabeçalho X-Telegram-Bot-Api-Secret-Token); sem WEBHOOK_SECRET
+# o token é aleatório a cada partida e as métricas ficam inacessíveis
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET') or secrets.token_urlsafe(32)
+WEBHOOK_MAX_QUEUE = int(os.getenv('WEBHOOK_MAX_QUEUE', '1000'))
+
+# Retorno da autorização do Google: no modo webhook o próprio servidor recebe o código;
+# sem ele, o Google redireciona para localhost e o usuário cola o endereço no chat
+OAUTH_REDIRECT_URL = os.getenv('OAUTH_REDIRECT_URL') or (
+    WEBHOOK_URL.rstrip('/') + '/oauth2callback' if WEBHOOK_URL else None
+)
+
+# Concorrência: updates de usuários diferentes em paralelo, cada usuário em ordem
+MAX_CONCURRENT_UPDATES = int(os.getenv('BOT_MAX_CONCURRENT_UPDATES', '16'))
+MAX_PENDING_UPDATES = int(os.getenv('BOT_MAX_PENDING_UPDATES', '10000'))
+
+# Estado de conversa persistido. Com vários workers o banco é compartilhado: cada usuário
+# pertence a um único worker por vez e o SQLite (WAL) serializa as escritas entre processos
+PERSISTENCE_DB = os.getenv('PERSISTENCE_DB', 'data/bot_state.db')
+PERSISTENCE_FLUSH_INTERVAL = float(os.getenv('PERSISTENCE_FLUSH_INTERVAL', '1.0'))
+
+# Expiração de conversas abandonadas (segundos)
+CONVERSATION_TTL = float(os.getenv('CONVERSATION_TTL', '900'))
+CONVERSATION_SETUP_TTL = float(os.getenv('CONVERSATION_SETUP_TTL', '1800'))
+CONVERSATION_IDLE_TTL = float(os.getenv('CONVERSATION_IDLE_TTL', '3600'))
+CONVERSATION_EXPIRY_NOTICE = os.getenv('CONVERSATION_EXPIRY_NOTICE', 'true').lower() in ('1', 'true', 'yes')
+
+# Janela (ms) para juntar mensagens enviadas em sequência rápida (0 desativa)
+DEBOUNCE_MS = float(os.getenv('DEBOUNCE_MS', '0'))
+
+# Tempo (s) que a listagem de um dia fica em cache (0 desativa)
+AGENDA_CACHE_TTL = float(os.getenv('AGENDA_CACHE_TTL', '60'))
+# Tempo (s) que uma listagem vencida ainda pode ser mostrada com a API fora do ar
+AGENDA_STALE_MAX = float(os.getenv('AGENDA_STALE_MAX', '21600'))
+
+# Pool de conexões HTTP compartilhado pelos clientes do Google (renovação de tokens e API)
+GOOGLE_HTTP_POOL_SIZE = int(os.getenv('GOOGLE_HTTP_POOL_SIZE', '32'))
+GOOGLE_HTTP_CONNECT_TIMEOUT = float(os.getenv('GOOGLE_HTTP_CONNECT_TIMEOUT', '5'))
+GOOGLE_HTTP_READ_TIMEOUT = float(os.getenv('GOOGLE_HTTP_READ_TIMEOUT', '20'))
+
+# Cliente da API do Google Calendar: 'google' (googleapiclient, uma thread por chamada) ou
+# 'async' (httpx com HTTP/2; as threads só esperam a resposta, ver async_calendar.py)
+CALENDAR_BACKEND = os.getenv('CALENDAR_BACKEND', 'google').lower()
+# Threads para ler e renovar credenciais com CALENDAR_BACKEND=async
+CALENDAR_AUTH_THREADS = int(os.getenv('CALENDAR_AUTH_THREADS', '4'))
+
+# Disjuntores da API do Google Calendar (falham na hora em vez de esperar o timeout)
+CIRCUIT_FAILURE_RATIO = float(os.getenv('CIRCUIT_FAILURE_RATIO', '0.5'))
+CIRCUIT_MIN_CALLS = int(os.getenv('CIRCUIT_MIN_CALLS', '20'))
+CIRCUIT_OPEN_SECONDS = float(os.getenv('CIRCUIT_OPEN_SECONDS', '30'))
+CIRCUIT_SLOW_CALL = float(os.getenv('CIRCUIT_SLOW_CALL', '10'))
+
+# Resumo diário da agenda ("sua agenda de hoje")
+DIGEST_ENABLED = os.getenv('DIGEST_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+DIGEST_HOUR = int(os.getenv('DIGEST_HOUR', '8'))
+DIGEST_MINUTE = int(os.getenv('DIGEST_MINUTE', '0'))
+DIGEST_TIMEZONE = os.getenv('DIGEST_TIMEZONE', 'America/Sao_Paulo')
+DIGEST_CONCURRENCY = int(os.getenv('DIGEST_CONCURRENCY', '16'))
+DIGEST_API_RATE = float(os.getenv('DIGEST_API_RATE', '50'))
+DIGEST_CHECKPOINT = os.getenv('DIGEST_CHECKPOINT', 'data/digest_checkpoint.txt')
+# Novas rodadas na mesma execução para usuários com falha (espera inicial em segundos, dobrando)
+DIGEST_RETRIES = int(os.getenv('DIGEST_RETRIES', '3'))
+DIGEST_RETRY_DELAY = float(os.getenv('DIGEST_RETRY_DELAY', '30'))
+
+# Lembretes antes dos eventos (minutos de antecedência; 0 desativa)
+REMINDER_LEAD_MINUTES = int(os.getenv('REMINDER_LEAD_MINUTES', '10'))
+REMINDER_MAX = int(os.getenv('REMINDER_MAX', '2000000'))
+
+# Fila persistente de alterações no Google Calendar
+OUTBOX_DB = os.getenv('OUTBOX_DB', 'data/outbox.db')
+OUTBOX_WORKERS = int(os.getenv('OUTBOX_WORKERS', '4'))
+# Tempo (s) esperando a API antes de responder que o pedido foi salvo e será concluído depois
+OUTBOX_ACK_TIMEOUT = float(os.getenv('OUTBOX_ACK_TIMEOUT', '5'))
+
+# Resposta quando a API demora: a alteração foi gravada e será concluída em segundo plano
+OUTBOX_QUEUED_MESSAGE = (
+    "⏳ O Google Calendar está demorando a responder. Seu pedido foi salvo e será "
+    "concluído automaticamente; aviso quando terminar."
+)
+
+# Pré-aquecimento após reinícios: credenciais, serviço e agenda de hoje dos usuários
+# mais ativos (WARMUP_USERS = 0 desativa; a atividade é registrada mesmo assim)
+WARMUP_USERS = int(os.getenv('WARMUP_USERS', '0'))
+WARMUP_CONCURRENCY = int(os.getenv('WARMUP_CONCURRENCY', '4'))
+ACTIVITY_FILE = os.getenv('ACTIVITY_FILE', 'data/activity.json')
+
+# Número de processos worker no modo webhook (1 = processo único)
+BOT_WORKERS = int(os.getenv('BOT_WORKERS', '1'))
+# Escala automática: até BOT_MAX_WORKERS workers conforme a taxa de updates por worker
+# medida a cada BOT_SCALE_INTERVAL segundos (BOT_MAX_WORKERS <= BOT_WORKERS desativa)
+BOT_MAX_WORKERS = int(os.getenv('BOT_MAX_WORKERS', str(BOT_WORKERS)))
+BOT_SCALE_UP_RATE = float(os.getenv('BOT_SCALE_UP_RATE', '50'))
+BOT_SCALE_DOWN_RATE = float(os.getenv('BOT_SCALE_DOWN_RATE', '10'))
+BOT_SCALE_INTERVAL = float(os.getenv('BOT_SCALE_INTERVAL', '30'))
 
 class CalendarBot:
     """Gerencia o bot e integra todos os componentes"""
     
-    def __init__(self):
-        """Inicializa o bot com todos os componentes necessários"""
-        self.auth_manager = CalendarAuth()
-        self.calendar_manager = CalendarManager(self.auth_manager)
-        self.nlp_processor = NLPProcessor()
+    def __init__(self, shard=None):
+        """
+        Inicializa o bot com todos os componentes necessários
+        
+        Args:
+            shard (int): Número do worker no modo com vários processos (cada um tem sua fila de
+                alterações e seu registro de atividade)
+        """
+        self.auth_manager = CalendarAuth(
+            transport=_build_transport(),
+            redirect_uri=OAUTH_REDIRECT_URL,
+            flow_ttl=CONVERSATION_SETUP_TTL
+        )
+        self.circuit = _build_circuit()
+        self.calendar_manager = _build_calendar_manager(self.auth_manager, self.circuit)
+        self.nlp_processor = NLPProcessor(
+            model_dir=os.getenv('NLP_MODEL_DIR'),
+            batch_size=int(os.getenv('NLP_BATCH_SIZE', '8')),
+            max_wait_ms=float(os.getenv('NLP_BATCH_MAX_WAIT_MS', '10')),
+            cache_size=int(os.getenv('NLP_CACHE_SIZE', '1024'))
+        )
+        
+        # Agrupamento opcional de mensagens fragmentadas ("marcar reunião" / "amanhã" / "às 15h")
+        self.debouncer = MessageDebouncer(DEBOUNCE_MS) if DEBOUNCE_MS > 0 else None
+        
+        # Criado antes da expiração, que consulta se o usuário tem update em andamento
+        self.update_processor = PerUserUpdateProcessor(
+            max_concurrent_updates=MAX_CONCURRENT_UPDATES,
+            max_pending_updates=MAX_PENDING_UPDATES,
+            arrival_hook=self.debouncer.note_arrival if self.debouncer else None,
+            turn_hook=self._debounce_turn if self.debouncer else None
+        )
+        
+        # Prazos do estado de conversa; a configuração do Google leva mais tempo
+        self.expiry = ConversationExpiry(
+            STATE_NORMAL,
+            default_ttl=CONVERSATION_TTL,
+            ttl_by_state={state: CONVERSATION_SETUP_TTL for state in SETUP_STATES},
+            idle_ttl=CONVERSATION_IDLE_TTL,
+            notify=CONVERSATION_EXPIRY_NOTICE,
+            is_busy=self.update_processor.is_busy
+        )
+        self._expiry_task = None
+        
+        # Máquina de estados: um handler por estado da conversa
+        self.conversation = StateMachine({
+            STATE_NORMAL: self._process_normal_message,
+            STATE_SETUP_START: self._handle_setup_start,
+            STATE_AWAITING_CLIENT_ID: self._handle_client_id,
+            STATE_AWAITING_CLIENT_SECRET: self._handle_client_secret,
+            STATE_AWAITING_AUTH_CODE: self._handle_auth_code,
+            STATE_AWAITING_DATE: self._fill_date,
+            STATE_AWAITING_TIME: self._fill_time,
+            STATE_AWAITING_DURATION: self._fill_duration,
+            STATE_AWAITING_SUMMARY: self._fill_summary,
+            STATE_AWAITING_ATTENDEES: self._fill_attendees,
+            STATE_AWAITING_EVENT_REF: self._fill_event_reference,
+        }, fallback=self._handle_unknown_state)
+        
+        # Ação executada quando não falta nenhum campo, por intenção
+        self.completions = {
+            "CREATE_EVENT": self._create_event_from_pending,
+            "UPDATE_DURATION": self._update_event_duration,
+            "DELETE_EVENT": self._confirm_delete,
+        }
+        
+        # Listagens paginadas: páginas seguintes só são buscadas quando pedidas no botão
+        self.agenda = AgendaPager()
+        self.agenda_cache = AgendaCache(
+            ttl=AGENDA_CACHE_TTL, max_stale=AGENDA_STALE_MAX
+        ) if AGENDA_CACHE_TTL > 0 else None
+        if self.agenda_cache:
+            # Criar, alterar ou excluir eventos descarta as listagens do usuário
+            self.calendar_manager.add_change_listener(self.agenda_cache.invalidate_user)
         
         # Inicializar a aplicação do Telegram
-        self.app = Application.builder().token(TOKEN).build()
+        self.persistence = SQLitePersistence(PERSISTENCE_DB, flush_interval=PERSISTENCE_FLUSH_INTERVAL)
+        # Envios passam por uma fila com limites do Telegram (respostas antes de envios em massa)
+        self.rate_limiter = FloodControlRateLimiter()
+        self.app = (
+            Application.builder()
+            .token(TOKEN)
+            .concurrent_updates(self.update_processor)
+            .persistence(self.persistence)
+            .rate_limiter(self.rate_limiter)
+            .post_init(self._post_init)
+            .post_stop(self._post_stop)
+            .build()
+        )
+        
+        # Limite de updates do webhook em andamento (backpressure até a fila HTTP)
+        self._webhook_slots = None
+        # Tarefas de updates do webhook ainda não concluídas (o rebalanceamento espera por elas)
+        self._update_tasks = set()
+        
+        # Lembretes dos eventos vistos pelo bot (criados, alterados, listados ou no resumo)
+        self.reminders = ReminderScheduler(
+            self._send_reminder,
+            self.nlp_processor.timezone,
+            lead_minutes=REMINDER_LEAD_MINUTES,
+            max_reminders=REMINDER_MAX
+        ) if REMINDER_LEAD_MINUTES > 0 else None
+        self._reminder_task = None
+        
+        # Alterações no Google Calendar passam pela fila persistente; com vários workers o
+        # banco é o mesmo e cada um assume só as dos seus usuários (mensagem 'claim')
+        self.outbox = MutationOutbox(
+            self.calendar_manager, OUTBOX_DB,
+            workers=OUTBOX_WORKERS,
+            on_result=self._notify_mutation_result,
+            circuit=self.circuit,
+            recover=shard is None
+        )
+        
+        # Resumo diário; com vários workers roda só no processo despachante
+        self.digest = _build_digest(
+            self.app.bot, self.calendar_manager, self.auth_manager,
+            on_events=self.reminders.track if self.reminders else None
+        ) if DIGEST_ENABLED else None
+        self._digest_task = None
+        
+        # Atividade recente (gravada no encerramento) e pré-aquecimento dos mais ativos na partida
+        self.activity = UserActivity(_shard_path(ACTIVITY_FILE, shard))
+        self.warmup = WarmUp(
+            self.auth_manager,
+            prefetch=self._prefetch_today if self.agenda_cache else None,
+            concurrency=WARMUP_CONCURRENCY,
+            circuit=self.circuit
+        ) if WARMUP_USERS > 0 else None
+        self._warmup_task = None
         
         # Adicionar handlers
         self._add_handlers()
@@ -79,6 +313,11 @@ class CalendarBot:
         # Mensagens de texto (não comandos)
         self.app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.process_message))
         
+        # Expiração do estado: verificar antes e renovar o prazo depois dos handlers
+        self.app.add_handler(TypeHandler(Update, self._check_expiry), group=-1)
+        self.app.add_handler(TypeHandler(Update, self._track_expiry), group=1)
+        self.app.add_handler(TypeHandler(Update, self._record_activity), group=2)
+        
         # Handler de erro
         self.app.add_error_handler(self.error_handler)
     
@@ -87,9 +326,9 @@ class CalendarBot:
         user_id = str(update.effective_user.id)
         
         # Verificar se o usuário já está autenticado
-        if self.auth_manager.is_authenticated(user_id):
+        if await asyncio.to_thread(self.auth_manager.is_authenticated, user_id):
             # Testar a conexão
-            if self.auth_manager.test_connection(user_id):
+            if await asyncio.to_thread(self.auth_manager.test_connection, user_id):
                 # Usuário já está configurado
                 await update.message.reply_text(
                     "🤖 Olá! Eu sou seu assistente de calendário.\n\n"
@@ -122,7 +361,7 @@ class CalendarBot:
         user_id = str(update.effective_user.id)
         
         # Limpar dados de autenticação existentes
-        self.auth_manager.clear_auth_data(user_id)
+        await asyncio.to_thread(self.auth_manager.clear_auth_data, user_id)
         
         await update.message.reply_text(
             "Vamos configurar sua conexão com o Google Calendar.\n\n"
@@ -166,23 +405,19 @@ class CalendarBot:
         user_id = str(update.effective_user.id)
         
         # Processar diferentes tipos de callbacks
-        if data.startswith('meet_'):
+        if data.startswith(CALLBACK_PREFIX):
+            # Página seguinte (ou anterior) de uma listagem de eventos
+            await self._show_agenda_page(update, user_id, data)
+        
+        elif data.startswith('meet_'):
             # Resposta para adicionar Google Meet
             add_meet = data == 'meet_yes'
             
             if 'pending_event' in context.user_data:
                 context.user_data['pending_event']['add_meet_link'] = add_meet
                 
-                # Se adicionar Meet, perguntar sobre participantes
-                if add_meet and not context.user_data['pending_event'].get('attendees'):
-                    await query.edit_message_text(
-                        "Quem serão os participantes da reunião? \n\n"
-                        "Digite os e-mails separados por vírgula ou nomes dos participantes."
-                    )
-                    context.user_data['state'] = STATE_AWAITING_ATTENDEES
-                else:
-                    # Criar o evento
-                    await self._create_event_from_pending(update, context, is_button=True)
+                # Perguntar os participantes, se necessário, ou criar o evento
+                await self._advance(update, context, is_button=True)
             else:
                 await query.edit_message_text(
                     "Ocorreu um erro ao processar sua solicitação. Por favor, tente novamente."
@@ -196,12 +431,14 @@ class CalendarBot:
                 event_id = context.user_data['event_to_delete']
                 
                 # Excluir o evento
-                success, result = self.calendar_manager.delete_event(user_id, event_id)
+                outcome = await self._submit_mutation(user_id, 'delete_event', event_id=event_id)
                 
-                if success:
+                if outcome is None:
+                    await query.edit_message_text(OUTBOX_QUEUED_MESSAGE)
+                elif outcome[0]:
                     await query.edit_message_text("✅ Evento excluído com sucesso!")
                 else:
-                    await query.edit_message_text(f"❌ Erro ao excluir evento: {result}")
+                    await query.edit_message_text(f"❌ Erro ao excluir evento: {outcome[1]}")
                 
                 # Limpar dados temporários
                 if 'event_to_delete' in context.user_data:
@@ -213,41 +450,39 @@ class CalendarBot:
     
     async def process_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Processa mensagens de texto recebidas"""
-        user_id = str(update.effective_user.id)
         text = update.message.text
         
         # Obter o estado atual da conversa
         state = context.user_data.get('state', STATE_NORMAL)
         
-        # Processar mensagem com base no estado atual
-        if state == STATE_SETUP_START:
-            await self._handle_setup_start(update, context, text)
-        
-        elif state == STATE_AWAITING_CLIENT_ID:
-            await self._handle_client_id(update, context, text)
-        
-        elif state == STATE_AWAITING_CLIENT_SECRET:
-            await self._handle_client_secret(update, context, text)
-        
-        elif state == STATE_AWAITING_AUTH_CODE:
-            await self._handle_auth_code(update, context, text)
-        
-        elif state in [STATE_AWAITING_DATE, STATE_AWAITING_TIME, STATE_AWAITING_DURATION, 
-                       STATE_AWAITING_SUMMARY, STATE_AWAITING_ATTENDEES, STATE_AWAITING_EVENT_REF]:
-            await self._handle_pending_info(update, context, text, state)
-        
-        elif state == STATE_NORMAL:
-            # Processamento normal de comando
-            await self._process_normal_message(update, context, text)
+        # Juntar fragmentos de um pedido novo; respostas a perguntas seguem separadas
+        if self.debouncer:
+            if state == STATE_NORMAL:
+                text = self.debouncer.collect(update)
+                if text is None:
+                    return  # Já incluída no texto de uma mensagem anterior
+            elif self.debouncer.skip(update):
+                return
         
-        else:
-            # Estado desconhecido
-            logger.warning(f"Estado desconhecido: {state}")
-            await update.message.reply_text(
-                "Desculpe, houve um problema ao processar sua mensagem. Vamos recomeçar.\n\n"
-                "Use /start para iniciar o bot novamente."
-            )
-            context.user_data['state'] = STATE_NORMAL
+        # Encaminhar ao handler do estado atual
+        await self.conversation.dispatch(state, update, context, text)
+    
+    async def _debounce_turn(self, update: Update) -> None:
+        """Na vez da mensagem, espera o usuário terminar de digitar se for um pedido novo"""
+        user = update.effective_user
+        # Usuários ainda não carregados da persistência não estão no meio de um fluxo
+        state = self.app.user_data.get(user.id, {}).get('state', STATE_NORMAL) if user else None
+        if state == STATE_NORMAL:
+            await self.debouncer.wait_quiet(update)
+    
+    async def _handle_unknown_state(self, update: Update, context: ContextTypes.DEFAULT_TYPE, text: str) -> None:
+        """Recomeça a conversa quando o estado salvo não tem handler"""
+        logger.warning(f"Estado desconhecido: {context.user_data.get('state')}")
+        await update.message.reply_text(
+            "Desculpe, houve um problema ao processar sua mensagem. Vamos recomeçar.\n\n"
+            "Use /start para iniciar o bot novamente."
+        )
+        context.user_data['state'] = STATE_NORMAL
     
     async def _handle_setup_start(self, update: Update, context: ContextTypes.DEFAULT_TYPE, text: str) -> None:
         """Processa a resposta inicial do setup"""
@@ -267,8 +502,7 @@ class CalendarBot:
                 "5. No menu lateral, acesse 'APIs e Serviços' > 'Credenciais'\n"
                 "6. Clique em 'Criar Credenciais' > 'ID do Cliente OAuth'\n"
                 "7. Configure a tela de consentimento (tipo 'Externo')\n"
-                "8. Para tipo de aplicativo, escolha 'Aplicativo para Desktop'\n"
-                "9. Dê um nome e clique em 'Criar'\n\n"
+                f"{_client_type_instructions()}"
                 "Você receberá um Client ID e um Client Secret. Me avise quando estiver pronto!"
             )
     
@@ -294,18 +528,22 @@ class CalendarBot:
         client_id = context.user_data.get('client_id')
         client_secret = text.strip()
         
-        # Salvar credenciais e gerar URL de autorização
-        credentials_file = self.auth_manager.save_temp_credentials(user_id, client_id, client_secret)
-        
         try:
-            # Gerar URL de autorização
-            auth_url = self.auth_manager.get_auth_url(user_id, credentials_file)
+            # Gerar URL de autorização (o fluxo fica em memória até o retorno do Google)
+            auth_url = self.auth_manager.start_auth(user_id, client_id, client_secret)
             
             if auth_url:
+                if OAUTH_REDIRECT_URL:
+                    next_step = "Após autorizar, a configuração será concluída automaticamente."
+                else:
+                    next_step = (
+                        "Após autorizar, o navegador tentará abrir um endereço em localhost, que não vai carregar. "
+                        "Copie o endereço completo da barra do navegador e cole aqui."
+                    )
                 await update.message.reply_text(
                     f"Agora você precisa autorizar o acesso ao seu Google Calendar. Clique no link abaixo:\n\n"
                     f"{auth_url}\n\n"
-                    f"Após autorizar, você receberá um código. Copie e cole esse código aqui."
+                    f"{next_step}"
                 )
                 context.user_data['state'] = STATE_AWAITING_AUTH_CODE
             else:
@@ -327,244 +565,208 @@ class CalendarBot:
         user_id = str(update.effective_user.id)
         auth_code = text.strip()
         
-        # Processar o código de autorização
-        success, message = self.auth_manager.process_auth_code(user_id, auth_code)
+        # Processar o código de autorização (troca pelo token sem bloquear o loop)
+        success, message = await self.auth_manager.process_auth_code(user_id, auth_code)
         
+        await update.message.reply_text(_auth_result_text(success, message))
         if success:
-            await update.message.reply_text(
-                f"🎉 {message}\n\n"
-                f"Seu assistente de calendário está pronto para uso!\n\n"
-                f"Você pode me pedir para:\n"
-                f"• Agendar eventos: 'Agendar reunião amanhã às 10h'\n"
-                f"• Consultar agenda: 'O que tenho hoje?'\n"
-                f"• E muito mais!\n\n"
-                f"Use /help para ver mais exemplos."
-            )
             context.user_data['state'] = STATE_NORMAL
-        else:
-            await update.message.reply_text(
-                f"{message}\n\n"
-                f"Por favor, tente novamente ou use /setup para reiniciar o processo."
-            )
     
-    async def _handle_pending_info(self, update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, state: int) -> None:
-        """Processa informações pendentes para completar uma operação"""
-        user_id = str(update.effective_user.id)
+    async def _handle_oauth_callback(self, method, query, body):
+        """Rota /oauth2callback: recebe o código do Google e conclui a configuração do usuário"""
+        if method != 'GET':
+            return 405, ''
+        user_id = await self._complete_oauth(
+            query.get('state', [''])[0], query.get('code', [None])[0], query.get('error', [None])[0]
+        )
+        if user_id is None:
+            return 400, _oauth_page("Link de autorização inválido ou expirado. Use /setup no Telegram para recomeçar.")
+        return 200, _oauth_page("Autorização recebida! Volte ao Telegram para continuar.")
+    
+    async def _complete_oauth(self, state, code, error=None):
+        """
+        Troca o código recebido no endereço de retorno e avisa o usuário no chat
         
-        # Garantir que há um dicionário para armazenar o evento pendente
+        Returns:
+            str: ID do usuário da autorização, ou None se o state é desconhecido
+        """
+        user_id, success, message = await self.auth_manager.complete_redirect(state, code, error)
+        if user_id is None:
+            return None
+        
+        if success:
+            user_data = self.app.user_data[int(user_id)]
+            user_data['state'] = STATE_NORMAL
+            self.expiry.touch(int(user_id), user_data)
+            self.app.mark_data_for_update_persistence(user_ids=int(user_id))
+        try:
+            await self.app.bot.send_message(chat_id=int(user_id), text=_auth_result_text(success, message))
+        except Exception as e:
+            logger.warning(f"Erro ao avisar {user_id} do resultado da autorização: {e}")
+        return user_id
+    
+    def _pending_event(self, context: ContextTypes.DEFAULT_TYPE) -> PendingEvent:
+        """Evento pendente do usuário (criado, com intenção de criar evento, se não existir)"""
         if 'pending_event' not in context.user_data:
-            context.user_data['pending_event'] = {}
+            context.user_data['pending_event'] = PendingEvent()
+        context.user_data.setdefault('pending_intent', "CREATE_EVENT")
+        return context.user_data['pending_event']
+    
+    async def _reply(self, update: Update, text: str, is_button=False, reply_markup=None) -> None:
+        """Responde com nova mensagem ou editando a mensagem do botão"""
+        if is_button:
+            await update.callback_query.edit_message_text(text, reply_markup=reply_markup)
+        else:
+            await update.message.reply_text(text, reply_markup=reply_markup)
+    
+    async def _advance(self, update: Update, context: ContextTypes.DEFAULT_TYPE, is_button=False) -> None:
+        """Pergunta o próximo campo que falta ou conclui a ação quando nada falta"""
+        intent = context.user_data.get('pending_intent', "CREATE_EVENT")
+        pending_event = self._pending_event(context)
         
-        if 'pending_intent' not in context.user_data:
-            context.user_data['pending_intent'] = "CREATE_EVENT"
+        slot = next_slot(intent, self.nlp_processor.get_missing_info(intent, pending_event))
+        if slot:
+            name, state, prompt = slot
+            reply_markup = None
+            if name == 'add_meet_link':
+                reply_markup = InlineKeyboardMarkup([[
+                    InlineKeyboardButton("✅ Sim", callback_data="meet_yes"),
+                    InlineKeyboardButton("❌ Não", callback_data="meet_no")
+                ]])
+            await self._reply(update, prompt, is_button, reply_markup)
+            context.user_data['state'] = state
+            return
         
-        # Processar com base no estado atual
-        if state == STATE_AWAITING_DATE:
-            # Extrair data da resposta
-            date = self.nlp_processor.extract_date(text)
-            if date:
-                context.user_data['pending_event']['date'] = date
-                
-                # Verificar se também precisa de hora
-                if 'time' not in context.user_data['pending_event']:
-                    await update.message.reply_text("Em qual horário?")
-                    context.user_data['state'] = STATE_AWAITING_TIME
-                else:
-                    # Verificar se é um evento de reunião
-                    await self._check_if_meeting(update, context)
-            else:
-                await update.message.reply_text(
-                    "Não consegui entender a data. Por favor, tente novamente com formatos como 'amanhã', 'sexta-feira' ou '15/04'."
-                )
+        action = self.completions.get(intent)
+        if action:
+            await action(update, context, is_button)
+    
+    async def _fill_date(self, update: Update, context: ContextTypes.DEFAULT_TYPE, text: str) -> None:
+        """Recebe a data do evento pendente"""
+        date = self.nlp_processor.extract_date(text)
+        if date:
+            self._pending_event(context).date = date
+            await self._advance(update, context)
+        else:
+            await update.message.reply_text(
+                "Não consegui entender a data. Por favor, tente novamente com formatos como 'amanhã', 'sexta-feira' ou '15/04'."
+            )
+    
+    async def _fill_time(self, update: Update, context: ContextTypes.DEFAULT_TYPE, text: str) -> None:
+        """Recebe o horário do evento pendente"""
+        time = self.nlp_processor.extract_time(text)
+        if time:
+            self._pending_event(context).time = time
+            await self._advance(update, context)
+        else:
+            await update.message.reply_text(
+                "Não consegui entender o horário. Por favor, tente novamente com formatos como '14h', '14:30' ou '2 da tarde'."
+            )
+    
+    async def _fill_duration(self, update: Update, context: ContextTypes.DEFAULT_TYPE, text: str) -> None:
+        """Recebe a duração do evento pendente"""
+        duration = self.nlp_processor.extract_duration(text)
+        if duration:
+            self._pending_event(context).duration = duration
+            await self._advance(update, context)
+        else:
+            await update.message.reply_text(
+                "Não consegui entender a duração. Por favor, tente novamente com formatos como '1 hora', '90 minutos' ou '1,5 horas'."
+            )
+    
+    async def _fill_summary(self, update: Update, context: ContextTypes.DEFAULT_TYPE, text: str) -> None:
+        """Usa o texto recebido como título/assunto do evento"""
+        self._pending_event(context).summary = text.strip()
+        await self._advance(update, context)
+    
+    async def _fill_attendees(self, update: Update, context: ContextTypes.DEFAULT_TYPE, text: str) -> None:
+        """Recebe a lista de participantes (e-mails ou nomes separados por vírgula)"""
+        # Nomes poderiam ser convertidos para e-mail em uma implementação real
+        attendees = [attendee.strip() for attendee in text.split(',') if attendee.strip()]
         
-        elif state == STATE_AWAITING_TIME:
-            # Extrair hora da resposta
-            time = self.nlp_processor.extract_time(text)
-            if time:
-                context.user_data['pending_event']['time'] = time
-                
-                # Verificar se também precisa de data
-                if 'date' not in context.user_data['pending_event']:
-                    await update.message.reply_text("Em qual data?")
-                    context.user_data['state'] = STATE_AWAITING_DATE
-                else:
-                    # Verificar se é um evento de reunião
-                    await self._check_if_meeting(update, context)
-            else:
-                await update.message.reply_text(
-                    "Não consegui entender o horário. Por favor, tente novamente com formatos como '14h', '14:30' ou '2 da tarde'."
-                )
+        if attendees:
+            self._pending_event(context).attendees = attendees
+            await self._advance(update, context)
+        else:
+            await update.message.reply_text(
+                "Não consegui identificar os participantes. Por favor, tente novamente com emails ou nomes separados por vírgula."
+            )
+    
+    async def _fill_event_reference(self, update: Update, context: ContextTypes.DEFAULT_TYPE, text: str) -> None:
+        """Busca o evento descrito pelo usuário para edição/exclusão"""
+        user_id = str(update.effective_user.id)
+        pending_event = self._pending_event(context)
         
-        elif state == STATE_AWAITING_DURATION:
-            # Extrair duração da resposta
-            duration = self.nlp_processor.extract_duration(text)
-            if duration:
-                context.user_data['pending_event']['duration'] = duration
-                
-                # Verificar o intent para decidir o próximo passo
-                intent = context.user_data.get('pending_intent')
-                
-                if intent == "UPDATE_DURATION":
-                    # Atualizar duração de um evento existente
-                    await self._update_event_duration(update, context)
-                else:
-                    # Para criar evento, verificar se é uma reunião
-                    await self._check_if_meeting(update, context)
-            else:
-                await update.message.reply_text(
-                    "Não consegui entender a duração. Por favor, tente novamente com formatos como '1 hora', '90 minutos' ou '1,5 horas'."
-                )
+        success, events = await asyncio.to_thread(self.calendar_manager.find_events_by_query, user_id, text)
         
-        elif state == STATE_AWAITING_SUMMARY:
-            # Usar o texto diretamente como título/assunto
-            context.user_data['pending_event']['summary'] = text.strip()
-            
-            # Verificar se é um evento de reunião
-            await self._check_if_meeting(update, context)
+        if not success or not events:
+            await update.message.reply_text(
+                "Não encontrei eventos correspondentes à sua descrição. Por favor, tente novamente com mais detalhes."
+            )
+            return
         
-        elif state == STATE_AWAITING_ATTENDEES:
-            # Processar lista de participantes
-            attendees = []
+        if len(events) > 1:
+            # Múltiplos eventos encontrados, pedir para escolher (mantém o estado)
+            message = "Encontrei vários eventos. Qual deles você deseja?\n\n"
             
-            # Dividir por vírgulas
-            for attendee in text.split(','):
-                attendee = attendee.strip()
-                if '@' in attendee:  # É um email
-                    attendees.append(attendee)
-                else:  # É um nome, poderia ser convertido para email em uma implementação real
-                    attendees.append(attendee)
+            for i, event in enumerate(events[:5]):  # Limitar a 5 eventos
+                start = datetime.fromisoformat(event['start'].get('dateTime', event['start'].get('date'))).replace(tzinfo=None)
+                message += f"{i+1}. {event['summary']} - {start.strftime('%d/%m/%Y %H:%M')}\n"
             
-            if attendees:
-                context.user_data['pending_event']['attendees'] = attendees
-                
-                # Criar o evento
-                await self._create_event_from_pending(update, context)
-            else:
-                await update.message.reply_text(
-                    "Não consegui identificar os participantes. Por favor, tente novamente com emails ou nomes separados por vírgula."
-                )
+            await update.message.reply_text(message)
+            return
         
-        elif state == STATE_AWAITING_EVENT_REF:
-            # Buscar eventos que correspondam à referência
-            success, events = self.calendar_manager.find_events_by_query(user_id, text)
-            
-            if success and events:
-                if len(events) == 1:
-                    # Apenas um evento encontrado, usar diretamente
-                    event = events[0]
-                    context.user_data['pending_event']['event_id'] = event['id']
-                    
-                    # Processar com base na intenção
-                    intent = context.user_data.get('pending_intent')
-                    
-                    if intent == "UPDATE_DURATION":
-                        if 'duration' in context.user_data['pending_event']:
-                            # Já tem duração, atualizar
-                            await self._update_event_duration(update, context)
-                        else:
-                            # Perguntar a duração
-                            await update.message.reply_text("Qual deve ser a nova duração do evento?")
-                            context.user_data['state'] = STATE_AWAITING_DURATION
-                    
-                    elif intent == "DELETE_EVENT":
-                        # Confirmar exclusão
-                        context.user_data['event_to_delete'] = event['id']
-                        
-                        # Formatar data e hora para exibição
-                        start = datetime.fromisoformat(event['start'].get('dateTime', event['start'].get('date'))).replace(tzinfo=None)
-                        
-                        keyboard = [
-                            [
-                                InlineKeyboardButton("✅ Sim, excluir", callback_data="delete_yes"),
-                                InlineKeyboardButton("❌ Não, cancelar", callback_data="delete_no")
-                            ]
-                        ]
-                        reply_markup = InlineKeyboardMarkup(keyboard)
-                        
-                        await update.message.reply_text(
-                            f"Você deseja excluir este evento?\n\n"
-                            f"📝 {event['summary']}\n"
-                            f"📅 {start.strftime('%d/%m/%Y')}\n"
-                            f"🕒 {start.strftime('%H:%M')}",
-                            reply_markup=reply_markup
-                        )
-                        context.user_data['state'] = STATE_CONFIRM_DELETE
-                else:
-                    # Múltiplos eventos encontrados, pedir para escolher
-                    message = "Encontrei vários eventos. Qual deles você deseja?\n\n"
-                    
-                    for i, event in enumerate(events[:5]):  # Limitar a 5 eventos
-                        start = datetime.fromisoformat(event['start'].get('dateTime', event['start'].get('date'))).replace(tzinfo=None)
-                        message += f"{i+1}. {event['summary']} - {start.strftime('%d/%m/%Y %H:%M')}\n"
-                    
-                    await update.message.reply_text(message)
-                    # Mantém o estado para esperar a escolha
-            else:
-                await update.message.reply_text(
-                    "Não encontrei eventos correspondentes à sua descrição. Por favor, tente novamente com mais detalhes."
-                )
+        # Apenas um evento encontrado, usar diretamente
+        pending_event.event_id = events[0]['id']
+        # Detalhes só para a confirmação; chaves com '_' não são persistidas
+        context.user_data['_matched_event'] = events[0]
+        await self._advance(update, context)
+        context.user_data.pop('_matched_event', None)
     
-    async def _check_if_meeting(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-        """Verifica se é um evento de reunião e pergunta se deve adicionar Google Meet"""
-        # Verificar se todas as informações essenciais estão presentes
-        pending_event = context.user_data.get('pending_event', {})
-        has_essential_info = all(field in pending_event for field in ['date', 'time'])
+    async def _confirm_delete(self, update: Update, context: ContextTypes.DEFAULT_TYPE, is_button=False) -> None:
+        """Pede confirmação antes de excluir o evento escolhido"""
+        pending_event = self._pending_event(context)
+        event = context.user_data.get('_matched_event')
+        context.user_data['event_to_delete'] = pending_event.event_id
         
-        if has_essential_info:
-            # Verificar se é reunião e não foi decidido ainda sobre o Meet
-            is_meeting = pending_event.get('is_meeting', False)
-            
-            if is_meeting and 'add_meet_link' not in pending_event:
-                keyboard = [
-                    [
-                        InlineKeyboardButton("✅ Sim", callback_data="meet_yes"),
-                        InlineKeyboardButton("❌ Não", callback_data="meet_no")
-                    ]
-                ]
-                reply_markup = InlineKeyboardMarkup(keyboard)
-                
-                await update.message.reply_text(
-                    "Deseja adicionar um link do Google Meet para esta reunião?",
-                    reply_markup=reply_markup
-                )
-                context.user_data['state'] = STATE_AWAITING_ADD_MEET
-            else:
-                # Criar o evento diretamente
-                await self._create_event_from_pending(update, context)
+        message = "Você deseja excluir este evento?"
+        if event:
+            # Formatar data e hora para exibição
+            start = datetime.fromisoformat(event['start'].get('dateTime', event['start'].get('date'))).replace(tzinfo=None)
+            message += (
+                f"\n\n📝 {event['summary']}\n"
+                f"📅 {start.strftime('%d/%m/%Y')}\n"
+                f"🕒 {start.strftime('%H:%M')}"
+            )
+        
+        keyboard = [
+            [
+                InlineKeyboardButton("✅ Sim, excluir", callback_data="delete_yes"),
+                InlineKeyboardButton("❌ Não, cancelar", callback_data="delete_no")
+            ]
+        ]
+        await self._reply(update, message, is_button, InlineKeyboardMarkup(keyboard))
+        context.user_data['state'] = STATE_CONFIRM_DELETE
     
     async def _create_event_from_pending(self, update: Update, context: ContextTypes.DEFAULT_TYPE, is_button=False) -> None:
         """Cria um evento a partir das informações pendentes"""
         user_id = str(update.effective_user.id)
-        pending_event = context.user_data.get('pending_event', {})
+        pending_event = context.user_data.get('pending_event') or PendingEvent()
 
         # Verificar se tem todas as informações necessárias
         if 'date' in pending_event and 'time' in pending_event:
-            # Extrair informações
-            date = pending_event.get('date')
-            time = pending_event.get('time')
-            duration = pending_event.get('duration', 1)  # Padrão: 1 hora
-            summary = pending_event.get('summary', "Evento")
-            location = pending_event.get('location')
-            add_meet_link = pending_event.get('add_meet_link', False)
-            attendees = pending_event.get('attendees')
-            recurrence = pending_event.get('recurrence')  # Novo
-            end_date = pending_event.get('end_date')      # Novo
-
             # Criar o evento
-            success, result = self.calendar_manager.create_event(
-                user_id=user_id,
-                summary=summary,
-                start_date=date,
-                start_time=time,
-                duration=duration,
-                location=location,
-                attendees=attendees,
-                add_meet_link=add_meet_link,
-                recurrence=recurrence,  # Novo
-                end_date=end_date       # Novo
-            )
+            outcome = await self._submit_mutation(
+                user_id, 'create_event', **CalendarManager.pending_event_args(pending_event))
             
-            if success:
+            date = pending_event.date
+            time = pending_event.time
+            duration = pending_event.get('duration', 1)
+            summary = pending_event.get('summary', "Evento")
+            
+            if outcome is None:
+                await self._reply(update, OUTBOX_QUEUED_MESSAGE, is_button)
+            elif outcome[0]:
                 # Formatar data e hora para exibição
                 date_obj = datetime.fromisoformat(date)
                 date_display = f"{date_obj.day:02d}/{date_obj.month:02d}/{date_obj.year}"
@@ -572,73 +774,64 @@ class CalendarBot:
                 hour, minute = time.split(":")
                 time_display = f"{int(hour)}:{minute}"
                 
-                # Mensagem de sucesso
-                if is_button:
-                    # Editar a mensagem do botão
-                    await update.callback_query.edit_message_text(
-                        f"✅ Evento criado com sucesso!\n\n"
-                        f"📝 {summary}\n"
-                        f"📅 {date_display}\n"
-                        f"🕒 {time_display}\n"
-                        f"⏱️ Duração: {duration} hora(s)"
-                    )
-                else:
-                    # Responder com nova mensagem
-                    await update.message.reply_text(
-                        f"✅ Evento criado com sucesso!\n\n"
-                        f"📝 {summary}\n"
-                        f"📅 {date_display}\n"
-                        f"🕒 {time_display}\n"
-                        f"⏱️ Duração: {duration} hora(s)"
-                    )
+                # Mensagem de sucesso (editando a mensagem do botão, se veio de um)
+                await self._reply(
+                    update,
+                    f"✅ Evento criado com sucesso!\n\n"
+                    f"📝 {summary}\n"
+                    f"📅 {date_display}\n"
+                    f"🕒 {time_display}\n"
+                    f"⏱️ Duração: {duration} hora(s)",
+                    is_button
+                )
             else:
-                error_message = f"❌ Erro ao criar evento: {result}"
-                
-                if is_button:
-                    await update.callback_query.edit_message_text(error_message)
-                else:
-                    await update.message.reply_text(error_message)
+                await self._reply(update, f"❌ Erro ao criar evento: {outcome[1]}", is_button)
             
             # Limpar dados temporários
             if 'pending_event' in context.user_data:
                 del context.user_data['pending_event']
             context.user_data['state'] = STATE_NORMAL
     
-    async def _update_event_duration(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    async def _update_event_duration(self, update: Update, context: ContextTypes.DEFAULT_TYPE, is_button=False) -> None:
         """Atualiza a duração de um evento"""
         user_id = str(update.effective_user.id)
-        pending_event = context.user_data.get('pending_event', {})
+        pending_event = context.user_data.get('pending_event') or PendingEvent()
         
         if 'event_id' in pending_event and 'duration' in pending_event:
             event_id = pending_event['event_id']
             duration = pending_event['duration']
             
             # Atualizar duração
-            success, result = self.calendar_manager.update_event_duration(user_id, event_id, duration)
+            outcome = await self._submit_mutation(
+                user_id, 'update_event_duration', event_id=event_id, duration_hours=duration)
             
-            if success:
+            if outcome is None:
+                await self._reply(update, OUTBOX_QUEUED_MESSAGE, is_button)
+            elif outcome[0]:
                 # Obter informações do evento atualizado
-                event_success, event = self.calendar_manager.get_event_by_id(user_id, event_id)
+                event_success, event = await asyncio.to_thread(self.calendar_manager.get_event_by_id, user_id, event_id)
                 
                 if event_success:
                     start = datetime.fromisoformat(event['start'].get('dateTime', event['start'].get('date'))).replace(tzinfo=None)
                     end = datetime.fromisoformat(event['end'].get('dateTime', event['end'].get('date'))).replace(tzinfo=None)
                     
-                    await update.message.reply_text(
+                    await self._reply(
+                        update,
                         f"✅ Duração atualizada com sucesso!\n\n"
                         f"📝 {event['summary']}\n"
                         f"📅 {start.strftime('%d/%m/%Y')}\n"
                         f"🕒 {start.strftime('%H:%M')} - {end.strftime('%H:%M')}\n"
-                        f"⏱️ Nova duração: {duration} hora(s)"
+                        f"⏱️ Nova duração: {duration} hora(s)",
+                        is_button
                     )
                 else:
-                    await update.message.reply_text(
-                        f"✅ Duração atualizada para {duration} hora(s), mas não foi possível obter detalhes do evento."
+                    await self._reply(
+                        update,
+                        f"✅ Duração atualizada para {duration} hora(s), mas não foi possível obter detalhes do evento.",
+                        is_button
                     )
             else:
-                await update.message.reply_text(
-                    f"❌ Erro ao atualizar duração: {result}"
-                )
+                await self._reply(update, f"❌ Erro ao atualizar duração: {outcome[1]}", is_button)
             
             # Limpar dados temporários
             if 'pending_event' in context.user_data:
@@ -650,14 +843,18 @@ class CalendarBot:
         user_id = str(update.effective_user.id)
         
         # Verificar se o usuário está autenticado
-        if not self.auth_manager.is_authenticated(user_id):
+        if not await asyncio.to_thread(self.auth_manager.is_authenticated, user_id):
             await update.message.reply_text(
                 "Você ainda não está conectado ao Google Calendar. Use /start para configurar."
             )
             return
         
-        # Processar a mensagem com NLP
-        intent, entities = self.nlp_processor.process_message(text)
+        # Processar a mensagem com NLP (em thread quando o modelo pode ser consultado,
+        # para que mensagens concorrentes formem micro-lotes)
+        if self.nlp_processor.intent_model:
+            intent, entities = await asyncio.to_thread(self.nlp_processor.process_message, text)
+        else:
+            intent, entities = self.nlp_processor.process_message(text)
         
         # Verificar se entendeu a intenção
         if intent == "UNKNOWN":
@@ -670,173 +867,269 @@ class CalendarBot:
             )
             return
         
-        # Verificar informações faltantes
-        missing = self.nlp_processor.get_missing_info(intent, entities)
+        if intent == "LIST_EVENTS":
+            await self._list_events(update, user_id, entities)
+            return
         
-        if missing:
-            # Armazenar intenção e informações parciais
-            context.user_data['pending_intent'] = intent
-            context.user_data['pending_event'] = entities
-            
-            # Perguntar por informações faltantes
-            if 'date' in missing:
-                await update.message.reply_text("Em qual data?")
-                context.user_data['state'] = STATE_AWAITING_DATE
-                return
-            
-            if 'time' in missing:
-                await update.message.reply_text("Em qual horário?")
-                context.user_data['state'] = STATE_AWAITING_TIME
-                return
-            
-            if 'duration' in missing:
-                await update.message.reply_text("Qual deve ser a duração?")
-                context.user_data['state'] = STATE_AWAITING_DURATION
-                return
-            
-            if 'summary' in missing:
-                await update.message.reply_text("Qual é o título ou assunto do evento?")
-                context.user_data['state'] = STATE_AWAITING_SUMMARY
-                return
+        # Demais intenções: guardar o pedido e preencher os campos que faltarem
+        context.user_data['pending_intent'] = intent
+        context.user_data['pending_event'] = entities
+        await self._advance(update, context)
+    
+    async def _list_events(self, update: Update, user_id: str, entities: PendingEvent) -> None:
+        """Lista eventos de um dia, de um período ou os próximos eventos"""
+        date = entities.get('date')
+        date_range = entities.get('date_range')
+        
+        # Um único dia é tratado como o período [dia, dia seguinte)
+        if not date_range and date:
+            date_obj = datetime.fromisoformat(date)
+            date_range = (date, (date_obj + timedelta(days=1)).date().isoformat())
+        
+        if not date_range:
+            # Listar próximos eventos
+            success, events = await asyncio.to_thread(
+                self.calendar_manager.list_events,
+                user_id=user_id,
+                max_results=5
+            )
             
-            if 'event_reference' in missing:
-                await update.message.reply_text("Qual evento você deseja modificar?")
-                context.user_data['state'] = STATE_AWAITING_EVENT_REF
+            if not success:
+                await update.message.reply_text(f"❌ Erro ao listar eventos: {events}")
+            elif not events:
+                await update.message.reply_text("Não há eventos próximos agendados.")
+            else:
+                now = datetime.now()
+                header = f"📅 Próximos eventos a partir de hoje ({now.day:02d}/{now.month:02d}):\n\n"
+                if self.reminders:
+                    self.reminders.track(user_id, events)
+                await self._send_agenda(update, user_id, AgendaView(header, [(True, events)]))
+            return
+        
+        start_date = datetime.fromisoformat(date_range[0])
+        end_date = datetime.fromisoformat(date_range[1])
+        single_day = start_date.date() if end_date - start_date == timedelta(days=1) else None
+        
+        # "O que tenho hoje/amanhã": reaproveitar a listagem do dia se ainda válida
+        stale = None
+        if single_day and self.agenda_cache:
+            view = self.agenda_cache.get(user_id, single_day)
+            if view is not None:
+                elapsed = await self._send_agenda(update, user_id, view)
+                self.agenda_cache.record_latency(True, elapsed)
                 return
             
-            if 'add_meet_link' in missing:
-                keyboard = [
-                    [
-                        InlineKeyboardButton("✅ Sim", callback_data="meet_yes"),
-                        InlineKeyboardButton("❌ Não", callback_data="meet_no")
-                    ]
-                ]
-                reply_markup = InlineKeyboardMarkup(keyboard)
-                
-                await update.message.reply_text(
-                    "Deseja adicionar um link do Google Meet para esta reunião?",
-                    reply_markup=reply_markup
-                )
-                context.user_data['state'] = STATE_AWAITING_ADD_MEET
+            # Com a API instável, responder na hora com a última listagem conhecida
+            stale = self.agenda_cache.get_stale(user_id, single_day)
+            if stale and self.circuit.is_open(user_id):
+                await self._send_agenda(update, user_id, *stale)
                 return
         
-        # Se chegou aqui, temos todas as informações necessárias
-        if intent == "CREATE_EVENT":
-            # Criar evento
-            date = entities.get('date')
-            time = entities.get('time')
-            duration = entities.get('duration', 1)
-            summary = entities.get('summary', "Evento")
-            location = entities.get('location')
-            add_meet_link = entities.get('is_meeting', False)
-            attendees = entities.get('attendees')
-            recurrence = entities.get('recurrence')  # Novo
-            end_date = entities.get('end_date')      # Novo
-
-            success, result = self.calendar_manager.create_event(
-                user_id=user_id,
-                summary=summary,
-                start_date=date,
-                start_time=time,
-                duration=duration,
-                location=location,
-                attendees=attendees,
-                add_meet_link=add_meet_link,
-                recurrence=recurrence,  # Novo
-                end_date=end_date       # Novo
+        view = self._agenda_view(user_id, start_date, end_date, single_day)
+        elapsed = await self._send_agenda(update, user_id, view, fallback=stale)
+        
+        if single_day and self.agenda_cache and not view.error:
+            self.agenda_cache.record_latency(False, elapsed)
+            self.agenda_cache.put(user_id, single_day, view)
+    
+    def _agenda_view(self, user_id: str, start_date: datetime, end_date: datetime, single_day=None) -> AgendaView:
+        """Listagem paginada do período [start_date, end_date), buscada na API sob demanda"""
+        # Limites do período no fuso local do usuário
+        timezone = self.nlp_processor.timezone
+        pages = self.calendar_manager.iter_event_pages(
+            user_id,
+            time_min=timezone.localize(start_date).isoformat(),
+            time_max=timezone.localize(end_date).isoformat()
         )
-            
-            if success:
-                # Formatar data e hora para exibição
-                date_obj = datetime.fromisoformat(date)
-                date_display = f"{date_obj.day:02d}/{date_obj.month:02d}/{date_obj.year}"
-                
-                hour, minute = time.split(":")
-                time_display = f"{int(hour)}:{minute}"
-                
-                await update.message.reply_text(
-                    f"✅ Evento criado com sucesso!\n\n"
-                    f"📝 {summary}\n"
-                    f"📅 {date_display}\n"
-                    f"🕒 {time_display}\n"
-                    f"⏱️ Duração: {duration} hora(s)"
-                )
+        
+        if single_day:
+            header = f"📅 Eventos para {WEEKDAYS[single_day.weekday()]}, {single_day.day:02d}/{single_day.month:02d}/{single_day.year}:\n\n"
+            empty = f"Não há eventos agendados para {WEEKDAYS[single_day.weekday()]}, {single_day.day:02d}/{single_day.month:02d}."
+        else:
+            last_day = end_date - timedelta(days=1)
+            period = f"{start_date.day:02d}/{start_date.month:02d} a {last_day.day:02d}/{last_day.month:02d}"
+            header = f"📅 Eventos de {period}:\n\n"
+            empty = f"Não há eventos agendados de {period}."
+        
+        return AgendaView(
+            header, pages, single_day=single_day, empty_message=empty,
+            on_events=(lambda events: self.reminders.track(user_id, events)) if self.reminders else None
+        )
+    
+    async def _prefetch_today(self, user_id: str) -> bool:
+        """
+        Busca a primeira página da agenda de hoje e a guarda no cache (pré-aquecimento)
+        
+        Returns:
+            bool: True se a agenda foi buscada e guardada
+        """
+        today = datetime.now(self.nlp_processor.timezone).date()
+        start_date = datetime.combine(today, datetime.min.time())
+        view = self._agenda_view(user_id, start_date, start_date + timedelta(days=1), single_day=today)
+        await view.page(0)
+        if view.error:
+            return False
+        self.agenda_cache.put(user_id, today, view)
+        return True
+    
+    async def _send_agenda(self, update: Update, user_id: str, view: AgendaView, age=None, fallback=None) -> float:
+        """
+        Envia a primeira página da listagem; as demais vêm pelos botões de página
+        
+        Args:
+            age (float): Idade (s) da listagem, se vier do cache já vencida; a resposta avisa
+            fallback (tuple): (AgendaView, idade) enviada no lugar se a listagem falhar
+        
+        Returns:
+            float: Segundos gastos para montar a primeira página
+        """
+        started = time.perf_counter()
+        text, keyboard = await self.agenda.open(user_id, view)
+        elapsed = time.perf_counter() - started
+        
+        if text is None and fallback:
+            return await self._send_agenda(update, user_id, *fallback)
+        if text is None:
+            await update.message.reply_text(f"❌ Erro ao listar eventos: {view.error}")
+            return elapsed
+        
+        if age is not None:
+            note = f"⚠️ O Google Calendar está instável; dados podem estar desatualizados (consultados há {max(1, round(age / 60))} min)."
+            if telegram_length(text) + telegram_length(note) + 2 <= MAX_MESSAGE_LENGTH:
+                text = f"{text.rstrip()}\n\n{note}"
             else:
-                await update.message.reply_text(f"❌ Erro ao criar evento: {result}")
+                await update.message.reply_text(note)
+        await update.message.reply_text(text, reply_markup=keyboard)
+        return elapsed
+    
+    async def _show_agenda_page(self, update: Update, user_id: str, data: str) -> None:
+        """Troca a mensagem da listagem pela página pedida no botão"""
+        query = update.callback_query
+        text, keyboard = await self.agenda.show(user_id, data)
+        if text is None:
+            await query.edit_message_reply_markup(reply_markup=None)
+            await query.message.reply_text("Esta listagem expirou. Peça a agenda novamente.")
+        else:
+            await query.edit_message_text(text, reply_markup=keyboard)
+    
+    
+    async def _post_init(self, application: Application) -> None:
+        """Prepara recursos que dependem do loop de eventos"""
+        # Chamadas bloqueantes (Google, arquivos) rodam em threads; uma por update concorrente
+        asyncio.get_running_loop().set_default_executor(
+            ThreadPoolExecutor(max_workers=MAX_CONCURRENT_UPDATES, thread_name_prefix="bot-io")
+        )
+        if isinstance(self.calendar_manager, BlockingCalendarManager):
+            self.calendar_manager.bind(asyncio.get_running_loop())
+        self._expiry_task = asyncio.create_task(self.expiry.run(application))
+        # Bibliotecas do Google carregadas em segundo plano, com o bot já respondendo
+        asyncio.get_running_loop().run_in_executor(None, self.auth_manager.preload_modules)
+        # Usuários mais ativos antes do reinício: preparados em segundo plano
+        await asyncio.to_thread(self.activity.load)
+        if self.warmup and len(self.activity):
+            self._warmup_task = asyncio.create_task(self.warmup.run(self.activity.top(WARMUP_USERS)))
+        # Retoma alterações que ficaram pendentes antes de um reinício
+        await self.outbox.start()
+        if self.digest:
+            self._digest_task = asyncio.create_task(self.digest.run())
+        if self.reminders:
+            # Mudanças feitas pelo bot chegam das threads da API; a roda só é tocada no loop
+            loop = asyncio.get_running_loop()
+            self.calendar_manager.add_change_listener(
+                lambda *change: loop.call_soon_threadsafe(self.reminders.on_calendar_change, *change)
+            )
+            self._reminder_task = asyncio.create_task(self.reminders.run())
+    
+    async def _post_stop(self, application: Application) -> None:
+        """Encerra as tarefas de fundo iniciadas em _post_init"""
+        if self._expiry_task:
+            self._expiry_task.cancel()
+            self._expiry_task = None
+        if self._digest_task:
+            self._digest_task.cancel()
+            self._digest_task = None
+        if self._reminder_task:
+            self._reminder_task.cancel()
+            self._reminder_task = None
+        if self._warmup_task:
+            self._warmup_task.cancel()
+            self._warmup_task = None
+        try:
+            await asyncio.to_thread(self.activity.save)
+        except Exception as e:
+            logger.error(f"Erro ao gravar atividade dos usuários: {e}")
+        await self.outbox.stop()
+        if isinstance(self.calendar_manager, BlockingCalendarManager):
+            await self.calendar_manager.aclose()
+        await self.auth_manager.aclose()
+    
+    async def _submit_mutation(self, user_id: str, op: str, **kwargs):
+        """
+        Grava a alteração na fila e aguarda o resultado por até OUTBOX_ACK_TIMEOUT segundos
         
-        elif intent == "LIST_EVENTS":
-                    # Listar eventos
-                    date = entities.get('date')
-                    
-                    if date:
-                        # Listar eventos para uma data específica
-                        date_obj = datetime.fromisoformat(date)
-                        next_day = (date_obj + timedelta(days=1)).isoformat() + "Z"
-                        
-                        success, events = self.calendar_manager.list_events(
-                            user_id=user_id,
-                            time_min=date + "T00:00:00Z",
-                            time_max=next_day,
-                            max_results=10
-                        )
-                    else:
-                        # Listar próximos eventos
-                        success, events = self.calendar_manager.list_events(
-                            user_id=user_id,
-                            max_results=5
-                        )
-                    
-                    if success:
-                        if events:
-                            # Definir os dias da semana para formatação
-                            days = ["Segunda", "Terça", "Quarta", "Quinta", "Sexta", "Sábado", "Domingo"]
-                            
-                            if date:
-                                date_obj = datetime.fromisoformat(date)
-                                weekday = days[date_obj.weekday()]
-                                date_display = f"{weekday}, {date_obj.day:02d}/{date_obj.month:02d}/{date_obj.year}"
-                                message = f"📅 Eventos para {date_display}:\n\n"
-                            else:
-                                now = datetime.now()
-                                message = f"📅 Próximos eventos a partir de hoje ({now.day:02d}/{now.month:02d}):\n\n"
-                            
-                            # Processar cada evento
-                            for event in events:
-                                start = datetime.fromisoformat(event['start'].get('dateTime', event['start'].get('date'))).replace(tzinfo=None)
-                                
-                                # Se não for do dia específico ou estamos listando próximos eventos, mostrar a data
-                                if not date or (date and start.date() != date_obj.date()):
-                                    event_weekday = days[start.weekday()]
-                                    date_str = f"{event_weekday}, {start.day:02d}/{start.month:02d} • "
-                                else:
-                                    date_str = ""
-                                
-                                if 'dateTime' in event['start']:  # Evento com hora específica
-                                    end = datetime.fromisoformat(event['end'].get('dateTime')).replace(tzinfo=None)
-                                    duration = (end - start).total_seconds() / 3600  # Duração em horas
-                                    time_str = f"{start.strftime('%H:%M')} - {end.strftime('%H:%M')}"
-                                    message += f"🕒 {date_str}{time_str}: {event['summary']}"
-                                    
-                                    # Adicionar informações do Google Meet se disponível
-                                    if 'conferenceData' in event and event['conferenceData'].get('conferenceId'):
-                                        message += " 📹"
-                                else:  # Evento do dia todo
-                                    message += f"📌 {date_str}{event['summary']} (dia todo)"
-                                
-                                message += "\n"
-                            
-                            await update.message.reply_text(message)
-                        else:
-                            if date:
-                                date_obj = datetime.fromisoformat(date)
-                                weekday = days[date_obj.weekday()]
-                                date_display = f"{weekday}, {date_obj.day:02d}/{date_obj.month:02d}"
-                                await update.message.reply_text(f"Não há eventos agendados para {date_display}.")
-                            else:
-                                await update.message.reply_text("Não há eventos próximos agendados.")
-                    else:
-                        await update.message.reply_text(f"❌ Erro ao listar eventos: {events}")
-            
+        Returns:
+            tuple: (sucesso, resultado) da API, ou None se a API demorou; nesse caso a
+                alteração segue na fila e o usuário é avisado por _notify_mutation_result
+        """
+        mutation, future = await self.outbox.submit(user_id, op, **kwargs)
+        if self.circuit.is_open(user_id):
+            # API instável: nem esperar, a fila envia quando o disjuntor fechar
+            self.outbox.detach(mutation)
+            return None
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), OUTBOX_ACK_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.outbox.detach(mutation)
+            return None
+    
+    async def _notify_mutation_result(self, mutation, success, result) -> None:
+        """Avisa o usuário do resultado de uma alteração concluída em segundo plano"""
+        args = mutation.args
+        if mutation.op == 'create_event':
+            what = f"criar o evento \"{args.get('summary', 'Evento')}\""
+            date_display = datetime.fromisoformat(args['start_date']).strftime('%d/%m/%Y')
+            done = f"✅ Evento \"{args.get('summary', 'Evento')}\" criado ({date_display} às {args['start_time']})."
+        elif mutation.op == 'update_event_duration':
+            what = "atualizar a duração do evento"
+            done = f"✅ Duração do evento atualizada para {args.get('duration_hours')} hora(s)."
+        elif mutation.op == 'delete_event':
+            what = "excluir o evento"
+            done = "✅ Evento excluído com sucesso!"
+        else:
+            what = "atualizar o evento"
+            done = "✅ Evento atualizado com sucesso!"
+        text = done if success else f"❌ Não foi possível {what}: {result}"
+        try:
+            await self.app.bot.send_message(chat_id=int(mutation.user_id), text=text, rate_limit_args=PRIORITY_BACKGROUND)
+        except Exception as e:
+            logger.warning(f"Erro ao avisar {mutation.user_id} do resultado da alteração {mutation.id}: {e}")
+    
+    async def _send_reminder(self, user_id: str, text: str) -> None:
+        """Entrega um lembrete pela fila de saída, depois das respostas interativas"""
+        await self.app.bot.send_message(chat_id=int(user_id), text=text, rate_limit_args=PRIORITY_BACKGROUND)
+    
+    async def _check_expiry(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Descarta um fluxo vencido antes de processar o update (ex.: após um reinício)"""
+        if not update.effective_user or context.user_data is None:
+            return
+        if self.expiry.is_expired(context.user_data):
+            had_flow = self.expiry.expire(context.user_data)
+            if had_flow and self.expiry.notify and update.effective_chat:
+                await context.bot.send_message(chat_id=update.effective_chat.id, text=EXPIRED_NOTICE)
+    
+    async def _track_expiry(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Renova o prazo do estado de conversa depois que o update foi tratado"""
+        if update.effective_user and context.user_data is not None:
+            self.expiry.touch(update.effective_user.id, context.user_data)
+    
+    async def _record_activity(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Conta o update na atividade do usuário (ordem do pré-aquecimento no próximo reinício)"""
+        if update.effective_user:
+            user_id = str(update.effective_user.id)
+            self.activity.record(user_id)
+            if self.warmup:
+                self.warmup.note_served(user_id)
+    
     async def error_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Lida com erros durante o processamento"""
         logger.error(f"Update {update} caused error {context.error}")
@@ -853,11 +1146,346 @@ class CalendarBot:
         os.makedirs("data/user_data", exist_ok=True)
         
         # Iniciar o bot
-        self.app.run_polling()
+        if WEBHOOK_URL:
+            asyncio.run(self._run_webhook())
+        else:
+            self.app.run_polling()
+    
+    def _component_stats(self):
+        """Métricas dos componentes expostas no /healthz do webhook"""
+        stats = {
+            'updates': self.update_processor.get_stats,
+            'outgoing': self.rate_limiter.get_stats,
+            'persistence': self.persistence.get_stats,
+            'expiry': self.expiry.get_stats,
+            'conversation': self.conversation.get_stats,
+            'agenda': self.agenda.get_stats,
+            'outbox': self.outbox.get_stats,
+            'circuit': self.circuit.get_stats,
+            'google_http': self.auth_manager.transport.get_stats,
+            'auth': self.auth_manager.get_stats,
+            'nlp_cache': self.nlp_processor.cache_info,
+        }
+        
+        # Componentes opcionais
+        if self.digest:
+            stats['digest'] = self.digest.get_stats
+        if self.reminders:
+            stats['reminders'] = self.reminders.get_stats
+        if self.agenda_cache:
+            stats['agenda_cache'] = self.agenda_cache.get_stats
+        if self.debouncer:
+            stats['debounce'] = self.debouncer.get_stats
+        if self.warmup:
+            stats['warmup'] = self.warmup.get_stats
+        if self.nlp_processor.intent_model:
+            stats['intent_model'] = self.nlp_processor.intent_model.get_stats
+        if isinstance(self.calendar_manager, BlockingCalendarManager):
+            stats['calendar_http'] = self.calendar_manager.get_stats
+        return stats
+    
+    async def _run_webhook(self):
+        """Executa o bot recebendo updates pelo servidor HTTP embutido"""
+        server = WebhookServer(
+            self._handle_webhook_update,
+            path=WEBHOOK_PATH,
+            secret_token=WEBHOOK_SECRET,
+            host=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            max_queue=WEBHOOK_MAX_QUEUE,
+            routes={_oauth_callback_path(): self._handle_oauth_callback} if OAUTH_REDIRECT_URL else None,
+            extra_stats=self._component_stats()
+        )
+        
+        self._webhook_slots = asyncio.Semaphore(MAX_PENDING_UPDATES)
+        
+        async with self.app:
+            await self._post_init(self.app)
+            await self.app.start()
+            await self.app.bot.set_webhook(
+                url=WEBHOOK_URL.rstrip('/') + WEBHOOK_PATH,
+                secret_token=WEBHOOK_SECRET,
+                allowed_updates=Update.ALL_TYPES
+            )
+            await server.start()
+            
+            try:
+                await _wait_for_stop_signal()
+            finally:
+                await server.stop()
+                await self._post_stop(self.app)
+                await self.app.stop()
+    
+    async def serve_shard(self, conn) -> None:
+        """
+        Executa o bot como worker, recebendo updates do despachante pelo pipe
+        
+        Args:
+            conn (Connection): Pipe com o processo despachante
+        """
+        self._webhook_slots = asyncio.Semaphore(MAX_PENDING_UPDATES)
+        self.digest = None  # Enviado pelo processo despachante
+        
+        async with self.app:
+            await self._post_init(self.app)
+            await self.app.start()
+            
+            try:
+                while True:
+                    message = await asyncio.to_thread(conn.recv)
+                    kind = message[0]
+                    
+                    if kind == 'update':
+                        await self._handle_webhook_update(message[1])
+                    
+                    elif kind == 'oauth':
+                        # Retorno da autorização recebido pelo despachante
+                        self._track_update_task(self.app.create_task(self._complete_oauth(*message[1:])))
+                    
+                    elif kind == 'export':
+                        # Rebalanceamento: entregar e esquecer o estado dos usuários (em memória)
+                        # cujo hash caiu nos trechos do anel que passaram a outro worker.
+                        # Antes, terminar todos os updates já recebidos: o primeiro update de um
+                        # usuário pode estar numa tarefa ainda não iniciada, sem estado em memória
+                        # e fora do processador, e rodaria aqui depois da entrega do estado
+                        if self._update_tasks:
+                            await asyncio.wait(set(self._update_tasks))
+                        states = {}
+                        leaving = [user_id for user_id in list(self.app.user_data)
+                                   if in_ranges(user_id, message[1])]
+                        for user_id in leaving:
+                            await self.update_processor.wait_idle(user_id)
+                            if user_id in self.app.user_data:
+                                states[user_id] = dict(self.app.user_data[user_id])
+                                # Gravar no banco e limpar só a memória (drop_user_data apagaria o registro)
+                                await self.persistence.release_user(user_id, states[user_id])
+                                self.app.user_data[user_id].clear()
+                        # Alterações pendentes ficam no banco para o novo dono assumir
+                        await self.outbox.release(lambda user_id: in_ranges(user_id, message[1]))
+                        conn.send(('state', states))
+                    
+                    elif kind == 'import':
+                        for user_id, data in message[1].items():
+                            self.app.user_data[user_id].update(data)
+                    
+                    elif kind == 'claim':
+                        # Trechos do anel que passaram a este worker (ou todos, na partida)
+                        await self.outbox.claim(lambda user_id: in_ranges(user_id, message[1]))
+                    
+                    elif kind == 'stop':
+                        break
+            except EOFError:
+                logger.warning("Despachante encerrou o pipe; finalizando worker")
+            finally:
+                await self._post_stop(self.app)
+                await self.app.stop()
+    
+    async def _handle_webhook_update(self, data: dict) -> None:
+        """Converte o JSON recebido em Update e o entrega à aplicação"""
+        update = Update.de_json(data, self.app.bot)
+        
+        # Aguardar vaga antes de disparar a tarefa: enquanto não houver, a fila HTTP enche
+        await self._webhook_slots.acquire()
+        task = self.app.create_task(
+            self.app.update_processor.process_update(update, self.app.process_update(update)),
+            update=update
+        )
+        task.add_done_callback(lambda _: self._webhook_slots.release())
+        self._track_update_task(task)
+    
+    def _track_update_task(self, task):
+        """Registra a tarefa até terminar (ver 'export' em serve_shard)"""
+        self._update_tasks.add(task)
+        task.add_done_callback(self._update_tasks.discard)
+
+
+def _shard_path(path, shard):
+    """Arquivo próprio do worker (ex.: data/activity.json -> data/activity.2.json); igual sem shard"""
+    if shard is None:
+        return path
+    base, ext = os.path.splitext(path)
+    return f"{base}.{shard}{ext}"
+
+
+def _auth_result_text(success, message):
+    """Mensagem do chat com o resultado da autorização do Google"""
+    if not success:
+        return f"{message}\n\nPor favor, tente novamente ou use /setup para reiniciar o processo."
+    return (
+        f"🎉 {message}\n\n"
+        f"Seu assistente de calendário está pronto para uso!\n\n"
+        f"Você pode me pedir para:\n"
+        f"• Agendar eventos: 'Agendar reunião amanhã às 10h'\n"
+        f"• Consultar agenda: 'O que tenho hoje?'\n"
+        f"• E muito mais!\n\n"
+        f"Use /help para ver mais exemplos."
+    )
+
+
+def _client_type_instructions():
+    """Passos finais da criação do cliente OAuth, conforme o endereço de retorno em uso"""
+    if OAUTH_REDIRECT_URL:
+        return (
+            "8. Para tipo de aplicativo, escolha 'Aplicativo da Web'\n"
+            f"9. Em 'URIs de redirecionamento autorizados', adicione {OAUTH_REDIRECT_URL}\n"
+            "10. Dê um nome e clique em 'Criar'\n\n"
+        )
+    return (
+        "8. Para tipo de aplicativo, escolha 'Aplicativo para Desktop'\n"
+        "9. Dê um nome e clique em 'Criar'\n\n"
+    )
+
+
+def _oauth_callback_path():
+    """Caminho da rota de retorno da autorização no servidor embutido"""
+    return urlsplit(OAUTH_REDIRECT_URL).path or '/'
+
+
+def _oauth_page(text):
+    """Página HTML mínima mostrada no navegador ao fim da autorização"""
+    return (
+        "<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>Google Calendar</title></head>"
+        f"<body><p>{html.escape(text)}</p></body></html>"
+    )
+
+
+def _build_transport():
+    """Monta o pool HTTP dos clientes do Google a partir da configuração do ambiente"""
+    return PooledTransport(
+        pool_size=GOOGLE_HTTP_POOL_SIZE,
+        connect_timeout=GOOGLE_HTTP_CONNECT_TIMEOUT,
+        read_timeout=GOOGLE_HTTP_READ_TIMEOUT
+    )
+
+
+def _build_calendar_manager(auth_manager, circuit):
+    """Monta o cliente da API do Google Calendar escolhido em CALENDAR_BACKEND"""
+    if CALENDAR_BACKEND == 'google':
+        return CalendarManager(auth_manager, circuit)
+    if CALENDAR_BACKEND == 'async':
+        return BlockingCalendarManager(AsyncCalendarManager(
+            auth_manager, circuit,
+            max_connections=GOOGLE_HTTP_POOL_SIZE,
+            connect_timeout=GOOGLE_HTTP_CONNECT_TIMEOUT,
+            read_timeout=GOOGLE_HTTP_READ_TIMEOUT,
+            executor=ThreadPoolExecutor(max_workers=CALENDAR_AUTH_THREADS, thread_name_prefix="calendar-auth")
+        ))
+    raise ValueError(f"CALENDAR_BACKEND inválido: {CALENDAR_BACKEND!r} (use 'google' ou 'async')")
+
+
+def _build_circuit():
+    """Monta os disjuntores da API do Google Calendar a partir da configuração do ambiente"""
+    return CalendarCircuit(
+        failure_ratio=CIRCUIT_FAILURE_RATIO,
+        min_calls=CIRCUIT_MIN_CALLS,
+        open_seconds=CIRCUIT_OPEN_SECONDS,
+        slow_call=CIRCUIT_SLOW_CALL
+    )
+
+
+def _build_digest(bot, calendar_manager, auth_manager, on_events=None):
+    """Monta o resumo diário a partir da configuração do ambiente"""
+    pipeline = DigestPipeline(
+        bot,
+        calendar_manager,
+        list_users=auth_manager.list_authenticated_users,
+        checkpoint=DigestCheckpoint(DIGEST_CHECKPOINT),
+        timezone=pytz.timezone(DIGEST_TIMEZONE),
+        concurrency=DIGEST_CONCURRENCY,
+        api_rate=DIGEST_API_RATE,
+        on_events=on_events,
+        retries=DIGEST_RETRIES,
+        retry_delay=DIGEST_RETRY_DELAY
+    )
+    return DailyDigest(pipeline, hour=DIGEST_HOUR, minute=DIGEST_MINUTE)
+
+
+def _build_dispatcher():
+    """Monta o despachante de workers a partir da configuração do ambiente"""
+    return ShardedDispatcher(
+        BOT_WORKERS,
+        max_workers=BOT_MAX_WORKERS,
+        scale_up_rate=BOT_SCALE_UP_RATE,
+        scale_down_rate=BOT_SCALE_DOWN_RATE,
+        scale_interval=BOT_SCALE_INTERVAL
+    )
+
+
+async def _run_sharded():
+    """Recebe o webhook neste processo e distribui os updates entre processos worker"""
+    dispatcher = _build_dispatcher()
+    
+    async def forward_oauth_callback(method, query, body):
+        """O fluxo de autorização está na memória do worker do usuário (ID no state)"""
+        if method != 'GET':
+            return 405, ''
+        state = query.get('state', [''])[0]
+        user_id = user_id_from_state(state)
+        if user_id is None or not user_id.isdigit():
+            return 400, _oauth_page("Link de autorização inválido. Use /setup no Telegram para recomeçar.")
+        await dispatcher.dispatch_to_user(
+            int(user_id), ('oauth', state, query.get('code', [None])[0], query.get('error', [None])[0])
+        )
+        return 200, _oauth_page("Autorização recebida! Volte ao Telegram para continuar.")
+    
+    server = WebhookServer(
+        dispatcher.dispatch,
+        path=WEBHOOK_PATH,
+        secret_token=WEBHOOK_SECRET,
+        host=WEBHOOK_LISTEN,
+        port=WEBHOOK_PORT,
+        max_queue=WEBHOOK_MAX_QUEUE,
+        routes={_oauth_callback_path(): forward_oauth_callback} if OAUTH_REDIRECT_URL else None,
+        extra_stats={'sharding': dispatcher.get_stats}
+    )
+    
+    # O resumo diário sai daqui, com limitador próprio, para não ser enviado uma vez por worker
+    bot = ExtBot(TOKEN, rate_limiter=FloodControlRateLimiter()) if DIGEST_ENABLED else Bot(TOKEN)
+    digest_task = None
+    
+    async with bot:
+        await dispatcher.start()
+        await bot.set_webhook(
+            url=WEBHOOK_URL.rstrip('/') + WEBHOOK_PATH,
+            secret_token=WEBHOOK_SECRET,
+            allowed_updates=Update.ALL_TYPES
+        )
+        await server.start()
+        
+        if DIGEST_ENABLED:
+            auth_manager = CalendarAuth(transport=_build_transport())
+            digest_calendar = _build_calendar_manager(auth_manager, _build_circuit())
+            if isinstance(digest_calendar, BlockingCalendarManager):
+                digest_calendar.bind(asyncio.get_running_loop())
+            digest = _build_digest(bot, digest_calendar, auth_manager)
+            digest_task = asyncio.create_task(digest.run())
+        
+        try:
+            await _wait_for_stop_signal()
+        finally:
+            if digest_task:
+                digest_task.cancel()
+            await server.stop()
+            await dispatcher.stop()
+
+
+async def _wait_for_stop_signal():
+    """Aguarda SIGINT ou SIGTERM"""
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
 
 
 def main():
     """Função principal"""
+    # Com webhook e mais de um worker (fixo ou por escala automática), este processo apenas despacha os updates
+    if WEBHOOK_URL and max(BOT_WORKERS, BOT_MAX_WORKERS) > 1:
+        os.makedirs("data/user_data", exist_ok=True)
+        asyncio.run(_run_sharded())
+        return
+    
     # Criar e executar o bot
     bot = CalendarBot()
     bot.run()
@@ -5,173 +5,269 @@ Gerencia a autenticação OAuth2, armazenamento de tokens e acesso à API.
 
 import os
 import json
+import time
+import asyncio
 import logging
-from datetime import datetime
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
+import secrets
+import importlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit, parse_qs
+
+import httpx
+
+from http_transport import PooledTransport
+
+# google_auth_oauthlib, googleapiclient.discovery e google.oauth2 são importados no primeiro
+# uso (ou por preload_modules, depois que o bot já responde): juntos levam ~200 ms na partida
 
-# Configuração de logging
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
 logger = logging.getLogger(__name__)
 
 # Escopos necessários para acessar o Google Calendar
 SCOPES = ['https://www.googleapis.com/auth/calendar']
 
+AUTH_URI = "https://accounts.google.com/o/oauth2/auth"
+TOKEN_URI = "https://oauth2.googleapis.com/token"
+
+# Retorno padrão: loopback, aceito para clientes "Aplicativo para Desktop" (o fluxo oob foi
+# desativado pelo Google). O navegador não abre a página, mas o endereço traz o código.
+LOOPBACK_REDIRECT_URI = "http://localhost"
+
+
+def user_id_from_state(state):
+    """
+    Extrai o ID do usuário do parâmetro state gerado por start_auth
+    
+    Returns:
+        str: ID do usuário ou None se o state não tem o formato esperado
+    """
+    user_id, sep, _ = (state or '').partition('.')
+    return user_id if sep and user_id else None
+
+
+class PendingAuth:
+    """Autorização em andamento: dados do cliente OAuth mantidos só em memória"""
+    
+    __slots__ = ('user_id', 'client_id', 'client_secret', 'code_verifier', 'created')
+    
+    def __init__(self, user_id, client_id, client_secret, code_verifier, created):
+        self.user_id = user_id
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.code_verifier = code_verifier
+        self.created = created
+
+
+class CachedUser:
+    """Credenciais e serviço de um usuário, válidos enquanto o arquivo de token não mudar"""
+    
+    __slots__ = ('mtime', 'credentials', 'service')
+    
+    def __init__(self, mtime, credentials, service=None):
+        self.mtime = mtime
+        self.credentials = credentials
+        self.service = service
+
+
 class CalendarAuth:
     """Gerencia a autenticação e acesso à API do Google Calendar"""
     
-    def __init__(self, storage_path='./data'):
+    def __init__(self, storage_path='./data', transport=None, redirect_uri=None, flow_ttl=1800,
+                 cache_size=1000):
         """
         Inicializa o gerenciador de autenticação
         
         Args:
             storage_path (str): Diretório base para armazenamento de dados
+            transport (PooledTransport): Transporte HTTP compartilhado pela renovação de
+                tokens e pelas chamadas à API; padrão: um novo com a configuração padrão
+            redirect_uri (str): Endereço de retorno da autorização (ex.: .../oauth2callback no
+                modo webhook); padrão: loopback, com o usuário colando o código no chat
+            flow_ttl (float): Validade (s) de uma autorização iniciada
+            cache_size (int): Usuários com credenciais e serviço mantidos em memória
         """
         self.storage_path = storage_path
+        self.transport = transport or PooledTransport()
+        self.redirect_uri = redirect_uri or LOOPBACK_REDIRECT_URI
+        self.flow_ttl = flow_ttl
         self.user_data_path = os.path.join(storage_path, 'user_data')
         
+        # Autorizações em andamento (state -> PendingAuth); nada é gravado em disco
+        self._flows = {}
+        self._flow_by_user = {}
+        self._http = None
+        
+        # Credenciais e serviços já montados (user_id -> CachedUser), do menos ao mais recente;
+        # cada acesso confere a data do arquivo de token (outro worker ou /setup podem trocá-lo)
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.service_hits = 0
+        self.service_misses = 0
+        
         # Garantir que os diretórios existam
         os.makedirs(self.user_data_path, exist_ok=True)
     
-    def save_temp_credentials(self, user_id, client_id, client_secret):
+    def start_auth(self, user_id, client_id, client_secret):
         """
-        Salva as credenciais temporárias para o processo de autenticação
+        Inicia a autorização OAuth2 do usuário, mantendo o fluxo em memória
         
         Args:
             user_id (str): ID único do usuário
             client_id (str): Google OAuth2 Client ID
             client_secret (str): Google OAuth2 Client Secret
             
-        Returns:
-            str: Caminho para o arquivo de credenciais
-        """
-        creds_data = {
-            "installed": {
-                "client_id": client_id,
-                "client_secret": client_secret,
-                "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-                "token_uri": "https://oauth2.googleapis.com/token",
-                "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs",
-                "redirect_uris": ["urn:ietf:wg:oauth:2.0:oob", "http://localhost"]
-            }
-        }
-        
-        # Criar arquivo de credenciais temporárias
-        creds_file = os.path.join(self.user_data_path, f"{user_id}_temp_credentials.json")
-        with open(creds_file, 'w') as f:
-            json.dump(creds_data, f)
-        
-        return creds_file
-    
-    def get_auth_url(self, user_id, credentials_file):
-        """
-        Gera URL para autorização OAuth2
-        
-        Args:
-            user_id (str): ID único do usuário
-            credentials_file (str): Caminho para o arquivo de credenciais
-            
         Returns:
             str: URL de autorização ou None se falhar
         """
         try:
-            flow = InstalledAppFlow.from_client_secrets_file(
-                credentials_file, SCOPES)
-            flow.redirect_uri = "urn:ietf:wg:oauth:2.0:oob"
+            from google_auth_oauthlib.flow import Flow
             
-            # Não vamos mais salvar o flow para evitar problemas de serialização
-            # Em vez disso, vamos salvar os dados necessários para recriar o flow
-            flow_data = {
-                'client_id': flow.client_config['client_id'],
-                'client_secret': flow.client_config['client_secret'],
-                'redirect_uri': flow.redirect_uri,
-                'scope': ' '.join(SCOPES)
-            }
-            
-            flow_file = os.path.join(self.user_data_path, f"{user_id}_flow_data.json")
-            with open(flow_file, 'w') as f:
-                json.dump(flow_data, f)
+            flow = Flow.from_client_config(
+                {
+                    "installed": {
+                        "client_id": client_id,
+                        "client_secret": client_secret,
+                        "auth_uri": AUTH_URI,
+                        "token_uri": TOKEN_URI,
+                        "redirect_uris": [self.redirect_uri]
+                    }
+                },
+                SCOPES
+            )
+            flow.redirect_uri = self.redirect_uri
             
-            auth_url, _ = flow.authorization_url(
+            # O state leva o ID do usuário para o despachante encaminhar o retorno ao worker certo
+            auth_url, state = flow.authorization_url(
                 access_type='offline',
-                include_granted_scopes='true')
-            
-            return auth_url
+                include_granted_scopes='true',
+                prompt='consent',
+                state=f"{user_id}.{secrets.token_urlsafe(16)}"
+            )
         except Exception as e:
             logger.error(f"Erro ao gerar URL de autorização: {e}")
             return None
+        
+        self._prune_flows()
+        self._drop_flow(user_id)
+        self._flows[state] = PendingAuth(user_id, client_id, client_secret, flow.code_verifier, time.monotonic())
+        self._flow_by_user[user_id] = state
+        return auth_url
     
-    def process_auth_code(self, user_id, auth_code):
+    async def process_auth_code(self, user_id, auth_code):
         """
-        Processa o código de autorização para obter tokens de acesso
+        Processa o código de autorização colado pelo usuário no chat
         
         Args:
             user_id (str): ID único do usuário
-            auth_code (str): Código de autorização recebido
+            auth_code (str): Código recebido ou o endereço completo do redirecionamento
             
         Returns:
             tuple: (sucesso (bool), mensagem (str))
         """
-        # Recriar o flow a partir dos dados salvos
-        flow_file = os.path.join(self.user_data_path, f"{user_id}_flow_data.json")
-        if not os.path.exists(flow_file):
+        code, state = auth_code.strip(), None
+        if 'code=' in code:
+            # Endereço colado da barra do navegador (http://localhost/?state=...&code=...)
+            query = parse_qs(urlsplit(code).query)
+            code = query.get('code', [''])[0]
+            state = query.get('state', [None])[0]
+        
+        pending_state = self._flow_by_user.get(user_id)
+        if pending_state is None or (state is not None and state != pending_state):
             return False, "Sessão de autorização expirada. Por favor, reinicie o processo."
+        return await self._exchange_code(pending_state, code)
+    
+    async def complete_redirect(self, state, code, error=None):
+        """
+        Conclui a autorização recebida no endereço de retorno (/oauth2callback)
         
-        try:
-            with open(flow_file, 'r') as f:
-                flow_data = json.load(f)
-            
-            # Recriar o flow a partir dos dados
-            flow = InstalledAppFlow.from_client_config(
-                {
-                    "installed": {
-                        "client_id": flow_data['client_id'],
-                        "client_secret": flow_data['client_secret'],
-                        "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-                        "token_uri": "https://oauth2.googleapis.com/token",
-                        "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs",
-                        "redirect_uris": ["urn:ietf:wg:oauth:2.0:oob", "http://localhost"]
-                    }
-                },
-                SCOPES
-            )
-            flow.redirect_uri = flow_data['redirect_uri']
-            
-            # Trocar o código pelo token
-            flow.fetch_token(code=auth_code)
-            credentials = flow.credentials
+        Args:
+            state (str): Parâmetro state devolvido pelo Google
+            code (str): Código de autorização (None se o usuário recusou)
+            error (str): Erro devolvido pelo Google, se houver
             
-            # Salvar as credenciais
-            token_file = os.path.join(self.user_data_path, f"{user_id}_token.json")
-            with open(token_file, 'w') as f:
-                json.dump({
-                    'token': credentials.token,
-                    'refresh_token': credentials.refresh_token,
-                    'token_uri': credentials.token_uri,
-                    'client_id': credentials.client_id,
-                    'client_secret': credentials.client_secret,
-                    'scopes': credentials.scopes,
-                    'expiry': credentials.expiry.isoformat() if credentials.expiry else None
-                }, f)
+        Returns:
+            tuple: (ID do usuário ou None se o state é desconhecido, sucesso (bool), mensagem (str))
+        """
+        pending = self._flows.get(state)
+        if pending is None:
+            return None, False, "Sessão de autorização expirada. Por favor, reinicie o processo."
+        if error or not code:
+            self._drop_flow(pending.user_id)
+            return pending.user_id, False, f"Autorização não concedida ({error or 'sem código'})."
+        success, message = await self._exchange_code(state, code)
+        return pending.user_id, success, message
+    
+    async def _exchange_code(self, state, code):
+        """Troca o código pelos tokens sem bloquear o loop e salva as credenciais"""
+        pending = self._flows.get(state)
+        if pending is None or time.monotonic() - pending.created > self.flow_ttl:
+            if pending:
+                self._drop_flow(pending.user_id)
+            return False, "Sessão de autorização expirada. Por favor, reinicie o processo."
+        
+        data = {
+            'grant_type': 'authorization_code',
+            'code': code,
+            'client_id': pending.client_id,
+            'client_secret': pending.client_secret,
+            'redirect_uri': self.redirect_uri,
+        }
+        if pending.code_verifier:
+            data['code_verifier'] = pending.code_verifier
+        
+        try:
+            from google.oauth2.credentials import Credentials
             
-            # Limpar arquivos temporários
-            if os.path.exists(flow_file):
-                os.remove(flow_file)
-                
-            temp_creds_file = os.path.join(self.user_data_path, f"{user_id}_temp_credentials.json")
-            if os.path.exists(temp_creds_file):
-                os.remove(temp_creds_file)
+            response = await self._oauth_client().post(TOKEN_URI, data=data)
+            token = response.json()
+            if response.status_code != 200:
+                reason = token.get('error_description') or token.get('error') or response.reason_phrase
+                logger.error(f"Erro ao trocar código de autorização do usuário {pending.user_id}: {reason}")
+                return False, f"Erro ao processar o código: {reason}"
             
-            return True, "Autenticação concluída com sucesso!"
+            credentials = Credentials(
+                token=token['access_token'],
+                refresh_token=token.get('refresh_token'),
+                token_uri=TOKEN_URI,
+                client_id=pending.client_id,
+                client_secret=pending.client_secret,
+                scopes=token.get('scope', ' '.join(SCOPES)).split(),
+                expiry=datetime.utcnow() + timedelta(seconds=int(token.get('expires_in', 3600)))
+            )
+            await asyncio.to_thread(self._save_token, pending.user_id, credentials)
         except Exception as e:
             logger.error(f"Erro ao processar código de autenticação: {e}")
             return False, f"Erro ao processar o código: {str(e)}"
+        
+        self._drop_flow(pending.user_id)
+        return True, "Autenticação concluída com sucesso!"
+    
+    def _oauth_client(self):
+        """Cliente HTTP assíncrono da troca de códigos, criado no primeiro uso (dentro do loop)"""
+        if self._http is None:
+            connect_timeout, read_timeout = self.transport.timeout
+            self._http = httpx.AsyncClient(timeout=httpx.Timeout(read_timeout, connect=connect_timeout))
+        return self._http
+    
+    async def aclose(self):
+        """Fecha o cliente HTTP da troca de códigos"""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+    
+    def _drop_flow(self, user_id):
+        """Descarta o fluxo de autorização pendente do usuário"""
+        state = self._flow_by_user.pop(user_id, None)
+        if state is not None:
+            self._flows.pop(state, None)
+    
+    def _prune_flows(self):
+        """Remove fluxos abandonados (mais antigos que flow_ttl)"""
+        deadline = time.monotonic() - self.flow_ttl
+        for pending in [p for p in self._flows.values() if p.created < deadline]:
+            self._drop_flow(pending.user_id)
     
     # No método get_credentials, altere a parte que lida com a expiração:
 
@@ -187,11 +283,31 @@ class CalendarAuth:
         """
         token_file = os.path.join(self.user_data_path, f"{user_id}_token.json")
         
-        if not os.path.exists(token_file):
+        try:
+            mtime = os.stat(token_file).st_mtime_ns
+        except FileNotFoundError:
+            self._forget(user_id)
             logger.info(f"Arquivo de token não encontrado para usuário {user_id}")
             return None
         
+        with self._cache_lock:
+            entry = self._cache.get(user_id)
+            if entry is not None and entry.mtime == mtime:
+                self._cache.move_to_end(user_id)
+            else:
+                entry = None
+        
         try:
+            if entry is not None:
+                # Em memória: renovar só se venceu (a renovação salva o token e atualiza a data)
+                creds = entry.credentials
+                if creds.expired and creds.refresh_token:
+                    creds.refresh(self.transport.auth_request)
+                    self._save_token(user_id, creds)
+                return creds
+            
+            from google.oauth2.credentials import Credentials
+            
             with open(token_file, 'r') as f:
                 token_data = json.load(f)
             
@@ -207,31 +323,88 @@ class CalendarAuth:
             
             creds = Credentials.from_authorized_user_info(token_data, SCOPES)
             
-            # Renovar o token se estiver expirado
+            # Renovar o token se estiver expirado (pelo pool compartilhado)
             if creds.expired and creds.refresh_token:
-                creds.refresh(Request())
-                
-                # Salvar o token atualizado
-                with open(token_file, 'w') as f:
-                    token_info = {
-                        'token': creds.token,
-                        'refresh_token': creds.refresh_token,
-                        'token_uri': creds.token_uri,
-                        'client_id': creds.client_id,
-                        'client_secret': creds.client_secret,
-                        'scopes': creds.scopes
-                    }
-                    # Adicionar expiry apenas se existir
-                    if creds.expiry:
-                        token_info['expiry'] = creds.expiry.isoformat()
-                    
-                    json.dump(token_info, f)
+                creds.refresh(self.transport.auth_request)
+                self._save_token(user_id, creds)
             
+            self._remember(user_id, creds)
             return creds
         except Exception as e:
             logger.error(f"Erro ao obter credenciais para usuário {user_id}: {e}")
             return None
         
+    def _save_token(self, user_id, creds):
+        """
+        Salva as credenciais do usuário (após a autorização ou uma renovação)
+        
+        Args:
+            user_id (str): ID único do usuário
+            creds (Credentials): Credenciais a salvar
+        """
+        token_info = {
+            'token': creds.token,
+            'refresh_token': creds.refresh_token,
+            'token_uri': creds.token_uri,
+            'client_id': creds.client_id,
+            'client_secret': creds.client_secret,
+            'scopes': creds.scopes
+        }
+        # Adicionar expiry apenas se existir
+        if creds.expiry:
+            token_info['expiry'] = creds.expiry.isoformat()
+        
+        token_file = os.path.join(self.user_data_path, f"{user_id}_token.json")
+        with open(token_file, 'w') as f:
+            json.dump(token_info, f)
+        
+        # Renovação das credenciais em memória: continuam válidas com a nova data do arquivo;
+        # credenciais novas (nova autorização) descartam o serviço montado com as antigas
+        with self._cache_lock:
+            entry = self._cache.get(user_id)
+            if entry is not None and entry.credentials is creds:
+                entry.mtime = os.stat(token_file).st_mtime_ns
+            elif entry is not None:
+                del self._cache[user_id]
+    
+    def _remember(self, user_id, creds):
+        """Guarda as credenciais lidas do arquivo, descartando os usuários menos recentes"""
+        try:
+            mtime = os.stat(os.path.join(self.user_data_path, f"{user_id}_token.json")).st_mtime_ns
+        except FileNotFoundError:
+            return
+        with self._cache_lock:
+            self._cache[user_id] = CachedUser(mtime, creds)
+            self._cache.move_to_end(user_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+    
+    def _forget(self, user_id):
+        """Descarta credenciais e serviço em memória do usuário"""
+        with self._cache_lock:
+            self._cache.pop(user_id, None)
+    
+    def refresh_credentials(self, user_id, creds):
+        """
+        Renova o token antes do vencimento (ex.: a API respondeu 401) e salva o novo
+        
+        Args:
+            user_id (str): ID único do usuário
+            creds (Credentials): Credenciais a renovar
+            
+        Returns:
+            bool: True se o token foi renovado
+        """
+        if not creds.refresh_token:
+            return False
+        try:
+            creds.refresh(self.transport.auth_request)
+            self._save_token(user_id, creds)
+            return True
+        except Exception as e:
+            logger.error(f"Erro ao renovar token do usuário {user_id}: {e}")
+            return False
+    
     def get_calendar_service(self, user_id):
         """
         Obtém um serviço autenticado do Google Calendar
@@ -246,13 +419,44 @@ class CalendarAuth:
         if not creds:
             return None
         
+        with self._cache_lock:
+            entry = self._cache.get(user_id)
+            if entry is None or entry.credentials is not creds:
+                entry = None
+            elif entry.service is not None:
+                self.service_hits += 1
+                return entry.service
+            self.service_misses += 1
+        
         try:
-            service = build('calendar', 'v3', credentials=creds)
+            from googleapiclient.discovery import build
+            
+            # Chamadas pelo pool compartilhado (seguro entre threads); tokens renovados no meio
+            # do caminho são salvos, então o serviço pode ser reaproveitado nas próximas chamadas
+            http = self.transport.http_for(creds, on_refresh=lambda: self._save_token(user_id, creds))
+            service = build('calendar', 'v3', http=http, cache_discovery=False)
+            if entry is not None:
+                entry.service = service
             return service
         except Exception as e:
             logger.error(f"Erro ao construir serviço do Calendar: {e}")
             return None
     
+    def preload_modules(self):
+        """
+        Importa as bibliotecas do Google e abre a sessão HTTP (em uma thread, após a partida),
+        para que o primeiro usuário a consultar a agenda não pague esse custo
+        """
+        started = time.perf_counter()
+        try:
+            importlib.import_module('google.oauth2.credentials')
+            importlib.import_module('googleapiclient.discovery')
+            self.transport.session  # Abre a sessão (requests, urllib3)
+        except Exception as e:
+            logger.error(f"Erro ao carregar bibliotecas do Google: {e}")
+            return
+        logger.info(f"Bibliotecas do Google carregadas em {time.perf_counter() - started:.2f}s")
+    
     def test_connection(self, user_id):
         """
         Testa a conexão com o Google Calendar
@@ -270,7 +474,7 @@ class CalendarAuth:
                 
             # Tenta listar os próximos 1 evento
             now = datetime.utcnow().isoformat() + 'Z'
-            events_result = service.events().list(
+            service.events().list(
                 calendarId='primary',
                 timeMin=now,
                 maxResults=1,
@@ -295,6 +499,35 @@ class CalendarAuth:
         """
         return self.get_credentials(user_id) is not None
     
+    def list_authenticated_users(self):
+        """
+        Percorre os usuários com token salvo, sem carregar a lista inteira
+
+        Yields:
+            str: ID de cada usuário com arquivo de token
+        """
+        suffix = "_token.json"
+        with os.scandir(self.user_data_path) as entries:
+            for entry in entries:
+                if entry.name.endswith(suffix) and entry.is_file():
+                    yield entry.name[:-len(suffix)]
+
+    def get_stats(self):
+        """
+        Retorna métricas das credenciais em memória
+        
+        Returns:
+            dict: Usuários em cache e acertos na reutilização de serviços
+        """
+        lookups = self.service_hits + self.service_misses
+        return {
+            'cached_users': len(self._cache),
+            'service_hits': self.service_hits,
+            'service_misses': self.service_misses,
+            'service_hit_ratio': self.service_hits / lookups if lookups else 0.0,
+            'pending_authorizations': len(self._flows),
+        }
+    
     def clear_auth_data(self, user_id):
         """
         Remove todos os dados de autenticação do usuário
@@ -302,6 +535,10 @@ class CalendarAuth:
         Args:
             user_id (str): ID único do usuário
         """
+        self._drop_flow(user_id)
+        self._forget(user_id)
+        
+        # Arquivos temporários de versões anteriores também são removidos
         files_to_remove = [
             f"{user_id}_token.json",
             f"{user_id}_temp_credentials.json",
@@ -3,32 +3,218 @@ Gerenciador de eventos do Google Calendar.
 Implementa funções para criar, listar, atualizar e excluir eventos.
 """
 
+import time
 import logging
+import functools
 from datetime import datetime, timedelta
 from googleapiclient.errors import HttpError
 
-# Configuração de logging
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
 logger = logging.getLogger(__name__)
 
+# Resposta quando não há credenciais ou serviço para o usuário
+NO_SERVICE_MESSAGE = "Não foi possível conectar ao Google Calendar."
+
+# Resposta imediata enquanto o disjuntor está aberto (a API não é chamada)
+CIRCUIT_OPEN_MESSAGE = "O Google Calendar está instável no momento. Tente novamente em alguns instantes."
+
+class CalendarError(str):
+    """
+    Mensagem de erro retornada pelos métodos (continua sendo o texto mostrado ao usuário),
+    com o status HTTP da resposta da API em status (None sem resposta: rede, timeout)
+    """
+
+    def __new__(cls, message, status=None):
+        error = super().__new__(cls, message)
+        error.status = status
+        return error
+
+def _api_error(message, error):
+    """Mensagem de erro com o status lido do HttpError (resp.status)"""
+    resp = getattr(error, 'resp', None)
+    status = getattr(resp, 'status', None)
+    return CalendarError(message, int(status) if status is not None else None)
+
+def http_status(result):
+    """Status HTTP de um resultado de erro dos métodos, se a API respondeu"""
+    return getattr(result, 'status', None)
+
+def is_backend_failure(success, result):
+    """
+    Diz se o resultado indica problema da API (e não do pedido)
+    
+    Erros sem status (timeout, conexão), 408, 429 e 5xx contam como falha do backend;
+    outros 4xx são respostas válidas da API a um pedido ruim.
+    """
+    if success or result in (NO_SERVICE_MESSAGE, CIRCUIT_OPEN_MESSAGE):
+        return False
+    status = http_status(result)
+    return status is None or status in (408, 429) or status >= 500
+
+def _guarded(method):
+    """Passa a chamada pelo disjuntor do CalendarManager, se houver"""
+    @functools.wraps(method)
+    def wrapper(self, user_id, *args, **kwargs):
+        if self.circuit is None:
+            return method(self, user_id, *args, **kwargs)
+        if not self.circuit.allow(user_id):
+            return False, CIRCUIT_OPEN_MESSAGE
+        started = time.monotonic()
+        success, result = method(self, user_id, *args, **kwargs)
+        self.circuit.record(user_id, is_backend_failure(success, result), time.monotonic() - started)
+        return success, result
+    return wrapper
+
 class CalendarManager:
     """Gerencia operações com eventos no Google Calendar"""
     
-    def __init__(self, auth_manager):
+    def __init__(self, auth_manager, circuit=None):
         """
         Inicializa o gerenciador de calendário
         
         Args:
             auth_manager: Instância de CalendarAuth para obter serviços autenticados
+            circuit (CalendarCircuit): Disjuntores que recusam chamadas na hora quando a API
+                está falhando (com eles abertos, os métodos retornam CIRCUIT_OPEN_MESSAGE)
         """
         self.auth_manager = auth_manager
+        self.circuit = circuit
+        self._change_listeners = []
+    
+    def add_change_listener(self, listener):
+        """
+        Registra uma função chamada quando eventos de um usuário mudam
+        
+        Args:
+            listener (callable): Recebe (user_id, event, deleted_event_id); pode ser chamada de uma thread
+        """
+        self._change_listeners.append(listener)
     
+    def notify_change(self, user_id, event=None, deleted_event_id=None):
+        """
+        Avisa os listeners que a agenda do usuário mudou
+        
+        Chamado depois de criar, atualizar ou excluir eventos pelo bot, e por quem
+        detectar mudanças feitas fora dele (ex.: uma sincronização em segundo plano).
+        
+        Args:
+            user_id (str): ID único do usuário
+            event (dict): Evento criado ou atualizado, se conhecido
+            deleted_event_id (str): ID do evento excluído, se for uma exclusão
+        """
+        for listener in self._change_listeners:
+            try:
+                listener(user_id, event, deleted_event_id)
+            except Exception as e:
+                logger.error(f"Erro ao notificar mudança na agenda de {user_id}: {e}")
+    
+    def create_pending_event(self, user_id, event):
+        """
+        Cria no Google Calendar o evento montado durante a conversa
+        
+        Args:
+            user_id (str): ID único do usuário
+            event (PendingEvent): Evento com ao menos data e hora definidas
+            
+        Returns:
+            tuple: (sucesso (bool), resultado (dict ou str))
+        """
+        return self.create_event(user_id=user_id, **self.pending_event_args(event))
+    
+    @staticmethod
+    def pending_event_args(event):
+        """
+        Converte o evento da conversa nos argumentos de create_event
+        
+        Args:
+            event (PendingEvent): Evento com ao menos data e hora definidas
+            
+        Returns:
+            dict: Argumentos nomeados (serializáveis em JSON) para create_event
+        """
+        return {
+            'summary': event.get('summary', "Evento"),
+            'start_date': event.date,
+            'start_time': event.time,
+            'duration': event.get('duration', 1),  # Padrão: 1 hora
+            'location': event.location,
+            'attendees': event.attendees,
+            'add_meet_link': event.get('add_meet_link', False),
+            'recurrence': event.recurrence,
+            'end_date': event.end_date
+        }
+    
+    @staticmethod
+    def event_body(user_id, summary, start_date, start_time, duration=1, description="", location="",
+                   attendees=None, add_meet_link=False, recurrence=None, end_date=None, event_id=None):
+        """
+        Monta o corpo de um evento novo no formato da API (argumentos como em create_event)
+        
+        Returns:
+            tuple: (evento (dict), conferenceDataVersion a usar na criação)
+        """
+        # Garantir que duration seja um número
+        if duration is None:
+            duration = 1.0  # valor padrão
+        else:
+            # Converter para float para garantir compatibilidade
+            duration = float(duration)
+        
+        # Processar data e hora
+        date_str = f"{start_date}T{start_time}:00"
+        start_datetime = datetime.fromisoformat(date_str)
+        end_datetime = start_datetime + timedelta(hours=duration)
+        
+        event = {
+            'summary': summary,
+            'location': location,
+            'description': description,
+            'start': {
+                'dateTime': start_datetime.isoformat(),
+                'timeZone': 'America/Sao_Paulo',
+            },
+            'end': {
+                'dateTime': end_datetime.isoformat(),
+                'timeZone': 'America/Sao_Paulo',
+            },
+        }
+        if event_id:
+            event['id'] = event_id
+        
+        # Adicionar regra de recorrência se especificada
+        if recurrence:
+            recurrence_rule = ['RRULE:FREQ=' + recurrence.upper()]
+            
+            # Adicionar data final para a recorrência se especificada
+            if end_date:
+                # Formatar a data final no formato apropriado (YYYYMMDD)
+                end_date_obj = datetime.fromisoformat(end_date)
+                formatted_end_date = end_date_obj.strftime('%Y%m%d')
+                recurrence_rule[0] += f';UNTIL={formatted_end_date}T235959Z'
+            
+            event['recurrence'] = recurrence_rule
+        
+        # Adicionar participantes se fornecidos
+        if attendees:
+            event['attendees'] = [{'email': email} for email in attendees]
+        
+        # Adicionar link do Google Meet se solicitado
+        if add_meet_link:
+            event['conferenceData'] = {
+                'createRequest': {
+                    'requestId': f"{user_id}-{datetime.now().strftime('%Y%m%d%H%M%S')}",
+                    'conferenceSolutionKey': {
+                        'type': 'hangoutsMeet'
+                    }
+                }
+            }
+        
+        # Quando adicionar link do Meet, precisamos usar conferenceDataVersion=1
+        return event, 1 if add_meet_link else 0
+    
+    @_guarded
     def create_event(self, user_id, summary, start_date, start_time, 
                     duration=1, description="", location="", attendees=None, 
-                    add_meet_link=False, recurrence=None, end_date=None):
+                    add_meet_link=False, recurrence=None, end_date=None, event_id=None):
         """
         Cria um novo evento no Google Calendar, com opção de recorrência
         
@@ -44,88 +230,41 @@ class CalendarManager:
             add_meet_link (bool): Se True, adiciona um link do Google Meet
             recurrence (str): Tipo de recorrência ('daily', 'weekly', 'monthly', etc.)
             end_date (str): Data final para eventos recorrentes (formato ISO: YYYY-MM-DD)
+            event_id (str): ID escolhido pelo cliente (base32hex), para repetir a criação
+                sem duplicar o evento; a segunda tentativa falha com 409
             
         Returns:
             tuple: (sucesso (bool), resultado (dict ou str))
         """
         service = self.auth_manager.get_calendar_service(user_id)
         if not service:
-            return False, "Não foi possível conectar ao Google Calendar."
+            return False, NO_SERVICE_MESSAGE
         
         try:
-            # Garantir que duration seja um número
-            if duration is None:
-                duration = 1.0  # valor padrão
-            else:
-                # Converter para float para garantir compatibilidade
-                duration = float(duration)
-            
-            # Processar data e hora
-            date_str = f"{start_date}T{start_time}:00"
-            start_datetime = datetime.fromisoformat(date_str)
-            end_datetime = start_datetime + timedelta(hours=duration)
-            
-            event = {
-                'summary': summary,
-                'location': location,
-                'description': description,
-                'start': {
-                    'dateTime': start_datetime.isoformat(),
-                    'timeZone': 'America/Sao_Paulo',
-                },
-                'end': {
-                    'dateTime': end_datetime.isoformat(),
-                    'timeZone': 'America/Sao_Paulo',
-                },
-            }
-            
-            # Adicionar regra de recorrência se especificada
-            if recurrence:
-                recurrence_rule = ['RRULE:FREQ=' + recurrence.upper()]
-                
-                # Adicionar data final para a recorrência se especificada
-                if end_date:
-                    # Formatar a data final no formato apropriado (YYYYMMDD)
-                    end_date_obj = datetime.fromisoformat(end_date)
-                    formatted_end_date = end_date_obj.strftime('%Y%m%d')
-                    recurrence_rule[0] += f';UNTIL={formatted_end_date}T235959Z'
-                
-                event['recurrence'] = recurrence_rule
-            
-            # Adicionar participantes se fornecidos
-            if attendees:
-                event['attendees'] = [{'email': email} for email in attendees]
-            
-            # Adicionar link do Google Meet se solicitado
-            if add_meet_link:
-                event['conferenceData'] = {
-                    'createRequest': {
-                        'requestId': f"{user_id}-{datetime.now().strftime('%Y%m%d%H%M%S')}",
-                        'conferenceSolutionKey': {
-                            'type': 'hangoutsMeet'
-                        }
-                    }
-                }
-                
-                # Quando adicionar link do Meet, precisamos usar conferenceDataVersion=1
-                created_event = service.events().insert(
-                    calendarId='primary', 
-                    body=event,
-                    conferenceDataVersion=1
-                ).execute()
-            else:
-                created_event = service.events().insert(
-                    calendarId='primary', 
-                    body=event
-                ).execute()
+            event, conference_data_version = self.event_body(
+                user_id, summary, start_date, start_time, duration, description, location,
+                attendees, add_meet_link, recurrence, end_date, event_id
+            )
+            created_event = service.events().insert(
+                calendarId='primary', 
+                body=event,
+                conferenceDataVersion=conference_data_version
+            ).execute()
             
             # Retornar sucesso e o evento criado
+            self.notify_change(user_id, event=created_event)
             return True, created_event
+        except HttpError as e:
+            # O status decide o que a outbox faz (ex.: 409 em uma repetição já aplicada)
+            error_message = _api_error(f"Erro ao criar evento: {e}", e)
+            logger.error(error_message)
+            return False, error_message
         except Exception as e:
             error_message = f"Erro ao criar evento: {str(e)}"
             logger.error(error_message)
             return False, error_message
     
+    @_guarded
     def list_events(self, user_id, time_min=None, time_max=None, max_results=10):
         """
         Lista eventos do calendário do usuário
@@ -141,7 +280,7 @@ class CalendarManager:
         """
         service = self.auth_manager.get_calendar_service(user_id)
         if not service:
-            return False, "Não foi possível conectar ao Google Calendar."
+            return False, NO_SERVICE_MESSAGE
         
         try:
             # Se time_min não foi especificado, usar agora
@@ -167,7 +306,7 @@ class CalendarManager:
             
             return True, events
         except HttpError as e:
-            error_message = f"Erro na API do Google Calendar: {e}"
+            error_message = _api_error(f"Erro na API do Google Calendar: {e}", e)
             logger.error(error_message)
             return False, error_message
         except Exception as e:
@@ -175,6 +314,114 @@ class CalendarManager:
             logger.error(error_message)
             return False, error_message
     
+    def iter_event_pages(self, user_id, time_min, time_max, page_size=50):
+        """
+        Percorre os eventos de um período página a página, sem carregar tudo de uma vez
+        
+        Args:
+            user_id (str): ID único do usuário
+            time_min (str): Início do período em formato ISO
+            time_max (str): Fim do período em formato ISO
+            page_size (int): Número de eventos por página da API
+            
+        Yields:
+            tuple: (sucesso (bool), eventos da página (list) ou mensagem de erro (str))
+        """
+        service = self.auth_manager.get_calendar_service(user_id)
+        if not service:
+            yield False, NO_SERVICE_MESSAGE
+            return
+        
+        params = {
+            'calendarId': 'primary',
+            'timeMin': time_min,
+            'timeMax': time_max,
+            'maxResults': page_size,
+            'singleEvents': True,
+            'orderBy': 'startTime'
+        }
+        
+        while True:
+            # Cada página passa pelo disjuntor, como uma chamada separada
+            if self.circuit is not None and not self.circuit.allow(user_id):
+                yield False, CIRCUIT_OPEN_MESSAGE
+                return
+            started = time.monotonic()
+            try:
+                events_result = service.events().list(**params).execute()
+            except HttpError as e:
+                error_message = _api_error(f"Erro na API do Google Calendar: {e}", e)
+            except Exception as e:
+                error_message = f"Erro ao listar eventos: {str(e)}"
+            else:
+                error_message = None
+            if self.circuit is not None:
+                self.circuit.record(user_id, error_message is not None and is_backend_failure(False, error_message),
+                                    time.monotonic() - started)
+            if error_message:
+                logger.error(error_message)
+                yield False, error_message
+                return
+            
+            yield True, events_result.get('items', [])
+            
+            page_token = events_result.get('nextPageToken')
+            if not page_token:
+                return
+            params['pageToken'] = page_token
+    
+    @staticmethod
+    def apply_updates(user_id, event, updates, update_conference=False):
+        """
+        Aplica as alterações de update_event ao evento obtido da API
+        
+        Returns:
+            int: conferenceDataVersion a usar no envio
+        """
+        # Aplicar atualizações
+        if 'summary' in updates:
+            event['summary'] = updates['summary']
+        
+        if 'location' in updates:
+            event['location'] = updates['location']
+        
+        if 'description' in updates:
+            event['description'] = updates['description']
+        
+        if 'start_datetime' in updates:
+            event['start']['dateTime'] = updates['start_datetime']
+        
+        if 'end_datetime' in updates:
+            event['end']['dateTime'] = updates['end_datetime']
+        
+        if 'attendees' in updates:
+            event['attendees'] = [{'email': email} for email in updates['attendees']]
+        
+        # Atualizar conferência (Google Meet)
+        if update_conference:
+            if 'add_meet_link' in updates and updates['add_meet_link']:
+                # Adicionar link do Meet
+                event['conferenceData'] = {
+                    'createRequest': {
+                        'requestId': f"{user_id}-{datetime.now().strftime('%Y%m%d%H%M%S')}",
+                        'conferenceSolutionKey': {
+                            'type': 'hangoutsMeet'
+                        }
+                    }
+                }
+                conference_data_version = 1
+            elif 'remove_meet_link' in updates and updates['remove_meet_link']:
+                # Remover link do Meet
+                if 'conferenceData' in event:
+                    del event['conferenceData']
+                conference_data_version = 1
+            else:
+                conference_data_version = 0
+        else:
+            conference_data_version = 0
+        return conference_data_version
+    
+    @_guarded
     def update_event(self, user_id, event_id, updates, update_conference=False):
         """
         Atualiza um evento existente
@@ -190,53 +437,13 @@ class CalendarManager:
         """
         service = self.auth_manager.get_calendar_service(user_id)
         if not service:
-            return False, "Não foi possível conectar ao Google Calendar."
+            return False, NO_SERVICE_MESSAGE
         
         try:
             # Obter o evento existente
             event = service.events().get(calendarId='primary', eventId=event_id).execute()
             
-            # Aplicar atualizações
-            if 'summary' in updates:
-                event['summary'] = updates['summary']
-            
-            if 'location' in updates:
-                event['location'] = updates['location']
-            
-            if 'description' in updates:
-                event['description'] = updates['description']
-            
-            if 'start_datetime' in updates:
-                event['start']['dateTime'] = updates['start_datetime']
-            
-            if 'end_datetime' in updates:
-                event['end']['dateTime'] = updates['end_datetime']
-            
-            if 'attendees' in updates:
-                event['attendees'] = [{'email': email} for email in updates['attendees']]
-            
-            # Atualizar conferência (Google Meet)
-            if update_conference:
-                if 'add_meet_link' in updates and updates['add_meet_link']:
-                    # Adicionar link do Meet
-                    event['conferenceData'] = {
-                        'createRequest': {
-                            'requestId': f"{user_id}-{datetime.now().strftime('%Y%m%d%H%M%S')}",
-                            'conferenceSolutionKey': {
-                                'type': 'hangoutsMeet'
-                            }
-                        }
-                    }
-                    conference_data_version = 1
-                elif 'remove_meet_link' in updates and updates['remove_meet_link']:
-                    # Remover link do Meet
-                    if 'conferenceData' in event:
-                        del event['conferenceData']
-                    conference_data_version = 1
-                else:
-                    conference_data_version = 0
-            else:
-                conference_data_version = 0
+            conference_data_version = self.apply_updates(user_id, event, updates, update_conference)
             
             # Enviar atualizações
             updated_event = service.events().update(
@@ -246,9 +453,10 @@ class CalendarManager:
                 conferenceDataVersion=conference_data_version
             ).execute()
             
+            self.notify_change(user_id, event=updated_event)
             return True, updated_event
         except HttpError as e:
-            error_message = f"Erro na API do Google Calendar: {e}"
+            error_message = _api_error(f"Erro na API do Google Calendar: {e}", e)
             logger.error(error_message)
             return False, error_message
         except Exception as e:
@@ -256,6 +464,7 @@ class CalendarManager:
             logger.error(error_message)
             return False, error_message
     
+    @_guarded
     def delete_event(self, user_id, event_id):
         """
         Exclui um evento
@@ -269,13 +478,14 @@ class CalendarManager:
         """
         service = self.auth_manager.get_calendar_service(user_id)
         if not service:
-            return False, "Não foi possível conectar ao Google Calendar."
+            return False, NO_SERVICE_MESSAGE
         
         try:
             service.events().delete(calendarId='primary', eventId=event_id).execute()
+            self.notify_change(user_id, deleted_event_id=event_id)
             return True, "Evento excluído com sucesso."
         except HttpError as e:
-            error_message = f"Erro na API do Google Calendar: {e}"
+            error_message = _api_error(f"Erro na API do Google Calendar: {e}", e)
             logger.error(error_message)
             return False, error_message
         except Exception as e:
@@ -303,7 +513,11 @@ class CalendarManager:
         if not success:
             return False, events
         
-        # Filtrar eventos que correspondam à consulta
+        return True, self.match_events(events, query_text, max_results)
+    
+    @staticmethod
+    def match_events(events, query_text, max_results=10):
+        """Filtra os eventos cujo título, descrição ou local contém o texto"""
         matching_events = []
         query_lower = query_text.lower()
         
@@ -321,8 +535,9 @@ class CalendarManager:
             if len(matching_events) >= max_results:
                 break
         
-        return True, matching_events[:max_results]
+        return matching_events[:max_results]
     
+    @_guarded
     def get_event_by_id(self, user_id, event_id):
         """
         Obtém um evento específico pelo ID
@@ -336,13 +551,13 @@ class CalendarManager:
         """
         service = self.auth_manager.get_calendar_service(user_id)
         if not service:
-            return False, "Não foi possível conectar ao Google Calendar."
+            return False, NO_SERVICE_MESSAGE
         
         try:
             event = service.events().get(calendarId='primary', eventId=event_id).execute()
             return True, event
         except HttpError as e:
-            error_message = f"Erro na API do Google Calendar: {e}"
+            error_message = _api_error(f"Erro na API do Google Calendar: {e}", e)
             logger.error(error_message)
             return False, error_message
         except Exception as e:
@@ -350,6 +565,17 @@ class CalendarManager:
             logger.error(error_message)
             return False, error_message
     
+    @staticmethod
+    def apply_duration(event, duration_hours):
+        """Muda o término do evento para início + duration_hours, mantendo o início"""
+        # Obter horário de início e calcular novo fim
+        start_datetime = datetime.fromisoformat(event['start']['dateTime'].replace('Z', '+00:00'))
+        new_end_datetime = start_datetime + timedelta(hours=duration_hours)
+        
+        # Atualizar apenas o horário de término
+        event['end']['dateTime'] = new_end_datetime.isoformat()
+    
+    @_guarded
     def update_event_duration(self, user_id, event_id, duration_hours):
         """
         Atualiza apenas a duração de um evento, mantendo o horário de início
@@ -364,18 +590,13 @@ class CalendarManager:
         """
         service = self.auth_manager.get_calendar_service(user_id)
         if not service:
-            return False, "Não foi possível conectar ao Google Calendar."
+            return False, NO_SERVICE_MESSAGE
         
         try:
             # Obter o evento existente
             event = service.events().get(calendarId='primary', eventId=event_id).execute()
             
-            # Obter horário de início e calcular novo fim
-            start_datetime = datetime.fromisoformat(event['start']['dateTime'].replace('Z', '+00:00'))
-            new_end_datetime = start_datetime + timedelta(hours=duration_hours)
-            
-            # Atualizar apenas o horário de término
-            event['end']['dateTime'] = new_end_datetime.isoformat()
+            self.apply_duration(event, duration_hours)
             
             # Enviar atualizações
             updated_event = service.events().update(
@@ -384,9 +605,10 @@ class CalendarManager:
                 body=event
             ).execute()
             
+            self.notify_change(user_id, event=updated_event)
             return True, updated_event
         except HttpError as e:
-            error_message = f"Erro na API do Google Calendar: {e}"
+            error_message = _api_error(f"Erro na API do Google Calendar: {e}", e)
             logger.error(error_message)
             return False, error_message
         except Exception as e:
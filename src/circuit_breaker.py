@@ -0,0 +1,251 @@
+"""
+Disjuntores (circuit breakers) para o backend do Google Calendar.
+Quando a API começa a falhar ou a demorar, o disjuntor abre e as chamadas falham na
+hora, sem esperar o timeout HTTP; depois de um tempo, poucas chamadas de teste
+(meio-aberto) decidem se ele fecha de novo.
+"""
+
+import time
+import logging
+import threading
+from collections import deque, OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Estados do disjuntor
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+
+class CircuitBreaker:
+    """Disjuntor pela taxa de falhas das últimas chamadas, com testes no estado meio-aberto"""
+
+    def __init__(self, name, failure_ratio=0.5, min_calls=10, window_calls=20, window=60.0,
+                 open_seconds=30.0, half_open_probes=1):
+        """
+        Inicializa o disjuntor
+
+        Args:
+            name (str): Nome usado nos logs
+            failure_ratio (float): Fração de falhas na janela que abre o disjuntor
+            min_calls (int): Chamadas mínimas na janela antes de avaliar a taxa
+            window_calls (int): Últimas chamadas consideradas no cálculo da taxa (por
+                contagem: uma queda aparece logo, sem se diluir nos acertos de antes)
+            window (float): Idade máxima (s) de uma chamada na janela
+            open_seconds (float): Tempo (s) aberto antes de deixar passar chamadas de teste
+            half_open_probes (int): Chamadas de teste simultâneas no estado meio-aberto
+        """
+        self.name = name
+        self.failure_ratio = failure_ratio
+        self.min_calls = min_calls
+        self.window = window
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+
+        self.state = CLOSED
+        self._calls = deque(maxlen=window_calls)  # (instante, falhou) das últimas chamadas
+        self._opened_at = 0.0
+        self._probes = 0
+        self.last_change = time.monotonic()
+
+        # Métricas
+        self.opens = 0
+        self.rejected = 0
+
+    def allow(self, now=None):
+        """
+        Diz se a chamada pode seguir; no estado meio-aberto reserva uma chamada de teste
+
+        Returns:
+            bool: False se o disjuntor está aberto (ou sem vagas de teste)
+        """
+        now = time.monotonic() if now is None else now
+        if self.state == OPEN and now - self._opened_at >= self.open_seconds:
+            self._set_state(HALF_OPEN, now)
+            self._probes = 0
+        if self.state == CLOSED:
+            return True
+        if self.state == HALF_OPEN and self._probes < self.half_open_probes:
+            self._probes += 1
+            return True
+        self.rejected += 1
+        return False
+
+    def release(self):
+        """Devolve uma chamada de teste reservada que acabou não sendo feita"""
+        if self.state == HALF_OPEN and self._probes > 0:
+            self._probes -= 1
+
+    def record(self, failed, now=None):
+        """
+        Registra o resultado de uma chamada autorizada por allow()
+
+        Args:
+            failed (bool): Se a chamada falhou por problema do backend (erro 5xx, 429, timeout, lentidão)
+        """
+        now = time.monotonic() if now is None else now
+        if self.state == HALF_OPEN:
+            # Uma chamada de teste decide: falhou, abre de novo; passou, fecha
+            self._probes = max(0, self._probes - 1)
+            if failed:
+                self._open(now)
+            else:
+                self._set_state(CLOSED, now)
+                self._calls.clear()
+            return
+        if self.state == OPEN:
+            return  # Chamada iniciada antes de abrir; não muda nada
+
+        self._calls.append((now, failed))
+        while now - self._calls[0][0] > self.window:
+            self._calls.popleft()
+        if len(self._calls) >= self.min_calls:
+            failures = sum(1 for _, call_failed in self._calls if call_failed)
+            if failures >= self.failure_ratio * len(self._calls):
+                self._open(now)
+
+    def retry_after(self, now=None):
+        """Segundos até o disjuntor aceitar chamadas de teste (0 se aceita agora)"""
+        if self.state != OPEN:
+            return 0.0
+        now = time.monotonic() if now is None else now
+        return max(0.0, self._opened_at + self.open_seconds - now)
+
+    def is_open(self, now=None):
+        """Diz se chamadas seriam recusadas agora, sem reservar chamada de teste"""
+        return self.retry_after(now) > 0
+
+    def _open(self, now):
+        self._set_state(OPEN, now)
+        self._opened_at = now
+        self._calls.clear()
+        self.opens += 1
+
+    def _set_state(self, state, now):
+        if state != self.state:
+            logger.log(logging.WARNING if state == OPEN else logging.INFO,
+                       f"Disjuntor {self.name}: {self.state} -> {state}")
+            self.state = state
+            self.last_change = now
+
+
+class CalendarCircuit:
+    """Disjuntor global da API do Google Calendar mais um disjuntor por usuário"""
+
+    def __init__(self, failure_ratio=0.5, min_calls=20, window_calls=50, window=60.0, open_seconds=30.0,
+                 user_min_calls=3, user_window_calls=5, user_open_seconds=60.0, slow_call=10.0,
+                 max_users=10000):
+        """
+        Inicializa os disjuntores
+
+        Args:
+            failure_ratio (float): Fração de falhas que abre um disjuntor
+            min_calls (int): Chamadas mínimas na janela para o disjuntor global
+            window_calls (int): Últimas chamadas consideradas pelo disjuntor global
+            window (float): Idade máxima (s) de uma chamada na janela
+            open_seconds (float): Tempo (s) aberto do disjuntor global
+            user_min_calls (int): Chamadas mínimas na janela para o disjuntor de um usuário
+            user_window_calls (int): Últimas chamadas consideradas por usuário
+            user_open_seconds (float): Tempo (s) aberto do disjuntor de um usuário
+            slow_call (float): Chamadas mais lentas que isso (s) contam como falha
+            max_users (int): Máximo de disjuntores por usuário em memória
+        """
+        self.failure_ratio = failure_ratio
+        self.window = window
+        self.user_min_calls = user_min_calls
+        self.user_window_calls = user_window_calls
+        self.user_open_seconds = user_open_seconds
+        self.slow_call = slow_call
+        self.max_users = max_users
+
+        self.global_breaker = CircuitBreaker('global', failure_ratio, min_calls, window_calls, window, open_seconds)
+        self._users = OrderedDict()  # user_id -> CircuitBreaker, do menos para o mais recente
+        # Chamadas vêm das threads que acessam a API
+        self._lock = threading.Lock()
+
+        # Métricas
+        self.slow_calls = 0
+
+    def _user_breaker(self, user_id, create=False):
+        """Disjuntor do usuário (com o lock adquirido)"""
+        breaker = self._users.get(user_id)
+        if breaker is not None:
+            self._users.move_to_end(user_id)
+        elif create:
+            breaker = CircuitBreaker(f"usuário {user_id}", self.failure_ratio, self.user_min_calls,
+                                     self.user_window_calls, self.window, self.user_open_seconds)
+            self._users[user_id] = breaker
+            # Descartar os mais antigos que estão fechados (um aberto ainda protege a API)
+            for stale_id in list(self._users):
+                if len(self._users) <= self.max_users:
+                    break
+                if self._users[stale_id].state == CLOSED:
+                    del self._users[stale_id]
+        return breaker
+
+    def allow(self, user_id):
+        """
+        Diz se uma chamada do usuário pode ir à API
+
+        Returns:
+            bool: False se o disjuntor do usuário ou o global está aberto
+        """
+        with self._lock:
+            breaker = self._user_breaker(user_id)
+            if breaker is not None and not breaker.allow():
+                return False
+            if not self.global_breaker.allow():
+                if breaker is not None:
+                    breaker.release()
+                return False
+            return True
+
+    def record(self, user_id, failed, elapsed=0.0):
+        """
+        Registra o resultado de uma chamada autorizada por allow()
+
+        Args:
+            user_id (str): ID do usuário
+            failed (bool): Se a chamada falhou por problema do backend
+            elapsed (float): Duração da chamada em segundos
+        """
+        if not failed and elapsed > self.slow_call:
+            failed = True
+            self.slow_calls += 1
+        with self._lock:
+            self.global_breaker.record(failed)
+            breaker = self._user_breaker(user_id, create=failed)
+            if breaker is not None:
+                breaker.record(failed)
+
+    def is_open(self, user_id):
+        """Diz se as chamadas do usuário estão sendo recusadas agora"""
+        with self._lock:
+            breaker = self._users.get(user_id)
+            return self.global_breaker.is_open() or (breaker is not None and breaker.is_open())
+
+    def retry_after(self, user_id):
+        """Segundos até as chamadas do usuário voltarem a ser testadas"""
+        with self._lock:
+            breaker = self._users.get(user_id)
+            user_wait = breaker.retry_after() if breaker is not None else 0.0
+            return max(self.global_breaker.retry_after(), user_wait)
+
+    def get_stats(self):
+        """
+        Retorna métricas dos disjuntores
+
+        Returns:
+            dict: Estado do global, aberturas, recusas e usuários com disjuntor aberto
+        """
+        with self._lock:
+            users = list(self._users.values())
+        return {
+            'state': self.global_breaker.state,
+            'opens': self.global_breaker.opens,
+            'rejected': self.global_breaker.rejected,
+            'users_tracked': len(users),
+            'users_open': sum(1 for breaker in users if breaker.state != CLOSED),
+            'user_opens': sum(breaker.opens for breaker in users),
+            'user_rejected': sum(breaker.rejected for breaker in users),
+            'slow_calls': self.slow_calls,
+        }
@@ -0,0 +1,141 @@
+"""
+Máquina de estados da conversa.
+Define os estados, a tabela de perguntas para preencher cada campo pendente e o
+despachante que encaminha cada mensagem ao handler do estado atual.
+"""
+
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Estados de conversa
+(
+    STATE_NORMAL,                 # Estado normal, processando comandos
+    STATE_SETUP_START,            # Início da configuração
+    STATE_AWAITING_CLIENT_ID,     # Aguardando Client ID
+    STATE_AWAITING_CLIENT_SECRET, # Aguardando Client Secret
+    STATE_AWAITING_AUTH_CODE,     # Aguardando código de autorização
+
+    STATE_AWAITING_DATE,          # Aguardando data
+    STATE_AWAITING_TIME,          # Aguardando hora
+    STATE_AWAITING_DURATION,      # Aguardando duração
+    STATE_AWAITING_SUMMARY,       # Aguardando título/assunto
+    STATE_AWAITING_ADD_MEET,      # Aguardando confirmação para adicionar Meet
+    STATE_AWAITING_ATTENDEES,     # Aguardando participantes
+    STATE_AWAITING_EVENT_REF,     # Aguardando referência do evento para edição/exclusão
+    STATE_CONFIRM_DELETE          # Confirmação para excluir evento
+) = range(13)
+
+STATE_NAMES = {
+    STATE_NORMAL: "normal",
+    STATE_SETUP_START: "setup_start",
+    STATE_AWAITING_CLIENT_ID: "awaiting_client_id",
+    STATE_AWAITING_CLIENT_SECRET: "awaiting_client_secret",
+    STATE_AWAITING_AUTH_CODE: "awaiting_auth_code",
+    STATE_AWAITING_DATE: "awaiting_date",
+    STATE_AWAITING_TIME: "awaiting_time",
+    STATE_AWAITING_DURATION: "awaiting_duration",
+    STATE_AWAITING_SUMMARY: "awaiting_summary",
+    STATE_AWAITING_ADD_MEET: "awaiting_add_meet",
+    STATE_AWAITING_ATTENDEES: "awaiting_attendees",
+    STATE_AWAITING_EVENT_REF: "awaiting_event_ref",
+    STATE_CONFIRM_DELETE: "confirm_delete",
+}
+
+# Estados da configuração do Google (prazo de expiração maior)
+SETUP_STATES = (
+    STATE_SETUP_START, STATE_AWAITING_CLIENT_ID,
+    STATE_AWAITING_CLIENT_SECRET, STATE_AWAITING_AUTH_CODE
+)
+
+# Campo pendente (de get_missing_info) -> (estado que aguarda a resposta, pergunta)
+SLOT_PROMPTS = {
+    'date': (STATE_AWAITING_DATE, "Em qual data?"),
+    'time': (STATE_AWAITING_TIME, "Em qual horário?"),
+    'duration': (STATE_AWAITING_DURATION, "Qual deve ser a duração?"),
+    'summary': (STATE_AWAITING_SUMMARY, "Qual é o título ou assunto do evento?"),
+    'event_reference': (STATE_AWAITING_EVENT_REF, "Qual evento você deseja modificar?"),
+    'add_meet_link': (STATE_AWAITING_ADD_MEET, "Deseja adicionar um link do Google Meet para esta reunião?"),
+    'attendees': (
+        STATE_AWAITING_ATTENDEES,
+        "Quem serão os participantes da reunião? \n\n"
+        "Digite os e-mails separados por vírgula ou nomes dos participantes."
+    ),
+}
+
+# Perguntas específicas de uma intenção, {(intenção, campo): pergunta}
+INTENT_SLOT_PROMPTS = {
+    ('UPDATE_DURATION', 'duration'): "Qual deve ser a nova duração do evento?",
+}
+
+def next_slot(intent, missing):
+    """
+    Escolhe o próximo campo a perguntar
+
+    Args:
+        intent (str): Intenção pendente
+        missing (list): Campos faltantes, na ordem de get_missing_info
+
+    Returns:
+        tuple: (campo, estado, pergunta) ou None se nada faltar
+    """
+    for slot in missing:
+        if slot in SLOT_PROMPTS:
+            state, prompt = SLOT_PROMPTS[slot]
+            return slot, state, INTENT_SLOT_PROMPTS.get((intent, slot), prompt)
+    return None
+
+
+class StateMachine:
+    """Despacha mensagens para o handler do estado atual e mede o tempo de cada estado"""
+
+    def __init__(self, transitions, fallback):
+        """
+        Inicializa a máquina de estados
+
+        Args:
+            transitions (dict): Tabela {estado: corrotina handler}
+            fallback (callable): Handler para estados sem entrada na tabela
+        """
+        self.transitions = dict(transitions)
+        self.fallback = fallback
+        self._timings = {}  # estado -> [chamadas, tempo total, tempo máximo]
+
+    async def dispatch(self, state, *args):
+        """
+        Executa o handler do estado
+
+        Args:
+            state (int): Estado atual do usuário
+            *args: Argumentos repassados ao handler
+        """
+        handler = self.transitions.get(state, self.fallback)
+
+        started = time.perf_counter()
+        try:
+            await handler(*args)
+        finally:
+            elapsed = time.perf_counter() - started
+            timing = self._timings.get(state)
+            if timing is None:
+                timing = self._timings[state] = [0, 0.0, 0.0]
+            timing[0] += 1
+            timing[1] += elapsed
+            timing[2] = max(timing[2], elapsed)
+
+    def get_stats(self):
+        """
+        Retorna o tempo gasto em cada estado
+
+        Returns:
+            dict: {nome do estado: {'calls', 'avg_ms', 'max_ms'}}
+        """
+        return {
+            STATE_NAMES.get(state, str(state)): {
+                'calls': calls,
+                'avg_ms': 1000 * total / calls,
+                'max_ms': 1000 * longest,
+            }
+            for state, (calls, total, longest) in self._timings.items()
+        }
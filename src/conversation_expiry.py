@@ -0,0 +1,219 @@
+"""
+Expiração do estado de conversa abandonado.
+Cada usuário tem um prazo que depende do estado em que parou; um varredor baseado
+em heap limpa os fluxos vencidos (e libera da memória usuários ociosos).
+"""
+
+import time
+import heapq
+import asyncio
+import logging
+
+from rate_limiter import PRIORITY_BACKGROUND
+
+logger = logging.getLogger(__name__)
+
+# Chaves de um fluxo em andamento, removidas quando ele expira
+FLOW_KEYS = ('pending_event', 'pending_intent', 'event_to_delete', 'client_id')
+
+# Espera máxima do varredor quando não há prazos próximos (segundos)
+MAX_SWEEP_SLEEP = 60
+
+# Nova tentativa para um usuário que estava com update em andamento no prazo (segundos)
+BUSY_RETRY = 5
+
+EXPIRED_NOTICE = (
+    "⌛ Sua solicitação expirou por falta de resposta. "
+    "Quando quiser, é só me pedir de novo."
+)
+
+class ConversationExpiry:
+    """Controla os prazos do estado de conversa de cada usuário"""
+
+    def __init__(self, idle_state, default_ttl=900, ttl_by_state=None, idle_ttl=3600, notify=True,
+                 is_busy=None):
+        """
+        Inicializa o controle de expiração
+
+        Args:
+            idle_state (int): Estado sem fluxo em andamento
+            default_ttl (float): Prazo em segundos para estados sem prazo próprio
+            ttl_by_state (dict): Prazos específicos {estado: segundos}
+            idle_ttl (float): Tempo até liberar da memória um usuário ocioso (None desativa)
+            notify (bool): Avisar o usuário quando um fluxo expirar
+            is_busy (callable): is_busy(user_id) -> True se há update do usuário em andamento
+                (PerUserUpdateProcessor.is_busy); esses usuários não são expirados no meio do passo
+        """
+        self.idle_state = idle_state
+        self.default_ttl = default_ttl
+        self.ttl_by_state = dict(ttl_by_state or {})
+        self.idle_ttl = idle_ttl
+        self.notify = notify
+        self.is_busy = is_busy
+
+        self._heap = []        # (prazo, user_id); entradas antigas são ignoradas ao sair do heap
+        self._deadlines = {}   # user_id -> prazo vigente
+        self._wakeup = None
+
+        # Métricas
+        self.expired_flows = 0
+        self.released_users = 0
+        self.deferred = 0
+
+    def ttl_for(self, state):
+        """Prazo em segundos para o estado (None = não expira)"""
+        if state == self.idle_state:
+            return self.idle_ttl
+        return self.ttl_by_state.get(state, self.default_ttl)
+
+    def touch(self, user_id, user_data, now=None):
+        """
+        Renova o prazo do usuário de acordo com o estado atual
+
+        Args:
+            user_id (int): ID do usuário
+            user_data (dict): context.user_data do usuário
+            now (float): Instante atual (epoch); padrão: time.time()
+        """
+        now = time.time() if now is None else now
+        ttl = self.ttl_for(user_data.get('state', self.idle_state))
+        if ttl is None:
+            user_data.pop('expires_at', None)
+            self._deadlines.pop(user_id, None)
+            return
+
+        deadline = now + ttl
+        # O prazo fica no próprio estado para valer também depois de um reinício
+        user_data['expires_at'] = deadline
+        self._schedule(user_id, deadline)
+
+    def _schedule(self, user_id, deadline):
+        """Registra o próximo prazo de verificação do usuário no heap"""
+        self._deadlines[user_id] = deadline
+        heapq.heappush(self._heap, (deadline, user_id))
+        if len(self._heap) > 4 * len(self._deadlines) + 1024:
+            # Muitas entradas antigas de usuários ativos: reconstruir só com os prazos vigentes
+            self._heap = [(value, key) for key, value in self._deadlines.items()]
+            heapq.heapify(self._heap)
+
+        if self._wakeup and self._heap[0][0] == deadline:
+            self._wakeup.set()
+
+    def is_expired(self, user_data, now=None):
+        """Indica se o prazo gravado no estado já passou"""
+        deadline = user_data.get('expires_at')
+        return deadline is not None and deadline <= (time.time() if now is None else now)
+
+    def expire(self, user_data):
+        """
+        Encerra o fluxo em andamento
+
+        Args:
+            user_data (dict): context.user_data do usuário
+
+        Returns:
+            bool: True se havia um fluxo em andamento (e não só um usuário ocioso)
+        """
+        state = user_data.get('state', self.idle_state)
+        for key in FLOW_KEYS:
+            user_data.pop(key, None)
+        user_data.pop('expires_at', None)
+        user_data['state'] = self.idle_state
+
+        if state != self.idle_state:
+            self.expired_flows += 1
+            return True
+        return False
+
+    def is_idle(self, user_data):
+        """Indica se o estado não guarda nada além do estado ocioso"""
+        return all(
+            key == 'state' and value == self.idle_state or key.startswith('_')
+            for key, value in user_data.items()
+        )
+
+    def due(self, now=None):
+        """
+        Retira do heap os usuários cujo prazo venceu
+
+        Returns:
+            list: IDs dos usuários vencidos
+        """
+        now = time.time() if now is None else now
+        expired = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, user_id = heapq.heappop(self._heap)
+            # Ignorar entradas substituídas por um touch mais recente
+            if self._deadlines.get(user_id) == deadline:
+                del self._deadlines[user_id]
+                expired.append(user_id)
+        return expired
+
+    async def run(self, application):
+        """
+        Varredor em segundo plano: expira fluxos vencidos e libera usuários ociosos
+
+        Args:
+            application (Application): Aplicação do Telegram
+        """
+        self._wakeup = asyncio.Event()
+        while True:
+            delay = MAX_SWEEP_SLEEP
+            if self._heap:
+                delay = min(delay, max(0.0, self._heap[0][0] - time.time()))
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            for user_id in self.due():
+                try:
+                    await self._expire_user(application, user_id)
+                except Exception as e:
+                    logger.error(f"Erro ao expirar estado do usuário {user_id}: {e}")
+
+    async def _expire_user(self, application, user_id):
+        """Expira o estado de um usuário da aplicação"""
+        # Cuidado: indexar application.user_data criaria uma entrada vazia
+        if user_id not in application.user_data:
+            return
+        user_data = application.user_data[user_id]
+        if not self.is_expired(user_data):
+            return
+
+        # Um handler do usuário está no meio de um passo (ou na fila dele): não mexer no estado
+        # agora; se o passo não renovar o prazo, a nova tentativa expira depois
+        if self.is_busy and self.is_busy(user_id):
+            self.deferred += 1
+            self._schedule(user_id, time.time() + BUSY_RETRY)
+            return
+
+        # Daqui até a alteração do estado não há await: nenhum update do usuário começa no meio
+        had_flow = self.expire(user_data)
+        if self.is_idle(user_data):
+            # Nada a guardar: liberar a memória (e o registro persistido)
+            application.drop_user_data(user_id)
+            self.released_users += 1
+        else:
+            application.mark_data_for_update_persistence(user_ids=user_id)
+
+        if had_flow and self.notify:
+            await application.bot.send_message(
+                chat_id=user_id, text=EXPIRED_NOTICE, rate_limit_args=PRIORITY_BACKGROUND
+            )
+
+    def get_stats(self):
+        """
+        Retorna métricas da expiração
+
+        Returns:
+            dict: Prazos acompanhados, fluxos expirados, usuários liberados e adiados por update em andamento
+        """
+        return {
+            'tracked_users': len(self._deadlines),
+            'heap_size': len(self._heap),
+            'expired_flows': self.expired_flows,
+            'released_users': self.released_users,
+            'deferred': self.deferred,
+        }
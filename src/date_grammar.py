@@ -0,0 +1,567 @@
+"""
+Gramática de datas e horários em português.
+Tokeniza a mensagem uma única vez e reconhece expressões de data/hora em uma passada linear.
+"""
+
+import re
+import unicodedata
+from datetime import date, timedelta
+
+# Um único scanner para todos os tipos de token; a ordem das alternativas define a prioridade
+_TOKEN_RE = re.compile(r"""
+      (?P<date>\d{1,2}[/.-]\d{1,2}(?:[/.-]\d{2,4})?)(?![\d:]|\s*h)   # 15/04, 15/04/2025
+    | (?P<clock>\d{1,2}):(?P<cmin>\d{2})                         # 14:30
+    | (?P<decimal>\d+[.,]\d+)                                    # 1,5 (duração, nunca data/hora)
+    | (?P<hour>\d{1,2})\s?(?:h|hs|hr|hrs)(?P<hmin>\d{2})?(?![^\W\d_])   # 14h, 14h30, 14 hrs
+    | (?P<num>\d+)[ºª]?                                           # 15, 1º
+    | (?P<word>[^\W\d_]+(?:-[^\W\d_]+)*)                         # palavras, inclusive "segunda-feira"
+    | (?P<dash>[-–])
+""", re.VERBOSE)
+
+WEEKDAYS = {
+    'segunda': 0, 'segunda-feira': 0,
+    'terca': 1, 'terca-feira': 1,
+    'quarta': 2, 'quarta-feira': 2,
+    'quinta': 3, 'quinta-feira': 3,
+    'sexta': 4, 'sexta-feira': 4,
+    'sabado': 5,
+    'domingo': 6,
+    # Plurais das recorrências ("todas as terças"): a primeira ocorrência é a data inicial
+    'segundas': 0, 'tercas': 1, 'quartas': 2, 'quintas': 3, 'sextas': 4, 'sabados': 5, 'domingos': 6
+}
+
+MONTHS = {
+    'janeiro': 1, 'fevereiro': 2, 'marco': 3, 'abril': 4, 'maio': 5, 'junho': 6,
+    'julho': 7, 'agosto': 8, 'setembro': 9, 'outubro': 10, 'novembro': 11, 'dezembro': 12
+}
+
+NUMBER_WORDS = {
+    'um': 1, 'uma': 1, 'dois': 2, 'duas': 2, 'tres': 3, 'quatro': 4, 'cinco': 5,
+    'seis': 6, 'sete': 7, 'oito': 8, 'nove': 9, 'dez': 10, 'onze': 11, 'doze': 12,
+    'quinze': 15, 'vinte': 20, 'trinta': 30
+}
+
+# Palavras que, antes de um número, indicam horário ("às 14", "das 9")
+TIME_MARKERS = {'as', 'a', 'das', 'pelas', 'ate'}
+
+# Palavras que, antes de "2h" ou "2 horas", indicam duração e não horário
+DURATION_CUES = {'duracao', 'durante', 'por', 'durar', 'dura', 'de', 'mais'}
+
+# Palavras que podem abrir uma expressão de horário ou intervalo
+TIME_OPENERS = {'de', 'da', 'entre'} | TIME_MARKERS
+
+# Conectores de intervalo de horário ("de 14h às 16h", "entre 9h e 10h", "14h-16h")
+RANGE_CONNECTORS = {'as', 'a', 'ate'}
+
+PERIODS = {'manha': 0, 'madrugada': 0, 'tarde': 12, 'noite': 12}
+
+# Unidades que, depois de um número, indicam que não se trata de horário ("3 dias", "15 minutos")
+NON_TIME_UNITS = {'dia', 'dias', 'semana', 'semanas', 'mes', 'meses', 'minuto', 'minutos', 'min', 'ano', 'anos'}
+
+# Tipos de token
+WORD, NUM, DATE, CLOCK, DASH, DECIMAL = range(6)
+
+
+# Letras acentuadas do português (minúsculas): uma tabela resolve quase todas as mensagens
+_ACCENTS = str.maketrans('áàâãäéèêëíìîïóòôõöúùûüç', 'aaaaaeeeeiiiiooooouuuuc')
+
+
+def _strip_accents(text):
+    """Remove acentos para que 'às', 'amanhã' e 'março' batam com o léxico"""
+    if text.isascii():
+        return text
+    text = text.translate(_ACCENTS)
+    if text.isascii():
+        return text
+    decomposed = unicodedata.normalize('NFD', text)
+    return ''.join(c for c in decomposed if unicodedata.category(c) != 'Mn')
+
+
+def tokenize(text):
+    """
+    Divide o texto em tokens já normalizados
+
+    Args:
+        text (str): Texto da mensagem
+
+    Returns:
+        list: Lista de tuplas (tipo, valor)
+    """
+    tokens = []
+    for match in _TOKEN_RE.finditer(_strip_accents(text.lower())):
+        kind = match.lastgroup
+        if kind == 'date':
+            parts = re.split(r'[/.-]', match.group('date'))
+            tokens.append((DATE, tuple(int(p) for p in parts)))
+        elif kind == 'cmin':
+            tokens.append((CLOCK, (int(match.group('clock')), int(match.group('cmin')))))
+        elif kind in ('hour', 'hmin'):
+            minute = match.group('hmin')
+            tokens.append((CLOCK, (int(match.group('hour')), int(minute) if minute else 0)))
+        elif kind == 'decimal':
+            tokens.append((DECIMAL, float(match.group('decimal').replace(',', '.'))))
+        elif kind == 'num':
+            tokens.append((NUM, int(match.group('num'))))
+        elif kind == 'word':
+            tokens.append((WORD, match.group('word')))
+        else:
+            tokens.append((DASH, '-'))
+    return tokens
+
+
+class DateTimeMatch:
+    """Resultado da análise de data e horário"""
+
+    __slots__ = ('date', 'time', 'end_time', 'range_start', 'range_end')
+
+    def __init__(self):
+        self.date = None         # date
+        self.time = None         # (hora, minuto)
+        self.end_time = None     # (hora, minuto) do fim de um intervalo
+        self.range_start = None  # date inicial de um período ("esta semana")
+        self.range_end = None    # date final exclusiva do período
+
+
+class DateTimeParser:
+    """Reconhece datas e horários a partir da lista de tokens em uma única passada"""
+
+    def parse(self, text, reference_date):
+        """
+        Analisa o texto procurando a primeira data e o primeiro horário
+
+        Args:
+            text (str): Texto da mensagem
+            reference_date (date): Data local usada para expressões relativas
+
+        Returns:
+            DateTimeMatch: Data, horário e fim do intervalo encontrados
+        """
+        tokens = tokenize(text)
+        result = DateTimeMatch()
+        period_shift = None
+        fallback_time = []  # "15 horas" sem "às" nem período: só vale se não houver outro horário
+        i = 0
+        n = len(tokens)
+
+        while i < n:
+            consumed = 0
+
+            if result.range_start is None:
+                consumed = self._match_range(tokens, i, reference_date, result)
+
+            if not consumed and result.date is None:
+                consumed = self._match_date(tokens, i, reference_date, result)
+
+            if not consumed and result.time is None:
+                consumed = self._match_time(tokens, i, result, fallback_time)
+
+            if not consumed:
+                # Período do dia solto na frase: "à tarde", "de noite"
+                kind, value = tokens[i]
+                if (kind == WORD and value in PERIODS and i > 0
+                        and tokens[i - 1] in ((WORD, 'a'), (WORD, 'da'), (WORD, 'de'), (WORD, 'na'), (WORD, 'pela'))):
+                    period_shift = PERIODS[value]
+                consumed = 1
+
+            i += consumed
+
+        if result.time is None and fallback_time:
+            result.time = fallback_time[0]
+
+        if period_shift and result.time and 1 <= result.time[0] < 12:
+            result.time = (result.time[0] + period_shift, result.time[1])
+            if result.end_time and 1 <= result.end_time[0] < 12:
+                result.end_time = (result.end_time[0] + period_shift, result.end_time[1])
+
+        return result
+
+    # Períodos
+
+    def _match_range(self, tokens, i, today, result):
+        """Tenta reconhecer um período de vários dias; retorna tokens consumidos"""
+        kind, value = tokens[i]
+        if kind != WORD:
+            return 0
+        following = tokens[i + 1] if i + 1 < len(tokens) else None
+
+        # "esta semana", "neste mês": de hoje até o fim do período
+        if value in ('esta', 'essa', 'nesta', 'nessa', 'desta', 'dessa') and following == (WORD, 'semana'):
+            self._set_range(result, today, self._next_week(today))
+            return 2
+        if value in ('este', 'esse', 'neste', 'nesse', 'deste', 'desse') and following == (WORD, 'mes'):
+            self._set_range(result, today, self._next_month(today))
+            return 2
+
+        # "próxima semana", "semana que vem", "próximo mês", "mês que vem": período inteiro
+        if value in ('proxima', 'proximo') and following in ((WORD, 'semana'), (WORD, 'mes')):
+            self._set_calendar_period(result, today, following[1])
+            return 2
+        if value in ('semana', 'mes') and self._words(tokens, i + 1, 'que', 'vem'):
+            self._set_calendar_period(result, today, value)
+            return 3
+
+        # "próximos 3 dias", "próximas duas semanas"
+        if value in ('proximos', 'proximas', 'nos', 'nas') and i + 2 < len(tokens):
+            start = i + 1
+            if value in ('nos', 'nas'):
+                if tokens[start] not in ((WORD, 'proximos'), (WORD, 'proximas')):
+                    return 0
+                start += 1
+            amount = self._number(tokens, start)
+            if amount is None or start + 1 >= len(tokens) or tokens[start + 1][0] != WORD:
+                return 0
+            unit = tokens[start + 1][1]
+            if unit in ('dia', 'dias'):
+                self._set_range(result, today, today + timedelta(days=amount))
+            elif unit in ('semana', 'semanas'):
+                self._set_range(result, today, today + timedelta(weeks=amount))
+            elif unit in ('mes', 'meses'):
+                end = today
+                for _ in range(amount):
+                    end = self._next_month(end)
+                self._set_range(result, today, end)
+            else:
+                return 0
+            return start + 2 - i
+
+        # "fim de semana": sábado e domingo (o atual, se já for fim de semana)
+        if value == 'fim' and self._words(tokens, i + 1, 'de', 'semana'):
+            saturday = today + timedelta(days=(5 - today.weekday()) % 7)
+            if today.weekday() == 6:
+                saturday = today - timedelta(days=1)
+            self._set_range(result, max(saturday, today), saturday + timedelta(days=2))
+            return 3
+
+        return 0
+
+    @staticmethod
+    def _set_range(result, start, end):
+        """Registra um período [start, end)"""
+        result.range_start = start
+        result.range_end = end
+
+    def _set_calendar_period(self, result, today, unit):
+        """Próxima semana ou próximo mês inteiros; o primeiro dia também vale como data"""
+        if unit == 'semana':
+            start = self._next_week(today)
+            end = start + timedelta(days=7)
+        else:
+            start = self._next_month(today)
+            end = self._next_month(start)
+        self._set_range(result, start, end)
+        if result.date is None:
+            result.date = start
+
+    # Datas
+
+    def _match_date(self, tokens, i, today, result):
+        """Tenta reconhecer uma data a partir da posição i; retorna tokens consumidos"""
+        kind, value = tokens[i]
+        word = value if kind == WORD else None
+
+        if word == 'depois' and self._words(tokens, i + 1, 'de', 'amanha'):
+            result.date = today + timedelta(days=2)
+            return 3
+
+        if word == 'hoje':
+            result.date = today
+            return 1
+
+        if word == 'amanha':
+            result.date = today + timedelta(days=1)
+            return 1
+
+        if word in ('proxima', 'proximo', 'nesta', 'nessa', 'esta', 'essa'):
+            consumed = self._match_weekday(tokens, i + 1, today, result)
+            if consumed:
+                return consumed + 1
+
+        if word in WEEKDAYS:
+            return self._match_weekday(tokens, i, today, result)
+
+        # "daqui a 3 dias", "em 2 semanas"
+        if word == 'daqui' and self._words(tokens, i + 1, 'a'):
+            consumed = self._match_offset(tokens, i + 2, today, result)
+            if consumed:
+                return consumed + 2
+        if word == 'em':
+            consumed = self._match_offset(tokens, i + 1, today, result)
+            if consumed:
+                return consumed + 1
+
+        # "dia 15", "dia 15 de março", "15 de março de 2026"
+        if word == 'dia' and i + 1 < len(tokens) and tokens[i + 1][0] == NUM:
+            consumed = self._match_day_month(tokens, i + 1, today, result, require_month=False)
+            if consumed:
+                return consumed + 1
+        if kind == NUM:
+            consumed = self._match_day_month(tokens, i, today, result, require_month=True)
+            if consumed:
+                return consumed
+
+        # "15/04" ou "15/04/2026", exceto o limite de uma recorrência ("até 31/12")
+        if kind == DATE and not (i > 0 and tokens[i - 1] == (WORD, 'ate')):
+            parts = value
+            if len(parts) == 3:
+                year = parts[2] + 2000 if parts[2] < 100 else parts[2]
+                result.date = self._safe_date(year, parts[1], parts[0])
+            else:
+                result.date = self._upcoming(today, parts[1], parts[0])
+            return 1 if result.date else 0
+
+        return 0
+
+    def _match_weekday(self, tokens, i, today, result):
+        """Reconhece "segunda", "segunda-feira", "segunda feira" e "segunda que vem" """
+        if i >= len(tokens) or tokens[i][0] != WORD or tokens[i][1] not in WEEKDAYS:
+            return 0
+
+        days_ahead = (WEEKDAYS[tokens[i][1]] - today.weekday()) % 7
+        if days_ahead == 0:
+            days_ahead = 7  # Se for o mesmo dia, considerar próxima semana
+        result.date = today + timedelta(days=days_ahead)
+
+        consumed = 1
+        if self._words(tokens, i + consumed, 'feira'):
+            consumed += 1
+        if self._words(tokens, i + consumed, 'que', 'vem'):
+            consumed += 2
+        return consumed
+
+    def _match_offset(self, tokens, i, today, result):
+        """Reconhece "3 dias", "duas semanas" e "1 mês" depois de "daqui a"/"em" """
+        amount = self._number(tokens, i)
+        if amount is None or i + 1 >= len(tokens) or tokens[i + 1][0] != WORD:
+            return 0
+
+        unit = tokens[i + 1][1]
+        if unit in ('dia', 'dias'):
+            result.date = today + timedelta(days=amount)
+        elif unit in ('semana', 'semanas'):
+            result.date = today + timedelta(weeks=amount)
+        elif unit in ('mes', 'meses'):
+            month_index = today.month - 1 + amount
+            year, month = today.year + month_index // 12, month_index % 12 + 1
+            result.date = self._safe_date(year, month, min(today.day, 28))
+        else:
+            return 0
+        return 2
+
+    def _match_day_month(self, tokens, i, today, result, require_month):
+        """Reconhece "15", "15 de março" e "15 de março de 2026" a partir do número do dia"""
+        day = tokens[i][1]
+        if not 1 <= day <= 31:
+            return 0
+
+        consumed = 1
+        month = None
+        year = None
+
+        j = i + 1
+        if self._words(tokens, j, 'de'):
+            j += 1
+        if j < len(tokens) and tokens[j][0] == WORD and tokens[j][1] in MONTHS:
+            month = MONTHS[tokens[j][1]]
+            consumed = j - i + 1
+            if (self._words(tokens, j + 1, 'de') and j + 2 < len(tokens)
+                    and tokens[j + 2][0] == NUM and tokens[j + 2][1] >= 1000):
+                year = tokens[j + 2][1]
+                consumed += 2
+
+        if month is None:
+            if require_month:
+                return 0
+            # "dia 15": este mês, ou o próximo se o dia já passou
+            if day >= today.day:
+                result.date = self._safe_date(today.year, today.month, day)
+            else:
+                year, month = (today.year + 1, 1) if today.month == 12 else (today.year, today.month + 1)
+                result.date = self._safe_date(year, month, day)
+        elif year:
+            result.date = self._safe_date(year, month, day)
+        else:
+            result.date = self._upcoming(today, month, day)
+
+        return consumed if result.date else 0
+
+    # Horários
+
+    def _match_time(self, tokens, i, result, fallback_time):
+        """Tenta reconhecer um horário ou intervalo a partir da posição i"""
+        kind, value = tokens[i]
+        start = i
+        has_marker = False
+
+        if kind == WORD and value in TIME_OPENERS:
+            # "duração de 2 horas" não abre um intervalo de horário
+            if value == 'de' and i > 0 and tokens[i - 1][0] == WORD and tokens[i - 1][1] in DURATION_CUES:
+                return 0
+            has_marker = True
+            start = i + 1
+
+        first = self._time_expr(tokens, start, allow_bare=has_marker)
+        if not first:
+            return 0
+        hour, minute, pos, weak = first
+
+        # Sem marcador, "de 2h"/"por 2 horas" é duração e não horário
+        if not has_marker and i > 0:
+            previous = tokens[i - 1]
+            if previous[0] == WORD and previous[1] in DURATION_CUES:
+                return 0
+
+        # Intervalo: "de 14h às 16h", "entre 9h e 10h", "14h-16h"
+        if pos < len(tokens):
+            connector = tokens[pos]
+            is_connector = (connector[0] == DASH
+                            or (connector[0] == WORD and connector[1] in RANGE_CONNECTORS)
+                            or (connector == (WORD, 'e') and tokens[i] == (WORD, 'entre')))
+            if is_connector:
+                second = self._time_expr(tokens, pos + 1, allow_bare=True)
+                # "de 2 horas às 15h" é duração seguida de horário; "de 14 horas às 16 horas" é intervalo
+                if (second and value == 'de' and self._hours_word_at(tokens, start)
+                        and not self._hours_word_at(tokens, pos + 1)):
+                    return 0
+                if second:
+                    # "de 2 às 4 da tarde": o período do fim vale também para o início
+                    if self._period_at(tokens, second[2] - 2) and 1 <= hour < 12:
+                        shifted = hour + PERIODS[tokens[second[2] - 1][1]]
+                        if shifted <= second[0]:
+                            hour = shifted
+                    result.time = (hour, minute)
+                    result.end_time = second[:2]
+                    return second[2] - i
+
+        # "de 2 horas" sem segundo horário também é duração
+        if kind == WORD and value == 'de':
+            return 0
+
+        if weak:
+            if not fallback_time:
+                fallback_time.append((hour, minute))
+            return pos - i
+
+        result.time = (hour, minute)
+        return pos - i
+
+    def _time_expr(self, tokens, i, allow_bare):
+        """
+        Reconhece uma expressão de horário
+
+        Returns:
+            tuple: (hora, minuto, próxima posição, fraco) ou None; "fraco" indica "15 horas"
+                sem marcador, que só vale como horário se a frase não tiver outro
+        """
+        if i >= len(tokens):
+            return None
+        kind, value = tokens[i]
+        pos = i + 1
+        weak = False
+
+        if kind == CLOCK:
+            hour, minute = value
+        elif kind == WORD and value in ('meio-dia', 'meia-noite'):
+            hour, minute = (12 if value == 'meio-dia' else 0), 0
+        elif kind == WORD and value in ('meio', 'meia') and self._words(tokens, pos, 'dia' if value == 'meio' else 'noite'):
+            hour, minute = (12 if value == 'meio' else 0), 0
+            pos += 1
+        elif kind == NUM or (kind == WORD and value in NUMBER_WORDS):
+            hour = self._number(tokens, i)
+            minute = 0
+            following = tokens[pos] if pos < len(tokens) else None
+            if following and following[0] == WORD and following[1] in NON_TIME_UNITS:
+                return None
+            if following and following[0] == WORD and following[1] in ('hora', 'horas'):
+                # Sem "às" nem período do dia: "1 hora" é duração e "15 horas" perde para um "10h" explícito
+                if not allow_bare and not self._period_at(tokens, pos + 1):
+                    if following[1] == 'hora':
+                        return None
+                    weak = True
+                pos += 1
+            elif not allow_bare and not self._period_at(tokens, pos):
+                return None
+        else:
+            return None
+
+        # "e meia", "e 15", "e 15 minutos"
+        if self._words(tokens, pos, 'e') and pos + 1 < len(tokens):
+            following = tokens[pos + 1]
+            if following == (WORD, 'meia'):
+                minute = 30
+                pos += 2
+            elif following[0] == NUM and following[1] < 60:
+                minute = following[1]
+                pos += 2
+                if pos < len(tokens) and tokens[pos][0] == WORD and tokens[pos][1] in ('minuto', 'minutos', 'min'):
+                    pos += 1
+
+        # "da manhã", "da tarde", "da noite"
+        if self._period_at(tokens, pos):
+            if 1 <= hour < 12:
+                hour += PERIODS[tokens[pos + 1][1]]
+            elif hour == 12 and tokens[pos + 1][1] == 'noite':
+                hour = 0  # "12 da noite" é meia-noite
+            pos += 2
+
+        if not (0 <= hour <= 23 and 0 <= minute <= 59):
+            return None
+        return hour, minute, pos, weak
+
+    # Auxiliares
+
+    @staticmethod
+    def _words(tokens, i, *words):
+        """Verifica se as próximas palavras a partir de i são exatamente as informadas"""
+        if i + len(words) > len(tokens):
+            return False
+        return all(tokens[i + k] == (WORD, word) for k, word in enumerate(words))
+
+    def _hours_word_at(self, tokens, i):
+        """Verifica se há um número seguido de "hora(s)" a partir da posição i ("2 horas")"""
+        return (self._number(tokens, i) is not None and i + 1 < len(tokens)
+                and tokens[i + 1] in ((WORD, 'hora'), (WORD, 'horas')))
+
+    @staticmethod
+    def _period_at(tokens, i):
+        """Verifica se há "da manhã/tarde/noite" a partir da posição i"""
+        return (i + 1 < len(tokens) and tokens[i][0] == WORD and tokens[i][1] in ('da', 'de', 'a')
+                and tokens[i + 1][0] == WORD and tokens[i + 1][1] in PERIODS)
+
+    @staticmethod
+    def _number(tokens, i):
+        """Lê um número em dígitos ou por extenso"""
+        if i >= len(tokens):
+            return None
+        kind, value = tokens[i]
+        if kind == NUM:
+            return value
+        if kind == WORD:
+            return NUMBER_WORDS.get(value)
+        return None
+
+    @staticmethod
+    def _safe_date(year, month, day):
+        """Cria a data ou retorna None se for inválida"""
+        try:
+            return date(year, month, day)
+        except ValueError:
+            return None
+
+    def _upcoming(self, today, month, day):
+        """Próxima ocorrência de dia/mês a partir de hoje"""
+        year = today.year
+        if month < today.month or (month == today.month and day < today.day):
+            year += 1
+        return self._safe_date(year, month, day)
+
+    @staticmethod
+    def _next_week(today):
+        """Segunda-feira da próxima semana"""
+        return today + timedelta(days=7 - today.weekday())
+
+    @staticmethod
+    def _next_month(today):
+        """Primeiro dia do próximo mês"""
+        if today.month == 12:
+            return date(today.year + 1, 1, 1)
+        return date(today.year, today.month + 1, 1)
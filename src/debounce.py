@@ -0,0 +1,162 @@
+"""
+Agrupamento de mensagens fragmentadas.
+Quando o usuário envia "marcar reunião", "amanhã" e "às 15h" em sequência rápida,
+a primeira mensagem espera a janela de silêncio e é processada com o texto combinado;
+as demais são absorvidas sem nova análise nem nova resposta.
+"""
+
+import time
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+class MessageDebouncer:
+    """Junta as mensagens de texto de um usuário que chegam dentro de uma janela curta"""
+
+    def __init__(self, window_ms=800, max_wait_ms=None):
+        """
+        Inicializa o agrupador
+
+        Args:
+            window_ms (float): Silêncio necessário (ms) para considerar a frase completa
+            max_wait_ms (float): Espera máxima (ms) da primeira mensagem; padrão: 3 janelas
+        """
+        self.window = window_ms / 1000
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else 3 * window_ms) / 1000
+        self._fragments = {}  # user_id -> [(message_id, texto)] ainda não processados
+        self._last_arrival = {}  # user_id -> instante da última mensagem recebida
+        self._absorbed = {}  # user_id -> message_ids já incluídos em um texto combinado
+
+        # Métricas
+        self.merged_batches = 0
+        self.absorbed_messages = 0
+
+    @staticmethod
+    def _text_message(update):
+        """Retorna (user_id, message_id, texto) de uma mensagem de texto comum, ou None"""
+        message = getattr(update, 'message', None)
+        user = getattr(update, 'effective_user', None)
+        if not message or not user or not message.text or message.text.startswith('/'):
+            return None
+        return user.id, message.message_id, message.text
+
+    def note_arrival(self, update):
+        """
+        Registra a chegada de uma mensagem, antes de ela entrar na fila do usuário
+
+        Args:
+            update (Update): Update recebido
+        """
+        fragment = self._text_message(update)
+        if not fragment:
+            return
+        user_id, message_id, text = fragment
+        self._fragments.setdefault(user_id, []).append((message_id, text))
+        self._last_arrival[user_id] = time.monotonic()
+
+    def skip(self, update):
+        """
+        Retira a mensagem do agrupamento (ex.: resposta a uma pergunta do bot)
+
+        Returns:
+            bool: True se a mensagem já tinha sido absorvida e não deve ser tratada
+        """
+        fragment = self._text_message(update)
+        if not fragment:
+            return False
+        user_id, message_id, _ = fragment
+        if self._consume_absorbed(user_id, message_id):
+            self.absorbed_messages += 1
+            return True
+        fragments = self._fragments.get(user_id)
+        if fragments:
+            fragments[:] = [item for item in fragments if item[0] != message_id]
+            if not fragments:
+                self._forget(user_id)
+        return False
+
+    async def wait_quiet(self, update):
+        """
+        Espera o usuário parar de digitar (janela sem novas mensagens)
+
+        Chamado quando chega a vez da mensagem na fila do usuário, antes de ocupar
+        uma vaga de execução, para que a espera não limite os demais usuários.
+
+        Args:
+            update (Update): Update da mensagem que será tratada
+        """
+        fragment = self._text_message(update)
+        if not fragment:
+            return
+        user_id, message_id, _ = fragment
+        if user_id not in self._fragments or message_id in self._absorbed.get(user_id, ()):
+            return
+
+        deadline = time.monotonic() + self.max_wait
+        while True:
+            now = time.monotonic()
+            quiet_at = self._last_arrival.get(user_id, now) + self.window
+            if now >= quiet_at or now >= deadline:
+                return
+            await asyncio.sleep(min(quiet_at, deadline) - now)
+
+    def collect(self, update):
+        """
+        Devolve o texto combinado desta mensagem com as que chegaram depois dela
+
+        Args:
+            update (Update): Update da mensagem sendo tratada
+
+        Returns:
+            str: Texto combinado, ou None se a mensagem já foi absorvida por uma anterior
+        """
+        fragment = self._text_message(update)
+        if not fragment:
+            return None
+        user_id, message_id, text = fragment
+
+        if self._consume_absorbed(user_id, message_id):
+            self.absorbed_messages += 1
+            return None
+
+        fragments = [item for item in self._fragments.get(user_id, []) if item[0] >= message_id]
+        if len(fragments) > 1:
+            self.merged_batches += 1
+            self._absorbed.setdefault(user_id, set()).update(item[0] for item in fragments[1:])
+
+        remaining = [item for item in self._fragments.get(user_id, []) if item[0] < message_id]
+        if remaining:
+            self._fragments[user_id] = remaining
+        else:
+            self._forget(user_id)
+
+        return " ".join(item[1] for item in fragments) if fragments else text
+
+    def _consume_absorbed(self, user_id, message_id):
+        """Remove a marca de mensagem absorvida, indicando se ela existia"""
+        absorbed = self._absorbed.get(user_id)
+        if not absorbed or message_id not in absorbed:
+            return False
+        absorbed.discard(message_id)
+        if not absorbed:
+            del self._absorbed[user_id]
+        return True
+
+    def _forget(self, user_id):
+        """Descarta os fragmentos pendentes do usuário"""
+        self._fragments.pop(user_id, None)
+        self._last_arrival.pop(user_id, None)
+
+    def get_stats(self):
+        """
+        Retorna métricas do agrupamento
+
+        Returns:
+            dict: Usuários com fragmentos pendentes, textos combinados e mensagens absorvidas
+        """
+        return {
+            'pending_users': len(self._fragments),
+            'merged_batches': self.merged_batches,
+            'absorbed_messages': self.absorbed_messages,
+        }
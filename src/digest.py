@@ -0,0 +1,411 @@
+"""
+Resumo diário da agenda ("sua agenda de hoje").
+Percorre os usuários autenticados em fluxo contínuo: busca as agendas com concorrência
+e ritmo limitados, formata e envia pela fila de saída com prioridade de envio em massa.
+O progresso fica em um arquivo de checkpoint, gravado a cada usuário atendido, então um
+reinício (mesmo após o processo ser morto) retoma sem reenviar. Usuários com falha são
+tentados de novo na mesma execução, após uma espera crescente.
+"""
+
+import os
+import time
+import asyncio
+import logging
+import itertools
+from datetime import datetime, timedelta, time as dt_time
+from concurrent.futures import ThreadPoolExecutor
+from telegram.error import Forbidden, TelegramError
+
+from agenda import AgendaEntry, MAX_MESSAGE_LENGTH, WEEKDAYS, telegram_length
+from rate_limiter import PRIORITY_BROADCAST, TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Marca gravada no checkpoint quando o envio do dia termina
+CHECKPOINT_DONE = "#fim"
+
+def render_digest(events, day):
+    """
+    Formata o resumo do dia
+
+    Args:
+        events (list): Eventos do dia retornados pela API
+        day (date): Dia do resumo
+
+    Returns:
+        str: Texto do resumo, ou None se não houver eventos
+    """
+    if not events:
+        return None
+
+    header = f"☀️ Bom dia! Sua agenda de hoje, {WEEKDAYS[day.weekday()]}, {day.day:02d}/{day.month:02d}:\n\n"
+    lines = [header]
+    length = telegram_length(header)
+
+    for index, event in enumerate(events):
+        line = AgendaEntry.from_event(event).format_line(day)
+        line_length = telegram_length(line)
+        if length + line_length > MAX_MESSAGE_LENGTH - 100:
+            lines.append(f"\n… e mais {len(events) - index} eventos. Pergunte \"o que tenho hoje\" para ver todos.")
+            break
+        lines.append(line)
+        length += line_length
+
+    return "".join(lines)
+
+
+class DigestCheckpoint:
+    """Arquivo com os usuários já atendidos no resumo de um dia (uma linha por usuário)"""
+
+    def __init__(self, path, sync_interval=1.0):
+        """
+        Inicializa o checkpoint
+
+        Args:
+            path (str): Caminho do arquivo
+            sync_interval (float): Intervalo mínimo em segundos entre fsyncs. Cada usuário já é
+                entregue ao sistema operacional na hora (sobrevive a SIGKILL e OOM); o fsync
+                limita o que se perde em uma queda da máquina
+        """
+        self.path = path
+        self.sync_interval = sync_interval
+        self._file = None
+        self._synced_at = 0.0
+
+    def load(self, day):
+        """
+        Lê o progresso do dia
+
+        Args:
+            day (date): Dia do resumo
+
+        Returns:
+            tuple: (usuários já atendidos (set), envio do dia concluído (bool))
+        """
+        done, finished = set(), False
+        if not os.path.exists(self.path):
+            return done, finished
+
+        with open(self.path, 'r') as f:
+            if f.readline().strip() != day.isoformat():
+                return done, finished  # Checkpoint de outro dia
+            for line in f:
+                line = line.strip()
+                if line == CHECKPOINT_DONE:
+                    finished = True
+                elif line:
+                    done.add(line)
+        return done, finished
+
+    def exists(self, day):
+        """True se há envio iniciado (concluído ou não) para o dia"""
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, 'r') as f:
+            return f.readline().strip() == day.isoformat()
+
+    def open(self, day):
+        """Abre o checkpoint para acrescentar, começando um novo se for de outro dia"""
+        fresh = not self.exists(day)
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        # Buffer de linha: cada usuário marcado vai para o sistema operacional no write
+        self._file = open(self.path, 'w' if fresh else 'a', buffering=1)
+        if fresh:
+            self._file.write(day.isoformat() + "\n")
+            self.sync()
+
+    def mark(self, user_id):
+        """Registra o usuário como atendido (antes de o próximo usuário ser marcado)"""
+        self._file.write(f"{user_id}\n")
+        if time.monotonic() - self._synced_at >= self.sync_interval:
+            self.sync()
+
+    def sync(self):
+        """Força a gravação do arquivo no disco"""
+        if self._file:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._synced_at = time.monotonic()
+
+    def close(self, finished=False):
+        """Fecha o arquivo, marcando o dia como concluído se for o caso"""
+        if not self._file:
+            return
+        if finished:
+            self._file.write(CHECKPOINT_DONE + "\n")
+        self.sync()
+        self._file.close()
+        self._file = None
+
+
+class DigestPipeline:
+    """Envio do resumo de um dia: usuários -> busca da agenda -> formatação -> envio"""
+
+    def __init__(self, bot, calendar_manager, list_users, checkpoint, timezone,
+                 concurrency=16, send_concurrency=64, api_rate=50, on_events=None,
+                 retries=3, retry_delay=30.0):
+        """
+        Inicializa o pipeline
+
+        Args:
+            bot (Bot): Bot usado para enviar (com o limitador de envio configurado)
+            calendar_manager (CalendarManager): Fonte das agendas
+            list_users (callable): Retorna um iterador com os IDs dos usuários
+            checkpoint (DigestCheckpoint): Progresso persistido do dia
+            timezone (tzinfo): Fuso usado para delimitar o dia
+            concurrency (int): Buscas simultâneas à API do Google
+            send_concurrency (int): Envios aguardando vez na fila de saída
+            api_rate (float): Buscas por segundo à API do Google
+            on_events (callable): Chamada com (user_id, eventos) de cada agenda buscada
+            retries (int): Novas rodadas, na mesma execução, para os usuários com falha
+            retry_delay (float): Espera antes da primeira nova rodada (dobra a cada rodada)
+        """
+        self.bot = bot
+        self.calendar_manager = calendar_manager
+        self.list_users = list_users
+        self.checkpoint = checkpoint
+        self.timezone = timezone
+        self.concurrency = concurrency
+        self.send_concurrency = send_concurrency
+        self.api_bucket = TokenBucket(api_rate, 1)
+        self.on_events = on_events
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self._reset_stats()
+
+    def _reset_stats(self):
+        """Zera as métricas no início de cada execução"""
+        self.started = None
+        self.finished = None
+        self.listed = 0
+        self.skipped = 0
+        self.fetched = 0
+        self.empty = 0
+        self.sent = 0
+        self.blocked = 0
+        self.failed = 0
+        self.retried = 0
+        self._failed_users = []
+        self._fetch_time = 0.0
+
+    async def run(self, day):
+        """
+        Envia o resumo do dia a todos os usuários ainda não atendidos
+
+        Args:
+            day (date): Dia do resumo
+
+        Returns:
+            dict: Métricas da execução
+        """
+        self._reset_stats()
+        self.started = time.monotonic()
+        done, finished = self.checkpoint.load(day)
+        if finished:
+            logger.info(f"Resumo de {day} já enviado")
+            self.finished = self.started
+            return self.get_stats()
+
+        if done:
+            logger.info(f"Retomando resumo de {day}: {len(done)} usuários já atendidos")
+        self.checkpoint.open(day)
+
+        # Limites do dia no fuso do bot
+        start = self.timezone.localize(datetime.combine(day, datetime.min.time()))
+        time_min, time_max = start.isoformat(), (start + timedelta(days=1)).isoformat()
+
+        executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="digest")
+        completed = False
+        try:
+            await self._run_pass(self.list_users(), done, executor, day, time_min, time_max)
+            # Falhas (API ou Telegram instáveis) voltam para novas rodadas, com espera crescente
+            for attempt in range(self.retries):
+                if not self._failed_users:
+                    break
+                pending, self._failed_users = self._failed_users, []
+                delay = self.retry_delay * 2 ** attempt
+                logger.info(f"Resumo: {len(pending)} usuários com falha; nova tentativa em {delay:.0f}s")
+                await asyncio.sleep(delay)
+                self.retried += len(pending)
+                await self._run_pass(pending, (), executor, day, time_min, time_max)
+            self.failed = len(self._failed_users)
+            completed = True
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+            # Quem ainda falhou fica fora do checkpoint, para o próximo início do dia
+            self.checkpoint.close(finished=completed and self.failed == 0)
+            self.finished = time.monotonic()
+
+        stats = self.get_stats()
+        logger.info(f"Resumo de {day} concluído: {stats}")
+        return stats
+
+    async def _run_pass(self, source, done, executor, day, time_min, time_max):
+        """Uma rodada do pipeline sobre os usuários de source; falhas vão para _failed_users"""
+        # Filas limitadas: cada etapa só avança quando a seguinte tem espaço
+        users = asyncio.Queue(maxsize=self.concurrency * 4)
+        outbox = asyncio.Queue(maxsize=self.send_concurrency * 2)
+
+        fetchers = [asyncio.create_task(self._fetch_worker(users, outbox, executor, day, time_min, time_max))
+                    for _ in range(self.concurrency)]
+        senders = [asyncio.create_task(self._send_worker(outbox))
+                   for _ in range(self.send_concurrency)]
+        try:
+            await self._produce(users, source, done, executor)
+            for _ in fetchers:
+                await users.put(None)
+            await asyncio.gather(*fetchers)
+            for _ in senders:
+                await outbox.put(None)
+            await asyncio.gather(*senders)
+        finally:
+            for task in fetchers + senders:
+                task.cancel()
+
+    async def _produce(self, users, source, done, executor):
+        """Lê os usuários em blocos, sem carregar a lista inteira"""
+        loop = asyncio.get_running_loop()
+        source = iter(source)
+        while True:
+            chunk = await loop.run_in_executor(executor, lambda: list(itertools.islice(source, 500)))
+            if not chunk:
+                return
+            for user_id in chunk:
+                self.listed += 1
+                if user_id in done:
+                    self.skipped += 1
+                    continue
+                await users.put(user_id)
+
+    async def _fetch_worker(self, users, outbox, executor, day, time_min, time_max):
+        """Busca e formata a agenda de cada usuário"""
+        loop = asyncio.get_running_loop()
+        while True:
+            user_id = await users.get()
+            if user_id is None:
+                return
+
+            wait = self.api_bucket.reserve()
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+            started = time.perf_counter()
+            success, events = await loop.run_in_executor(
+                executor, lambda: self.calendar_manager.list_events(
+                    user_id, time_min=time_min, time_max=time_max, max_results=50
+                )
+            )
+            self._fetch_time += time.perf_counter() - started
+
+            if not success:
+                self._failed_users.append(user_id)
+                logger.warning(f"Resumo: erro ao buscar agenda de {user_id}: {events}")
+                continue
+            self.fetched += 1
+            if self.on_events:
+                self.on_events(user_id, events)
+
+            text = render_digest(events, day)
+            if text is None:
+                self.empty += 1
+                self.checkpoint.mark(user_id)
+                continue
+            await outbox.put((user_id, text))
+
+    async def _send_worker(self, outbox):
+        """Envia os resumos pela fila de saída do bot"""
+        while True:
+            item = await outbox.get()
+            if item is None:
+                return
+            user_id, text = item
+
+            try:
+                await self.bot.send_message(chat_id=int(user_id), text=text,
+                                            rate_limit_args=PRIORITY_BROADCAST)
+                self.sent += 1
+            except Forbidden:
+                self.blocked += 1  # Usuário bloqueou o bot: não tentar de novo
+            except TelegramError as e:
+                self._failed_users.append(user_id)
+                logger.warning(f"Resumo: erro ao enviar para {user_id}: {e}")
+                continue
+            self.checkpoint.mark(user_id)
+
+    def get_stats(self):
+        """
+        Retorna métricas da última execução
+
+        Returns:
+            dict: Contagens por etapa, vazão e tempo médio de busca
+        """
+        if self.started is None:
+            return {}
+        elapsed = (self.finished or time.monotonic()) - self.started
+        return {
+            'running': self.finished is None,
+            'elapsed_s': elapsed,
+            'listed': self.listed,
+            'skipped': self.skipped,
+            'fetched': self.fetched,
+            'empty': self.empty,
+            'sent': self.sent,
+            'blocked': self.blocked,
+            'failed': self.failed if self.finished else len(self._failed_users),
+            'retried': self.retried,
+            'sent_per_s': self.sent / elapsed if elapsed > 0 else 0.0,
+            'avg_fetch_ms': 1000 * self._fetch_time / self.fetched if self.fetched else 0.0,
+        }
+
+
+class DailyDigest:
+    """Agenda o pipeline do resumo para um horário fixo do dia"""
+
+    def __init__(self, pipeline, hour=8, minute=0):
+        """
+        Inicializa o agendamento
+
+        Args:
+            pipeline (DigestPipeline): Pipeline de envio
+            hour (int): Hora local do envio
+            minute (int): Minuto do envio
+        """
+        self.pipeline = pipeline
+        self.hour = hour
+        self.minute = minute
+
+    def _next_run(self, now):
+        """Próximo horário de envio a partir de now"""
+        timezone = self.pipeline.timezone
+        day = now.date()
+        while True:
+            run_at = timezone.localize(datetime.combine(day, dt_time(self.hour, self.minute)))
+            if run_at > now:
+                return run_at
+            day += timedelta(days=1)
+
+    async def run(self):
+        """Laço do agendamento; retoma um envio interrompido antes de esperar o próximo"""
+        timezone = self.pipeline.timezone
+        today = datetime.now(timezone).date()
+        if self.pipeline.checkpoint.exists(today):
+            await self._run_safely(today)
+
+        while True:
+            now = datetime.now(timezone)
+            run_at = self._next_run(now)
+            await asyncio.sleep((run_at - now).total_seconds())
+            await self._run_safely(run_at.date())
+
+    async def _run_safely(self, day):
+        """Executa o pipeline sem derrubar o agendamento em caso de erro"""
+        try:
+            await self.pipeline.run(day)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Erro no resumo diário de {day}: {e}")
+
+    def get_stats(self):
+        """Métricas da última execução do pipeline"""
+        return self.pipeline.get_stats()
@@ -0,0 +1,200 @@
+"""
+Transporte HTTP compartilhado pelos clientes do Google.
+Uma única sessão do requests, com pool de conexões keep-alive e timeouts, atende a
+renovação de tokens e as chamadas à API de todos os usuários, reaproveitando conexões
+TLS em vez de abrir uma por serviço.
+"""
+
+import logging
+import threading
+from http.cookiejar import DefaultCookiePolicy
+
+logger = logging.getLogger(__name__)
+
+# Status que levam a renovar o token e repetir a chamada uma vez
+_REFRESH_STATUS = (401,)
+
+
+class PooledTransport:
+    """Sessão HTTP com pool de conexões, segura para uso por várias threads"""
+
+    def __init__(self, pool_size=32, connect_timeout=5.0, read_timeout=20.0):
+        """
+        Inicializa o transporte
+
+        Args:
+            pool_size (int): Conexões mantidas abertas por host (chamadas além disso esperam uma livre)
+            connect_timeout (float): Tempo máximo (s) para abrir uma conexão
+            read_timeout (float): Tempo máximo (s) esperando a resposta
+        """
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+
+        # Sessão criada no primeiro uso: importar requests/urllib3 atrasaria a partida do bot
+        self._session = None
+        self._adapter = None
+        self._auth_request = None
+
+        # Métricas
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+
+    @property
+    def session(self):
+        """requests.Session: Sessão compartilhada (criada na primeira chamada)"""
+        if self._session is None:
+            self._open()
+        return self._session
+
+    @property
+    def auth_request(self):
+        """Request: Transporte do google.auth para renovar tokens pela mesma sessão"""
+        if self._session is None:
+            self._open()
+        return self._auth_request
+
+    def _open(self):
+        """Cria a sessão e o pool de conexões"""
+        import requests
+        from requests.adapters import HTTPAdapter
+        from google.auth.transport.requests import Request
+
+        with self._lock:
+            if self._session is not None:
+                return
+            session = requests.Session()
+            # Nenhuma API do Google precisa de cookies; sem eles a sessão não guarda estado entre usuários
+            session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+            self._adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_size, pool_block=True, max_retries=0)
+            session.mount('https://', self._adapter)
+            session.mount('http://', self._adapter)
+
+            # Renovação de tokens pela mesma sessão (google.auth chama com timeout próprio)
+            self._auth_request = Request(session=session)
+            self._session = session
+
+    def request(self, method, url, body=None, headers=None, timeout=None):
+        """
+        Executa uma requisição pelo pool
+
+        Returns:
+            requests.Response: Resposta recebida
+        """
+        import requests  # Já carregado pela sessão
+
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        session = self.session
+        with self._lock:
+            self.requests += 1
+        try:
+            return session.request(method, url, data=body, headers=headers,
+                                        timeout=timeout or self.timeout, allow_redirects=True)
+        except requests.RequestException:
+            with self._lock:
+                self.errors += 1
+            raise
+
+    def http_for(self, credentials, on_refresh=None):
+        """
+        Cliente compatível com httplib2 para googleapiclient.discovery.build(http=...)
+
+        Args:
+            credentials (Credentials): Credenciais do usuário, renovadas quando necessário
+            on_refresh (callable): Chamada sem argumentos depois de renovar o token (para salvá-lo)
+
+        Returns:
+            AuthorizedPooledHttp: Cliente que autentica as chamadas e usa o pool
+        """
+        return AuthorizedPooledHttp(self, credentials, on_refresh)
+
+    def _pools(self):
+        """Pools de conexão por host abertos pela sessão"""
+        if self._adapter is None:
+            return []
+        pools = self._adapter.poolmanager.pools
+        result = []
+        for key in pools.keys():
+            try:
+                result.append(pools[key])
+            except KeyError:
+                pass  # Descartado por outra thread
+        return result
+
+    def get_stats(self):
+        """
+        Retorna métricas do pool
+
+        Returns:
+            dict: Requisições, conexões abertas, taxa de reaproveitamento e erros
+        """
+        pools = self._pools()
+        connections = sum(pool.num_connections for pool in pools)
+        requests_sent = sum(pool.num_requests for pool in pools)
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'hosts': len(pools),
+            'connections_opened': connections,
+            'connection_reuse': 1 - connections / requests_sent if requests_sent else 0.0,
+            'pool_size': self.pool_size,
+        }
+
+
+class AuthorizedPooledHttp:
+    """Imita httplib2.Http para o googleapiclient, com credenciais e sessão compartilhada"""
+
+    def __init__(self, transport, credentials, on_refresh=None):
+        self.transport = transport
+        self.credentials = credentials
+        self.on_refresh = on_refresh
+
+    def request(self, uri, method='GET', body=None, headers=None, redirections=5, connection_type=None):
+        """
+        Executa a chamada no formato do httplib2
+
+        Returns:
+            tuple: (httplib2.Response, conteúdo em bytes)
+        """
+        request_headers = dict(headers or {})
+        # Renova o token se estiver vencido e adiciona o cabeçalho Authorization
+        token = self.credentials.token
+        self.credentials.before_request(self.transport.auth_request, method, uri, request_headers)
+        if self.credentials.token != token:
+            self._refreshed()
+        response = self.transport.request(method, uri, body=body, headers=request_headers)
+
+        if response.status_code in _REFRESH_STATUS and self.credentials.refresh_token:
+            # Token revogado ou expirado antes do previsto: renovar e repetir uma vez
+            self.credentials.refresh(self.transport.auth_request)
+            self._refreshed()
+            request_headers = dict(headers or {})
+            self.credentials.apply(request_headers)
+            response = self.transport.request(method, uri, body=body, headers=request_headers)
+
+        return self._to_httplib2(response), response.content
+
+    def _refreshed(self):
+        if self.on_refresh:
+            try:
+                self.on_refresh()
+            except Exception as e:
+                logger.error(f"Erro ao salvar token renovado: {e}")
+
+    @staticmethod
+    def _to_httplib2(response):
+        """Converte a resposta do requests para o formato esperado pelo googleapiclient"""
+        import httplib2
+
+        info = {key.lower(): value for key, value in response.headers.items()}
+        # O requests já descompactou o corpo, como o httplib2 faria
+        info.pop('content-encoding', None)
+        info.pop('content-length', None)
+        info['status'] = str(response.status_code)
+        result = httplib2.Response(info)
+        result.reason = response.reason
+        return result
+
+    def close(self):
+        """O pool é compartilhado; nada a fechar por cliente"""
@@ -0,0 +1,217 @@
+"""
+Modelo opcional de intenções baseado em transformers.
+Carrega o modelo em segundo plano e agrupa mensagens concorrentes em micro-lotes.
+"""
+
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+# Intenções reconhecidas pelo bot, na ordem usada quando o modelo não traz rótulos próprios
+INTENT_LABELS = [
+    "LIST_EVENTS", "CREATE_EVENT", "UPDATE_EVENT",
+    "UPDATE_DURATION", "DELETE_EVENT", "UNKNOWN"
+]
+
+class TransformerIntentModel:
+    """Classificador de intenções com carregamento preguiçoso e micro-lotes dinâmicos"""
+
+    def __init__(self, model_dir, max_batch_size=8, max_wait_ms=10, min_confidence=0.5):
+        """
+        Inicializa o modelo e dispara o carregamento em uma thread separada
+
+        Args:
+            model_dir (str): Diretório local com o modelo e o tokenizer
+            max_batch_size (int): Número máximo de mensagens por lote
+            max_wait_ms (float): Tempo máximo que a primeira mensagem espera pelo lote
+            min_confidence (float): Probabilidade mínima para aceitar a predição
+        """
+        self.model_dir = model_dir
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000
+        self.min_confidence = min_confidence
+
+        self._torch = None
+        self._tokenizer = None
+        self._model = None
+        self._labels = INTENT_LABELS
+        self._load_error = None
+        self._ready = threading.Event()
+        self._queue = queue.Queue()
+
+        # Métricas de lote e latência
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._queue_wait_total = 0.0
+        self._inference_total = 0.0
+
+        # Importar torch/transformers pode levar segundos; não bloquear a inicialização
+        self._loader = threading.Thread(target=self._load, name="intent-model-loader", daemon=True)
+        self._loader.start()
+
+    @property
+    def is_ready(self):
+        """bool: True quando o modelo terminou de carregar"""
+        return self._ready.is_set()
+
+    def wait_ready(self, timeout=None):
+        """
+        Aguarda o fim do carregamento
+
+        Args:
+            timeout (float): Tempo máximo de espera em segundos (None espera indefinidamente)
+
+        Returns:
+            bool: True se o modelo carregou; False em caso de erro ou prazo esgotado
+        """
+        self._loader.join(timeout)
+        return self.is_ready
+
+    def _load(self):
+        """Carrega tokenizer e modelo sem acesso à rede e inicia o worker de inferência"""
+        started = time.perf_counter()
+        try:
+            import torch
+            from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+            self._tokenizer = AutoTokenizer.from_pretrained(self.model_dir, local_files_only=True)
+            self._model = AutoModelForSequenceClassification.from_pretrained(
+                self.model_dir, local_files_only=True)
+            self._model.eval()
+            self._torch = torch
+
+            # Usar os rótulos do modelo quando forem intenções conhecidas
+            id2label = getattr(self._model.config, 'id2label', None) or {}
+            labels = [id2label.get(i) for i in range(len(id2label))]
+            if labels and all(label in INTENT_LABELS for label in labels):
+                self._labels = labels
+
+            worker = threading.Thread(target=self._run, name="intent-model-worker", daemon=True)
+            worker.start()
+            self._ready.set()
+            logger.info(f"Modelo de intenções carregado em {time.perf_counter() - started:.2f}s")
+        except Exception as e:
+            self._load_error = e
+            logger.error(f"Erro ao carregar modelo de intenções de {self.model_dir}: {e}")
+
+    def submit(self, text):
+        """
+        Enfileira uma mensagem para classificação
+
+        Args:
+            text (str): Texto da mensagem
+
+        Returns:
+            Future: Resolve para (intenção, confiança) ou None se o modelo não estiver pronto
+        """
+        future = Future()
+        if not self.is_ready:
+            future.set_result(None)
+            return future
+
+        self._queue.put((text, future, time.perf_counter()))
+        return future
+
+    def predict(self, text, timeout=1.0):
+        """
+        Classifica uma mensagem aguardando o resultado do lote
+
+        Args:
+            text (str): Texto da mensagem
+            timeout (float): Tempo máximo de espera em segundos
+
+        Returns:
+            str: Intenção prevista ou None se indisponível ou pouco confiável
+        """
+        try:
+            result = self.submit(text).result(timeout=timeout)
+        except Exception as e:
+            logger.warning(f"Predição do modelo de intenções falhou: {e}")
+            return None
+
+        if not result:
+            return None
+
+        intent, confidence = result
+        if confidence < self.min_confidence:
+            return None
+        return intent
+
+    def _collect_batch(self):
+        """Agrupa mensagens até encher o lote ou estourar o prazo da primeira"""
+        first = self._queue.get()
+        batch = [first]
+        deadline = first[2] + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    # Prazo vencido (fila acumulada): levar o que já espera, sem aguardar mais
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _run(self):
+        """Loop do worker dedicado que executa a inferência em lotes"""
+        while True:
+            batch = self._collect_batch()
+            texts = [item[0] for item in batch]
+            started = time.perf_counter()
+
+            try:
+                encoded = self._tokenizer(texts, padding=True, truncation=True, return_tensors='pt')
+                with self._torch.no_grad():
+                    logits = self._model(**encoded).logits
+                probs = self._torch.softmax(logits, dim=-1)
+                confidences, indices = probs.max(dim=-1)
+                results = [
+                    (self._labels[index] if index < len(self._labels) else "UNKNOWN", float(conf))
+                    for conf, index in zip(confidences.tolist(), indices.tolist())
+                ]
+            except Exception as e:
+                logger.error(f"Erro na inferência do modelo de intenções: {e}")
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+
+            finished = time.perf_counter()
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+
+            with self._stats_lock:
+                self._batches += 1
+                self._items += len(batch)
+                self._inference_total += finished - started
+                self._queue_wait_total += sum(started - item[2] for item in batch)
+
+    def get_stats(self):
+        """
+        Retorna métricas de lote e latência do modelo
+
+        Returns:
+            dict: Tamanho médio de lote, espera média na fila e tempo médio de inferência (ms)
+        """
+        with self._stats_lock:
+            batches = self._batches
+            items = self._items
+            return {
+                'ready': self.is_ready,
+                'load_error': str(self._load_error) if self._load_error else None,
+                'batches': batches,
+                'items': items,
+                'avg_batch_size': items / batches if batches else 0.0,
+                'avg_queue_wait_ms': 1000 * self._queue_wait_total / items if items else 0.0,
+                'avg_inference_ms': 1000 * self._inference_total / batches if batches else 0.0,
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000,
+            }
@@ -0,0 +1,135 @@
+"""
+Estruturas compactas para o estado de conversa e o resultado do processamento de linguagem.
+Usam __slots__ para não carregar um dicionário por instância.
+"""
+
+class PendingEvent:
+    """
+    Evento em construção durante a conversa
+
+    Mantém a interface de dicionário usada pelo bot (event['date'], 'time' in event,
+    event.get(...)); um campo conta como presente quando não é None.
+    """
+
+    # A ordem define a serialização: novos campos devem entrar sempre no fim
+    __slots__ = (
+        'date', 'time', 'duration', 'summary', 'location', 'is_meeting', 'attendees',
+        'add_meet_link', 'recurrence', 'end_date', 'end_time', 'date_range',
+        'event_id', 'event_reference'
+    )
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, None)
+        for name, value in fields.items():
+            self[name] = value
+
+    # Interface de dicionário
+
+    def __contains__(self, name):
+        return name in self.__slots__ and getattr(self, name) is not None
+
+    def __getitem__(self, name):
+        if name not in self:
+            raise KeyError(name)
+        return getattr(self, name)
+
+    def __setitem__(self, name, value):
+        if name not in self.__slots__:
+            raise KeyError(name)
+        setattr(self, name, value)
+
+    def __delitem__(self, name):
+        self[name] = None
+
+    def get(self, name, default=None):
+        """Valor do campo ou default quando não definido"""
+        value = getattr(self, name, None) if name in self.__slots__ else None
+        return default if value is None else value
+
+    def items(self):
+        """Pares (campo, valor) dos campos definidos"""
+        return [(name, getattr(self, name)) for name in self.__slots__ if getattr(self, name) is not None]
+
+    def __iter__(self):
+        return (name for name, _ in self.items())
+
+    def __eq__(self, other):
+        if not isinstance(other, PendingEvent):
+            return NotImplemented
+        return self.to_state() == other.to_state()
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={value!r}" for name, value in self.items())
+        return f"PendingEvent({fields})"
+
+    def copy(self):
+        """Cópia independente (a lista de participantes não é compartilhada)"""
+        clone = PendingEvent()
+        for name in self.__slots__:
+            setattr(clone, name, getattr(self, name))
+        if self.attendees is not None:
+            clone.attendees = list(self.attendees)
+        return clone
+
+    # Serialização compacta
+
+    def to_state(self):
+        """
+        Serializa como lista posicional, sem os campos vazios do fim
+
+        Returns:
+            list: Valores na ordem de __slots__
+        """
+        values = [getattr(self, name) for name in self.__slots__]
+        while values and values[-1] is None:
+            values.pop()
+        if self.date_range is not None:
+            values[self.__slots__.index('date_range')] = list(self.date_range)
+        return values
+
+    @classmethod
+    def from_state(cls, values):
+        """
+        Reconstrói a partir de to_state()
+
+        Args:
+            values (list): Valores na ordem de __slots__
+
+        Returns:
+            PendingEvent: Evento reconstruído
+        """
+        event = cls()
+        for name, value in zip(cls.__slots__, values):
+            setattr(event, name, value)
+        if event.date_range is not None:
+            event.date_range = tuple(event.date_range)
+        return event
+
+
+class ParseResult:
+    """Intenção e entidades de uma mensagem; pode ser desempacotado como (intent, entities)"""
+
+    __slots__ = ('intent', 'entities')
+
+    def __init__(self, intent, entities):
+        self.intent = intent
+        self.entities = entities
+
+    def __iter__(self):
+        yield self.intent
+        yield self.entities
+
+    def __eq__(self, other):
+        if not isinstance(other, ParseResult):
+            return NotImplemented
+        return self.intent == other.intent and self.entities == other.entities
+
+    def __repr__(self):
+        return f"ParseResult({self.intent!r}, {self.entities!r})"
+
+
+# Tipos que a persistência sabe serializar (nome -> classe com to_state/from_state)
+STATE_TYPES = {
+    'PendingEvent': PendingEvent,
+}
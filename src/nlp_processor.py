@@ -5,27 +5,55 @@ Utiliza regras e expressões regulares para interpretar comandos do usuário.
 
 import re
 import logging
-from datetime import datetime, timedelta
-import dateutil.parser
-from dateutil.relativedelta import relativedelta
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
 import pytz
 
-# Configuração de logging
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
+from date_grammar import DateTimeParser
+from intent_model import TransformerIntentModel
+from models import PendingEvent, ParseResult
+
 logger = logging.getLogger(__name__)
 
+# Palavras cujo sentido muda com o dia: resultados que as contêm valem só para a data de referência
+_RELATIVE_WORDS_RE = re.compile(
+    r'\b(?:hoje|amanh[ãa]|ontem|semanas?|m[êe]s|meses|dias?|segundas?|ter[çc]as?|quartas?|quintas?|sextas?|'
+    r's[áa]bados?|domingos?|pr[óo]xim[oa]s?|daqui)\b', re.IGNORECASE)
+
 class NLPProcessor:
     """Processa mensagens em linguagem natural para extrair intenções e entidades"""
     
-    def __init__(self):
+    def __init__(self, model_dir=None, batch_size=8, max_wait_ms=10, cache_size=1024):
         """
         Inicializa o processador NLP
+        
+        Args:
+            model_dir (str): Diretório local de um modelo transformer de intenções (opcional)
+            batch_size (int): Tamanho máximo dos micro-lotes do modelo
+            max_wait_ms (float): Espera máxima para formar um micro-lote
+            cache_size (int): Número máximo de resultados memorizados (0 desativa o cache)
         """
         # Timezone padrão para o Brasil
         self.timezone = pytz.timezone('America/Sao_Paulo')
+        self.date_parser = DateTimeParser()
+        
+        # Cache LRU de resultados: (texto com espaços normalizados, fuso) -> (data de referência, intenção, entidades)
+        self.cache_size = cache_size
+        self._parse_cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._cache_day = None
+        self._cache_hits = 0
+        self._cache_misses = 0
+        
+        # Modelo transformer opcional; as regras continuam sendo o caminho rápido
+        self.intent_model = None
+        self._model_options = None
+        if model_dir:
+            self._model_options = {'model_dir': model_dir, 'batch_size': batch_size, 'max_wait_ms': max_wait_ms}
+            self.intent_model = TransformerIntentModel(
+                model_dir, max_batch_size=batch_size, max_wait_ms=max_wait_ms)
         
     def identify_intent(self, text):
         """
@@ -118,7 +146,11 @@ class NLPProcessor:
             "o que tenho amanhã", "o que eu tenho amanhã", "o que tem amanhã", 
             "tenho algo amanhã", "reuniões de amanhã", "compromissos de amanhã",
             "o que tenho essa semana", "o que está marcado", "quais são os próximos",
-            "próximos eventos", "próximas reuniões", "próximos compromissos"
+            "próximos eventos", "próximas reuniões", "próximos compromissos",
+            "o que tenho", "o que eu tenho", "o que tem",
+            "esta semana", "nesta semana", "desta semana", "essa semana", "dessa semana",
+            "este mês", "neste mês", "deste mês", "esse mês", "desse mês",
+            "próximos dias", "próximas semanas", "próximas duas semanas", "próximos meses"
         ]
 
         for expr in list_expressions:
@@ -156,87 +188,69 @@ class NLPProcessor:
         # Não foi possível identificar a intenção
         return "UNKNOWN"
     
-    def extract_date(self, text):
+    def _reference_date(self, now=None):
+        """
+        Retorna a data de referência no fuso do processador
+        
+        Args:
+            now (datetime): Instante de referência fixo ou None para agora
+            
+        Returns:
+            date: Data local de referência
+        """
+        if now is None:
+            return datetime.now(self.timezone).date()
+        if now.tzinfo is not None:
+            return now.astimezone(self.timezone).date()
+        return now.date()
+    
+    def parse_datetime(self, text, now=None):
+        """
+        Analisa data, horário e intervalo de horário com a gramática de datas
+        
+        Args:
+            text (str): Texto da mensagem
+            now (datetime): Instante de referência fixo ou None para agora
+            
+        Returns:
+            DateTimeMatch: Resultado com date, time e end_time
+        """
+        return self.date_parser.parse(text, self._reference_date(now))
+    
+    def extract_date(self, text, now=None):
         """
         Extrai a data da mensagem
         
         Args:
             text (str): Texto da mensagem
+            now (datetime): Instante de referência fixo ou None para agora
             
         Returns:
             str: Data em formato ISO (YYYY-MM-DD) ou None
         """
-        # Base de tempo atual
-        current_date = datetime.now(self.timezone).date()
-        text_lower = text.lower()
-        
-        # Palavras-chave para datas relativas
-        if 'hoje' in text_lower:
-            return current_date.isoformat()
-        
-        if 'amanhã' in text_lower or 'amanha' in text_lower:
-            return (current_date + timedelta(days=1)).isoformat()
-        
-        if 'depois de amanhã' in text_lower or 'depois de amanha' in text_lower:
-            return (current_date + timedelta(days=2)).isoformat()
-        
-        # Dias da semana
-        days_map = {
-            'segunda': 0, 'segunda-feira': 0, 'segunda feira': 0,
-            'terça': 1, 'terça-feira': 1, 'terça feira': 1, 'terca': 1, 'terca-feira': 1, 'terca feira': 1,
-            'quarta': 2, 'quarta-feira': 2, 'quarta feira': 2,
-            'quinta': 3, 'quinta-feira': 3, 'quinta feira': 3,
-            'sexta': 4, 'sexta-feira': 4, 'sexta feira': 4,
-            'sábado': 5, 'sabado': 5,
-            'domingo': 6
-        }
-        
-        for day_name, day_num in days_map.items():
-            if day_name in text_lower:
-                # Calcular próximo dia da semana
-                days_ahead = (day_num - current_date.weekday()) % 7
-                if days_ahead == 0:
-                    days_ahead = 7  # Se for o mesmo dia, considerar próxima semana
-                next_date = current_date + timedelta(days=days_ahead)
-                return next_date.isoformat()
-        
-        # Procurar datas no formato DD/MM ou DD/MM/YY
-        date_patterns = [
-            r'\b(\d{1,2})[/.-](\d{1,2})(?:[/.-](\d{2,4}))?\b',  # DD/MM/YYYY ou DD/MM
-            r'\bdia (\d{1,2})(?:[ ](?:de|do|da)[ ]([a-zA-Zç]+))?\b'  # "dia 15" ou "dia 15 de março"
-        ]
-        
-        for pattern in date_patterns:
-            matches = re.findall(pattern, text_lower)
-            if matches:
-                match = matches[0]
-                
-                # Formato DD/MM ou DD/MM/YYYY
-                if len(match) >= 2 and match[0].isdigit() and match[1].isdigit():
-                    day = int(match[0])
-                    month = int(match[1])
-                    
-                    # Se tiver o ano
-                    if len(match) > 2 and match[2] and match[2].isdigit():
-                        year = int(match[2])
-                        # Ajustar anos de 2 dígitos
-                        if year < 100:
-                            year += 2000
-                    else:
-                        year = current_date.year
-                        
-                        # Se o mês for anterior ao atual, considerar próximo ano
-                        if month < current_date.month or (month == current_date.month and day < current_date.day):
-                            year += 1
-                    
-                    try:
-                        date_obj = datetime(year, month, day).date()
-                        return date_obj.isoformat()
-                    except ValueError:
-                        logger.warning(f"Data inválida: {day}/{month}/{year}")
+        match = self.parse_datetime(text, now)
+        return match.date.isoformat() if match.date else None
+    
+    def extract_date_range(self, text, now=None):
+        """
+        Extrai um período de datas ("esta semana", "próximas duas semanas", "este mês")
         
-        # Se não encontrar uma data específica, retornar None
-        return None
+        Args:
+            text (str): Texto da mensagem
+            now (datetime): Instante de referência fixo ou None para agora
+            
+        Returns:
+            tuple: (início, fim exclusivo) em formato ISO ou None
+        """
+        match = self.parse_datetime(text, now)
+        return self._format_range(match)
+    
+    @staticmethod
+    def _format_range(match):
+        """Formata o período de um DateTimeMatch como (início, fim) ISO"""
+        if not match.range_start:
+            return None
+        return match.range_start.isoformat(), match.range_end.isoformat()
     
     def extract_time(self, text):
         """
@@ -248,48 +262,15 @@ class NLPProcessor:
         Returns:
             str: Hora em formato "HH:MM" ou None
         """
-        text_lower = text.lower()
-        
-        # Procurar horários no formato HH:MM, HHh, HH horas
-        time_patterns = [
-            r'\b(\d{1,2}):(\d{2})\b',  # HH:MM
-            r'\b(\d{1,2})h(?:(\d{2}))?\b',  # HHh ou HHhMM
-            r'\b(\d{1,2}) ?horas?(?: e (\d{1,2}) ?minutos?)?\b',  # HH horas ou HH horas e MM minutos
-            r'\b(\d{1,2}) ?(?:h|hrs)\b',  # HH h ou HH hrs
-            r'\b(?:às|as|ao meio[- ]dia)(?: e (\d{1,2}))?\b',  # meio-dia ou meio-dia e MM
-            r'\bmeio[- ]dia\b'  # meio-dia
-        ]
-        
-        for pattern in time_patterns:
-            matches = re.findall(pattern, text_lower)
-            if matches:
-                match = matches[0]
-                
-                # Meio-dia
-                if pattern == r'\bmeio[- ]dia\b':
-                    return "12:00"
-                
-                # "às meio-dia e 30"
-                if pattern == r'\b(?:às|as|ao meio[- ]dia)(?: e (\d{1,2}))?\b':
-                    if match:
-                        minutes = int(match)
-                        return f"12:{minutes:02d}"
-                    else:
-                        return "12:00"
-                
-                # Outros formatos
-                hour = int(match[0]) if match[0] else 0
-                minute = int(match[1]) if len(match) > 1 and match[1] else 0
-                
-                # Ajustar para formato 24h se necessário
-                if 'tarde' in text_lower or 'noite' in text_lower:
-                    if hour < 12:
-                        hour += 12
-                
-                return f"{hour:02d}:{minute:02d}"
-        
-        # Se não encontrar um horário específico, retornar None
-        return None
+        match = self.parse_datetime(text)
+        return self._format_time(match.time)
+    
+    @staticmethod
+    def _format_time(time_tuple):
+        """Formata (hora, minuto) como "HH:MM" """
+        if not time_tuple:
+            return None
+        return f"{time_tuple[0]:02d}:{time_tuple[1]:02d}"
     
     def extract_duration(self, text):
         """
@@ -474,42 +455,177 @@ class NLPProcessor:
         
         return None
     
-    def extract_entities(self, text):
+    def process_message(self, text, now=None):
         """
-        Extrai todas as entidades relevantes da mensagem
+        Processa uma mensagem completa e retorna a intenção e entidades
         
         Args:
             text (str): Texto da mensagem
+            now (datetime): Instante de referência fixo ou None para agora
             
         Returns:
-            dict: Dicionário com todas as entidades extraídas
-        """
-        entities = {
-            'date': self.extract_date(text),
-            'time': self.extract_time(text),
-            'duration': self.extract_duration(text),
-            'summary': self.extract_summary(text),
-            'location': self.extract_location(text),
-            'is_meeting': self.is_meeting_request(text),
-            'attendees': self.extract_attendees(text)
-        }
+            ParseResult: Intenção e entidades (desempacotável como (intenção, entidades))
+        """
+        reference_date = self._reference_date(now)
+        # Sem mudar maiúsculas: os e-mails dos participantes saem com a grafia original
+        key = (" ".join(text.split()), self.timezone.zone)
         
-        return entities
+        cached = self._cache_get(key, reference_date)
+        if cached:
+            return cached
+        
+        intent = self.identify_intent(text)
+        
+        # Consultar o modelo apenas quando as regras não reconhecem a intenção
+        model_pending = False
+        if intent == "UNKNOWN" and self.intent_model:
+            if self.intent_model.is_ready:
+                intent = self.intent_model.predict(text) or intent
+            else:
+                model_pending = True
+        
+        entities = self.extract_entities(text, now)
+        
+        # Não memorizar respostas que o modelo ainda poderia mudar depois de carregado
+        if not model_pending:
+            self._cache_put(key, reference_date, intent, entities)
+        
+        return ParseResult(intent, entities)
     
-    def process_message(self, text):
+    def _cache_get(self, key, reference_date):
         """
-        Processa uma mensagem completa e retorna a intenção e entidades
+        Busca um resultado memorizado ainda válido para a data de referência
         
         Args:
-            text (str): Texto da mensagem
+            key (tuple): (texto normalizado, fuso)
+            reference_date (date): Data local de referência
             
         Returns:
-            tuple: (intenção, entidades)
+            ParseResult: Cópia do resultado ou None
         """
-        intent = self.identify_intent(text)
-        entities = self.extract_entities(text)
+        if not self.cache_size:
+            return None
+        
+        with self._cache_lock:
+            self._purge_relative_entries()
+            
+            entry = self._parse_cache.get(key)
+            # Resultados com datas relativas só valem para o dia em que foram calculados
+            if entry is None or (entry[0] is not None and entry[0] != reference_date):
+                self._cache_misses += 1
+                return None
+            
+            self._parse_cache.move_to_end(key)
+            self._cache_hits += 1
+            intent, entities = entry[1], entry[2]
         
-        return intent, entities
+        # Devolver cópias: o bot altera as entidades durante a conversa
+        return ParseResult(intent, entities.copy())
+    
+    def _cache_put(self, key, reference_date, intent, entities):
+        """
+        Memoriza um resultado, descartando o menos usado quando o cache está cheio
+        
+        Args:
+            key (tuple): (texto normalizado, fuso)
+            reference_date (date): Data local de referência
+            intent (str): Intenção identificada
+            entities (PendingEvent): Entidades extraídas
+        """
+        if not self.cache_size:
+            return
+        
+        # Resultados sem data nem palavra relativa não dependem do dia e sobrevivem à meia-noite;
+        # os demais ficam presos à data de referência, que faz parte da chave na consulta
+        depends_on_date = bool(entities.get('date') or entities.get('end_date') or entities.get('date_range')
+                               or _RELATIVE_WORDS_RE.search(key[0]))
+        entry = (reference_date if depends_on_date else None, intent, entities.copy())
+        
+        with self._cache_lock:
+            self._parse_cache[key] = entry
+            self._parse_cache.move_to_end(key)
+            while len(self._parse_cache) > self.cache_size:
+                self._parse_cache.popitem(last=False)
+    
+    def _purge_relative_entries(self):
+        """Remove, na virada do dia local, as entradas calculadas com datas relativas"""
+        today = datetime.now(self.timezone).date()
+        if self._cache_day == today:
+            return
+        
+        if self._cache_day is not None:
+            stale = [key for key, entry in self._parse_cache.items()
+                     if entry[0] is not None and entry[0] < today]
+            for key in stale:
+                del self._parse_cache[key]
+        self._cache_day = today
+    
+    def cache_info(self):
+        """
+        Retorna estatísticas do cache de resultados
+        
+        Returns:
+            dict: Acertos, falhas, tamanho atual e tamanho máximo
+        """
+        with self._cache_lock:
+            return {
+                'hits': self._cache_hits,
+                'misses': self._cache_misses,
+                'size': len(self._parse_cache),
+                'maxsize': self.cache_size
+            }
+    
+    def process_messages(self, texts, now=None, workers=None, chunksize=64):
+        """
+        Processa várias mensagens, devolvendo os resultados em ordem à medida que ficam prontos
+        
+        Args:
+            texts (iterable): Mensagens a processar (consumidas de forma preguiçosa)
+            now (datetime): Instante de referência fixo; se None, é fixado no início da chamada
+            workers (int): Número de processos; None ou 1 processa no próprio processo
+            chunksize (int): Quantidade de mensagens enviadas a cada processo por vez
+            
+        Yields:
+            ParseResult: Resultado de cada mensagem, na ordem de entrada
+        """
+        # Fixar o "agora" para que todas as mensagens usem a mesma referência
+        if now is None:
+            now = datetime.now(self.timezone)
+        
+        # Esperar o modelo: com ele ainda carregando, as primeiras mensagens sairiam só pelas regras
+        if self.intent_model:
+            self.intent_model.wait_ready()
+        
+        if not workers or workers <= 1:
+            for text in texts:
+                yield self.process_message(text, now)
+            return
+        
+        # Os processos auxiliares recebem a mesma configuração de cache e modelo deste processador
+        worker_options = {'cache_size': self.cache_size}
+        if self._model_options:
+            worker_options.update(self._model_options, min_confidence=self.intent_model.min_confidence)
+        
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(worker_options,)) as executor:
+            pending = deque()
+            chunk = []
+            
+            for text in texts:
+                chunk.append(text)
+                if len(chunk) >= chunksize:
+                    pending.append(executor.submit(_process_chunk, chunk, now))
+                    chunk = []
+                    
+                    # Limitar o trabalho em andamento para manter memória constante
+                    while len(pending) >= workers * 2:
+                        yield from pending.popleft().result()
+            
+            if chunk:
+                pending.append(executor.submit(_process_chunk, chunk, now))
+            
+            while pending:
+                yield from pending.popleft().result()
     
     def get_missing_info(self, intent, entities):
         """
@@ -517,7 +633,7 @@ class NLPProcessor:
         
         Args:
             intent (str): Intenção identificada
-            entities (dict): Entidades extraídas
+            entities (PendingEvent): Entidades extraídas
             
         Returns:
             list: Lista de campos faltantes
@@ -591,12 +707,13 @@ class NLPProcessor:
         except:
             return time_str
         
-    def extract_recurrence(self, text):
+    def extract_recurrence(self, text, now=None):
         """
         Extrai informações de recorrência da mensagem
 
         Args:
             text (str): Texto da mensagem
+            now (datetime): Instante de referência fixo ou None para agora
 
         Returns:
             tuple: (tipo_recorrencia, data_final) ou (None, None)
@@ -624,7 +741,7 @@ class NLPProcessor:
             match = end_date_matches[0]
             day = int(match[0])
             month = int(match[1])
-            year = int(match[2]) if len(match) > 2 and match[2] else datetime.now().year
+            year = int(match[2]) if len(match) > 2 and match[2] else self._reference_date(now).year
             if year < 100:
                 year += 2000
 
@@ -635,31 +752,77 @@ class NLPProcessor:
             
         return recurrence, end_date
     
-    def extract_entities(self, text):
+    def extract_entities(self, text, now=None):
         """
         Extrai todas as entidades relevantes da mensagem
         
         Args:
             text (str): Texto da mensagem
+            now (datetime): Instante de referência fixo ou None para agora
             
         Returns:
-            dict: Dicionário com todas as entidades extraídas
-        """
-        entities = {
-            'date': self.extract_date(text),
-            'time': self.extract_time(text),
-            'duration': self.extract_duration(text),
-            'summary': self.extract_summary(text),
-            'location': self.extract_location(text),
-            'is_meeting': self.is_meeting_request(text),
-            'attendees': self.extract_attendees(text)
-        }
+            PendingEvent: Entidades extraídas (campos não encontrados ficam vazios)
+        """
+        # Data e horário vêm de uma única passada da gramática
+        match = self.parse_datetime(text, now)
+        
+        entities = PendingEvent(
+            date=match.date.isoformat() if match.date else None,
+            time=self._format_time(match.time),
+            duration=self.extract_duration(text),
+            summary=self.extract_summary(text),
+            location=self.extract_location(text),
+            is_meeting=self.is_meeting_request(text),
+            attendees=self.extract_attendees(text)
+        )
+        
+        # Período de vários dias para consultas de agenda
+        entities.date_range = self._format_range(match)
+        
+        # Intervalo "de 14h às 16h": o fim explícito define a duração
+        if match.time and match.end_time:
+            entities.end_time = self._format_time(match.end_time)
+            minutes = (match.end_time[0] * 60 + match.end_time[1]) - (match.time[0] * 60 + match.time[1])
+            if minutes > 0:
+                entities.duration = minutes / 60
         
         # Extrair informações de recorrência
-        recurrence, end_date = self.extract_recurrence(text)
+        recurrence, end_date = self.extract_recurrence(text, now)
         if recurrence:
-            entities['recurrence'] = recurrence
-            if end_date:
-                entities['end_date'] = end_date
+            entities.recurrence = recurrence
+            entities.end_date = end_date
         
-        return entities
\ No newline at end of file
+        return entities
+
+
+# Processador usado pelos processos auxiliares de process_messages
+_worker_processor = None
+
+def _init_worker(options):
+    """
+    Cria o processador de um processo auxiliar com a configuração do processador principal
+    
+    Args:
+        options (dict): cache_size e, com modelo de intenções, model_dir, batch_size,
+            max_wait_ms e min_confidence
+    """
+    global _worker_processor
+    options = dict(options)
+    min_confidence = options.pop('min_confidence', None)
+    _worker_processor = NLPProcessor(**options)
+    if _worker_processor.intent_model:
+        _worker_processor.intent_model.min_confidence = min_confidence
+        _worker_processor.intent_model.wait_ready()
+
+def _process_chunk(texts, now):
+    """
+    Processa um bloco de mensagens em um processo auxiliar
+    
+    Args:
+        texts (list): Mensagens do bloco
+        now (datetime): Instante de referência fixo
+        
+    Returns:
+        list: Lista de ParseResult
+    """
+    return [_worker_processor.process_message(text, now) for text in texts]
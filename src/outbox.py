@@ -0,0 +1,452 @@
+"""
+Fila persistente de alterações no Google Calendar (outbox).
+Cada criação, alteração ou exclusão é gravada em SQLite antes de ir para a API; workers
+em segundo plano enviam na ordem de cada usuário, com novas tentativas e gravações
+agrupadas. Se o processo cair antes do envio, a alteração é retomada ao reiniciar.
+
+Com vários workers (sharding.py) todos gravam no mesmo banco. Cada worker só envia as
+alterações dos usuários que são seus no anel: assume as pendentes ao receber trechos do
+anel (claim) e as devolve ao perdê-los (release); o que um worker morto deixou no banco
+é assumido pelos novos donos dos seus trechos.
+"""
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import asyncio
+import logging
+import threading
+from collections import deque
+
+from calendar_manager import CIRCUIT_OPEN_MESSAGE, http_status
+
+logger = logging.getLogger(__name__)
+
+# Métodos de CalendarManager que podem passar pela fila
+OPERATIONS = ('create_event', 'update_event', 'update_event_duration', 'delete_event')
+
+# Resultado de cada tentativa (WAIT: disjuntor aberto, a API nem foi chamada)
+DONE, RETRY, FAILED, WAIT = 'done', 'retry', 'failed', 'wait'
+
+# Espera máxima (s) pelo lock de escrita do banco quando outro worker está gravando
+BUSY_TIMEOUT = 30.0
+
+
+class Mutation:
+    """Alteração registrada na fila"""
+
+    __slots__ = ('id', 'user_id', 'op', 'args', 'attempts', 'created')
+
+    def __init__(self, id, user_id, op, args, attempts=0, created=None):
+        self.id = id
+        self.user_id = user_id
+        self.op = op
+        self.args = args
+        self.attempts = attempts
+        self.created = created if created is not None else time.time()
+
+
+class MutationOutbox:
+    """Grava as alterações antes de enviá-las e as envia em segundo plano, em ordem por usuário"""
+
+    def __init__(self, calendar_manager, db_path="data/outbox.db", workers=4, batch_size=10,
+                 max_attempts=8, base_delay=2.0, max_delay=300.0, on_result=None, circuit=None,
+                 recover=True):
+        """
+        Inicializa a fila
+
+        Args:
+            calendar_manager (CalendarManager): Executa as alterações na API
+            db_path (str): Caminho do banco SQLite da fila
+            workers (int): Usuários atendidos em paralelo
+            batch_size (int): Alterações seguidas de um usuário enviadas por vez
+            max_attempts (int): Tentativas antes de desistir de uma alteração
+            base_delay (float): Espera (s) antes da primeira nova tentativa; dobra a cada falha
+            max_delay (float): Espera máxima (s) entre tentativas
+            on_result (callable): Corrotina on_result(mutation, sucesso, resultado) para
+                alterações sem ninguém aguardando (destacadas ou recuperadas após reinício)
+            circuit (CalendarCircuit): Disjuntores da API; com o do usuário aberto, a fila
+                espera ele fechar sem gastar tentativas
+            recover (bool): Retomar no início todas as alterações pendentes do banco; False nos
+                workers do shard, que só assumem as dos seus usuários (claim)
+        """
+        self.calendar_manager = calendar_manager
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.on_result = on_result
+        self.circuit = circuit
+        self.recover = recover
+
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # Uma alteração confirmada ao usuário não pode se perder nem em queda de energia
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT NOT NULL, op TEXT NOT NULL, "
+            "args TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, created REAL NOT NULL)"
+        )
+        self._db_lock = threading.Lock()
+
+        self._queues = {}     # user_id -> deque de Mutation, em ordem de chegada
+        self._active = {}     # usuário com envio agendado ou em andamento -> ficha do agendamento
+        self._flushing = {}   # usuário -> evento marcado ao fim do envio em andamento
+        self._timers = {}     # usuário -> nova tentativa agendada (call_later)
+        self._ready = None    # fila de usuários prontos para os workers
+        self._waiters = {}    # id da alteração -> future de quem aguarda o resultado
+        self._incoming = []   # (Mutation, future) ainda não gravadas
+        self._inserter = None
+        self._tasks = []
+
+        # Métricas
+        self.submitted = 0
+        self.recovered = 0
+        self.released = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.retries = 0
+        self.deferred = 0
+        self.insert_batches = 0
+        self.flush_batches = 0
+
+    # Acesso ao banco (executado em threads para não bloquear o loop)
+
+    def _load_pending(self, owns=None):
+        """Lê as alterações pendentes (só as dos usuários aceitos por owns), em ordem de chegada"""
+        with self._db_lock:
+            rows = self._conn.execute(
+                "SELECT id, user_id, op, args, attempts, created FROM outbox ORDER BY id"
+            ).fetchall()
+        return [Mutation(row[0], row[1], row[2], json.loads(row[3]), row[4], row[5])
+                for row in rows if owns is None or owns(row[1])]
+
+    def _insert_batch(self, mutations):
+        """Grava um lote de alterações novas em uma única transação, atribuindo os IDs"""
+        with self._db_lock:
+            self._conn.execute("BEGIN")
+            try:
+                for mutation in mutations:
+                    cursor = self._conn.execute(
+                        "INSERT INTO outbox (user_id, op, args, attempts, created) VALUES (?, ?, ?, 0, ?)",
+                        (mutation.user_id, mutation.op,
+                         json.dumps(mutation.args, separators=(',', ':'), ensure_ascii=False),
+                         mutation.created)
+                    )
+                    mutation.id = cursor.lastrowid
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _commit_batch(self, finished, retried):
+        """Remove as alterações concluídas e registra as tentativas, em uma transação"""
+        with self._db_lock:
+            self._conn.execute("BEGIN")
+            try:
+                if finished:
+                    self._conn.executemany("DELETE FROM outbox WHERE id = ?", [(m.id,) for m in finished])
+                if retried:
+                    self._conn.execute("UPDATE outbox SET attempts = ? WHERE id = ?", (retried.attempts, retried.id))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    # Ciclo de vida
+
+    async def start(self):
+        """Recupera as alterações pendentes (se recover) e inicia os workers"""
+        self._ready = asyncio.Queue()
+        if self.recover:
+            await self.claim()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Para os workers; o que não foi enviado continua gravado para o próximo início"""
+        if self._inserter:
+            await asyncio.gather(self._inserter, return_exceptions=True)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+
+    async def claim(self, owns=None):
+        """
+        Assume as alterações pendentes no banco dos usuários aceitos por owns
+
+        Com vários workers, é chamado durante o rebalanceamento, com o despachante parado:
+        nenhum update dos usuários assumidos chegou ainda a este worker.
+
+        Args:
+            owns (callable): owns(user_id) -> bool; None assume todos
+
+        Returns:
+            int: Alterações assumidas
+        """
+        pending = await asyncio.to_thread(self._load_pending, owns)
+        queued = {mutation.id for queue in self._queues.values() for mutation in queue}
+        claimed = [mutation for mutation in pending if mutation.id not in queued]
+        for mutation in claimed:
+            self._enqueue(mutation)
+        self.recovered += len(claimed)
+        if claimed:
+            logger.info(f"Outbox: {len(claimed)} alterações pendentes recuperadas")
+        return len(claimed)
+
+    async def release(self, owns):
+        """
+        Deixa de enviar as alterações dos usuários aceitos por owns (passaram a outro worker)
+
+        O envio em andamento de cada um termina antes; o restante continua no banco para
+        o novo dono assumir com claim.
+
+        Args:
+            owns (callable): owns(user_id) -> bool
+
+        Returns:
+            int: Alterações devolvidas
+        """
+        users = [user_id for user_id in self._queues if owns(user_id)]
+        for user_id in users:
+            # Invalida a ficha: nenhum envio novo começa e as novas tentativas são canceladas
+            self._active.pop(user_id, None)
+            timer = self._timers.pop(user_id, None)
+            if timer:
+                timer.cancel()
+
+        released = 0
+        for user_id in users:
+            flushing = self._flushing.get(user_id)
+            if flushing:
+                await flushing.wait()
+            self._active.pop(user_id, None)
+            for mutation in self._queues.pop(user_id, ()):
+                # Quem aguardava recebe o aviso do novo dono (on_result)
+                self._waiters.pop(mutation.id, None)
+                released += 1
+        self.released += released
+        return released
+
+    # Entrada
+
+    async def submit(self, user_id, op, **kwargs):
+        """
+        Grava uma alteração e a coloca na fila do usuário
+
+        Args:
+            user_id (str): ID do usuário
+            op (str): Método de CalendarManager (ver OPERATIONS)
+            **kwargs: Argumentos do método (serializáveis em JSON)
+
+        Returns:
+            tuple: (Mutation já gravada, future com (sucesso, resultado) do envio)
+        """
+        if op not in OPERATIONS:
+            raise ValueError(f"Operação não suportada na outbox: {op}")
+
+        # ID definido aqui para que repetir a criação não duplique o evento
+        if op == 'create_event' and not kwargs.get('event_id'):
+            kwargs['event_id'] = uuid.uuid4().hex
+
+        mutation = Mutation(None, user_id, op, kwargs)
+        written = asyncio.get_running_loop().create_future()
+        self._incoming.append((mutation, written))
+        if self._inserter is None or self._inserter.done():
+            self._inserter = asyncio.create_task(self._insert_incoming())
+        await written
+
+        result = asyncio.get_running_loop().create_future()
+        self._waiters[mutation.id] = result
+        self.submitted += 1
+        self._enqueue(mutation)
+        return mutation, result
+
+    def detach(self, mutation):
+        """Ninguém mais aguarda o resultado: ele será entregue por on_result"""
+        future = self._waiters.pop(mutation.id, None)
+        if future is not None and not future.done():
+            future.cancel()
+
+    async def _insert_incoming(self):
+        """Grava as alterações recebidas, agrupando as que chegaram juntas"""
+        await asyncio.sleep(0)
+        while self._incoming:
+            batch, self._incoming = self._incoming, []
+            try:
+                await asyncio.to_thread(self._insert_batch, [mutation for mutation, _ in batch])
+                self.insert_batches += 1
+            except Exception as e:
+                for _, written in batch:
+                    written.set_exception(e)
+                continue
+            for _, written in batch:
+                written.set_result(None)
+
+    def _enqueue(self, mutation):
+        """Acrescenta a alteração à fila do usuário e acorda um worker se necessário"""
+        self._queues.setdefault(mutation.user_id, deque()).append(mutation)
+        if mutation.user_id not in self._active:
+            token = self._active[mutation.user_id] = object()
+            self._ready.put_nowait((mutation.user_id, token))
+
+    # Envio
+
+    async def _worker(self):
+        """Atende um usuário por vez, enviando suas alterações em ordem"""
+        while True:
+            user_id, token = await self._ready.get()
+            # Ficha antiga: o usuário foi devolvido (release) depois de agendado
+            if self._active.get(user_id) is not token:
+                continue
+
+            flushed = self._flushing[user_id] = asyncio.Event()
+            try:
+                delay = await self._flush_user(user_id)
+            except Exception as e:
+                logger.error(f"Outbox: erro ao enviar alterações de {user_id}: {e}")
+                delay = self.base_delay
+            finally:
+                del self._flushing[user_id]
+                flushed.set()
+            if self._active.get(user_id) is not token:
+                continue
+
+            queue = self._queues.get(user_id)
+            if not queue:
+                self._queues.pop(user_id, None)
+                del self._active[user_id]
+            elif delay:
+                self._timers[user_id] = asyncio.get_running_loop().call_later(delay, self._wake, user_id, token)
+            else:
+                self._ready.put_nowait((user_id, token))
+
+    def _wake(self, user_id, token):
+        """Fim da espera antes de uma nova tentativa"""
+        self._timers.pop(user_id, None)
+        self._ready.put_nowait((user_id, token))
+
+    async def _flush_user(self, user_id):
+        """
+        Envia um lote de alterações do usuário, parando na primeira que precisar ser repetida
+
+        Returns:
+            float: Espera antes da próxima tentativa, ou 0 para continuar
+        """
+        queue = self._queues[user_id]
+        finished, results, retried, delay = [], [], None, 0
+
+        # API instável: esperar o disjuntor sem chamar nem gastar tentativas
+        if self.circuit is not None and self.circuit.is_open(user_id):
+            self.deferred += 1
+            return max(self.base_delay, self.circuit.retry_after(user_id))
+
+        for mutation in list(queue)[:self.batch_size]:
+            outcome, result = await asyncio.to_thread(self._execute, mutation)
+            if outcome == WAIT:
+                self.deferred += 1
+                delay = self.base_delay
+                if self.circuit is not None:
+                    delay = max(delay, self.circuit.retry_after(user_id))
+                break
+            mutation.attempts += 1
+
+            if outcome == RETRY and mutation.attempts < self.max_attempts:
+                self.retries += 1
+                retried = mutation
+                delay = min(self.max_delay, self.base_delay * 2 ** (mutation.attempts - 1))
+                logger.warning(f"Outbox: {mutation.op} de {user_id} falhou "
+                               f"(tentativa {mutation.attempts}), nova tentativa em {delay:.0f}s: {result}")
+                break
+
+            queue.popleft()
+            finished.append(mutation)
+            results.append((mutation, outcome == DONE, result))
+
+        try:
+            await asyncio.to_thread(self._commit_batch, finished, retried)
+            self.flush_batches += 1
+        except Exception as e:
+            # As alterações já foram aplicadas; no próximo início são repetidas sem efeito
+            logger.error(f"Outbox: erro ao registrar {len(finished)} alterações de {user_id}: {e}")
+
+        for mutation, success, result in results:
+            if success:
+                self.succeeded += 1
+            else:
+                self.failed += 1
+            await self._deliver(mutation, success, result)
+        return delay
+
+    def _execute(self, mutation):
+        """
+        Executa a alteração na API
+
+        Returns:
+            tuple: (DONE, RETRY, FAILED ou WAIT, resultado ou mensagem de erro)
+        """
+        method = getattr(self.calendar_manager, mutation.op)
+        try:
+            success, result = method(mutation.user_id, **mutation.args)
+        except Exception as e:
+            return RETRY, str(e)
+        if success:
+            return DONE, result
+        if result == CIRCUIT_OPEN_MESSAGE:
+            return WAIT, result
+
+        status = http_status(result)
+        # Repetição de algo que já tinha sido aplicado antes de uma queda
+        if mutation.op == 'create_event' and status == 409:
+            found, event = self.calendar_manager.get_event_by_id(mutation.user_id, mutation.args['event_id'])
+            return (DONE, event) if found else (RETRY, result)
+        if mutation.op == 'delete_event' and status in (404, 410):
+            return DONE, result
+
+        # Sem status (rede, conexão) ou erros temporários: tentar de novo
+        if status is None or status in (408, 429) or status >= 500:
+            return RETRY, result
+        return FAILED, result
+
+    async def _deliver(self, mutation, success, result):
+        """Entrega o resultado a quem aguarda ou, se ninguém aguarda, a on_result"""
+        future = self._waiters.pop(mutation.id, None)
+        if future is not None and not future.done():
+            future.set_result((success, result))
+            return
+        if self.on_result:
+            try:
+                await self.on_result(mutation, success, result)
+            except Exception as e:
+                logger.error(f"Outbox: erro ao avisar resultado de {mutation.op} para {mutation.user_id}: {e}")
+
+    def get_stats(self):
+        """
+        Retorna métricas da fila
+
+        Returns:
+            dict: Pendentes, usuários com fila, recuperadas, devolvidas, concluídas, falhas,
+                novas tentativas, adiadas e lotes
+        """
+        return {
+            'pending': sum(len(queue) for queue in self._queues.values()),
+            'users': len(self._queues),
+            'submitted': self.submitted,
+            'recovered': self.recovered,
+            'released': self.released,
+            'succeeded': self.succeeded,
+            'failed': self.failed,
+            'retries': self.retries,
+            'deferred': self.deferred,
+            'insert_batches': self.insert_batches,
+            'flush_batches': self.flush_batches,
+        }
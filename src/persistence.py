@@ -0,0 +1,268 @@
+"""
+Persistência do estado de conversa em SQLite.
+Escritas são agrupadas e gravadas em lote (write-behind) e o estado de cada usuário
+só é lido do banco no primeiro update dele, então a inicialização não depende do
+número de usuários salvos.
+
+Com vários workers (sharding.py) todos usam o mesmo arquivo. Não há escritas
+concorrentes ao mesmo usuário: cada usuário pertence a um único worker por vez, e ao
+mudar de dono o estado é gravado (release_user) antes de o novo dono o receber. Entre
+processos, o modo WAL deixa as leituras correrem junto com a escrita e o SQLite aceita
+um escritor por vez; os outros esperam o lock até BUSY_TIMEOUT segundos. Cada escrita é
+uma transação curta com um lote de usuários, então a espera fica em milissegundos.
+"""
+
+import os
+import json
+import sqlite3
+import asyncio
+import logging
+import threading
+from telegram.ext import BasePersistence, PersistenceInput
+
+from models import STATE_TYPES, PendingEvent
+
+logger = logging.getLogger(__name__)
+
+# Marca de exclusão na fila de escrita
+_DELETE = object()
+
+# Espera máxima (s) pelo lock de escrita do banco quando outro worker está gravando
+BUSY_TIMEOUT = 30.0
+
+def _encode(value):
+    """Serializa objetos do estado de conversa (ex.: PendingEvent) como {"$t": tipo, "v": estado}"""
+    name = type(value).__name__
+    if STATE_TYPES.get(name) is type(value):
+        return {'$t': name, 'v': value.to_state()}
+    raise TypeError(f"Tipo {name} não é serializável")
+
+def _decode(obj):
+    """Reconstrói os objetos marcados por _encode"""
+    cls = STATE_TYPES.get(obj.get('$t')) if '$t' in obj else None
+    return cls.from_state(obj['v']) if cls else obj
+
+class SQLitePersistence(BasePersistence):
+    """Guarda context.user_data em SQLite (modo WAL), com carga preguiçosa por usuário"""
+
+    def __init__(self, db_path="data/bot_state.db", flush_interval=1.0):
+        """
+        Inicializa a persistência
+
+        Args:
+            db_path (str): Caminho do banco SQLite (compartilhado entre workers; ver o topo do módulo)
+            flush_interval (float): Intervalo em segundos entre gravações em lote
+        """
+        # Só user_data é persistido; o PTB chama update_user_data a cada flush_interval
+        # apenas para os usuários que tiveram updates, o que já agrupa as escritas
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=flush_interval
+        )
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS user_data (user_id INTEGER PRIMARY KEY, data TEXT NOT NULL)"
+        )
+        self._db_lock = threading.Lock()
+
+        self._loaded = set()   # usuários cujo estado já foi lido do banco neste processo
+        self._dirty = {}       # user_id -> JSON serializado ou _DELETE
+        self._writer = None
+
+        # Métricas
+        self.loads = 0
+        self.batches = 0
+        self.rows_written = 0
+
+    # Acesso ao banco (executado em threads para não bloquear o loop)
+
+    def _load(self, user_id):
+        """Lê o estado salvo de um usuário"""
+        with self._db_lock:
+            row = self._conn.execute(
+                "SELECT data FROM user_data WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        return json.loads(row[0], object_hook=_decode) if row else {}
+
+    def _write_batch(self, batch):
+        """Grava um lote de alterações em uma única transação"""
+        upserts = [(user_id, data) for user_id, data in batch.items() if data is not _DELETE]
+        deletes = [(user_id,) for user_id, data in batch.items() if data is _DELETE]
+
+        with self._db_lock:
+            self._conn.execute("BEGIN")
+            try:
+                if upserts:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO user_data (user_id, data) VALUES (?, ?)", upserts
+                    )
+                if deletes:
+                    self._conn.executemany("DELETE FROM user_data WHERE user_id = ?", deletes)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+        self.batches += 1
+        self.rows_written += len(batch)
+
+    @staticmethod
+    def _serialize(user_data):
+        """
+        Serializa o estado de forma compacta
+
+        Chaves iniciadas por '_' são transitórias (caches, paginação) e não são salvas.
+        """
+        data = {key: value for key, value in user_data.items() if not str(key).startswith('_')}
+        return json.dumps(data, separators=(',', ':'), ensure_ascii=False, default=_encode)
+
+    # Escrita em segundo plano
+
+    def _schedule_write(self):
+        """Garante que há uma tarefa gravando as alterações pendentes"""
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.create_task(self._write_pending())
+
+    async def _write_pending(self):
+        """Grava as alterações pendentes até a fila esvaziar"""
+        # Deixa o ciclo de persistência do PTB terminar de enfileirar os demais usuários
+        await asyncio.sleep(0)
+
+        while self._dirty:
+            batch, self._dirty = self._dirty, {}
+            try:
+                await asyncio.to_thread(self._write_batch, batch)
+            except Exception as e:
+                logger.error(f"Erro ao gravar estado de {len(batch)} usuários: {e}")
+                # Manter no próximo lote o que não foi gravado (sem sobrescrever alterações novas)
+                for user_id, data in batch.items():
+                    self._dirty.setdefault(user_id, data)
+                return
+
+    # user_data
+
+    async def get_user_data(self):
+        """Nada é carregado na inicialização; cada usuário é lido no primeiro acesso"""
+        return {}
+
+    async def refresh_user_data(self, user_id, user_data):
+        """Carrega o estado salvo do usuário na primeira vez que ele aparece"""
+        if user_id in self._loaded:
+            return
+        self._loaded.add(user_id)
+
+        try:
+            stored = await asyncio.to_thread(self._load, user_id)
+        except Exception as e:
+            logger.error(f"Erro ao carregar estado do usuário {user_id}: {e}")
+            return
+
+        self.loads += 1
+        # Estados gravados antes do PendingEvent guardavam o evento como dicionário
+        if isinstance(stored.get('pending_event'), dict):
+            stored['pending_event'] = PendingEvent(**{
+                name: value for name, value in stored['pending_event'].items()
+                if name in PendingEvent.__slots__
+            })
+        # O que já está em memória (ex.: importado de outro worker) é mais recente
+        for key, value in stored.items():
+            user_data.setdefault(key, value)
+
+    async def update_user_data(self, user_id, data):
+        """Enfileira o estado do usuário para a próxima gravação em lote"""
+        if user_id not in self._loaded:
+            # Usuário liberado para outro worker; o estado em memória aqui não vale mais
+            return
+        try:
+            self._dirty[user_id] = self._serialize(data)
+        except (TypeError, ValueError) as e:
+            logger.error(f"Estado do usuário {user_id} não é serializável: {e}")
+            return
+        self._schedule_write()
+
+    async def drop_user_data(self, user_id):
+        """Apaga o estado salvo do usuário"""
+        self._loaded.discard(user_id)
+        self._dirty[user_id] = _DELETE
+        self._schedule_write()
+
+    async def release_user(self, user_id, data):
+        """
+        Grava o estado do usuário e deixa de acompanhá-lo neste processo
+
+        Usado quando o usuário passa a ser atendido por outro worker, que lerá
+        o estado do banco no primeiro update.
+
+        Args:
+            user_id (int): ID do usuário
+            data (dict): Estado atual do usuário
+        """
+        if user_id not in self._loaded:
+            return
+        self._loaded.discard(user_id)
+        self._dirty.pop(user_id, None)
+        await asyncio.to_thread(self._write_batch, {user_id: self._serialize(data)})
+
+    async def flush(self):
+        """Grava tudo o que está pendente e fecha o banco (chamado no encerramento)"""
+        if self._writer and not self._writer.done():
+            await self._writer
+        if self._dirty:
+            batch, self._dirty = self._dirty, {}
+            await asyncio.to_thread(self._write_batch, batch)
+        with self._db_lock:
+            self._conn.close()
+
+    def get_stats(self):
+        """
+        Retorna métricas da persistência
+
+        Returns:
+            dict: Usuários carregados, pendentes de gravação, lotes e linhas gravadas
+        """
+        return {
+            'loaded_users': len(self._loaded),
+            'pending_writes': len(self._dirty),
+            'loads': self.loads,
+            'batches': self.batches,
+            'rows_written': self.rows_written,
+        }
+
+    # Dados não persistidos por este bot
+
+    async def get_chat_data(self):
+        return {}
+
+    async def get_bot_data(self):
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name):
+        return {}
+
+    async def update_conversation(self, name, key, new_state):
+        pass
+
+    async def update_chat_data(self, chat_id, data):
+        pass
+
+    async def update_bot_data(self, data):
+        pass
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def drop_chat_data(self, chat_id):
+        pass
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        pass
+
+    async def refresh_bot_data(self, bot_data):
+        pass
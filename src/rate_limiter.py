@@ -0,0 +1,266 @@
+"""
+Controle de envio de mensagens para a Bot API do Telegram.
+Limita o ritmo global e por chat com token buckets, dá prioridade às respostas
+interativas sobre envios em massa e reagenda as requisições que recebem RetryAfter.
+"""
+
+import time
+import heapq
+import asyncio
+import logging
+import itertools
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+logger = logging.getLogger(__name__)
+
+# Prioridades (menor sai primeiro); passadas como rate_limit_args nas chamadas ao bot
+PRIORITY_INTERACTIVE = 0   # Respostas a mensagens e botões
+PRIORITY_BACKGROUND = 5    # Avisos gerados pelo bot (ex.: expiração)
+PRIORITY_BROADCAST = 10    # Envios em massa (ex.: resumo diário)
+
+# Limites documentados pelo Telegram
+GLOBAL_RATE = 30            # mensagens por segundo no total
+PRIVATE_CHAT_RATE = 1       # mensagens por segundo em um chat privado
+GROUP_CHAT_RATE = 20 / 60   # mensagens por segundo em grupos
+
+# Buckets de chats inativos são descartados quando passam deste número
+MAX_CHAT_BUCKETS = 10000
+
+class TokenBucket:
+    """Token bucket com reserva: quem reserva primeiro é atendido primeiro"""
+
+    def __init__(self, rate, capacity):
+        """
+        Inicializa o bucket
+
+        Args:
+            rate (float): Tokens repostos por segundo
+            capacity (float): Máximo de tokens acumulados (rajada)
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now=None):
+        """Segundos até haver um token disponível"""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        wait = 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+        return max(wait, self.paused_until - now)
+
+    def take(self, now=None):
+        """Consome um token (depois de wait_time() == 0)"""
+        # Repor antes: o tempo entre wait_time() e take() não pode voltar como token
+        self._refill(time.monotonic() if now is None else now)
+        self.tokens -= 1
+
+    def reserve(self, now=None):
+        """
+        Reserva o próximo token, mesmo que ainda não exista
+
+        Returns:
+            float: Segundos a esperar antes de usar o token reservado
+        """
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        start = max(now, self.paused_until)
+        self.tokens -= 1
+        wait = 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+        return max(wait, start - now)
+
+    def pause(self, seconds):
+        """Suspende o bucket (ex.: depois de um RetryAfter)"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def is_idle(self, now):
+        self._refill(now)
+        return self.tokens >= self.capacity and now >= self.paused_until
+
+
+class FloodControlRateLimiter(BaseRateLimiter):
+    """Fila de saída com limites global e por chat, prioridades e tratamento de RetryAfter"""
+
+    def __init__(self, global_rate=GLOBAL_RATE, private_chat_rate=PRIVATE_CHAT_RATE,
+                 group_chat_rate=GROUP_CHAT_RATE, max_retries=3):
+        """
+        Inicializa o limitador
+
+        Args:
+            global_rate (float): Mensagens por segundo no total
+            private_chat_rate (float): Mensagens por segundo em cada chat privado
+            group_chat_rate (float): Mensagens por segundo em cada grupo
+            max_retries (int): Novas tentativas depois de um RetryAfter
+        """
+        # Sem rajada global: envios espaçados não estouram o limite em nenhuma janela de 1s
+        self.global_bucket = TokenBucket(global_rate, 1)
+        self.private_chat_rate = private_chat_rate
+        self.group_chat_rate = group_chat_rate
+        self.max_retries = max_retries
+
+        self._chat_buckets = {}
+        self._chat_locks = {}  # chat_id -> asyncio.Lock: um envio por vez em cada chat
+        self._waiters = []  # heap de (prioridade, ordem de chegada, future)
+        self._sequence = itertools.count()
+        self._wakeup = None
+        self._scheduler = None
+
+        # Métricas
+        self._started = time.monotonic()
+        self.sent = 0
+        self.retry_after_hits = 0
+        self.retries = 0
+        self._delays = {}  # prioridade -> [envios, espera total, espera máxima]
+
+    async def initialize(self):
+        """Inicia o agendador global"""
+        self._wakeup = asyncio.Event()
+        self._scheduler = asyncio.create_task(self._schedule())
+
+    async def shutdown(self):
+        """Para o agendador e libera quem ainda esperava"""
+        if self._scheduler:
+            self._scheduler.cancel()
+            try:
+                await self._scheduler
+            except asyncio.CancelledError:
+                pass
+            self._scheduler = None
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.cancel()
+
+    def _chat_bucket(self, chat_id):
+        """Bucket e lock do chat, criados no primeiro envio"""
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) >= MAX_CHAT_BUCKETS:
+                now = time.monotonic()
+                for idle in [key for key, value in self._chat_buckets.items()
+                             if value.is_idle(now) and not self._chat_locks[key].locked()]:
+                    del self._chat_buckets[idle]
+                    del self._chat_locks[idle]
+
+            # IDs negativos (ou @canal) são grupos e canais
+            is_group = isinstance(chat_id, str) or int(chat_id) < 0
+            rate = self.group_chat_rate if is_group else self.private_chat_rate
+            bucket = self._chat_buckets[chat_id] = TokenBucket(rate, 1)
+            self._chat_locks[chat_id] = asyncio.Lock()
+        return bucket, self._chat_locks[chat_id]
+
+    async def _acquire_global(self, priority):
+        """Aguarda um token global, atendendo antes as prioridades menores"""
+        if not self._waiters and self.global_bucket.wait_time() == 0:
+            self.global_bucket.take()
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        self._wakeup.set()
+        await future
+
+    async def _schedule(self):
+        """Libera as requisições em espera no ritmo do bucket global"""
+        while True:
+            if not self._waiters:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            wait = self.global_bucket.wait_time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                self.global_bucket.take()
+                future.set_result(None)
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        """Espera a vez da requisição, envia e reagenda em caso de RetryAfter"""
+        priority = rate_limit_args if isinstance(rate_limit_args, int) else PRIORITY_INTERACTIVE
+        chat_id = data.get('chat_id')
+        queued_at = time.monotonic()
+        if chat_id is None:
+            return await self._send(callback, args, kwargs, endpoint, priority, queued_at, None, None)
+
+        # Um envio por vez no chat, na ordem de chegada. O token do chat só é consumido com
+        # o token global já obtido: reservado antes, a espera na fila global poderia juntar
+        # vários envios do mesmo chat acima do limite dele
+        bucket, lock = self._chat_bucket(chat_id)
+        async with lock:
+            return await self._send(callback, args, kwargs, endpoint, priority, queued_at, chat_id, bucket)
+
+    async def _send(self, callback, args, kwargs, endpoint, priority, queued_at, chat_id, bucket):
+        """Aguarda os tokens do chat e global, envia e repete depois de RetryAfter"""
+        for attempt in range(self.max_retries + 1):
+            while bucket:
+                wait = bucket.wait_time()
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+            await self._acquire_global(priority)
+            if bucket:
+                bucket.take()
+
+            if attempt == 0:
+                self._record_delay(priority, time.monotonic() - queued_at)
+
+            try:
+                result = await callback(*args, **kwargs)
+                self.sent += 1
+                return result
+            except RetryAfter as e:
+                retry_after = e.retry_after.total_seconds() if hasattr(e.retry_after, 'total_seconds') else e.retry_after
+                self.retry_after_hits += 1
+                logger.warning(f"RetryAfter de {retry_after}s em {endpoint} (chat {chat_id})")
+
+                # O limite pode ser do chat ou do bot inteiro: suspender os dois
+                if bucket:
+                    bucket.pause(retry_after)
+                self.global_bucket.pause(retry_after)
+                if attempt == self.max_retries:
+                    raise
+                self.retries += 1
+
+    def _record_delay(self, priority, delay):
+        """Registra quanto a requisição esperou na fila"""
+        entry = self._delays.get(priority)
+        if entry is None:
+            entry = self._delays[priority] = [0, 0.0, 0.0]
+        entry[0] += 1
+        entry[1] += delay
+        entry[2] = max(entry[2], delay)
+
+    def get_stats(self):
+        """
+        Retorna métricas de envio
+
+        Returns:
+            dict: Vazão, fila, RetryAfter e espera (ms) por prioridade
+        """
+        elapsed = time.monotonic() - self._started
+        return {
+            'sent': self.sent,
+            'throughput_per_s': self.sent / elapsed if elapsed > 0 else 0.0,
+            'queued': len(self._waiters),
+            'chat_buckets': len(self._chat_buckets),
+            'retry_after_hits': self.retry_after_hits,
+            'retries': self.retries,
+            'delay_by_priority': {
+                priority: {
+                    'requests': count,
+                    'avg_ms': 1000 * total / count,
+                    'max_ms': 1000 * longest,
+                }
+                for priority, (count, total, longest) in sorted(self._delays.items())
+            },
+        }
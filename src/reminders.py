@@ -0,0 +1,298 @@
+"""
+Lembretes antes do início dos eventos.
+Os lembretes ficam em uma roda de temporização hierárquica com resolução de um minuto:
+inserir e cancelar custam O(1), e os lembretes do mesmo usuário no mesmo minuto
+saem em uma única mensagem.
+"""
+
+import time
+import asyncio
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+class Reminder:
+    """Lembrete agendado na roda"""
+
+    __slots__ = ('key', 'user_id', 'start', 'summary', 'expires', 'slot')
+
+    def __init__(self, key, user_id, start, summary, expires):
+        self.key = key
+        self.user_id = user_id
+        self.start = start      # início do evento (timestamp)
+        self.summary = summary
+        self.expires = expires  # tick em que o lembrete dispara
+        self.slot = None        # conjunto da roda onde está
+
+
+class TimerWheel:
+    """Roda de temporização hierárquica (cada nível cobre uma volta completa do anterior)"""
+
+    def __init__(self, tick=60, slots=(256, 256, 64), now=None, max_timers=2000000):
+        """
+        Inicializa a roda
+
+        Args:
+            tick (float): Duração de um tick em segundos
+            slots (tuple): Número de posições de cada nível; com ticks de um minuto, o padrão
+                redistribui ~4h de lembretes a cada 256 minutos, em vez de dias de uma vez
+            now (float): Instante inicial (timestamp); padrão: agora
+            max_timers (int): Máximo de lembretes agendados
+        """
+        self.tick = tick
+        self.sizes = slots
+        self.max_timers = max_timers
+        self.levels = [[set() for _ in range(size)] for size in slots]
+
+        # Ticks cobertos por uma posição de cada nível
+        self.spans = []
+        span = 1
+        for size in slots:
+            self.spans.append(span)
+            span *= size
+
+        self.current = int((time.time() if now is None else now) // tick)
+        self._index = {}  # chave -> Reminder, para cancelar em O(1)
+
+    def __len__(self):
+        return len(self._index)
+
+    def tick_of(self, timestamp):
+        """Tick que contém o instante"""
+        return int(timestamp // self.tick)
+
+    def insert(self, timer):
+        """
+        Agenda (ou reagenda) o lembrete para timer.expires
+
+        Returns:
+            bool: False se a roda está cheia ou o prazo passa do horizonte
+        """
+        previous = self._index.pop(timer.key, None)
+        if previous is not None:
+            previous.slot.discard(previous)
+
+        if len(self._index) >= self.max_timers:
+            return False
+
+        # Prazos já vencidos disparam no próximo tick
+        timer.expires = max(timer.expires, self.current + 1)
+        if not self._place(timer):
+            return False  # Além do horizonte da roda
+        self._index[timer.key] = timer
+        return True
+
+    def cancel(self, key):
+        """
+        Cancela o lembrete da chave
+
+        Returns:
+            bool: True se havia um lembrete agendado
+        """
+        timer = self._index.pop(key, None)
+        if timer is None:
+            return False
+        timer.slot.discard(timer)
+        timer.slot = None
+        return True
+
+    def _place(self, timer):
+        """Coloca o lembrete no nível mais baixo que alcança o seu prazo"""
+        for level, (size, span) in enumerate(zip(self.sizes, self.spans)):
+            if timer.expires // span - self.current // span < size:
+                slot = self.levels[level][(timer.expires // span) % size]
+                slot.add(timer)
+                timer.slot = slot
+                return True
+        return False
+
+    def advance(self, now=None):
+        """
+        Avança a roda até o instante, retornando os lembretes vencidos
+
+        Args:
+            now (float): Instante atual (timestamp); padrão: agora
+
+        Returns:
+            list: Lembretes que dispararam, em ordem de tick
+        """
+        target = self.tick_of(time.time() if now is None else now)
+        fired = []
+        while self.current < target:
+            self.current += 1
+            tick = self.current
+
+            # Ao completar uma volta de um nível, redistribuir a posição do nível acima
+            for level in range(len(self.sizes) - 1, 0, -1):
+                span = self.spans[level]
+                if tick % span == 0:
+                    slot = self.levels[level][(tick // span) % self.sizes[level]]
+                    timers = list(slot)
+                    slot.clear()
+                    for timer in timers:
+                        self._place(timer)
+
+            slot = self.levels[0][tick % self.sizes[0]]
+            if slot:
+                for timer in slot:
+                    del self._index[timer.key]
+                    timer.slot = None
+                fired.extend(slot)
+                slot.clear()
+        return fired
+
+
+class ReminderScheduler:
+    """Agenda lembretes a partir dos eventos vistos pelo bot e envia quando vencem"""
+
+    def __init__(self, send, timezone, lead_minutes=10, max_reminders=2000000):
+        """
+        Inicializa o agendador
+
+        Args:
+            send (callable): Corrotina send(user_id, texto) que entrega a mensagem
+            timezone (tzinfo): Fuso usado para mostrar os horários
+            lead_minutes (int): Antecedência do lembrete em minutos
+            max_reminders (int): Máximo de lembretes agendados (limita a memória)
+        """
+        self.send = send
+        self.timezone = timezone
+        self.lead = lead_minutes * 60
+        self.wheel = TimerWheel(tick=60, max_timers=max_reminders)
+        self._sending = set()
+
+        # Métricas
+        self.scheduled = 0
+        self.cancelled = 0
+        self.rejected = 0
+        self.fired = 0
+        self.messages = 0
+        self.max_lag = 0.0
+
+    @staticmethod
+    def _key(user_id, event_id):
+        return f"{user_id}:{event_id}"
+
+    def schedule(self, user_id, event_id, start, summary):
+        """
+        Agenda o lembrete de um evento, substituindo o anterior do mesmo evento
+
+        Args:
+            user_id (str): ID do usuário
+            event_id (str): ID do evento no Google Calendar
+            start (float): Início do evento (timestamp)
+            summary (str): Título do evento
+
+        Returns:
+            bool: True se o lembrete foi agendado
+        """
+        key = self._key(user_id, event_id)
+        if start <= time.time():
+            self.cancel(user_id, event_id)  # Evento já começou
+            return False
+
+        timer = Reminder(key, user_id, start, summary, self.wheel.tick_of(start - self.lead))
+        if not self.wheel.insert(timer):
+            self.rejected += 1
+            return False
+        self.scheduled += 1
+        return True
+
+    def cancel(self, user_id, event_id):
+        """Cancela o lembrete do evento, se houver"""
+        if self.wheel.cancel(self._key(user_id, event_id)):
+            self.cancelled += 1
+
+    def track(self, user_id, events):
+        """
+        Agenda lembretes para eventos retornados pela API (listagens, resumo diário)
+
+        Args:
+            user_id (str): ID do usuário
+            events (list): Eventos no formato da API do Google Calendar
+        """
+        for event in events:
+            event_id = event.get('id')
+            start = event.get('start', {}).get('dateTime')
+            if not event_id:
+                continue
+            if not start or event.get('status') == 'cancelled':
+                self.cancel(user_id, event_id)  # Dia todo ou cancelado: sem lembrete
+                continue
+            timestamp = datetime.fromisoformat(start.replace('Z', '+00:00')).timestamp()
+            self.schedule(user_id, event_id, timestamp, event.get('summary', '(sem título)'))
+
+    def on_calendar_change(self, user_id, event=None, deleted_event_id=None):
+        """Listener de CalendarManager: reagenda eventos criados ou alterados e cancela os excluídos"""
+        if event is not None:
+            self.track(user_id, [event])
+        if deleted_event_id is not None:
+            self.cancel(user_id, deleted_event_id)
+
+    def due(self, now=None):
+        """
+        Avança a roda e agrupa os lembretes vencidos por usuário
+
+        Returns:
+            dict: {user_id: [Reminder]} ordenados pelo início do evento
+        """
+        batches = {}
+        for timer in self.wheel.advance(now):
+            batches.setdefault(timer.user_id, []).append(timer)
+        for reminders in batches.values():
+            reminders.sort(key=lambda timer: timer.start)
+        return batches
+
+    def render(self, reminders, now):
+        """Texto de um lembrete (um ou vários eventos do mesmo minuto)"""
+        lines = []
+        for timer in reminders:
+            start = datetime.fromtimestamp(timer.start, self.timezone)
+            minutes = max(0, round((timer.start - now) / 60))
+            lines.append(f"• {start:%H:%M} {timer.summary} (em {minutes} min)")
+        title = "⏰ Lembrete:" if len(lines) == 1 else "⏰ Lembretes:"
+        return title + "\n" + "\n".join(lines)
+
+    async def run(self):
+        """Laço principal: a cada minuto envia os lembretes vencidos"""
+        tick = self.wheel.tick
+        while True:
+            await asyncio.sleep(tick - time.time() % tick)
+            now = time.time()
+            batches = self.due(now)
+            if not batches:
+                continue
+
+            self.max_lag = max(self.max_lag, now % tick)
+            for user_id, reminders in batches.items():
+                self.fired += len(reminders)
+                self.messages += 1
+                # Envios seguem em paralelo para não atrasar o próximo tick
+                task = asyncio.create_task(self._deliver(user_id, self.render(reminders, now)))
+                self._sending.add(task)
+                task.add_done_callback(self._sending.discard)
+
+    async def _deliver(self, user_id, text):
+        try:
+            await self.send(user_id, text)
+        except Exception as e:
+            logger.warning(f"Erro ao enviar lembrete para {user_id}: {e}")
+
+    def get_stats(self):
+        """
+        Retorna métricas dos lembretes
+
+        Returns:
+            dict: Agendados, cancelados, recusados, disparados e mensagens enviadas
+        """
+        return {
+            'pending': len(self.wheel),
+            'scheduled': self.scheduled,
+            'cancelled': self.cancelled,
+            'rejected': self.rejected,
+            'fired': self.fired,
+            'messages': self.messages,
+            'sending': len(self._sending),
+            'max_tick_lag_s': self.max_lag,
+        }
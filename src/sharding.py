@@ -0,0 +1,482 @@
+"""
+Execução do bot em vários processos com hashing consistente.
+Um despachante recebe os updates do webhook e os encaminha, pelo ID do usuário,
+ao processo worker dono daquele usuário (IPC local por pipes). O número de workers
+acompanha a carga: acima de um limite de updates por segundo por worker, um worker
+novo assume parte do anel; abaixo de outro, o mais recente sai.
+"""
+
+import time
+import bisect
+import signal
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+
+logger = logging.getLogger(__name__)
+
+# Intervalo de verificação de workers que morreram (segundos)
+WATCHDOG_INTERVAL = 5
+
+# Fim do espaço de hashes do anel (hashes de 64 bits)
+HASH_SPACE = 1 << 64
+
+class ConsistentHashRing:
+    """Anel de hashing consistente com nós virtuais"""
+
+    def __init__(self, vnodes=64):
+        """
+        Inicializa o anel
+
+        Args:
+            vnodes (int): Número de nós virtuais por nó real
+        """
+        self.vnodes = vnodes
+        self._hashes = []
+        self._owners = {}
+
+    @staticmethod
+    def _hash(key):
+        """Hash estável entre processos (o hash() do Python muda a cada execução)"""
+        return ring_hash(key)
+
+    def copy(self):
+        """Cópia do anel (para comparar antes e depois de um rebalanceamento)"""
+        other = ConsistentHashRing(self.vnodes)
+        other._hashes = list(self._hashes)
+        other._owners = dict(self._owners)
+        return other
+
+    def add(self, node):
+        """Adiciona um nó ao anel"""
+        for i in range(self.vnodes):
+            point = self._hash(f"{node}#{i}")
+            self._owners[point] = node
+            bisect.insort(self._hashes, point)
+
+    def remove(self, node):
+        """Remove um nó do anel"""
+        for i in range(self.vnodes):
+            point = self._hash(f"{node}#{i}")
+            if self._owners.pop(point, None) is not None:
+                index = bisect.bisect_left(self._hashes, point)
+                del self._hashes[index]
+
+    def get(self, key):
+        """
+        Retorna o nó responsável pela chave
+
+        Args:
+            key: Chave (ID do usuário)
+
+        Returns:
+            Nó dono da chave ou None se o anel estiver vazio
+        """
+        if not self._hashes:
+            return None
+        return self._owner_of_hash(self._hash(key))
+
+    def _owner_of_hash(self, point):
+        """Nó dono de um valor de hash: o do primeiro ponto acima dele, dando a volta no anel"""
+        index = bisect.bisect(self._hashes, point) % len(self._hashes)
+        return self._owners[self._hashes[index]]
+
+    def moved_ranges(self, before):
+        """
+        Trechos do anel que mudaram de dono desde outro estado do anel
+
+        Entre dois pontos consecutivos (de qualquer dos dois anéis) o dono não muda,
+        então basta comparar um trecho por vez: o custo depende do número de pontos,
+        não do número de usuários.
+
+        Args:
+            before (ConsistentHashRing): Anel antes da mudança
+
+        Returns:
+            dict: Dono anterior -> lista de intervalos [início, fim) de hashes que saíram dele
+        """
+        moved = {}
+        for start, end, old_owner, _ in self._changed_segments(before):
+            moved.setdefault(old_owner, []).extend(_segment(start, end))
+        return moved
+
+    def gained_ranges(self, before):
+        """
+        Trechos do anel que passaram a cada nó desde outro estado do anel
+
+        Args:
+            before (ConsistentHashRing): Anel antes da mudança
+
+        Returns:
+            dict: Novo dono -> lista de intervalos [início, fim) de hashes que passaram a ele
+        """
+        gained = {}
+        for start, end, _, new_owner in self._changed_segments(before):
+            gained.setdefault(new_owner, []).extend(_segment(start, end))
+        return gained
+
+    def ranges_of(self, node):
+        """
+        Trechos do anel que pertencem a um nó
+
+        Returns:
+            list: Intervalos [início, fim) de hashes do nó
+        """
+        ranges = []
+        starts = self._hashes[-1:] + self._hashes[:-1]
+        for start, end in zip(starts, self._hashes):
+            if self._owners[end] == node:
+                ranges.extend(_segment(start, end))
+        return ranges
+
+    def _changed_segments(self, before):
+        """Trechos [início, fim) com dono diferente nos dois anéis: (início, fim, antes, agora)"""
+        if not before._hashes or not self._hashes:
+            return
+        points = sorted(set(before._hashes) | set(self._hashes))
+        # Trechos [ponto anterior, ponto); o primeiro dá a volta pelo fim do espaço de hashes
+        starts = [points[-1]] + points[:-1]
+        for start, end in zip(starts, points):
+            old_owner = before._owner_of_hash(start)
+            new_owner = self._owner_of_hash(start)
+            if old_owner != new_owner:
+                yield start, end, old_owner, new_owner
+
+    def __len__(self):
+        return len(self._hashes) // self.vnodes if self.vnodes else 0
+
+
+def _segment(start, end):
+    """Intervalos de um trecho do anel; o que dá a volta é dividido em dois"""
+    if start < end:
+        return [(start, end)]
+    return [(start, HASH_SPACE), (0, end)]
+
+
+def ring_hash(key):
+    """
+    Hash de 64 bits usado no anel, estável entre processos
+
+    Args:
+        key: Chave (ID do usuário)
+
+    Returns:
+        int: Valor em [0, HASH_SPACE)
+    """
+    return int.from_bytes(hashlib.blake2b(str(key).encode(), digest_size=8).digest(), 'big')
+
+
+def in_ranges(key, ranges):
+    """
+    Verifica se o hash da chave cai em algum dos intervalos
+
+    Args:
+        key: Chave (ID do usuário)
+        ranges (list): Intervalos [início, fim) de hashes
+
+    Returns:
+        bool: True se a chave pertence a um dos intervalos
+    """
+    point = ring_hash(key)
+    return any(start <= point < end for start, end in ranges)
+
+
+def user_id_of(update):
+    """
+    Extrai o ID do usuário de um update em JSON sem desserializá-lo por completo
+
+    Args:
+        update (dict): Update da Bot API
+
+    Returns:
+        int: ID do usuário (ou do chat) ou None
+    """
+    for key, value in update.items():
+        if key == 'update_id' or not isinstance(value, dict):
+            continue
+        sender = value.get('from') or value.get('user')
+        if sender:
+            return sender.get('id')
+        chat = value.get('chat') or (value.get('message') or {}).get('chat')
+        if chat:
+            return chat.get('id')
+    return None
+
+
+def _worker_main(worker_id, conn):
+    """Ponto de entrada do processo worker"""
+    from bot import CalendarBot
+
+    # O despachante coordena o encerramento; Ctrl+C no terminal não deve matar o worker
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logger.info(f"Worker {worker_id} iniciado")
+    bot = CalendarBot(shard=worker_id)
+    asyncio.run(bot.serve_shard(conn))
+
+
+class _Worker:
+    """Processo worker e o pipe usado para falar com ele"""
+
+    def __init__(self, worker_id, context):
+        self.worker_id = worker_id
+        self.conn, child_conn = context.Pipe(duplex=True)
+        self.process = context.Process(
+            target=_worker_main, args=(worker_id, child_conn),
+            name=f"bot-worker-{worker_id}", daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.lock = asyncio.Lock()
+
+    async def send(self, message):
+        """Envia uma mensagem ao worker; bloqueia (em thread) se o pipe estiver cheio"""
+        async with self.lock:
+            await asyncio.to_thread(self.conn.send, message)
+
+    async def request(self, message):
+        """Envia uma mensagem e aguarda a resposta do worker"""
+        async with self.lock:
+            await asyncio.to_thread(self.conn.send, message)
+            return await asyncio.to_thread(self.conn.recv)
+
+
+class ShardedDispatcher:
+    """Roteia updates para processos worker usando hashing consistente"""
+
+    def __init__(self, num_workers, vnodes=64, max_workers=None, scale_up_rate=50.0,
+                 scale_down_rate=10.0, scale_interval=30.0):
+        """
+        Inicializa o despachante
+
+        Args:
+            num_workers (int): Número inicial (e mínimo) de processos worker
+            vnodes (int): Nós virtuais por worker no anel
+            max_workers (int): Máximo de workers com carga alta (None ou igual a num_workers: fixo)
+            scale_up_rate (float): Updates por segundo por worker acima dos quais um worker é adicionado
+            scale_down_rate (float): Updates por segundo por worker abaixo dos quais um worker sai
+            scale_interval (float): Janela em segundos usada para medir a carga
+        """
+        self.num_workers = num_workers
+        self.max_workers = max(num_workers, max_workers or num_workers)
+        self.scale_up_rate = scale_up_rate
+        self.scale_down_rate = scale_down_rate
+        self.scale_interval = scale_interval
+        self.ring = ConsistentHashRing(vnodes)
+        self._context = multiprocessing.get_context('spawn')
+        self._workers = {}
+        self._routed_per_worker = {}
+        self._next_id = 0
+        self._rebalanced = asyncio.Event()
+        self._rebalanced.set()
+        self._rebalance_lock = asyncio.Lock()  # Um rebalanceamento por vez (escala e watchdog)
+        self._watchdog = None
+        self._autoscaler = None
+        self.routed = 0
+        self.scale_ups = 0
+        self.scale_downs = 0
+
+    async def start(self):
+        """Inicia os workers e a verificação de processos mortos"""
+        for _ in range(self.num_workers):
+            self._spawn()
+        # Cada worker assume as alterações pendentes (outbox) dos seus usuários
+        for worker_id, worker in self._workers.items():
+            await worker.send(('claim', self.ring.ranges_of(worker_id)))
+        self._watchdog = asyncio.create_task(self._watch_workers())
+        if self.max_workers > self.num_workers:
+            self._autoscaler = asyncio.create_task(self._autoscale())
+
+    async def stop(self):
+        """Encerra todos os workers"""
+        for task in (self._watchdog, self._autoscaler):
+            if task:
+                task.cancel()
+        for worker in list(self._workers.values()):
+            await self._stop_worker(worker)
+        self._workers.clear()
+
+    def _spawn(self):
+        """Cria um worker e o adiciona ao anel"""
+        worker_id = self._next_id
+        self._next_id += 1
+        self._workers[worker_id] = _Worker(worker_id, self._context)
+        self._routed_per_worker[worker_id] = 0
+        self.ring.add(worker_id)
+        return worker_id
+
+    async def _stop_worker(self, worker):
+        """Pede ao worker que termine e aguarda o processo"""
+        try:
+            await worker.send(('stop',))
+        except (BrokenPipeError, OSError):
+            pass
+        await asyncio.to_thread(worker.process.join, 10)
+        if worker.process.is_alive():
+            worker.process.terminate()
+
+    async def dispatch(self, update):
+        """
+        Encaminha um update (JSON) ao worker dono do usuário
+
+        Args:
+            update (dict): Update da Bot API
+        """
+        user_id = user_id_of(update)
+        worker_id = await self._send_to_owner(
+            user_id if user_id is not None else update.get('update_id'), ('update', update))
+        self.routed += 1
+        self._routed_per_worker[worker_id] += 1
+
+    async def dispatch_to_user(self, user_id, message):
+        """Encaminha uma mensagem de controle ao worker dono do usuário"""
+        await self._send_to_owner(user_id, message)
+
+    async def _send_to_owner(self, key, message):
+        """
+        Envia a mensagem ao dono da chave; se o worker morreu, substitui e envia ao novo dono
+
+        O Telegram já recebeu 200 pelo update: perder o envio aqui perderia o update.
+
+        Returns:
+            int: ID do worker que recebeu a mensagem
+        """
+        while True:
+            await self._rebalanced.wait()
+            worker_id = self.ring.get(key)
+            try:
+                await self._workers[worker_id].send(message)
+                return worker_id
+            except (BrokenPipeError, ConnectionError, EOFError, OSError) as e:
+                logger.error(f"Worker {worker_id} inacessível ({e}); substituindo antes de reenviar")
+                await self._replace_worker(worker_id)
+
+    async def add_worker(self):
+        """Adiciona um worker e migra para ele o estado dos usuários que passam a ser seus"""
+        async with self._rebalance_lock:
+            self._rebalanced.clear()
+            try:
+                before = self.ring.copy()
+                worker_id = self._spawn()
+                await self._migrate(before)
+                logger.info(f"Worker {worker_id} adicionado; {len(self._workers)} workers ativos")
+                return worker_id
+            finally:
+                self._rebalanced.set()
+
+    async def remove_worker(self, worker_id):
+        """Remove um worker, migrando o estado dos seus usuários para os demais"""
+        async with self._rebalance_lock:
+            self._rebalanced.clear()
+            try:
+                before = self.ring.copy()
+                self.ring.remove(worker_id)
+                await self._migrate(before)
+                worker = self._workers.pop(worker_id)
+                self._routed_per_worker.pop(worker_id, None)
+                await self._stop_worker(worker)
+                logger.info(f"Worker {worker_id} removido; {len(self._workers)} workers ativos")
+            finally:
+                self._rebalanced.set()
+
+    async def _migrate(self, before):
+        """
+        Move o estado de conversa e as alterações pendentes dos usuários cujo dono mudou no anel
+
+        Cada dono anterior recebe os trechos de hash que perdeu, para de enviar as alterações
+        desses usuários (outbox) e devolve o estado em memória deles; quem não está em memória
+        é lido do banco compartilhado pelo novo dono no primeiro update. Depois de todos os
+        donos anteriores, cada novo dono assume as alterações pendentes dos trechos que ganhou,
+        inclusive as de um worker morto.
+
+        Args:
+            before (ConsistentHashRing): Anel antes da mudança
+        """
+        for old_owner, ranges in self.ring.moved_ranges(before).items():
+            worker = self._workers.get(old_owner)
+            if not worker or not worker.process.is_alive():
+                continue
+            _, states = await worker.request(('export', ranges))
+
+            by_new_owner = {}
+            for user_id, data in states.items():
+                by_new_owner.setdefault(self.ring.get(user_id), {})[user_id] = data
+            for new_owner, payload in by_new_owner.items():
+                await self._workers[new_owner].send(('import', payload))
+
+        for new_owner, ranges in self.ring.gained_ranges(before).items():
+            await self._workers[new_owner].send(('claim', ranges))
+
+    async def _watch_workers(self):
+        """Substitui workers que morreram; o estado em memória deles é perdido"""
+        while True:
+            await asyncio.sleep(WATCHDOG_INTERVAL)
+            for worker_id, worker in list(self._workers.items()):
+                if not worker.process.is_alive():
+                    logger.error(f"Worker {worker_id} terminou inesperadamente; substituindo")
+                    await self._replace_worker(worker_id)
+
+    async def _replace_worker(self, worker_id):
+        """Tira um worker morto (ou com o pipe quebrado) do anel e cria outro no lugar"""
+        async with self._rebalance_lock:
+            worker = self._workers.get(worker_id)
+            if worker is None:
+                return  # Já substituído (pelo watchdog ou por outro envio)
+            self._rebalanced.clear()
+            try:
+                # Pipe quebrado com o processo ainda saindo: esperar, e forçar se não sair
+                await asyncio.to_thread(worker.process.join, 5)
+                if worker.process.is_alive():
+                    worker.process.kill()
+                    await asyncio.to_thread(worker.process.join)
+                before = self.ring.copy()
+                self.ring.remove(worker_id)
+                del self._workers[worker_id]
+                self._routed_per_worker.pop(worker_id, None)
+                self._spawn()
+                await self._migrate(before)
+            finally:
+                self._rebalanced.set()
+
+    async def _autoscale(self):
+        """Ajusta o número de workers à taxa de updates medida a cada scale_interval"""
+        last_routed = self.routed
+        last_time = time.monotonic()
+        while True:
+            await asyncio.sleep(self.scale_interval)
+            now = time.monotonic()
+            rate = (self.routed - last_routed) / max(now - last_time, 1e-9) / max(len(self._workers), 1)
+            last_routed, last_time = self.routed, now
+
+            try:
+                if rate > self.scale_up_rate and len(self._workers) < self.max_workers:
+                    logger.info(f"Carga de {rate:.1f} updates/s por worker; adicionando worker")
+                    await self.add_worker()
+                    self.scale_ups += 1
+                elif rate < self.scale_down_rate and len(self._workers) > self.num_workers:
+                    # Sai o worker mais recente: os iniciais ficam com os usuários de sempre
+                    worker_id = max(self._workers)
+                    logger.info(f"Carga de {rate:.1f} updates/s por worker; removendo worker {worker_id}")
+                    await self.remove_worker(worker_id)
+                    self.scale_downs += 1
+            except Exception as e:
+                logger.error(f"Erro ao ajustar o número de workers: {e}")
+            # A janela seguinte começa depois do rebalanceamento
+            last_routed, last_time = self.routed, time.monotonic()
+
+    def get_stats(self):
+        """
+        Retorna métricas do despachante
+
+        Returns:
+            dict: Workers ativos, updates roteados (total e por worker) e ajustes de escala
+        """
+        return {
+            'workers': len(self._workers),
+            'min_workers': self.num_workers,
+            'max_workers': self.max_workers,
+            'routed': self.routed,
+            'routed_per_worker': dict(self._routed_per_worker),
+            'scale_ups': self.scale_ups,
+            'scale_downs': self.scale_downs,
+        }
@@ -0,0 +1,143 @@
+"""
+Processador de updates concorrente com ordenação por usuário.
+Usuários diferentes são atendidos em paralelo; os updates de um mesmo usuário seguem em ordem.
+"""
+
+import time
+import asyncio
+import logging
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Executa updates de usuários distintos em paralelo, mantendo a ordem de cada usuário"""
+
+    def __init__(self, max_concurrent_updates=16, max_pending_updates=10000,
+                 arrival_hook=None, turn_hook=None):
+        """
+        Inicializa o processador
+
+        Args:
+            max_concurrent_updates (int): Número máximo de updates executando ao mesmo tempo
+            max_pending_updates (int): Número máximo de updates aceitos (executando ou aguardando)
+            arrival_hook (callable): Função chamada com o update assim que ele é aceito
+            turn_hook (callable): Corrotina aguardada quando chega a vez do update do usuário,
+                antes de ocupar uma vaga de execução
+        """
+        # O semáforo da classe base limita apenas os updates pendentes; a concorrência real
+        # é limitada depois de obter a vez do usuário, para que a fila de um usuário não
+        # ocupe vagas que outros usuários poderiam usar
+        super().__init__(max(max_pending_updates, max_concurrent_updates))
+        self.concurrency_limit = max_concurrent_updates
+        self.arrival_hook = arrival_hook
+        self.turn_hook = turn_hook
+        self._running = None
+        self._user_queues = {}  # chave -> [asyncio.Lock, updates aguardando ou executando]
+
+        # Métricas
+        self._processed = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._max_user_queue = 0
+
+    async def initialize(self):
+        """Cria o semáforo de execução no loop atual"""
+        self._running = asyncio.Semaphore(self.concurrency_limit)
+
+    async def shutdown(self):
+        """Nada a liberar além das filas, que se esvaziam sozinhas"""
+
+    @staticmethod
+    def _ordering_key(update):
+        """Chave que define a ordem: o usuário, ou o chat quando não houver usuário"""
+        user = getattr(update, 'effective_user', None)
+        if user:
+            return user.id
+        chat = getattr(update, 'effective_chat', None)
+        if chat:
+            return ('chat', chat.id)
+        return None
+
+    async def do_process_update(self, update, coroutine):
+        """Aguarda a vez do usuário e uma vaga de execução antes de processar o update"""
+        enqueued_at = time.perf_counter()
+        key = self._ordering_key(update)
+        if self.arrival_hook:
+            self.arrival_hook(update)
+
+        if key is None:
+            async with self._running:
+                self._record_wait(enqueued_at)
+                await coroutine
+            return
+
+        entry = self._user_queues.get(key)
+        if entry is None:
+            entry = self._user_queues[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        self._max_user_queue = max(self._max_user_queue, entry[1])
+
+        try:
+            # asyncio.Lock atende quem chegou primeiro, preservando a ordem dos updates
+            async with entry[0]:
+                if self.turn_hook:
+                    await self.turn_hook(update)
+                async with self._running:
+                    self._record_wait(enqueued_at)
+                    await coroutine
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._user_queues[key]
+
+    async def wait_idle(self, key):
+        """
+        Aguarda até que os updates já aceitos de um usuário terminem
+
+        Args:
+            key: ID do usuário
+        """
+        entry = self._user_queues.get(key)
+        if entry:
+            async with entry[0]:
+                pass
+
+    def is_busy(self, key):
+        """
+        Indica se o usuário tem updates aceitos (executando ou aguardando a vez)
+
+        Args:
+            key: ID do usuário
+
+        Returns:
+            bool: True enquanto a fila do usuário não estiver vazia
+        """
+        return key in self._user_queues
+
+    def _record_wait(self, enqueued_at):
+        """Registra o tempo que o update esperou até começar a executar"""
+        wait = time.perf_counter() - enqueued_at
+        self._processed += 1
+        self._wait_total += wait
+        self._wait_max = max(self._wait_max, wait)
+
+    def get_stats(self):
+        """
+        Retorna métricas das filas por usuário
+
+        Returns:
+            dict: Usuários com fila, updates pendentes, maior fila e tempos de espera (ms)
+        """
+        pending = sum(entry[1] for entry in self._user_queues.values())
+        longest = max((entry[1] for entry in self._user_queues.values()), default=0)
+        return {
+            'active_users': len(self._user_queues),
+            'pending_updates': pending,
+            'longest_user_queue': longest,
+            'max_user_queue_seen': self._max_user_queue,
+            'processed': self._processed,
+            'avg_wait_ms': 1000 * self._wait_total / self._processed if self._processed else 0.0,
+            'max_wait_ms': 1000 * self._wait_max,
+            'concurrency_limit': self.concurrency_limit,
+        }
@@ -0,0 +1,201 @@
+"""
+Pré-aquecimento após um reinício.
+O bot registra a atividade recente de cada usuário e a grava ao encerrar; na partida
+seguinte, os usuários mais ativos têm credenciais e serviço do Google montados e a
+agenda de hoje buscada antes da primeira mensagem, em segundo plano e com concorrência
+limitada, para que o deploy não pese na latência das primeiras respostas.
+"""
+
+import os
+import json
+import time
+import heapq
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+class UserActivity:
+    """Pontuação de atividade por usuário, com decaimento exponencial"""
+
+    def __init__(self, path, half_life=86400, max_age=7 * 86400, max_users=100000):
+        """
+        Inicializa o registro
+
+        Args:
+            path (str): Arquivo JSON onde a atividade é gravada no encerramento
+            half_life (float): Segundos para uma mensagem valer metade na pontuação
+            max_age (float): Usuários sem atividade há mais tempo são descartados ao gravar e carregar
+            max_users (int): Máximo de usuários mantidos (os de menor pontuação saem primeiro)
+        """
+        self.path = path
+        self.half_life = half_life
+        self.max_age = max_age
+        self.max_users = max_users
+        self._scores = {}  # user_id -> (pontuação, último acesso em segundos desde a época)
+
+    def _decayed(self, score, last_seen, now):
+        return score * 0.5 ** ((now - last_seen) / self.half_life)
+
+    def record(self, user_id, now=None):
+        """
+        Conta um update do usuário
+
+        Args:
+            user_id (str): ID do usuário
+        """
+        now = time.time() if now is None else now
+        item = self._scores.get(user_id)
+        score = self._decayed(*item, now) if item else 0.0
+        self._scores[user_id] = (score + 1.0, now)
+        if len(self._scores) > 2 * self.max_users:
+            self._trim(now)
+
+    def top(self, n, now=None):
+        """
+        Usuários mais ativos
+
+        Args:
+            n (int): Quantidade de usuários
+
+        Returns:
+            list: IDs dos usuários, do mais ativo ao menos ativo
+        """
+        now = time.time() if now is None else now
+        ranked = heapq.nlargest(n, self._scores.items(), key=lambda item: self._decayed(*item[1], now))
+        return [user_id for user_id, _ in ranked]
+
+    def _trim(self, now):
+        """Descarta usuários inativos há mais de max_age e os de menor pontuação além de max_users"""
+        recent = {user_id: item for user_id, item in self._scores.items() if now - item[1] <= self.max_age}
+        if len(recent) > self.max_users:
+            keep = heapq.nlargest(self.max_users, recent.items(), key=lambda item: self._decayed(*item[1], now))
+            recent = dict(keep)
+        self._scores = recent
+
+    def load(self):
+        """Lê a atividade gravada no último encerramento (arquivo ausente ou inválido: começa vazio)"""
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            self._scores = {user_id: (float(score), float(last_seen)) for user_id, (score, last_seen) in data.items()}
+        except FileNotFoundError:
+            return
+        except (ValueError, TypeError, AttributeError) as e:
+            logger.warning(f"Arquivo de atividade {self.path} ignorado: {e}")
+            return
+        self._trim(time.time())
+        logger.info(f"Atividade recente de {len(self._scores)} usuários carregada")
+
+    def save(self):
+        """Grava a atividade (escrita atômica: um encerramento interrompido não corrompe o arquivo)"""
+        self._trim(time.time())
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump({user_id: list(item) for user_id, item in self._scores.items()}, f)
+        os.replace(temp_path, self.path)
+
+    def __len__(self):
+        return len(self._scores)
+
+
+class WarmUp:
+    """Prepara credenciais, serviço e agenda do dia dos usuários mais ativos"""
+
+    def __init__(self, auth_manager, prefetch=None, concurrency=4, circuit=None):
+        """
+        Inicializa o pré-aquecimento
+
+        Args:
+            auth_manager (CalendarAuth): Mantém credenciais e serviços em memória
+            prefetch (callable): Corrotina prefetch(user_id) que busca e guarda a agenda do dia
+            concurrency (int): Usuários preparados ao mesmo tempo (o resto das threads fica
+                para os updates que já estão chegando)
+            circuit (CalendarCircuit): Disjuntores da API; com a API fora do ar, o aquecimento para
+        """
+        self.auth_manager = auth_manager
+        self.prefetch = prefetch
+        self.concurrency = concurrency
+        self.circuit = circuit
+        self._served = set()  # Usuários que já falaram com o bot desde a partida
+
+        # Métricas
+        self.requested = 0
+        self.warmed = 0
+        self.skipped = 0
+        self.failed = 0
+        self.elapsed = 0.0
+        self.running = False
+
+    def note_served(self, user_id):
+        """
+        Marca um usuário atendido pelo caminho normal (já aquecido; não precisa de nova busca)
+
+        Args:
+            user_id (str): ID do usuário
+        """
+        if self.running:
+            self._served.add(user_id)
+
+    async def run(self, user_ids):
+        """
+        Prepara os usuários na ordem dada (os mais ativos primeiro)
+
+        Args:
+            user_ids (list): IDs dos usuários
+        """
+        self.requested += len(user_ids)
+        self.running = True
+        started = time.perf_counter()
+        pending = iter(user_ids)
+
+        async def worker():
+            for user_id in pending:
+                if user_id in self._served or self.circuit and self.circuit.is_open(user_id):
+                    self.skipped += 1
+                    continue
+                await self._warm(user_id)
+
+        try:
+            await asyncio.gather(*(worker() for _ in range(max(1, self.concurrency))))
+        finally:
+            self.running = False
+            self._served.clear()
+            self.elapsed = time.perf_counter() - started
+        logger.info(f"Pré-aquecimento: {self.warmed} usuários prontos, {self.skipped} ignorados, "
+                    f"{self.failed} com erro em {self.elapsed:.1f}s")
+
+    async def _warm(self, user_id):
+        """Carrega o token, monta o serviço e busca a agenda do dia de um usuário"""
+        try:
+            service = await asyncio.to_thread(self.auth_manager.get_calendar_service, user_id)
+            if service is None:
+                # Sem token (saiu ou nunca configurou)
+                self.skipped += 1
+                return
+            if self.prefetch and not await self.prefetch(user_id):
+                self.failed += 1
+                return
+            self.warmed += 1
+        except Exception as e:
+            self.failed += 1
+            logger.warning(f"Erro ao pré-aquecer usuário {user_id}: {e}")
+
+    def get_stats(self):
+        """
+        Retorna métricas do pré-aquecimento
+
+        Returns:
+            dict: Usuários pedidos, prontos, ignorados, com erro e duração
+        """
+        return {
+            'running': self.running,
+            'requested': self.requested,
+            'warmed': self.warmed,
+            'skipped': self.skipped,
+            'failed': self.failed,
+            'elapsed_s': self.elapsed,
+        }
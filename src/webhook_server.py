@@ -0,0 +1,279 @@
+"""
+Servidor HTTP assíncrono embutido para receber updates do Telegram via webhook.
+Valida o token secreto e entrega os updates à aplicação com uma fila limitada (backpressure).
+O /healthz expõe detalhes internos dos componentes e exige o mesmo token secreto.
+"""
+
+import hmac
+import json
+import time
+import asyncio
+import logging
+from urllib.parse import urlsplit, parse_qs
+
+logger = logging.getLogger(__name__)
+
+# Limites de proteção para requisições recebidas
+MAX_HEADER_COUNT = 100
+MAX_BODY_SIZE = 1024 * 1024
+
+SECRET_HEADER = 'x-telegram-bot-api-secret-token'
+
+REASONS = {
+    200: 'OK', 400: 'Bad Request', 401: 'Unauthorized', 404: 'Not Found',
+    405: 'Method Not Allowed', 413: 'Payload Too Large', 429: 'Too Many Requests',
+    503: 'Service Unavailable'
+}
+
+class WebhookServer:
+    """Recebe updates por HTTP e os repassa para um consumidor assíncrono"""
+
+    def __init__(self, handle_update, path='/telegram', secret_token=None, host='0.0.0.0',
+                 port=8443, max_queue=1000, enqueue_timeout=1.0, routes=None, extra_stats=None):
+        """
+        Inicializa o servidor
+
+        Args:
+            handle_update (callable): Corrotina que recebe o update (dict) já validado
+            path (str): Caminho do webhook
+            secret_token (str): Token esperado no cabeçalho do Telegram, exigido também no /healthz
+                (None desativa a validação)
+            host (str): Endereço de escuta
+            port (int): Porta de escuta
+            max_queue (int): Número máximo de updates aguardando processamento
+            enqueue_timeout (float): Espera máxima por espaço na fila antes de responder 503
+            routes (dict): Rotas extras {caminho: corrotina(method, query, body) -> (status, corpo)}
+            extra_stats (dict): Métricas de outros componentes no /healthz {nome: função}
+        """
+        self.handle_update = handle_update
+        self.path = path
+        self.secret_token = secret_token
+        self.host = host
+        self.port = port
+        self.enqueue_timeout = enqueue_timeout
+        self.routes = dict(routes or {})
+        self.extra_stats = dict(extra_stats or {})
+
+        self._queue = asyncio.Queue(maxsize=max_queue)
+        self._server = None
+        self._consumer = None
+
+        # Métricas
+        self.received = 0
+        self.rejected = 0
+        self.processed = 0
+        self.failed = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+
+    async def start(self):
+        """Começa a escutar conexões e a consumir a fila"""
+        self._consumer = asyncio.create_task(self._consume())
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        logger.info(f"Webhook escutando em {self.host}:{self.port}{self.path}")
+
+    async def stop(self):
+        """Para de aceitar conexões e processa o que já estava na fila"""
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+        if self._consumer:
+            await self._queue.join()
+            self._consumer.cancel()
+            try:
+                await self._consumer
+            except asyncio.CancelledError:
+                pass
+            self._consumer = None
+
+    async def _consume(self):
+        """Entrega os updates enfileirados à aplicação, um por vez"""
+        while True:
+            update, received_at = await self._queue.get()
+            try:
+                await self.handle_update(update)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Erro ao processar update do webhook: {e}")
+            finally:
+                latency = time.perf_counter() - received_at
+                self._latency_total += latency
+                self._latency_max = max(self._latency_max, latency)
+                self._queue.task_done()
+
+    async def _enqueue(self, update):
+        """
+        Coloca o update na fila, esperando um pouco se estiver cheia
+
+        Returns:
+            bool: False se a fila continuar cheia (o Telegram reenviará o update)
+        """
+        item = (update, time.perf_counter())
+        try:
+            self._queue.put_nowait(item)
+            return True
+        except asyncio.QueueFull:
+            pass
+
+        try:
+            await asyncio.wait_for(self._queue.put(item), timeout=self.enqueue_timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def _handle_connection(self, reader, writer):
+        """Atende uma conexão HTTP/1.1, inclusive com keep-alive"""
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+
+                method, target, headers, body, error = request
+                if error:
+                    # Corpo não lido: o resto do fluxo não é uma requisição; responder e fechar
+                    self._write_response(writer, error, b'', 'text/plain', keep_alive=False)
+                    await writer.drain()
+                    break
+
+                status, payload, content_type = await self._dispatch(method, target, headers, body)
+
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                self._write_response(writer, status, payload, content_type, keep_alive)
+                await writer.drain()
+
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            logger.error(f"Erro na conexão do webhook: {e}")
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        """
+        Lê uma requisição HTTP
+
+        Returns:
+            tuple: (método, alvo, cabeçalhos, corpo, erro) ou None se a conexão foi encerrada;
+                erro é o status a responder (400 ou 413) quando o corpo não pôde ser lido
+        """
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+
+        try:
+            method, target, _ = request_line.decode('latin-1').split(' ', 2)
+        except ValueError:
+            return None
+
+        headers = {}
+        for _ in range(MAX_HEADER_COUNT):
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        # Sem um Content-Length válido não há como saber onde o corpo termina
+        if 'transfer-encoding' in headers:
+            return method, target, headers, None, 400
+        try:
+            length = int(headers.get('content-length') or 0)
+        except ValueError:
+            return method, target, headers, None, 400
+        if length < 0:
+            return method, target, headers, None, 400
+        if length > MAX_BODY_SIZE:
+            return method, target, headers, None, 413
+        body = await reader.readexactly(length) if length else b''
+
+        return method, target, headers, body, None
+
+    async def _dispatch(self, method, target, headers, body):
+        """
+        Roteia a requisição
+
+        Returns:
+            tuple: (status, corpo, content-type)
+        """
+        url = urlsplit(target)
+
+        if url.path == self.path:
+            if method != 'POST':
+                return 405, b'', 'text/plain'
+
+            # Validar o token secreto enviado pelo Telegram
+            if not self._authorized(headers):
+                return 401, b'', 'text/plain'
+
+            try:
+                update = json.loads(body)
+            except ValueError:
+                return 400, b'', 'text/plain'
+
+            self.received += 1
+            if not await self._enqueue(update):
+                self.rejected += 1
+                return 503, b'', 'text/plain'
+            return 200, b'', 'text/plain'
+
+        if url.path == '/healthz':
+            # Mesmo listener público do webhook: métricas só para quem tem o token
+            if not self._authorized(headers):
+                return 401, b'', 'text/plain'
+            stats = self.get_stats()
+            for name, provider in self.extra_stats.items():
+                stats[name] = provider()
+            return 200, json.dumps(stats).encode(), 'application/json'
+
+        handler = self.routes.get(url.path)
+        if handler:
+            status, payload = await handler(method, parse_qs(url.query), body)
+            if isinstance(payload, str):
+                payload = payload.encode()
+            return status, payload, 'text/html; charset=utf-8'
+
+        return 404, b'', 'text/plain'
+
+    def _authorized(self, headers):
+        """Confere o token secreto no cabeçalho (sempre True se a validação está desativada)"""
+        if self.secret_token is None:
+            return True
+        received = headers.get(SECRET_HEADER, '')
+        return hmac.compare_digest(received.encode(), self.secret_token.encode())
+
+    @staticmethod
+    def _write_response(writer, status, payload, content_type, keep_alive):
+        """Escreve a resposta HTTP"""
+        head = (
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+            "\r\n"
+        )
+        writer.write(head.encode('latin-1') + payload)
+
+    def get_stats(self):
+        """
+        Retorna métricas do webhook
+
+        Returns:
+            dict: Updates recebidos, rejeitados, processados, fila e latência (ms)
+        """
+        done = self.processed + self.failed
+        return {
+            'received': self.received,
+            'rejected': self.rejected,
+            'processed': self.processed,
+            'failed': self.failed,
+            'queue_size': self._queue.qsize(),
+            'queue_capacity': self._queue.maxsize,
+            'avg_latency_ms': 1000 * self._latency_total / done if done else 0.0,
+            'max_latency_ms': 1000 * self._latency_max,
+        }
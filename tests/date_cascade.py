@@ -0,0 +1,107 @@
+"""
+Cascata de expressões regulares que a gramática de datas substituiu (extract_date/extract_time
+da versão anterior do NLPProcessor), com a data de referência como parâmetro. É o oráculo
+dos casos de referência e a base de comparação do benchmark (bench/date_grammar_bench.py).
+"""
+
+import re
+from datetime import datetime, timedelta
+
+def legacy_extract_date(text, current_date):
+    """extract_date da cascata antiga"""
+    text_lower = text.lower()
+
+    if 'hoje' in text_lower:
+        return current_date.isoformat()
+
+    if 'amanhã' in text_lower or 'amanha' in text_lower:
+        return (current_date + timedelta(days=1)).isoformat()
+
+    if 'depois de amanhã' in text_lower or 'depois de amanha' in text_lower:
+        return (current_date + timedelta(days=2)).isoformat()
+
+    days_map = {
+        'segunda': 0, 'segunda-feira': 0, 'segunda feira': 0,
+        'terça': 1, 'terça-feira': 1, 'terça feira': 1, 'terca': 1, 'terca-feira': 1, 'terca feira': 1,
+        'quarta': 2, 'quarta-feira': 2, 'quarta feira': 2,
+        'quinta': 3, 'quinta-feira': 3, 'quinta feira': 3,
+        'sexta': 4, 'sexta-feira': 4, 'sexta feira': 4,
+        'sábado': 5, 'sabado': 5,
+        'domingo': 6
+    }
+
+    for day_name, day_num in days_map.items():
+        if day_name in text_lower:
+            days_ahead = (day_num - current_date.weekday()) % 7
+            if days_ahead == 0:
+                days_ahead = 7
+            return (current_date + timedelta(days=days_ahead)).isoformat()
+
+    date_patterns = [
+        r'\b(\d{1,2})[/.-](\d{1,2})(?:[/.-](\d{2,4}))?\b',
+        r'\bdia (\d{1,2})(?:[ ](?:de|do|da)[ ]([a-zA-Zç]+))?\b'
+    ]
+
+    for pattern in date_patterns:
+        matches = re.findall(pattern, text_lower)
+        if matches:
+            match = matches[0]
+            if len(match) >= 2 and match[0].isdigit() and match[1].isdigit():
+                day = int(match[0])
+                month = int(match[1])
+                if len(match) > 2 and match[2] and match[2].isdigit():
+                    year = int(match[2])
+                    if year < 100:
+                        year += 2000
+                else:
+                    year = current_date.year
+                    if month < current_date.month or (month == current_date.month and day < current_date.day):
+                        year += 1
+                try:
+                    return datetime(year, month, day).date().isoformat()
+                except ValueError:
+                    pass
+
+    return None
+
+def legacy_extract_time(text):
+    """extract_time da cascata antiga"""
+    text_lower = text.lower()
+
+    time_patterns = [
+        r'\b(\d{1,2}):(\d{2})\b',
+        r'\b(\d{1,2})h(?:(\d{2}))?\b',
+        r'\b(\d{1,2}) ?horas?(?: e (\d{1,2}) ?minutos?)?\b',
+        r'\b(\d{1,2}) ?(?:h|hrs)\b',
+        r'\b(?:às|as|ao meio[- ]dia)(?: e (\d{1,2}))?\b',
+        r'\bmeio[- ]dia\b'
+    ]
+
+    for pattern in time_patterns:
+        matches = re.findall(pattern, text_lower)
+        if matches:
+            match = matches[0]
+            if pattern == r'\bmeio[- ]dia\b':
+                return "12:00"
+            if pattern == r'\b(?:às|as|ao meio[- ]dia)(?: e (\d{1,2}))?\b':
+                if match:
+                    return f"12:{int(match):02d}"
+                return "12:00"
+            hour = int(match[0]) if match[0] else 0
+            minute = int(match[1]) if len(match) > 1 and match[1] else 0
+            if 'tarde' in text_lower or 'noite' in text_lower:
+                if hour < 12:
+                    hour += 12
+            return f"{hour:02d}:{minute:02d}"
+
+    return None
+
+def legacy_parse(text, today):
+    """Data e horário pela cascata antiga: (data ISO, "HH:MM")"""
+    return legacy_extract_date(text, today), legacy_extract_time(text)
+
+def grammar_parse(parser, text, today):
+    """Data e horário pela gramática, no mesmo formato da cascata"""
+    match = parser.parse(text, today)
+    return (match.date.isoformat() if match.date else None,
+            f"{match.time[0]:02d}:{match.time[1]:02d}" if match.time else None)
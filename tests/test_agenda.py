@@ -0,0 +1,193 @@
+"""
+Agenda paginada: páginas montadas sob demanda, limite de tamanho e botões de navegação;
+cache das listagens de um dia e invalidação quando a agenda muda.
+"""
+
+import asyncio
+import threading
+from datetime import date
+
+import pytest
+
+pytest.importorskip("telegram")
+
+import agenda
+from agenda import AgendaCache, AgendaPager, AgendaView, telegram_length
+
+DAY = date(2026, 10, 19)
+
+
+def event(index, day=DAY, summary=None):
+    return {
+        'start': {'dateTime': f"{day.isoformat()}T{8 + index // 4:02d}:{index % 4 * 15:02d}:00-03:00"},
+        'end': {'dateTime': f"{day.isoformat()}T{9 + index // 4:02d}:00:00-03:00"},
+        'summary': summary or f"Evento {index}",
+    }
+
+
+class Source:
+    """Páginas da API com contagem de buscas; falha na página fail_at"""
+
+    def __init__(self, count, page_size=2, fail_at=None):
+        self.count = count
+        self.page_size = page_size
+        self.fail_at = fail_at
+        self.fetched = 0
+
+    def __iter__(self):
+        for start in range(0, self.count, self.page_size):
+            if self.fetched == self.fail_at:
+                yield False, "Erro ao listar eventos: timeout"
+                return
+            self.fetched += 1
+            yield True, [event(index) for index in range(start, min(start + self.page_size, self.count))]
+
+
+def make_view(source, **kwargs):
+    return AgendaView("📅 Agenda:\n\n", source, single_day=DAY, **kwargs)
+
+
+def test_pages_are_fetched_only_when_shown():
+    source = Source(20)
+    view = make_view(source, page_events=3)
+
+    first, has_next = asyncio.run(view.page(0))
+
+    # Três eventos na página e um a mais para saber se há próxima: duas páginas da API
+    assert source.fetched == 2 and has_next
+    assert first.count("🕒") == 3 and "08:00 - 09:00: Evento 0" in first
+
+    last, has_next = asyncio.run(view.page(6))
+    assert source.fetched == 10 and not has_next
+    assert "(página 7)" in last and last.count("🕒") == 2
+    assert asyncio.run(view.page(7)) == (None, False)
+
+
+def test_pages_stay_under_the_message_limit():
+    long_title = "Reunião de planejamento 🚀 " * 8
+    source_events = [event(index, summary=long_title) for index in range(12)]
+    view = make_view([(True, source_events)], page_events=10, max_length=1000)
+
+    async def all_pages():
+        pages, index = [], 0
+        while True:
+            text, has_next = await view.page(index)
+            if text is None:
+                return pages
+            pages.append(text)
+            index += 1
+
+    pages = asyncio.run(all_pages())
+
+    assert len(pages) > 1
+    assert all(telegram_length(text) <= 1000 for text in pages)
+    assert sum(text.count("🕒") for text in pages) == 12
+
+
+def test_pager_buttons_and_expired_listings():
+    pager = AgendaPager(ttl=600)
+
+    async def scenario():
+        text, keyboard = await pager.open("42", make_view(Source(25), page_events=10))
+        next_data = keyboard.inline_keyboard[0][0].callback_data
+        second, second_keyboard = await pager.show("42", next_data)
+        intruder = await pager.show("7", next_data)
+        return text, next_data, second, second_keyboard, intruder
+
+    text, next_data, second, second_keyboard, intruder = asyncio.run(scenario())
+
+    assert next_data.endswith(":1") and "(página 2)" in second
+    assert [button.text for button in second_keyboard.inline_keyboard[0]] == ["◀️ Página anterior", "Próxima página ▶️"]
+    # Botão de uma listagem de outro usuário é tratado como expirado
+    assert intruder == (None, None) and pager.get_stats()['expired_requests'] == 1
+
+
+def test_single_page_has_no_keyboard_and_errors_are_reported():
+    pager = AgendaPager()
+
+    async def scenario():
+        single = await pager.open("42", make_view(Source(3), page_events=10))
+        empty = await pager.open("42", make_view(Source(0), empty_message="Nada hoje."))
+        failed = await pager.open("42", make_view(Source(30, fail_at=0)))
+        # Falha depois de 12 eventos: a página 2 mostra os 2 já buscados e avisa do erro
+        _, keyboard = await pager.open("42", make_view(Source(30, fail_at=6), page_events=10))
+        partial = await pager.show("42", keyboard.inline_keyboard[0][0].callback_data)
+        return single, empty, failed, partial
+
+    (single_text, single_keyboard), empty, failed, (partial_text, partial_keyboard) = asyncio.run(scenario())
+
+    assert single_text.count("🕒") == 3 and single_keyboard is None
+    assert empty == ("Nada hoje.", None)
+    assert failed == (None, None)
+    assert partial_text.count("🕒") == 2
+    assert partial_text.endswith("⚠️ Não foi possível buscar o restante da agenda: Erro ao listar eventos: timeout")
+    assert [button.text for button in partial_keyboard.inline_keyboard[0]] == ["◀️ Página anterior"]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(agenda.time, "monotonic", clock)
+    return clock
+
+
+def test_cached_day_expires_and_stays_available_as_stale(clock):
+    cache = AgendaCache(ttl=60, max_stale=3600)
+    view = make_view(Source(3))
+    cache.put("42", DAY, view)
+
+    assert cache.get("42", DAY) is view
+    clock.now += 61
+    assert cache.get("42", DAY) is None
+    assert cache.get_stale("42", DAY) == (view, 61)
+    clock.now += 3600
+    assert cache.get_stale("42", DAY) is None
+    assert cache.get_stats()['hits'] == 1 and cache.get_stats()['misses'] == 1
+
+
+def test_change_invalidates_every_day_of_the_user():
+    cache = AgendaCache(ttl=60)
+    other_day = date(2026, 10, 20)
+    for user_id, day in (("42", DAY), ("42", other_day), ("7", DAY)):
+        cache.put(user_id, day, make_view(Source(1)))
+
+    # Chega da thread que chamou a API, como o listener do CalendarManager
+    thread = threading.Thread(target=cache.invalidate_user, args=("42",), kwargs={'event': event(0)})
+    thread.start()
+    thread.join()
+
+    assert cache.get("42", DAY) is None and cache.get("42", other_day) is None
+    assert cache.get("7", DAY) is not None
+    assert cache.get_stats()['invalidations'] == 1 and cache.get_stats()['entries'] == 1
+
+
+def test_oldest_entries_leave_first():
+    cache = AgendaCache(ttl=60, max_entries=2)
+    for user_id in ("1", "2", "3"):
+        cache.put(user_id, DAY, make_view(Source(1)))
+
+    assert cache.get("1", DAY) is None
+    assert cache.get("2", DAY) is not None and cache.get("3", DAY) is not None
+
+
+def test_shared_view_fetches_each_page_once():
+    source = Source(40)
+    view = make_view(source, page_events=10)
+
+    async def scenario():
+        # O mesmo dia em cache atendendo dois toques no botão ao mesmo tempo
+        return await asyncio.gather(view.page(1), view.page(1), view.page(0))
+
+    second, again, first = asyncio.run(scenario())
+
+    assert second == again and "(página 2)" in second[0]
+    assert first[0].count("🕒") == 10
+    assert source.fetched == 11 and view.fetches == 11
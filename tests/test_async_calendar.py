@@ -0,0 +1,77 @@
+"""
+BlockingCalendarManager: chamadas feitas em threads executadas no loop pelo cliente assíncrono.
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+pytest.importorskip("httpx")
+pytest.importorskip("googleapiclient")
+
+from async_calendar import BlockingCalendarManager
+
+
+class FakeAsyncCalendarManager:
+    """Registra em que thread cada corrotina rodou"""
+
+    def __init__(self):
+        self.threads = []
+        self.circuit = "disjuntor"
+
+    async def get_event_by_id(self, user_id, event_id):
+        self.threads.append(threading.current_thread())
+        await asyncio.sleep(0)
+        return True, {'id': event_id}
+
+    async def iter_event_pages(self, user_id, time_min, time_max, page_size=50):
+        for page in range(3):
+            self.threads.append(threading.current_thread())
+            yield True, [{'id': f"{page}-{index}"} for index in range(page_size)]
+
+    def get_stats(self):
+        return {'requests': len(self.threads)}
+
+
+def run_in_threads(calls):
+    """Executa as chamadas em threads, com o loop rodando na thread principal"""
+    manager = FakeAsyncCalendarManager()
+    calendar = BlockingCalendarManager(manager)
+
+    async def scenario():
+        calendar.bind(asyncio.get_running_loop())
+        return await asyncio.gather(*(asyncio.to_thread(call, calendar) for call in calls))
+
+    return manager, asyncio.run(scenario())
+
+
+def test_calls_from_threads_run_on_the_loop():
+    manager, results = run_in_threads([
+        lambda calendar: calendar.get_event_by_id("42", "abc"),
+        lambda calendar: list(calendar.iter_event_pages("42", "2026-10-19", "2026-10-20", page_size=2)),
+    ])
+
+    event, pages = results
+    assert event == (True, {'id': "abc"})
+    assert [len(events) for _, events in pages] == [2, 2, 2]
+    assert set(manager.threads) == {threading.main_thread()}
+
+
+def test_other_attributes_pass_through():
+    calendar = BlockingCalendarManager(FakeAsyncCalendarManager())
+
+    assert calendar.circuit == "disjuntor"
+    assert calendar.get_stats() == {'requests': 0}
+
+
+def test_call_on_the_loop_thread_is_refused():
+    calendar = BlockingCalendarManager(FakeAsyncCalendarManager())
+
+    async def scenario():
+        calendar.bind(asyncio.get_running_loop())
+        # Bloquearia o loop que precisa executar a chamada
+        return calendar.get_event_by_id("42", "abc")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(scenario())
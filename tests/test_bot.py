@@ -0,0 +1,61 @@
+"""
+Montagem do CalendarBot: o construtor liga todos os componentes entre si, e um erro de
+ordem entre eles impede o bot de subir em qualquer modo (inclusive nos workers).
+"""
+
+import sys
+import importlib
+
+import pytest
+
+pytest.importorskip("telegram")
+pytest.importorskip("googleapiclient")
+
+
+@pytest.fixture
+def bot_module(tmp_path, monkeypatch):
+    """Módulo bot importado com token de teste e arquivos em um diretório temporário"""
+    monkeypatch.setenv("TELEGRAM_TOKEN", "123456:TEST-TOKEN")
+    monkeypatch.setenv("DEBOUNCE_MS", "300")
+    monkeypatch.delenv("WEBHOOK_URL", raising=False)
+    # Os caminhos padrão (data/...) são relativos ao diretório de trabalho
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data").mkdir()
+
+    # As configurações são lidas na importação
+    sys.modules.pop("bot", None)
+    module = importlib.import_module("bot")
+    yield module
+    sys.modules.pop("bot", None)
+
+
+def test_calendar_bot_builds(bot_module):
+    bot = bot_module.CalendarBot()
+
+    assert bot.expiry.is_busy == bot.update_processor.is_busy
+    assert bot.app.update_processor is bot.update_processor
+
+
+def test_calendar_bot_builds_as_shard_worker(bot_module):
+    bot = bot_module.CalendarBot(shard=2)
+
+    assert bot.expiry.is_busy == bot.update_processor.is_busy
+    assert not bot.update_processor.is_busy(42)
+
+
+def test_healthz_reports_nlp_cache(bot_module):
+    bot = bot_module.CalendarBot()
+    bot.nlp_processor.process_message("o que tenho hoje?")
+    bot.nlp_processor.process_message("o que tenho hoje?")
+
+    stats = bot._component_stats()['nlp_cache']()
+
+    assert stats['hits'] == 1 and stats['misses'] == 1
+
+
+def test_calendar_backend_async(bot_module, monkeypatch):
+    monkeypatch.setattr(bot_module, "CALENDAR_BACKEND", "async")
+    bot = bot_module.CalendarBot()
+
+    assert bot.calendar_manager.circuit is bot.circuit
+    assert bot._component_stats()['calendar_http']()['requests'] == 0
@@ -0,0 +1,239 @@
+"""
+Disjuntores: abertura pela taxa de falhas, recusa imediata, teste meio-aberto e disjuntores por usuário.
+"""
+
+import pytest
+
+import circuit_breaker
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CalendarCircuit, CircuitBreaker
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", clock)
+    return clock
+
+
+def make_breaker(**kwargs):
+    return CircuitBreaker("teste", **{'failure_ratio': 0.5, 'min_calls': 4, 'window_calls': 4,
+                                     'open_seconds': 30, **kwargs})
+
+
+def test_opens_only_after_min_calls_and_fails_fast(clock):
+    breaker = make_breaker()
+    for failed in (True, True, True):
+        breaker.record(failed)
+    # Três falhas seguidas não bastam: ainda abaixo de min_calls
+    assert breaker.state == CLOSED
+
+    breaker.record(False)
+
+    assert breaker.state == OPEN and breaker.opens == 1
+    assert [breaker.allow() for _ in range(3)] == [False] * 3
+    assert breaker.rejected == 3
+    assert breaker.is_open() and breaker.retry_after() == 30
+    clock.now += 10
+    assert breaker.retry_after() == 20
+
+
+def test_failures_are_weighed_over_the_latest_calls(clock):
+    breaker = make_breaker(window=60)
+    for failed in (False, False, False, True):
+        breaker.record(failed)
+    assert breaker.state == CLOSED
+
+    # Chamadas antigas saem da janela por idade: sem isso, [acerto, acerto, falha, falha] já abriria
+    clock.now += 61
+    for failed in (True, False, False):
+        breaker.record(failed)
+    assert breaker.state == CLOSED
+
+    breaker.record(True)
+    assert breaker.state == OPEN
+
+
+def test_half_open_probe_closes_on_success(clock):
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.record(True)
+    clock.now += 30
+
+    assert breaker.allow() and breaker.state == HALF_OPEN
+    # Só uma chamada de teste por vez; as outras continuam recusadas
+    assert not breaker.allow()
+    assert breaker.retry_after() == 0 and not breaker.is_open()
+
+    breaker.record(False)
+
+    assert breaker.state == CLOSED
+    assert all(breaker.allow() for _ in range(5))
+    # A janela recomeça: falhas de antes da abertura não voltam a contar
+    for failed in (True, True, True):
+        breaker.record(failed)
+    assert breaker.state == CLOSED
+
+
+def test_failed_probe_reopens_for_another_period(clock):
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.record(True)
+    clock.now += 30
+    assert breaker.allow()
+
+    breaker.record(True)
+
+    assert breaker.state == OPEN and breaker.opens == 2
+    assert breaker.retry_after() == 30
+    assert not breaker.allow()
+
+
+def test_released_probe_lets_the_next_call_test(clock):
+    breaker = make_breaker(half_open_probes=1)
+    for _ in range(4):
+        breaker.record(True)
+    clock.now += 30
+    assert breaker.allow()
+
+    # Chamada de teste desistida (ex.: o disjuntor global recusou)
+    breaker.release()
+
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+
+
+def test_call_started_before_opening_does_not_change_the_open_breaker(clock):
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.record(True)
+
+    breaker.record(False)
+
+    assert breaker.state == OPEN and breaker.retry_after() == 30
+
+
+def make_circuit(**kwargs):
+    return CalendarCircuit(**{'min_calls': 4, 'window_calls': 4, 'open_seconds': 30, 'user_min_calls': 2,
+                              'user_window_calls': 2, 'user_open_seconds': 60, 'slow_call': 10, **kwargs})
+
+
+def test_user_breaker_isolates_a_failing_user(clock):
+    circuit = make_circuit(min_calls=100, window_calls=100)
+    for _ in range(2):
+        assert circuit.allow("1")
+        circuit.record("1", True)
+
+    assert not circuit.allow("1")
+    assert circuit.is_open("1") and circuit.retry_after("1") == 60
+    assert circuit.allow("2") and not circuit.is_open("2")
+    stats = circuit.get_stats()
+    assert stats['state'] == CLOSED and stats['users_open'] == 1 and stats['user_rejected'] == 1
+
+    clock.now += 60
+    assert circuit.allow("1")
+    circuit.record("1", False)
+    assert circuit.allow("1") and circuit.get_stats()['users_open'] == 0
+
+
+def test_global_breaker_stops_every_user(clock):
+    circuit = make_circuit()
+    for user_id in ("1", "2", "3", "4"):
+        assert circuit.allow(user_id)
+        circuit.record(user_id, True)
+
+    assert circuit.get_stats()['state'] == OPEN
+    assert not circuit.allow("5") and circuit.is_open("5") and circuit.retry_after("5") == 30
+
+    clock.now += 30
+    # Uma única chamada de teste passa pelo global, de qualquer usuário
+    assert circuit.allow("5")
+    assert not circuit.allow("6")
+    circuit.record("5", False)
+
+    assert circuit.get_stats()['state'] == CLOSED
+    assert circuit.allow("6")
+
+
+def test_global_refusal_releases_the_user_probe(clock):
+    circuit = make_circuit(user_min_calls=2, min_calls=100, window_calls=100)
+    circuit.record("1", True)
+    circuit.record("1", True)
+    clock.now += 60
+    # Disjuntor do usuário meio-aberto, global aberto: a vaga de teste do usuário volta
+    circuit.global_breaker._open(clock.now)
+
+    assert not circuit.allow("1")
+    assert circuit._users["1"].state == HALF_OPEN and circuit._users["1"]._probes == 0
+
+
+def test_slow_calls_count_as_failures(clock):
+    circuit = make_circuit()
+
+    circuit.record("1", False, elapsed=11)
+    circuit.record("1", False, elapsed=12)
+
+    assert circuit.is_open("1")
+    assert circuit.get_stats()['slow_calls'] == 2
+
+
+def test_eviction_keeps_open_user_breakers(clock):
+    circuit = make_circuit(min_calls=100, window_calls=100, max_users=2)
+    circuit.record("1", True)
+    circuit.record("1", True)
+    circuit.record("2", True)
+    circuit.record("3", True)
+
+    assert list(circuit._users) == ["1", "3"]
+    assert circuit.is_open("1")
+
+
+class FailingService:
+    """Serviço da API que sempre falha ao excluir, contando as chamadas"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def events(self):
+        return self
+
+    def delete(self, calendarId, eventId):
+        return self
+
+    def execute(self):
+        self.calls += 1
+        raise TimeoutError("timed out")
+
+
+class FakeAuth:
+    def __init__(self, service):
+        self.service = service
+
+    def get_calendar_service(self, user_id):
+        return self.service
+
+
+def test_open_circuit_answers_without_calling_the_api(clock):
+    pytest.importorskip("googleapiclient")
+    from calendar_manager import CIRCUIT_OPEN_MESSAGE, CalendarManager
+
+    service = FailingService()
+    manager = CalendarManager(FakeAuth(service), circuit=make_circuit(min_calls=100, window_calls=100))
+
+    results = [manager.delete_event("42", "evento") for _ in range(5)]
+
+    # Duas falhas sem status (timeout) abrem o disjuntor do usuário; o resto nem chega à API
+    assert service.calls == 2
+    assert all(not success for success, _ in results)
+    assert [message for _, message in results[2:]] == [CIRCUIT_OPEN_MESSAGE] * 3
+
+    clock.now += 60
+    manager.delete_event("42", "evento")
+    assert service.calls == 3 and manager.circuit.is_open("42")
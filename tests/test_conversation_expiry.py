@@ -0,0 +1,94 @@
+"""
+Expiração do estado de conversa: prazos por estado, limpeza do fluxo e adiamento com update em andamento.
+"""
+
+import time
+import asyncio
+
+import pytest
+
+pytest.importorskip("telegram")
+
+from conversation_expiry import BUSY_RETRY, EXPIRED_NOTICE, ConversationExpiry
+
+IDLE, AWAITING_TIME, SETUP = 0, 1, 2
+
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text, rate_limit_args=None):
+        self.sent.append((chat_id, text))
+
+
+class FakeApplication:
+    """O que o varredor usa da Application do PTB"""
+
+    def __init__(self, user_data):
+        self.user_data = user_data
+        self.bot = FakeBot()
+        self.dropped = []
+        self.marked = []
+
+    def drop_user_data(self, user_id):
+        self.dropped.append(user_id)
+        del self.user_data[user_id]
+
+    def mark_data_for_update_persistence(self, user_ids):
+        self.marked.append(user_ids)
+
+
+def make_expiry(**kwargs):
+    return ConversationExpiry(IDLE, default_ttl=900, ttl_by_state={SETUP: None, AWAITING_TIME: 60}, **kwargs)
+
+
+def test_deadline_follows_the_state_and_the_latest_touch():
+    expiry = make_expiry()
+    waiting, setup = {'state': AWAITING_TIME}, {'state': SETUP}
+
+    expiry.touch(1, waiting, now=0)
+    expiry.touch(1, waiting, now=50)   # Resposta do usuário renova o prazo
+    expiry.touch(2, setup, now=0)      # Configuração não expira
+
+    assert expiry.due(now=100) == []
+    assert expiry.due(now=110) == [1]
+    assert 'expires_at' not in setup and expiry.get_stats()['tracked_users'] == 0
+
+
+def test_expired_flow_is_cleared_and_the_user_notified():
+    expiry = make_expiry()
+    application = FakeApplication({
+        1: {'state': AWAITING_TIME, 'pending_event': {'summary': 'Reunião'}, 'expires_at': time.time() - 1},
+        2: {'state': AWAITING_TIME, 'pending_event': {}, 'timezone': 'America/Recife',
+            'expires_at': time.time() - 1},
+    })
+
+    asyncio.run(expiry._expire_user(application, 1))
+    asyncio.run(expiry._expire_user(application, 2))
+
+    # Sem mais nada guardado, o usuário sai da memória; com preferências, só o fluxo sai
+    assert application.dropped == [1]
+    assert application.user_data[2] == {'state': IDLE, 'timezone': 'America/Recife'}
+    assert application.marked == [2]
+    assert application.bot.sent == [(1, EXPIRED_NOTICE), (2, EXPIRED_NOTICE)]
+
+
+def test_busy_user_is_deferred_until_the_update_finishes():
+    busy = {1}
+    expiry = make_expiry(is_busy=lambda user_id: user_id in busy)
+    user_data = {'state': AWAITING_TIME, 'pending_event': {}, 'expires_at': time.time() - 1}
+    application = FakeApplication({1: user_data})
+
+    before = time.time()
+    asyncio.run(expiry._expire_user(application, 1))
+
+    assert user_data['state'] == AWAITING_TIME and 'pending_event' in user_data
+    assert expiry.deferred == 1 and application.bot.sent == []
+    assert expiry.due(now=before + BUSY_RETRY - 1) == []
+    assert expiry.due(now=time.time() + BUSY_RETRY) == [1]
+
+    busy.clear()
+    asyncio.run(expiry._expire_user(application, 1))
+
+    assert application.dropped == [1] and application.bot.sent == [(1, EXPIRED_NOTICE)]
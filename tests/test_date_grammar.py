@@ -0,0 +1,160 @@
+"""
+Casos de referência da gramática de datas (data de referência: segunda-feira, 19/10/2026).
+
+Cada caso traz a data e o horário esperados e, quando diferem, o que a cascata de
+expressões regulares anterior devolvia (baseline): as diferenças são correções
+intencionais, e os casos sem baseline têm de continuar iguais à cascata.
+"""
+
+from datetime import date
+
+import pytest
+
+from date_grammar import DateTimeParser
+from date_cascade import grammar_parse, legacy_parse
+
+TODAY = date(2026, 10, 19)
+
+def case(text, expected_date, expected_time, end=None, period=None, baseline=None):
+    """Caso de referência; baseline=None significa "igual ao esperado" """
+    return pytest.param(text, (expected_date, expected_time), end, period,
+                        baseline or (expected_date, expected_time), id=text)
+
+GOLDEN = [
+    case('o que tenho hoje?', '2026-10-19', None),
+    case('quais são meus compromissos amanhã', '2026-10-20', None),
+    case('o que tenho depois de amanhã?', '2026-10-21', None, baseline=('2026-10-20', None)),
+    case('marcar reunião depois de amanha às 10h', '2026-10-21', '10:00', baseline=('2026-10-20', '10:00')),
+    case('marcar reunião segunda às 14h', '2026-10-26', '14:00'),
+    case('reunião na segunda-feira às 9h', '2026-10-26', '09:00'),
+    case('reunião segunda feira 9h', '2026-10-26', '09:00'),
+    case('call na terça às 15:30', '2026-10-20', '15:30'),
+    case('terça-feira 11h dentista', '2026-10-20', '11:00'),
+    case('quarta às 8h30', '2026-10-21', '08:30'),
+    case('consulta quinta-feira de manhã às 9', '2026-10-22', '09:00', baseline=('2026-10-22', '12:00')),
+    case('sexta às 18h', '2026-10-23', '18:00'),
+    case('sábado às 10h churrasco', '2026-10-24', '10:00'),
+    case('domingo almoço ao meio-dia', '2026-10-25', '12:00'),
+    case('próxima sexta às 16h', '2026-10-23', '16:00'),
+    case('sexta que vem às 16h', '2026-10-23', '16:00'),
+    case('nesta quinta às 13h', '2026-10-22', '13:00'),
+    case('marcar dentista 15/11 às 9h', '2026-11-15', '09:00'),
+    case('reunião 15/11/2026 10:00', '2026-11-15', '10:00'),
+    case('reunião 05/01/27 às 14h', '2027-01-05', '14:00'),
+    case('evento 30/02 às 10h', None, '10:00'),
+    case('reunião 01.12 às 10h', '2026-12-01', '10:00'),
+    case('reunião 3-11 às 10h', '2026-11-03', '10:00'),
+    case('reunião dia 25 às 10h', '2026-10-25', '10:00', baseline=(None, '10:00')),
+    case('reunião dia 5 às 10h', '2026-11-05', '10:00', baseline=(None, '10:00')),
+    case('reunião dia 15 de março às 9h', '2027-03-15', '09:00', baseline=(None, '09:00')),
+    case('reunião dia 15 de março de 2027 às 9h', '2027-03-15', '09:00', baseline=(None, '09:00')),
+    case('reunião 20 de novembro às 14h', '2026-11-20', '14:00', baseline=(None, '14:00')),
+    case('aniversário 2 de janeiro', '2027-01-02', None, baseline=(None, None)),
+    case('reunião 31 de dezembro às 23h', '2026-12-31', '23:00', baseline=(None, '23:00')),
+    case('daqui a 3 dias às 10h', '2026-10-22', '10:00', baseline=(None, '10:00')),
+    case('daqui a duas semanas reunião', '2026-11-02', None, baseline=(None, None)),
+    case('em 2 semanas consulta às 9h', '2026-11-02', '09:00', baseline=(None, '09:00')),
+    case('em 1 mês revisão', '2026-11-19', None, baseline=(None, None)),
+    case('reunião às 14:30', None, '14:30'),
+    case('reunião às 14h30', None, '14:30'),
+    case('reunião 14h', None, '14:00'),
+    case('reunião às 3 da tarde', None, '15:00', baseline=(None, '12:00')),
+    case('reunião às 8 da noite', None, '20:00', baseline=(None, '12:00')),
+    case('às 7 da manhã corrida', None, '07:00', baseline=(None, '12:00')),
+    case('reunião às 3 horas', None, '03:00'),
+    case('reunião 3 horas da tarde', None, '15:00'),
+    case('reunião às 15', None, '15:00', baseline=(None, '12:00')),
+    case('reunião às 9 e meia', None, '09:30', baseline=(None, '12:00')),
+    case('reunião às 10 e 15', None, '10:15', baseline=(None, '12:00')),
+    case('reunião às 10 e 15 minutos', None, '10:15', baseline=(None, '12:00')),
+    case('almoço meio-dia', None, '12:00'),
+    case('almoço ao meio dia', None, '12:00'),
+    case('festa à meia-noite', None, '00:00', baseline=(None, None)),
+    case('reunião de 14h às 16h', None, '14:00', end='16:00'),
+    case('reunião das 9h às 10h30', None, '09:00', end='10:30'),
+    case('reunião entre 9h e 10h', None, '09:00', end='10:00'),
+    case('reunião 14h-16h', None, '14:00', end='16:00'),
+    case('reunião de 2 às 4 da tarde', None, '14:00', end='16:00', baseline=(None, '12:00')),
+    case('aula das 19h às 21h', None, '19:00', end='21:00'),
+    case('reunião com duração de 2 horas amanhã às 10h', '2026-10-20', '10:00'),
+    case('reunião por 2 horas amanhã às 10h', '2026-10-20', '10:00'),
+    case('reunião de 2 horas às 15h', None, '15:00'),
+    case('reunião de 1,5 horas amanhã às 9h', '2026-10-20', '09:00'),
+    case('reunião 1 hora amanhã 10h', '2026-10-20', '10:00'),
+    case('reunião 1 hora amanhã', '2026-10-20', None, baseline=('2026-10-20', '01:00')),
+    case('reunião 2 horas amanhã às 10', '2026-10-20', '10:00', baseline=('2026-10-20', '02:00')),
+    case('marcar dentista amanhã 15 horas', '2026-10-20', '15:00'),
+    case('reunião 14 horas', None, '14:00'),
+    case('reunião de 14 horas às 16 horas', None, '14:00', end='16:00'),
+    case('reunião amanhã à tarde às 3', '2026-10-20', '15:00', baseline=('2026-10-20', '12:00')),
+    case('reunião amanhã de tarde 4h', '2026-10-20', '16:00'),
+    case('reunião amanhã à noite', '2026-10-20', None),
+    case('reunião amanhã às', '2026-10-20', None, baseline=('2026-10-20', '12:00')),
+    case('o que tenho esta semana?', None, None, period=('2026-10-19', '2026-10-26')),
+    case('o que tenho essa semana às 10h', None, '10:00', period=('2026-10-19', '2026-10-26')),
+    case('mostre a agenda deste mês', None, None, period=('2026-10-19', '2026-11-01')),
+    case('compromissos da próxima semana', '2026-10-26', None, period=('2026-10-26', '2026-11-02'), baseline=(None, None)),
+    case('agenda da semana que vem', '2026-10-26', None, period=('2026-10-26', '2026-11-02'), baseline=(None, None)),
+    case('o que tenho no próximo mês', '2026-11-01', None, period=('2026-11-01', '2026-12-01'), baseline=(None, None)),
+    case('mês que vem', '2026-11-01', None, period=('2026-11-01', '2026-12-01'), baseline=(None, None)),
+    case('compromissos nos próximos 3 dias', None, None, period=('2026-10-19', '2026-10-22')),
+    case('próximas duas semanas', None, None, period=('2026-10-19', '2026-11-02')),
+    case('próximos 2 meses', None, None, period=('2026-10-19', '2026-12-01')),
+    case('o que tenho no fim de semana', None, None, period=('2026-10-24', '2026-10-26')),
+    case('lembrar de ligar para o segundo colocado', None, None),
+    case('reunião sobre o segmento B hoje', '2026-10-19', None),
+    case('academia toda segunda às 7h até 30/12', '2026-10-26', '07:00'),
+    case('academia toda quarta às 7h até 31/12/2026', '2026-10-21', '07:00'),
+    case('reunião semanal todas as terças às 10h', '2026-10-20', '10:00'),
+    case('aumentar a duração da reunião de amanhã para 2 horas', '2026-10-20', '02:00'),
+    case('mudar a reunião de quinta para 15h', '2026-10-22', '15:00'),
+    case('cancelar o evento de sexta', '2026-10-23', None),
+    case('cancelar reunião de 15/11', '2026-11-15', None),
+    case('quais reuniões tenho hoje à tarde', '2026-10-19', None),
+    case('reunião com ana@exemplo.com amanhã 9:15', '2026-10-20', '09:15'),
+    case('reunião às 25h', None, None, baseline=(None, '25:00')),
+    case('reunião 24:00', None, None, baseline=(None, '24:00')),
+    case('reunião amanhã 9h e depois almoço às 12h', '2026-10-20', '09:00'),
+    case('hoje não, amanhã às 10h', '2026-10-19', '10:00'),
+    case('reunião em 3 dias', '2026-10-22', None, baseline=(None, None)),
+    case('reunião daqui a 10 dias às 8h', '2026-10-29', '08:00', baseline=(None, '08:00')),
+    case('evento 29/02/2028', '2028-02-29', None),
+    case('evento 29/02/2027', None, None),
+    case('tenho algo dia 19?', '2026-10-19', None, baseline=(None, None)),
+    case('tenho algo dia 18?', '2026-11-18', None, baseline=(None, None)),
+    case('encontro ao meio-dia e meia', None, '12:30', baseline=(None, '12:00')),
+    case('reunião às 12 da tarde', None, '12:00'),
+    case('reunião às 12 da noite', None, '00:00', baseline=(None, '12:00')),
+    case('jantar às 9 da noite', None, '21:00', baseline=(None, '12:00')),
+    case('café às 10 da manhã', None, '10:00', baseline=(None, '12:00')),
+    case('prova em 15 minutos', None, None),
+    case('reunião de 30 minutos amanhã às 16h', '2026-10-20', '16:00'),
+    case('reunião 45 minutos segunda 10h', '2026-10-26', '10:00'),
+    case('reunião dia 10 de outubro', '2027-10-10', None, baseline=(None, None)),
+    case('reunião dia 19 de outubro às 10h', '2026-10-19', '10:00', baseline=(None, '10:00')),
+    case('reunião 1º de maio', '2027-05-01', None, baseline=(None, None)),
+    case('reunião amanhã 10 hrs', '2026-10-20', '10:00', baseline=('2026-10-20', '01:00')),
+    case('reunião amanhã 10hs', '2026-10-20', '10:00', baseline=('2026-10-20', None)),
+    case('reunião amanhã 10 h', '2026-10-20', '10:00', baseline=('2026-10-20', '01:00')),
+    case('reunião às duas da tarde', None, '14:00', baseline=(None, '12:00')),
+    case('reunião às onze', None, '11:00', baseline=(None, '12:00')),
+    case('reunião à uma da tarde', None, '13:00', baseline=(None, None)),
+    case('reunião às quinze horas', None, '15:00', baseline=(None, '12:00')),
+    case('reunião amanhã as 9', '2026-10-20', '09:00', baseline=('2026-10-20', '12:00')),
+]
+
+@pytest.fixture(scope="module")
+def parser():
+    return DateTimeParser()
+
+@pytest.mark.parametrize("text, expected, end, period, baseline", GOLDEN)
+def test_grammar(parser, text, expected, end, period, baseline):
+    match = parser.parse(text, TODAY)
+
+    assert grammar_parse(parser, text, TODAY) == expected
+    assert (f"{match.end_time[0]:02d}:{match.end_time[1]:02d}" if match.end_time else None) == end
+    assert ((match.range_start.isoformat(), match.range_end.isoformat()) if match.range_start else None) == period
+
+@pytest.mark.parametrize("text, expected, end, period, baseline", GOLDEN)
+def test_regex_cascade_baseline(text, expected, end, period, baseline):
+    assert legacy_parse(text, TODAY) == baseline
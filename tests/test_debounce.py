@@ -0,0 +1,75 @@
+"""
+Agrupamento de mensagens fragmentadas: texto combinado, mensagens absorvidas e espera limitada.
+"""
+
+import time
+import asyncio
+from types import SimpleNamespace
+
+from debounce import MessageDebouncer
+
+
+def message(message_id, text, user_id=1):
+    return SimpleNamespace(
+        message=SimpleNamespace(message_id=message_id, text=text),
+        effective_user=SimpleNamespace(id=user_id)
+    )
+
+
+def test_fragments_are_merged_into_the_first_message():
+    debouncer = MessageDebouncer(window_ms=20)
+    updates = [message(1, "marcar reunião"), message(2, "amanhã"), message(3, "às 15h")]
+    for update in updates:
+        debouncer.note_arrival(update)
+
+    asyncio.run(debouncer.wait_quiet(updates[0]))
+
+    assert debouncer.collect(updates[0]) == "marcar reunião amanhã às 15h"
+    assert debouncer.collect(updates[1]) is None and debouncer.skip(updates[2])
+    assert debouncer.get_stats() == {'pending_users': 0, 'merged_batches': 1, 'absorbed_messages': 2}
+
+
+def test_users_and_commands_are_not_mixed():
+    debouncer = MessageDebouncer(window_ms=20)
+    first, other, command = message(1, "agenda"), message(2, "oi", user_id=2), message(3, "/help")
+    for update in (first, other, command):
+        debouncer.note_arrival(update)
+
+    assert debouncer.collect(first) == "agenda"
+    assert debouncer.collect(other) == "oi"
+    assert debouncer.collect(command) is None and not debouncer.skip(command)
+
+
+def test_answer_skipped_from_the_batch_is_not_merged():
+    debouncer = MessageDebouncer(window_ms=20)
+    question_answer, next_request = message(1, "14h"), message(2, "o que tenho hoje?")
+    debouncer.note_arrival(question_answer)
+    debouncer.note_arrival(next_request)
+
+    # Resposta a uma pergunta do bot é tratada sozinha
+    assert not debouncer.skip(question_answer)
+    assert debouncer.collect(next_request) == "o que tenho hoje?"
+
+
+def test_wait_is_capped_while_the_user_keeps_typing():
+    debouncer = MessageDebouncer(window_ms=30, max_wait_ms=90)
+    first = message(1, "reunião")
+    debouncer.note_arrival(first)
+
+    async def keep_typing():
+        for message_id in range(2, 60):
+            await asyncio.sleep(0.01)
+            debouncer.note_arrival(message(message_id, "e"))
+
+    async def scenario():
+        typing = asyncio.create_task(keep_typing())
+        started = time.monotonic()
+        await debouncer.wait_quiet(first)
+        waited = time.monotonic() - started
+        typing.cancel()
+        return waited
+
+    waited = asyncio.run(scenario())
+
+    # Sem o limite, esperaria os 0,6 s de digitação
+    assert 0.08 <= waited < 0.4
@@ -0,0 +1,105 @@
+"""
+Resumo diário: checkpoint gravado a cada usuário e novas tentativas na mesma execução.
+"""
+
+import asyncio
+from collections import Counter
+from datetime import date
+
+import pytest
+
+pytz = pytest.importorskip("pytz")
+pytest.importorskip("telegram")
+
+from digest import DigestCheckpoint, DigestPipeline
+
+DAY = date(2026, 10, 19)
+
+EVENT = {'start': {'dateTime': '2026-10-19T09:00:00-03:00'},
+         'end': {'dateTime': '2026-10-19T10:00:00-03:00'}, 'summary': 'Reunião'}
+
+
+class FakeCalendarManager:
+    """Agenda com um evento; os usuários em failures falham nas primeiras chamadas"""
+
+    def __init__(self, failures=None):
+        self.failures = Counter(failures or {})
+        self.calls = Counter()
+
+    def list_events(self, user_id, time_min=None, time_max=None, max_results=10):
+        self.calls[user_id] += 1
+        if self.failures[user_id] > 0:
+            self.failures[user_id] -= 1
+            return False, "Erro ao listar eventos: timeout"
+        return True, [EVENT]
+
+
+class FakeBot:
+    """Registra os envios"""
+
+    def __init__(self):
+        self.sent = Counter()
+
+    async def send_message(self, chat_id, text, rate_limit_args=None):
+        self.sent[chat_id] += 1
+
+
+def make_pipeline(tmp_path, calendar_manager, bot, users, retries=2):
+    return DigestPipeline(
+        bot, calendar_manager, list_users=lambda: iter(users),
+        checkpoint=DigestCheckpoint(str(tmp_path / "checkpoint.txt")),
+        timezone=pytz.timezone('America/Sao_Paulo'),
+        concurrency=2, send_concurrency=2, api_rate=1000,
+        retries=retries, retry_delay=0
+    )
+
+
+def test_marks_reach_the_file_before_close(tmp_path):
+    path = str(tmp_path / "checkpoint.txt")
+    checkpoint = DigestCheckpoint(path)
+    checkpoint.open(DAY)
+    checkpoint.mark("101")
+    checkpoint.mark("102")
+
+    # Sem close nem sync explícito: é o que um processo morto deixa no arquivo
+    done, finished = DigestCheckpoint(path).load(DAY)
+
+    assert done == {"101", "102"} and not finished
+
+
+def test_resume_skips_marked_users(tmp_path):
+    users = [str(100 + index) for index in range(10)]
+    checkpoint = DigestCheckpoint(str(tmp_path / "checkpoint.txt"))
+    checkpoint.open(DAY)
+    for user_id in users[:4]:
+        checkpoint.mark(user_id)
+    bot = FakeBot()
+
+    stats = asyncio.run(make_pipeline(tmp_path, FakeCalendarManager(), bot, users).run(DAY))
+
+    assert stats['skipped'] == 4 and stats['sent'] == 6
+    assert set(bot.sent) == {int(user_id) for user_id in users[4:]}
+
+
+def test_failed_users_are_retried_in_the_same_run(tmp_path):
+    users = ["101", "102", "103"]
+    calendar_manager = FakeCalendarManager(failures={"102": 2})
+    bot = FakeBot()
+
+    stats = asyncio.run(make_pipeline(tmp_path, calendar_manager, bot, users).run(DAY))
+
+    assert bot.sent == Counter({101: 1, 102: 1, 103: 1})
+    assert calendar_manager.calls["102"] == 3
+    assert stats['failed'] == 0 and stats['retried'] == 2
+    assert DigestCheckpoint(str(tmp_path / "checkpoint.txt")).load(DAY) == (set(users), True)
+
+
+def test_users_still_failing_stay_out_of_the_checkpoint(tmp_path):
+    users = ["101", "102"]
+    bot = FakeBot()
+
+    stats = asyncio.run(make_pipeline(tmp_path, FakeCalendarManager(failures={"102": 5}), bot, users,
+                                      retries=1).run(DAY))
+
+    assert stats['failed'] == 1 and stats['retried'] == 1
+    assert DigestCheckpoint(str(tmp_path / "checkpoint.txt")).load(DAY) == ({"101"}, False)
@@ -0,0 +1,99 @@
+"""
+Modelo de intenções contra um modelo minúsculo com pesos aleatórios, montado em um
+diretório temporário: nenhum download e nenhum acesso à rede.
+"""
+
+import time
+from concurrent.futures import Future
+
+import pytest
+
+from intent_model import INTENT_LABELS, TransformerIntentModel
+from nlp_processor import NLPProcessor
+
+# Texto que as regras não reconhecem: só o modelo pode dar uma intenção
+UNKNOWN_TEXT = "blá blá blá"
+
+VOCAB = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]",
+         "blá", "marcar", "reunião", "amanhã", "agenda", "hoje"]
+
+@pytest.fixture(scope="module")
+def model_dir(tmp_path_factory):
+    """Salva um tokenizer e um classificador BERT aleatório com os rótulos do bot"""
+    torch = pytest.importorskip("torch")
+    transformers = pytest.importorskip("transformers")
+    directory = tmp_path_factory.mktemp("intent-model")
+    vocab_file = directory / "vocab.txt"
+    vocab_file.write_text("\n".join(VOCAB) + "\n")
+    transformers.BertTokenizer(vocab_file=str(vocab_file)).save_pretrained(directory)
+
+    torch.manual_seed(0)
+    config = transformers.BertConfig(
+        vocab_size=len(VOCAB), hidden_size=8, num_hidden_layers=1, num_attention_heads=2,
+        intermediate_size=16, max_position_embeddings=32, num_labels=len(INTENT_LABELS),
+        id2label=dict(enumerate(INTENT_LABELS)),
+        label2id={label: index for index, label in enumerate(INTENT_LABELS)})
+    transformers.BertForSequenceClassification(config).save_pretrained(directory)
+    return str(directory)
+
+@pytest.fixture
+def processor(model_dir, monkeypatch):
+    """NLPProcessor com o modelo carregado, em modo offline"""
+    monkeypatch.setenv("HF_HUB_OFFLINE", "1")
+    monkeypatch.setenv("TRANSFORMERS_OFFLINE", "1")
+    nlp = NLPProcessor(model_dir=model_dir, cache_size=0)
+    assert nlp.intent_model.wait_ready(timeout=60), nlp.intent_model.get_stats()['load_error']
+    return nlp
+
+def test_model_prediction_is_used_for_unknown_text(processor):
+    processor.intent_model.min_confidence = 0.0
+
+    result = processor.process_message(UNKNOWN_TEXT)
+
+    assert result.intent in INTENT_LABELS
+    stats = processor.intent_model.get_stats()
+    assert stats['items'] == 1 and stats['batches'] == 1
+
+def test_rules_skip_the_model(processor):
+    processor.intent_model.min_confidence = 0.0
+
+    assert processor.process_message("o que tenho hoje?").intent == "LIST_EVENTS"
+    assert processor.intent_model.get_stats()['items'] == 0
+
+def test_low_confidence_falls_back_to_rules(processor):
+    # Nenhuma probabilidade passa de 1: a predição é sempre descartada
+    processor.intent_model.min_confidence = 1.01
+
+    assert processor.process_message(UNKNOWN_TEXT).intent == "UNKNOWN"
+    assert processor.intent_model.get_stats()['items'] == 1
+
+def test_timeout_falls_back_to_rules(processor, monkeypatch):
+    processor.intent_model.min_confidence = 0.0
+    # Um lote que nunca termina: predict desiste após o prazo
+    monkeypatch.setattr(processor.intent_model, "submit", lambda text: Future())
+
+    assert processor.process_message(UNKNOWN_TEXT).intent == "UNKNOWN"
+
+def test_batches_concurrent_messages(processor):
+    processor.intent_model.min_confidence = 0.0
+    processor.intent_model.max_wait = 0.2
+
+    futures = [processor.intent_model.submit(UNKNOWN_TEXT) for _ in range(4)]
+    results = [future.result(timeout=10) for future in futures]
+
+    assert all(intent in INTENT_LABELS and 0.0 <= confidence <= 1.0 for intent, confidence in results)
+    # Resultados idênticos para o mesmo texto, qualquer que seja a posição no lote
+    assert len(set(results)) == 1
+    assert processor.intent_model.get_stats()['avg_batch_size'] > 1
+
+def test_backlog_is_batched_after_the_deadline(tmp_path):
+    # Diretório vazio: o carregamento falha e nenhum worker consome a fila
+    model = TransformerIntentModel(str(tmp_path), max_batch_size=4, max_wait_ms=10)
+    model.wait_ready(timeout=60)
+    # Mensagens que esperam há mais que max_wait: o lote não pode sair com uma só
+    enqueued = time.perf_counter() - 1.0
+    for index in range(6):
+        model._queue.put((f"texto {index}", Future(), enqueued))
+
+    assert len(model._collect_batch()) == 4
+    assert len(model._collect_batch()) == 2
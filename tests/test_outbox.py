@@ -0,0 +1,162 @@
+"""
+Outbox compartilhada entre workers: retomada depois de uma queda, entrega de usuários entre
+workers (release/claim) e repetições que a API já tinha aplicado (409 e 404).
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+pytest.importorskip("googleapiclient")
+
+from calendar_manager import CalendarError
+from outbox import MutationOutbox
+from sharding import ConsistentHashRing, in_ranges
+
+USERS = [str(user_id) for user_id in range(100, 140)]
+
+
+class FakeCalendarManager:
+    """Registra as chamadas; com down, responde 503 como a API fora do ar"""
+
+    def __init__(self, down=False):
+        self.down = down
+        self.calls = []
+        self.events = {}
+        self.lock = threading.Lock()
+
+    def create_event(self, user_id, event_id, summary):
+        with self.lock:
+            self.calls.append((user_id, 'create_event', summary))
+            if self.down:
+                return False, CalendarError("indisponível", 503)
+            if (user_id, event_id) in self.events:
+                return False, CalendarError("duplicado", 409)
+            self.events[(user_id, event_id)] = {'id': event_id, 'summary': summary}
+            return True, self.events[(user_id, event_id)]
+
+    def delete_event(self, user_id, event_id):
+        with self.lock:
+            self.calls.append((user_id, 'delete_event', event_id))
+            if self.down:
+                return False, CalendarError("indisponível", 503)
+            if self.events.pop((user_id, event_id), None) is None:
+                return False, CalendarError("não encontrado", 404)
+            return True, "Evento excluído"
+
+    def get_event_by_id(self, user_id, event_id):
+        with self.lock:
+            event = self.events.get((user_id, event_id))
+            return (True, event) if event else (False, CalendarError("não encontrado", 404))
+
+
+def make_outbox(path, calendar_manager, **kwargs):
+    kwargs.setdefault('recover', False)
+    return MutationOutbox(calendar_manager, str(path), workers=2, base_delay=0.01, max_delay=0.05,
+                          max_attempts=100, **kwargs)
+
+
+async def settle(outbox, timeout=5):
+    """Aguarda a outbox esvaziar e registrar o último envio"""
+    for _ in range(int(timeout / 0.01)):
+        if outbox.get_stats()['pending'] == 0 and not outbox._flushing:
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"outbox não esvaziou: {outbox.get_stats()}")
+
+
+def test_pending_mutations_of_a_dead_worker_are_replayed_by_the_new_owners(tmp_path):
+    db = tmp_path / "outbox.db"
+    ring = ConsistentHashRing(vnodes=16)
+    ring.add(0)
+    down = FakeCalendarManager(down=True)
+    up = FakeCalendarManager()
+
+    async def scenario():
+        # Worker 0 grava as alterações, mas a API está fora e ele morre sem enviá-las
+        dead = make_outbox(db, down)
+        await dead.start()
+        await dead.claim(lambda user_id: in_ranges(user_id, ring.ranges_of(0)))
+        for user_id in USERS:
+            for index in range(3):
+                await dead.submit(user_id, 'create_event', summary=f"evento {index}")
+        await dead.stop()
+
+        # Substituto e outro worker dividem os trechos do morto
+        before = ring.copy()
+        ring.remove(0)
+        ring.add(1)
+        ring.add(2)
+        survivors = {node: make_outbox(db, up, on_result=lambda *_: asyncio.sleep(0)) for node in (1, 2)}
+        for node, outbox in survivors.items():
+            await outbox.start()
+            await outbox.claim(lambda user_id, node=node: in_ranges(user_id, ring.gained_ranges(before)[node]))
+        for outbox in survivors.values():
+            await settle(outbox)
+            await outbox.stop()
+        return survivors
+
+    survivors = asyncio.run(scenario())
+
+    assert sum(outbox.recovered for outbox in survivors.values()) == 3 * len(USERS)
+    for user_id in USERS:
+        assert [call[2] for call in up.calls if call[0] == user_id] == ["evento 0", "evento 1", "evento 2"]
+    # Nada ficou no banco
+    assert make_outbox(db, up)._load_pending() == []
+
+
+def test_released_users_are_sent_only_by_the_new_owner(tmp_path):
+    db = tmp_path / "outbox.db"
+    calendar_manager = FakeCalendarManager(down=True)
+    moved = set(USERS[:10])
+
+    async def scenario():
+        old = make_outbox(db, calendar_manager, on_result=lambda *_: asyncio.sleep(0))
+        await old.start()
+        for user_id in USERS:
+            await old.submit(user_id, 'create_event', summary="reunião")
+        await asyncio.sleep(0.05)  # Novas tentativas agendadas
+
+        released = await old.release(lambda user_id: user_id in moved)
+        calls_at_release = len(calendar_manager.calls)
+        await asyncio.sleep(0.1)
+        old_calls_after = [call for call in calendar_manager.calls[calls_at_release:] if call[0] in moved]
+
+        calendar_manager.down = False
+        new = make_outbox(db, calendar_manager, on_result=lambda *_: asyncio.sleep(0))
+        await new.start()
+        claimed = await new.claim(lambda user_id: user_id in moved)
+        await settle(new)
+        await settle(old)
+        await new.stop()
+        await old.stop()
+        return released, claimed, old_calls_after, old.get_stats(), new.get_stats()
+
+    released, claimed, old_calls_after, old_stats, new_stats = asyncio.run(scenario())
+
+    assert released == claimed == len(moved)
+    assert old_calls_after == []
+    assert old_stats['succeeded'] == len(USERS) - len(moved) and new_stats['succeeded'] == len(moved)
+    # Cada evento foi criado uma única vez
+    assert len(calendar_manager.events) == len(USERS)
+
+
+def test_replayed_create_and_delete_count_as_done(tmp_path):
+    calendar_manager = FakeCalendarManager()
+    # Aplicados antes da queda, que ocorreu antes de a outbox registrar o envio
+    calendar_manager.events[("100", "abc")] = {'id': "abc", 'summary': "reunião"}
+
+    async def scenario():
+        outbox = make_outbox(tmp_path / "outbox.db", calendar_manager)
+        await outbox.start()
+        _, created = await outbox.submit("100", 'create_event', event_id="abc", summary="reunião")
+        _, deleted = await outbox.submit("101", 'delete_event', event_id="sumiu")
+        outcome = await asyncio.gather(created, deleted)
+        await outbox.stop()
+        return outcome
+
+    (created_ok, event), (deleted_ok, _) = asyncio.run(scenario())
+
+    assert created_ok and event['id'] == "abc"
+    assert deleted_ok
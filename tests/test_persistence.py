@@ -0,0 +1,80 @@
+"""
+Persistência do estado de conversa: carga preguiçosa, gravação em lote e entrega a outro worker.
+"""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("telegram")
+
+from models import PendingEvent
+from persistence import SQLitePersistence
+
+
+def test_state_is_loaded_only_on_the_first_update(tmp_path):
+    db = str(tmp_path / "state.db")
+
+    async def scenario():
+        writer = SQLitePersistence(db)
+        await writer.refresh_user_data(1, {})
+        await writer.update_user_data(1, {
+            'state': 'AWAITING_TIME', '_agenda': object(),
+            'pending_event': PendingEvent(date='2026-10-20', summary='Reunião'),
+        })
+        await writer.flush()
+
+        reader = SQLitePersistence(db)
+        initial = await reader.get_user_data()
+        loads_before_update = reader.loads
+        user_data = {}
+        await reader.refresh_user_data(1, user_data)
+        await reader.refresh_user_data(1, user_data)
+        return initial, loads_before_update, reader.loads, user_data
+
+    initial, loads_before_update, loads, user_data = asyncio.run(scenario())
+
+    assert initial == {} and loads_before_update == 0 and loads == 1
+    assert user_data['state'] == 'AWAITING_TIME'
+    assert '_agenda' not in user_data
+    assert isinstance(user_data['pending_event'], PendingEvent)
+    assert user_data['pending_event']['summary'] == 'Reunião'
+
+
+def test_updates_in_the_same_tick_are_written_in_one_batch(tmp_path):
+    async def scenario():
+        persistence = SQLitePersistence(str(tmp_path / "state.db"))
+        for user_id in range(50):
+            await persistence.refresh_user_data(user_id, {})
+        for user_id in range(50):
+            await persistence.update_user_data(user_id, {'state': 'NORMAL', 'n': user_id})
+        await persistence.flush()
+        return persistence.get_stats()
+
+    stats = asyncio.run(scenario())
+
+    assert stats['batches'] == 1 and stats['rows_written'] == 50
+
+
+def test_released_user_is_read_by_the_new_owner(tmp_path):
+    db = str(tmp_path / "state.db")
+
+    async def scenario():
+        old = SQLitePersistence(db)
+        new = SQLitePersistence(db)
+        await old.refresh_user_data(7, {})
+        await old.release_user(7, {'state': 'AWAITING_SUMMARY'})
+        # Gravação atrasada do PTB no worker antigo: não pode sobrescrever o estado entregue
+        await old.update_user_data(7, {'state': 'NORMAL'})
+        await old.flush()
+
+        # Estado importado pelo pipe é mais recente que o do banco
+        user_data = {'imported': True}
+        await new.refresh_user_data(7, user_data)
+        await new.flush()
+        return old.get_stats(), user_data
+
+    old_stats, user_data = asyncio.run(scenario())
+
+    assert old_stats['loaded_users'] == 0
+    assert user_data == {'imported': True, 'state': 'AWAITING_SUMMARY'}
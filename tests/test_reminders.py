@@ -0,0 +1,94 @@
+"""
+Lembretes: roda de temporização (descida entre níveis, cancelamento, horizonte) e agrupamento por usuário.
+"""
+
+import time
+import random
+
+import pytest
+
+pytz = pytest.importorskip("pytz")
+
+from reminders import Reminder, ReminderScheduler, TimerWheel
+
+
+def timer(key, expires, user_id="42"):
+    return Reminder(key, user_id, start=expires, summary=key, expires=expires)
+
+
+def run_wheel(wheel, until):
+    """Avança tick a tick, devolvendo {chave: tick em que disparou}"""
+    fired = {}
+    for tick in range(wheel.current + 1, until + 1):
+        for item in wheel.advance(now=tick * wheel.tick):
+            fired[item.key] = tick
+    return fired
+
+
+def test_every_timer_fires_on_its_tick_across_levels():
+    # Níveis de 4 posições: 4, 16 e 64 ticks de alcance
+    wheel = TimerWheel(tick=1, slots=(4, 4, 4), now=0)
+    for expires in range(1, 64):
+        assert wheel.insert(timer(f"t{expires}", expires))
+
+    fired = run_wheel(wheel, 70)
+
+    assert fired == {f"t{expires}": expires for expires in range(1, 64)}
+    assert len(wheel) == 0
+
+
+def test_timers_inserted_while_the_wheel_turns_fire_on_time():
+    random.seed(1)
+    wheel = TimerWheel(tick=1, slots=(4, 4, 4), now=0)
+    expected, fired = {}, {}
+    for step in range(300):
+        # Prazos a partir do tick atual, inclusive perto das viradas de cada nível
+        expires = wheel.current + random.randint(1, 48)
+        key = f"t{step}"
+        assert wheel.insert(timer(key, expires))
+        expected[key] = expires
+        fired.update(run_wheel(wheel, wheel.current + random.randint(0, 3)))
+    fired.update(run_wheel(wheel, wheel.current + 64))
+
+    assert fired == expected
+
+
+def test_cancel_and_reschedule_in_upper_levels():
+    wheel = TimerWheel(tick=1, slots=(4, 4, 4), now=0)
+    wheel.insert(timer("cancelado", 40))
+    wheel.insert(timer("movido", 50))
+    wheel.insert(timer("fica", 20))
+
+    assert wheel.cancel("cancelado") and not wheel.cancel("cancelado")
+    wheel.insert(timer("movido", 9))
+
+    assert run_wheel(wheel, 64) == {"movido": 9, "fica": 20}
+
+
+def test_past_deadlines_fire_next_tick_and_the_horizon_is_enforced():
+    wheel = TimerWheel(tick=1, slots=(4, 4, 4), now=10)
+
+    assert wheel.insert(timer("atrasado", 3))
+    assert not wheel.insert(timer("longe", 10 + 64))
+    assert run_wheel(wheel, 12) == {"atrasado": 11}
+
+
+def test_scheduler_groups_reminders_per_user_and_follows_changes():
+    scheduler = ReminderScheduler(send=None, timezone=pytz.timezone('America/Sao_Paulo'), lead_minutes=10)
+    start = (time.time() // 60 + 60) * 60  # Daqui a ~1h, no início de um minuto
+
+    def api_event(event_id, offset=0, **extra):
+        moment = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(start + offset))
+        return {'id': event_id, 'summary': event_id, 'start': {'dateTime': moment}, **extra}
+
+    scheduler.track("1", [api_event("b", offset=30), api_event("a"), api_event("dia", start={'date': '2026-10-19'})])
+    scheduler.track("2", [api_event("c"), api_event("cancelado", status='cancelled')])
+    scheduler.on_calendar_change("2", deleted_event_id="c")
+    scheduler.on_calendar_change("1", event=api_event("d", offset=3600))
+
+    batches = scheduler.due(now=start - 600 + 1)
+
+    assert {user_id: [item.key for item in items] for user_id, items in batches.items()} == {"1": ["1:a", "1:b"]}
+    assert scheduler.get_stats()['pending'] == 1 and scheduler.get_stats()['cancelled'] == 1
+    text = scheduler.render(batches["1"], now=start - 600)
+    assert text.startswith("⏰ Lembretes:") and "(em 10 min)" in text
@@ -0,0 +1,128 @@
+"""
+Anel de hashing consistente e despachante, com workers simulados no próprio processo.
+"""
+
+import asyncio
+
+import pytest
+
+import sharding
+from sharding import ConsistentHashRing, ShardedDispatcher, in_ranges
+
+USERS = range(1, 3001)
+
+
+class FakeProcess:
+    def __init__(self):
+        self.alive = True
+
+    def is_alive(self):
+        return self.alive
+
+    def join(self, timeout=None):
+        pass
+
+    def kill(self):
+        self.alive = False
+
+    terminate = kill
+
+
+class FakeWorker:
+    """Worker simulado: guarda as mensagens; morto, o pipe quebra como o de um processo real"""
+
+    def __init__(self, worker_id, context):
+        self.worker_id = worker_id
+        self.process = FakeProcess()
+        self.received = []
+        self.users = set()
+
+    async def send(self, message):
+        if not self.process.alive:
+            raise BrokenPipeError(32, "Broken pipe")
+        self.received.append(message)
+        if message[0] == 'import':
+            self.users.update(message[1])
+
+    async def request(self, message):
+        await self.send(message)
+        # Exporta os usuários "em memória" nos trechos pedidos
+        leaving = {user_id for user_id in self.users if in_ranges(user_id, message[1])}
+        self.users -= leaving
+        return 'state', {user_id: {'state': 'NORMAL'} for user_id in leaving}
+
+
+@pytest.fixture
+def dispatcher(monkeypatch):
+    monkeypatch.setattr(sharding, "_Worker", FakeWorker)
+    dispatcher = ShardedDispatcher(3)
+    for _ in range(3):
+        dispatcher._spawn()
+    return dispatcher
+
+
+def update_from(user_id):
+    return {'update_id': user_id, 'message': {'from': {'id': user_id}, 'text': 'oi'}}
+
+
+def test_moved_ranges_cover_exactly_the_users_that_changed_owner():
+    ring = ConsistentHashRing(vnodes=32)
+    for node in range(3):
+        ring.add(node)
+    before = ring.copy()
+    ring.add(3)
+
+    moved = ring.moved_ranges(before)
+
+    for user_id in USERS:
+        old, new = before.get(user_id), ring.get(user_id)
+        assert in_ranges(user_id, moved.get(old, [])) == (old != new)
+
+
+def test_gained_ranges_partition_the_ring_by_new_owner():
+    ring = ConsistentHashRing(vnodes=32)
+    for node in range(4):
+        ring.add(node)
+    before = ring.copy()
+    ring.remove(1)
+
+    gained = ring.gained_ranges(before)
+
+    for user_id in USERS:
+        owner = ring.get(user_id)
+        assert in_ranges(user_id, ring.ranges_of(owner))
+        assert not any(in_ranges(user_id, ring.ranges_of(node)) for node in (0, 2, 3) if node != owner)
+        assert in_ranges(user_id, gained.get(owner, [])) == (before.get(user_id) == 1)
+
+
+def test_dispatch_replaces_a_dead_worker_and_redelivers(dispatcher):
+    user_id = 42
+    dead = dispatcher.ring.get(user_id)
+    dispatcher._workers[dead].process.alive = False
+
+    asyncio.run(dispatcher.dispatch(update_from(user_id)))
+
+    owner = dispatcher.ring.get(user_id)
+    assert owner != dead and dead not in dispatcher._workers
+    assert ('update', update_from(user_id)) in dispatcher._workers[owner].received
+    assert len(dispatcher._workers) == 3 and dispatcher.routed == 1
+
+
+def test_add_and_remove_worker_move_state_to_the_ring_owner(dispatcher):
+    # Cada worker começa com os usuários que são seus no anel
+    for user_id in USERS:
+        dispatcher._workers[dispatcher.ring.get(user_id)].users.add(user_id)
+
+    async def scenario():
+        added = await dispatcher.add_worker()
+        claims = [message for message in dispatcher._workers[added].received if message[0] == 'claim']
+        assert claims and all(in_ranges(user_id, claims[0][1])
+                              for user_id in USERS if dispatcher.ring.get(user_id) == added)
+        placed_after_add = all(user_id in dispatcher._workers[dispatcher.ring.get(user_id)].users
+                               for user_id in USERS)
+        await dispatcher.remove_worker(added)
+        return placed_after_add
+
+    assert asyncio.run(scenario())
+    for user_id in USERS:
+        assert user_id in dispatcher._workers[dispatcher.ring.get(user_id)].users
@@ -0,0 +1,101 @@
+"""
+Processador de updates: ordem por usuário, paralelismo entre usuários e espera pelo fim da fila.
+"""
+
+import random
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("telegram")
+
+from update_processor import PerUserUpdateProcessor
+
+
+def update_from(user_id):
+    return SimpleNamespace(effective_user=SimpleNamespace(id=user_id), effective_chat=None)
+
+
+class Recorder:
+    """Registra a ordem de execução e o pico de updates simultâneos"""
+
+    def __init__(self):
+        self.order = {}
+        self.running = 0
+        self.peak = 0
+
+    async def handle(self, user_id, index):
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        await asyncio.sleep(random.uniform(0, 0.005))
+        self.order.setdefault(user_id, []).append(index)
+        self.running -= 1
+
+
+async def process_all(processor, recorder, users, per_user):
+    await processor.initialize()
+    await asyncio.gather(*(
+        processor.process_update(update_from(user_id), recorder.handle(user_id, index))
+        for index in range(per_user) for user_id in users
+    ))
+
+
+def test_updates_of_each_user_run_in_arrival_order():
+    random.seed(0)
+    processor = PerUserUpdateProcessor(max_concurrent_updates=8)
+    recorder = Recorder()
+
+    asyncio.run(process_all(processor, recorder, users=range(20), per_user=10))
+
+    assert all(order == list(range(10)) for order in recorder.order.values())
+    assert recorder.peak == 8
+    assert processor.get_stats()['processed'] == 200 and processor.get_stats()['active_users'] == 0
+
+
+def test_one_busy_user_does_not_hold_the_others():
+    processor = PerUserUpdateProcessor(max_concurrent_updates=4)
+    finished = []
+
+    async def slow(release):
+        await release.wait()
+        finished.append('lento')
+
+    async def fast(user_id):
+        finished.append(user_id)
+
+    async def scenario():
+        await processor.initialize()
+        release = asyncio.Event()
+        # Cinco updates do mesmo usuário, parados, enfileirados antes dos demais
+        tasks = [asyncio.create_task(processor.process_update(update_from(1), slow(release))) for _ in range(5)]
+        await asyncio.sleep(0)
+        await asyncio.gather(*(processor.process_update(update_from(user_id), fast(user_id)) for user_id in range(2, 6)))
+        release.set()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(scenario())
+
+    assert finished == [2, 3, 4, 5] + ['lento'] * 5
+
+
+def test_wait_idle_returns_after_the_accepted_updates():
+    processor = PerUserUpdateProcessor()
+    done = []
+
+    async def handle(index):
+        await asyncio.sleep(0.01)
+        done.append(index)
+
+    async def scenario():
+        await processor.initialize()
+        tasks = [asyncio.create_task(processor.process_update(update_from(7), handle(index))) for index in range(3)]
+        await asyncio.sleep(0)
+        busy = processor.is_busy(7)
+        await processor.wait_idle(7)
+        await asyncio.gather(*tasks)
+        return busy
+
+    assert asyncio.run(scenario())
+    assert done == [0, 1, 2]
+    assert not processor.is_busy(7)
@@ -0,0 +1,88 @@
+"""
+Servidor do webhook contra conexões reais em uma porta local.
+"""
+
+import json
+import asyncio
+
+import pytest
+
+from webhook_server import SECRET_HEADER, WebhookServer
+
+SECRET = "segredo-de-teste"
+
+
+async def request(port, method, path, headers=None, body=b''):
+    """Envia uma requisição HTTP/1.1 e devolve (status, corpo)"""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    lines = [f"{method} {path} HTTP/1.1", "Host: teste", f"Content-Length: {len(body)}", "Connection: close"]
+    lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, payload = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), payload
+
+
+@pytest.fixture
+def serve():
+    """Roda o cenário com um servidor em uma porta livre"""
+    def run(scenario, **kwargs):
+        async def main():
+            received = []
+
+            async def handle_update(update):
+                received.append(update)
+
+            server = WebhookServer(handle_update, secret_token=SECRET, host='127.0.0.1', port=0, **kwargs)
+            await server.start()
+            try:
+                port = server._server.sockets[0].getsockname()[1]
+                return await scenario(port, received)
+            finally:
+                await server.stop()
+        return asyncio.run(main())
+    return run
+
+
+def test_update_requires_secret(serve):
+    async def scenario(port, received):
+        denied = await request(port, 'POST', '/telegram', body=b'{"update_id": 1}')
+        accepted = await request(port, 'POST', '/telegram', {SECRET_HEADER: SECRET}, b'{"update_id": 2}')
+        await asyncio.sleep(0.05)
+        return denied[0], accepted[0], received
+
+    denied, accepted, received = serve(scenario)
+
+    assert (denied, accepted) == (401, 200)
+    assert received == [{'update_id': 2}]
+
+
+def test_healthz_requires_secret(serve):
+    async def scenario(port, received):
+        anonymous = await request(port, 'GET', '/healthz')
+        wrong = await request(port, 'GET', '/healthz', {SECRET_HEADER: 'outro'})
+        authorized = await request(port, 'GET', '/healthz', {SECRET_HEADER: SECRET})
+        return anonymous, wrong, authorized
+
+    anonymous, wrong, authorized = serve(scenario, extra_stats={'outbox': lambda: {'pending': 3}})
+
+    assert anonymous == (401, b'') and wrong == (401, b'')
+    assert authorized[0] == 200
+    assert json.loads(authorized[1])['outbox'] == {'pending': 3}
+
+
+def test_oversized_body_closes_connection(serve):
+    async def scenario(port, received):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(b"POST /telegram HTTP/1.1\r\nContent-Length: 99999999\r\n\r\n")
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        return response
+
+    response = serve(scenario)
+
+    assert response.startswith(b"HTTP/1.1 413 ")
+    assert b"Connection: close" in response